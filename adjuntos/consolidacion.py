@@ -2,6 +2,7 @@ from django.conf import settings
 import structlog
 from adjuntos.models import Attachment, Identificacion
 from elecciones.models import Carga, MesaCategoria
+from elecciones.contadores_avance import actualizando_contadores
 from fiscales.models import Fiscal
 from django.db import transaction
 from django.db.models import Count, Q
@@ -14,6 +15,7 @@ from antitrolling.efecto import (
     efecto_scoring_troll_asociacion_attachment, efecto_scoring_troll_confirmacion_carga
 )
 from sentry_sdk import capture_message
+from escrutinio_social.metricas import medir
 
 logger = structlog.get_logger(__name__)
 
@@ -234,30 +236,61 @@ def consolidar_identificaciones(attachment):
     # me acuerdo la mesa anterior por si se esta pasando a sin_identificar
     mesa_anterior = attachment.mesa
 
-    for attachment in attachment.with_children():
-        # si tiene hijos se asigna la misma mesa.
-
-        # Identifico el attachment y potencialmente sus attachment hijos.
-        # Notar que esta identificación podría estar sumando al attachment a una mesa que ya tenga.
-        # Eso es correcto.
-        # También podría estar haciendo pasar una attachment identificado al estado sin_identificar,
-        # porque ya no está más vigente alguna identificación que antes sí.
-        attachment.status = status_attachment
-        attachment.mesa = mesa_attachment
-        if attachment.parent is None:
-            attachment.identificacion_testigo = testigo
-        attachment.save(update_fields=['mesa', 'status', 'identificacion_testigo'])
-        logger.info(
-            'Consolid. identificación',
-            attachment=attachment.id,
-            testigo=getattr(attachment.identificacion_testigo, 'id', None),
-            status=status_attachment
-        )
+    attachments = list(attachment.with_children())
+    # Los cambios se reflejan en los contadores del resumen de avance.
+    afectados = dict(
+        mesas={getattr(mesa_anterior, 'id', None), getattr(mesa_attachment, 'id', None)} | {
+            attachment.mesa_id for attachment in attachments
+        },
+        fotos=[attachment.id for attachment in attachments],
+        preidentificaciones=[attachment.pre_identificacion_id for attachment in attachments],
+    )
+    with actualizando_contadores(**afectados):
+        for attachment in attachments:
+            # si tiene hijos se asigna la misma mesa.
+
+            # Identifico el attachment y potencialmente sus attachment hijos.
+            # Notar que esta identificación podría estar sumando al attachment a una mesa que ya tenga.
+            # Eso es correcto.
+            # También podría estar haciendo pasar una attachment identificado al estado sin_identificar,
+            # porque ya no está más vigente alguna identificación que antes sí.
+            attachment.status = status_attachment
+            attachment.mesa = mesa_attachment
+            if attachment.parent is None:
+                attachment.identificacion_testigo = testigo
+            attachment.save(update_fields=['mesa', 'status', 'identificacion_testigo'])
+            logger.info(
+                'Consolid. identificación',
+                attachment=attachment.id,
+                testigo=getattr(attachment.identificacion_testigo, 'id', None),
+                status=status_attachment
+            )
+
+        # Si el attachment pasa de tener una mesa a no tenerla, entonces hay que invalidar
+        # todo lo que se haya cargado para las MesaCategoria de la mesa que perdió su attachment.
+        if mesa_anterior and not mesa_attachment:
+            mesa_anterior.invalidar_asignacion_attachment()
 
-    # Si el attachment pasa de tener una mesa a no tenerla, entonces hay que invalidar
-    # todo lo que se haya cargado para las MesaCategoria de la mesa que perdió su attachment.
-    if mesa_anterior and not mesa_attachment:
-        mesa_anterior.invalidar_asignacion_attachment()
+
+def identificaciones_a_consolidar(desde):
+    """
+    Identificaciones sin procesar que no están tomadas por un consolidador, o que
+    fueron tomadas antes de ``desde`` (y se asume que ese consolidador falló).
+    """
+    return Identificacion.objects.filter(
+        Q(tomada_por_consolidador__isnull=True) | Q(tomada_por_consolidador__lt=desde),
+        procesada=False
+    )
+
+
+def cargas_a_consolidar(desde):
+    """
+    Ídem :func:`identificaciones_a_consolidar` para las cargas.
+    """
+    return Carga.objects.filter(
+        Q(tomada_por_consolidador__isnull=True) | Q(tomada_por_consolidador__lt=desde),
+        procesada=False,
+    )
 
 
 def consumir_novedades_identificacion(cant_por_iteracion=None):
@@ -265,12 +298,7 @@ def consumir_novedades_identificacion(cant_por_iteracion=None):
     desde = ahora - timedelta(minutes=settings.TIMEOUT_CONSOLIDACION)
     with transaction.atomic():
         # Lo hacemos en una transacción para no competir con otros consolidadores.
-        a_procesar = Identificacion.objects.select_for_update(
-            skip_locked=True
-        ).filter(
-            Q(tomada_por_consolidador__isnull=True) | Q(tomada_por_consolidador__lt=desde),
-            procesada=False
-        )
+        a_procesar = identificaciones_a_consolidar(desde).select_for_update(skip_locked=True)
         if cant_por_iteracion:
             a_procesar = a_procesar[0:cant_por_iteracion]
         # OJO - acá precomputar los ids_a_procesar es importante
@@ -340,12 +368,7 @@ def consumir_novedades_carga(cant_por_iteracion=None):
     desde = ahora - timedelta(minutes=settings.TIMEOUT_CONSOLIDACION)
     with transaction.atomic():
         # Lo hacemos en una transacción para no competir con otros consolidadores.
-        a_procesar = Carga.objects.select_for_update(
-            skip_locked=True
-        ).filter(
-            Q(tomada_por_consolidador__isnull=True) | Q(tomada_por_consolidador__lt=desde),
-            procesada=False,
-        )
+        a_procesar = cargas_a_consolidar(desde).select_for_update(skip_locked=True)
         if cant_por_iteracion:
             a_procesar = a_procesar[0:cant_por_iteracion]
         ids_a_procesar = list(a_procesar.values_list('id', flat=True).all())
@@ -422,11 +445,13 @@ def consumir_novedades(cant_por_iteracion=None):
     no impidan el procesamiento de las de otro tipo (eg, carga).
     None se interpreta como sin límite.
     """
-    liberar_mesacategorias_y_attachments()
-    return (
-        consumir_novedades_identificacion(cant_por_iteracion),
-        consumir_novedades_carga(cant_por_iteracion)
-    )
+    with medir('liberar_mesacategorias_y_attachments'):
+        liberar_mesacategorias_y_attachments()
+    with medir('consumir_novedades_identificacion'):
+        n_identificaciones = consumir_novedades_identificacion(cant_por_iteracion)
+    with medir('consumir_novedades_carga'):
+        n_cargas = consumir_novedades_carga(cant_por_iteracion)
+    return n_identificaciones, n_cargas
 
 
 @receiver(post_save, sender=Attachment)
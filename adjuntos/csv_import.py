@@ -3,16 +3,18 @@ from django.http import Http404
 from django.shortcuts import get_object_or_404
 import math
 from elecciones.models import Mesa, Carga, VotoMesaReportado, Opcion, CategoriaOpcion
-from django.db import transaction
+from elecciones.registro_metadata import registro
+from django.db import connections, transaction
 from django.db.utils import IntegrityError
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from escrutinio_social import settings
+from escrutinio_social.conexiones import pool
 from fiscales.models import Fiscal
 import structlog
 from threading import Thread
 import time
 import logging
-from constance import config
+from elecciones.registro_config import config
 
 logger = logging.getLogger('csv_import')
 
@@ -168,6 +170,16 @@ class CSVImporter:
         self.procesamiento_terminado = True
         return self.resultados()
 
+    def procesar_en_hilo_propio(self):
+        """
+        Sin pool, cada importación corre en su propio hilo: al terminar se cierran las conexiones
+        que abrió, que de otro modo quedarían abiertas hasta que se recolecte el hilo.
+        """
+        try:
+            return self.procesar_post_validar()
+        finally:
+            connections.close_all()
+
     def yield_errores(self):
         """
         Entrega los errores gradualmente.
@@ -194,8 +206,12 @@ class CSVImporter:
         except Exception as e:
             self.anadir_error(str(e))
             return self.resultados()
-        t = Thread(target=self.procesar_post_validar, daemon=False)
-        t.start()
+        pool_importacion = pool('importacion_csv')
+        if pool_importacion:
+            pool_importacion.ejecutar(self.procesar_post_validar)
+        else:
+            t = Thread(target=self.procesar_en_hilo_propio, daemon=False)
+            t.start()
         return self.yield_errores()
 
     def anadir_error(self, error):
@@ -616,9 +632,11 @@ class CSVImporter:
         (correspondiente a los partidos prioritarios).
         :param categoria: Objeto de tipo Categoria que queremos verificar que esté completo.
         """
-        opciones_de_la_categoria = categoria.opciones_actuales(
-            solo_prioritarias=es_parcial, excluir_optativas=True
-        ).values_list('id', flat=True)
+        opciones_de_la_categoria = [
+            opcion.id for opcion in registro.opciones_actuales(
+                categoria, solo_prioritarias=es_parcial, excluir_optativas=True
+            )
+        ]
         opciones_votadas = carga.listado_de_opciones()
         opciones_faltantes = set(opciones_de_la_categoria) - set(opciones_votadas)
 
@@ -1,12 +1,12 @@
 from django import forms
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
-from django.db.models import Q
 
 from upload_validator import FileTypeValidator
 
 from .models import Identificacion, PreIdentificacion
 from elecciones.models import Mesa, Seccion, Circuito, Distrito
+from elecciones.registro_geografia import registro_geografia, unico
 
 from .widgets import Select
 
@@ -102,14 +102,28 @@ class IdentificacionForm(forms.ModelForm):
             kwargs["initial"]["distrito"] = circuito.seccion.distrito
         super().__init__(*args, **kwargs)
 
+    @staticmethod
+    def instancia(modelo, id, conocida=None):
+        """
+        Devuelve la instancia de ``modelo`` con el id dado. Si coincide con ``conocida``
+        (por ejemplo, la sección de la mesa ya encontrada) no se consulta la base.
+        """
+        if id is None:
+            return None
+        if conocida is not None and conocida.id == id:
+            return conocida
+        return modelo.objects.filter(id=id).first()
+
     def check_seccion(self, distrito, mesa=None):
         seccion_nro = self.fields["seccion"].clean(self.data["seccion"])
         seccion = None
 
         if seccion_nro is not None:
             # la busco en el distrito
-            lookup = Q(distrito_id=distrito.id)
-            seccion = self.fields["seccion"].get_object(seccion_nro, lookup)
+            seccion = self.instancia(
+                Seccion, unico(registro_geografia.secciones(distrito.id, seccion_nro)),
+                mesa.circuito.seccion if mesa else None
+            )
             if seccion is None:
                 # no lo encontré, la seccion no pertenece al distrito
                 self.add_error("seccion", MENSAJES_ERROR["seccion"])
@@ -132,8 +146,10 @@ class IdentificacionForm(forms.ModelForm):
         circuito = None
         if circuito_nro is not None and seccion is not None:
             # lo busco en la sección
-            lookup = Q(seccion__distrito=distrito, seccion=seccion)
-            circuito = self.fields["circuito"].get_object(circuito_nro, lookup)
+            circuito = self.instancia(
+                Circuito, unico(registro_geografia.circuitos(distrito.id, seccion.id, circuito_nro)),
+                mesa.circuito if mesa else None
+            )
             if circuito is None:
                 # no lo encontré, el circuito no pertenece a la sección
                 self.add_error("circuito", MENSAJES_ERROR["circuito"])
@@ -183,15 +199,7 @@ class IdentificacionForm(forms.ModelForm):
         self.cleaned_data["distrito"] = distrito
 
         # Intentamos obtener la mesa con distrito y número de mesa.
-        lookup_mesa = Q(circuito__seccion__distrito=distrito)
-
-        if seccion_nro:
-            lookup_mesa &= Q(circuito__seccion__numero=seccion_nro)
-
-        if circuito_nro:
-            lookup_mesa &= Q(circuito__numero__iexact=circuito_nro)
-
-        mesa = self.buscar_mesa(mesa_nro, lookup_mesa)
+        mesa = self.buscar_mesa(mesa_nro, distrito, seccion_nro, circuito_nro)
 
         # Intentamos obtener la sección y circuito con lo que tengamos
         # a nuestra disposición (distrito, mesa o los valores del form).
@@ -212,23 +220,29 @@ class IdentificacionForm(forms.ModelForm):
 
         return self.cleaned_data
 
-    def buscar_mesa(self, mesa_nro, lookup_mesa):
+    def buscar_mesa(self, mesa_nro, distrito, seccion_nro=None, circuito_nro=None):
         """
         Esta función busca una mesa en base al input que envía el usuario
         realizando una serie de normalizaciones tendientes a encontrarla por más
         que esté escrita de formas "raras".
 
         La busca de forma literal, eliminándole los ceros, sacándole su parte alfanumérica,
-        etc.
+        etc. La búsqueda se hace sobre el índice en memoria de la geografía; sólo
+        se consulta la base para traer la mesa encontrada.
         """
         # Nos aseguramos de que sea texto.
         nro_mesa = str(mesa_nro).strip()
+
+        def buscar(numero):
+            return registro_geografia.mesas(
+                distrito_id=distrito.id, numero_seccion=seccion_nro, numero_circuito=circuito_nro,
+                numero=numero
+            )
+
         # Primero busco como viene o sacando ceros adelante.
-        query_nro_mesa = Q(numero=nro_mesa) | Q(numero=nro_mesa.lstrip("0"))
-        query_nro_mesa &= lookup_mesa
-        mesa = Mesa.objects.filter(query_nro_mesa)
+        mesas = buscar(nro_mesa)
 
-        if not mesa.exists():
+        if not mesas:
             # Separo el nro de mesa dividiéndolo por letra o caracter
             # especial para buscar la primera parte del número de mesa.
             # ejemplo:
@@ -236,12 +250,12 @@ class IdentificacionForm(forms.ModelForm):
             # 47B queda como ['47', 'B']
             mesa_nro_split = re.findall(r"[A-Za-z]+|\d+|^\w", nro_mesa)
             # Busco solo la parte 1 con o sin ceros
-            query_nro_mesa = Q(numero=mesa_nro_split[0]) | Q(
-                numero=mesa_nro_split[0].lstrip("0")
-            )
-            query_nro_mesa &= lookup_mesa
-            mesa = Mesa.objects.filter(query_nro_mesa)
-        return mesa.first()
+            if mesa_nro_split:
+                mesas = buscar(mesa_nro_split[0])
+
+        if not mesas:
+            return None
+        return Mesa.objects.select_related('circuito__seccion__distrito').filter(id=min(mesas)).first()
 
 
 class PreIdentificacionForm(forms.ModelForm):
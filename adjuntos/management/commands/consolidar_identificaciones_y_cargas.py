@@ -5,6 +5,8 @@ import time
 import structlog
 
 from adjuntos.consolidacion import consumir_novedades
+from escrutinio_social.conexiones import reciclar_conexiones
+from escrutinio_social.metricas import medir
 from scheduling.scheduler import scheduler
 
 
@@ -13,7 +15,8 @@ logger = structlog.get_logger('consolidador')
 
 def consolidador(cant_por_iteracion=500, ejecutado_desde=''):
     msg = f'Consolidación desde {ejecutado_desde}' if ejecutado_desde != '' else 'Consolidación'
-    n_identificaciones, n_cargas = consumir_novedades(cant_por_iteracion)
+    with medir('consolidador', ejecutado_desde=ejecutado_desde):
+        n_identificaciones, n_cargas = consumir_novedades(cant_por_iteracion)
     logger.debug(
         msg,
         identificaciones=n_identificaciones,
@@ -35,6 +38,7 @@ class Command(BaseCommand):
         finalizar = False
         while not finalizar:
             try:
+                reciclar_conexiones()
                 consolidador(cant_por_iteracion)
                 time.sleep(settings.PAUSA_CONSOLIDACION)
             except KeyboardInterrupt:
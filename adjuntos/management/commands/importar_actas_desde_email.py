@@ -8,6 +8,7 @@ from django.db import IntegrityError
 from adjuntos.models import Email, Attachment
 from django.core.files.base import ContentFile
 from elecciones.management.commands.basic_command import BaseCommand
+from escrutinio_social.conexiones import reciclar_conexiones
 
 
 class Command(BaseCommand):
@@ -28,6 +29,7 @@ class Command(BaseCommand):
             finalizar = False
             while not finalizar:
                 try:
+                    reciclar_conexiones()
                     self.check_emails(**options)
                     time.sleep(config.PAUSA_IMPORTAR_EMAILS)
                 except KeyboardInterrupt:
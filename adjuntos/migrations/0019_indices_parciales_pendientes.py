@@ -0,0 +1,21 @@
+# Generated by Django 2.2.23 on 2026-10-19 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adjuntos', '0018_attachment_parent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attachment',
+            index=models.Index(condition=models.Q(('parent__isnull', True), ('status', 'sin_identificar')), fields=['cant_fiscales_asignados', 'cant_asignaciones_realizadas', 'id'], name='attach_sin_identificar'),
+        ),
+        migrations.AddIndex(
+            model_name='identificacion',
+            index=models.Index(condition=models.Q(procesada=False), fields=['tomada_por_consolidador', 'id'], name='ident_pendiente_consolidar'),
+        ),
+    ]
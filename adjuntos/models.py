@@ -3,7 +3,7 @@ from functools import partial
 from urllib.parse import quote_plus
 
 from django.conf import settings
-from constance import config
+from elecciones.registro_config import config
 from django.db.models import Count, Value, F
 from django.db.models.functions import Coalesce
 from django.db.models import Q
@@ -210,6 +210,17 @@ class Attachment(TimeStampedModel):
         null=False
     )
 
+    class Meta:
+        indexes = [
+            # Índice parcial para la cola de fotos por identificar (ver `sin_identificar`). Acota las
+            # filas a ordenar, pero no da el orden de `priorizadas`, que depende de la configuración.
+            models.Index(
+                fields=['cant_fiscales_asignados', 'cant_asignaciones_realizadas', 'id'],
+                name='attach_sin_identificar',
+                condition=Q(parent__isnull=True, status='sin_identificar'),
+            ),
+        ]
+
     def asignar_a_fiscal(self):
         self.cant_fiscales_asignados += 1
         self.cant_asignaciones_realizadas += 1
@@ -338,6 +349,15 @@ class Identificacion(TimeStampedModel):
     procesada = models.BooleanField(default=False)
     invalidada = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Índice parcial para las novedades que busca el consolidador.
+            models.Index(
+                fields=['tomada_por_consolidador', 'id'], name='ident_pendiente_consolidar',
+                condition=Q(procesada=False),
+            ),
+        ]
+
     def __str__(self):
         return (
             f'id: {self.id} - {self.status} - {self.mesa} - {self.fiscal} - '
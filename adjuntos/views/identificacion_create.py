@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse
 from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
 from django.views.generic.edit import CreateView
 from django.core.serializers import serialize
 from django.conf import settings
@@ -51,11 +52,15 @@ class IdentificacionCreateView(CreateView):
         else:
             return {'decision': 'mesa', 'contenido': self.identificacion().mesa.numero}
 
-    @property
+    @cached_property
     def attachment(self):
-        attachment = get_object_or_404(Attachment, id=self.kwargs['attachment_id'])
-
-        return attachment
+        # Se usa varias veces en cada request: se trae una sola vez, con la preidentificación.
+        return get_object_or_404(
+            Attachment.objects.select_related(
+                'pre_identificacion__distrito', 'pre_identificacion__seccion', 'pre_identificacion__circuito'
+            ),
+            id=self.kwargs['attachment_id']
+        )
 
     def get_initial(self):
         initial = super(CreateView, self).get_initial()
@@ -24,8 +24,8 @@ class IdentificacionCreateViewDesdeUnidadBasica(IdentificacionCreateView):
         identificacion = form.save(commit=False)
         identificacion.source = Identificacion.SOURCES.csv
         identificacion.fiscal = self.request.user.fiscal
+        # La vista base ya desasigna el attachment.
         super().form_valid(form)
-        identificacion.attachment.desasignar_a_fiscal()
         # Como viene desde una UB, consolidamos el attachment y ya le pasamos la mesa
         consolidar_identificaciones(identificacion.attachment)
         return redirect(self.get_success_url())
@@ -1,4 +1,4 @@
-from constance import config
+from elecciones.registro_config import config
 from adjuntos.models import Identificacion
 from elecciones.models import Carga, CargasIncompatiblesError
 from .models import (
@@ -1,4 +1,4 @@
-from constance import config
+from elecciones.registro_config import config
 from django.conf import settings
 from django.db import models
 from model_utils.models import TimeStampedModel
@@ -6,7 +6,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.views.generic.base import TemplateView
 
-from constance import config
+from elecciones.registro_config import config
 from elecciones.models import Carga
 from adjuntos.models import Identificacion
 from fiscales.models import Fiscal
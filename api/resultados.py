@@ -0,0 +1,206 @@
+"""
+Respuestas de la API pública de resultados.
+
+Cada combinación de categoría, nivel, ids, agregación, opciones y proyección se calcula con el
+sumarizador y se guarda ya serializada a JSON en el caché ``settings.CACHE_API_RESULTADOS``
+(durante ``settings.API_RESULTADOS_EXPIRACION`` segundos), junto con la generación de los
+resultados con la que se calculó (ver ``elecciones.generacion_resultados``). Esa generación es el
+``ETag`` y su momento el ``Last-Modified`` de la respuesta, así que un cliente que consulta cada
+pocos segundos recibe un 304 sin que se calcule ni se envíe nada mientras no haya cambios.
+
+Se calcula sobre la base principal y no sobre la réplica: una réplica atrasada daría resultados
+viejos con la generación actual, y los clientes seguirían recibiendo 304 para ellos. La carga
+sobre la principal queda acotada porque cada respuesta se calcula una vez por generación:
+
+- La generación cambia con cada consolidación, así que una respuesta se sigue sirviendo durante
+  ``settings.API_RESULTADOS_VIGENCIA`` segundos aunque haya una generación más nueva.
+- Un único proceso a la vez recalcula cada respuesta. Mientras tanto los demás sirven la anterior
+  o, si todavía no hay ninguna, esperan a que esté (hasta ``settings.API_RESULTADOS_ESPERA``
+  segundos, y si no responden 503).
+"""
+from contextlib import contextmanager
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+import structlog
+
+from elecciones.generacion_resultados import CLAVE_GENERACION, cache_resultados, nueva_generacion_resultados
+from elecciones.models import TecnicaProyeccion
+from elecciones.proyecciones import create_sumarizador
+
+logger = structlog.get_logger(__name__)
+
+PARAMETROS = ('nivel', 'id', 'agregacion', 'opciones', 'proyeccion')
+
+# Segundos que un proceso puede tardar en recalcular una respuesta antes de que otro lo intente.
+TIEMPO_MAXIMO_CALCULO = 60
+
+# Cada cuántos segundos se vuelve a mirar el caché mientras otro proceso calcula la respuesta.
+INTERVALO_ESPERA = 0.1
+
+
+def clave_respuesta(categoria, parametros):
+    datos = json.dumps([categoria.id] + [parametros.get(nombre) for nombre in PARAMETROS])
+    return 'api.resultados.' + hashlib.sha1(datos.encode()).hexdigest()
+
+
+def porcentajes(datos):
+    return {clave: valor for clave, valor in datos.items() if clave.startswith('porcentaje')}
+
+
+def serializar(categoria, parametros, resultados):
+    positivos = []
+    for partido, datos in resultados.tabla_positivos().items():
+        es_partido = not isinstance(partido, str)
+        positivos.append({
+            'partido': partido.nombre if es_partido else partido,
+            'codigo': partido.codigo if es_partido else None,
+            'color': partido.color if es_partido else None,
+            'votos': datos['votos'],
+            **porcentajes(datos),
+            'opciones': [
+                {'nombre': nombre, 'votos': datos_opcion['votos'], **porcentajes(datos_opcion)}
+                for nombre, datos_opcion in datos['detalle'].items()
+            ],
+        })
+
+    contenido = {
+        'categoria': {'id': categoria.id, 'nombre': categoria.nombre, 'slug': categoria.slug},
+        'parametros': {nombre: parametros.get(nombre) for nombre in PARAMETROS},
+        'mesas': {
+            'total': resultados.total_mesas(),
+            'escrutadas': resultados.total_mesas_escrutadas(),
+            'porcentaje_escrutadas': resultados.porcentaje_mesas_escrutadas(),
+        },
+        'porcentaje_escrutado': resultados.porcentaje_escrutado(),
+        'votantes': resultados.votantes(),
+        'porcentaje_participacion': resultados.porcentaje_participacion(),
+        'positivos': positivos,
+        'no_positivos': resultados.tabla_no_positivos(),
+    }
+    if not settings.OCULTAR_CANTIDADES_DE_ELECTORES:
+        contenido['electores'] = {
+            'total': resultados.electores(),
+            'en_mesas_escrutadas': resultados.electores_en_mesas_escrutadas(),
+        }
+    return contenido
+
+
+def calcular(categoria, parametros):
+    tecnica_de_proyeccion = None
+    if parametros.get('proyeccion'):
+        tecnica_de_proyeccion = TecnicaProyeccion.objects.get(id=parametros['proyeccion'])
+    ids = [str(id) for id in parametros['id']] if parametros.get('nivel') else None
+    sumarizador = create_sumarizador(
+        parametros_sumarizacion=[
+            parametros['agregacion'], parametros['opciones'], parametros.get('nivel'), ids
+        ],
+        tecnica_de_proyeccion=tecnica_de_proyeccion
+    )
+    resultados = sumarizador.get_resultados(categoria)
+    return json.dumps(serializar(categoria, parametros, resultados)).encode()
+
+
+def vigente(guardada, generacion):
+    if guardada is None or generacion is None:
+        return False
+    return (
+        guardada['generacion'] == generacion
+        or time.time() - guardada['calculada'] < settings.API_RESULTADOS_VIGENCIA
+    )
+
+
+@contextmanager
+def calculo_exclusivo(cache, clave):
+    """
+    Intenta tomar el bloqueo para calcular la respuesta ``clave`` y devuelve si lo tomó. Al salir
+    lo libera sólo si sigue siendo el suyo: si el cálculo tardó más que ``TIEMPO_MAXIMO_CALCULO``,
+    el bloqueo venció y puede tenerlo otro proceso.
+    """
+    bloqueo, propio = f'{clave}.calculando', uuid.uuid4().hex
+    tomado = cache.add(bloqueo, propio, TIEMPO_MAXIMO_CALCULO)
+    try:
+        yield tomado
+    finally:
+        if tomado and cache.get(bloqueo) == propio:
+            cache.delete(bloqueo)
+
+
+def esperar_respuesta(cache, clave):
+    """
+    Espera a que otro proceso guarde la respuesta ``clave``, hasta ``settings.API_RESULTADOS_ESPERA``
+    segundos. Devuelve ``None`` si no llegó.
+    """
+    limite = time.monotonic() + settings.API_RESULTADOS_ESPERA
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        guardada = cache.get(clave)
+        if guardada is not None:
+            return guardada
+    return None
+
+
+def respuesta_resultados(request, categoria, parametros):
+    """
+    La respuesta (JSON, 304, 412 o 503) para la categoría y los parámetros ya validados.
+    """
+    cache = cache_resultados()
+    clave = clave_respuesta(categoria, parametros)
+    valores = cache.get_many([CLAVE_GENERACION, clave])
+    guardada = valores.get(clave)
+    generacion = valores.get(CLAVE_GENERACION)
+
+    if not vigente(guardada, generacion):
+        generacion = generacion or nueva_generacion_resultados()
+        with calculo_exclusivo(cache, clave) as propio:
+            if propio:
+                # El cliente puede tener ya la versión de la generación vigente.
+                respuesta = respuesta_condicional(request, generacion)
+                if respuesta is not None:
+                    return respuesta
+                guardada = {
+                    'generacion': generacion,
+                    'calculada': time.time(),
+                    'contenido': calcular(categoria, parametros),
+                }
+                cache.set(clave, guardada, settings.API_RESULTADOS_EXPIRACION)
+                logger.info('resultados calculados', categoria=categoria.id, generacion=generacion[0])
+        # Si otro proceso la está recalculando se sirve la anterior o, si no hay, se la espera.
+        if guardada is None:
+            guardada = esperar_respuesta(cache, clave)
+        if guardada is None:
+            respuesta = HttpResponse(status=503)
+            respuesta['Retry-After'] = settings.API_RESULTADOS_ESPERA
+            return respuesta
+
+    generacion = guardada['generacion']
+    respuesta = respuesta_condicional(request, generacion)
+    if respuesta is None:
+        respuesta = con_encabezados(
+            HttpResponse(guardada['contenido'], content_type='application/json'), generacion
+        )
+    return respuesta
+
+
+def respuesta_condicional(request, generacion):
+    """
+    La respuesta 304 (o 412) si las precondiciones del request (``If-None-Match``,
+    ``If-Modified-Since``, etc.) lo indican para esa generación; si no, ``None``.
+    """
+    respuesta = get_conditional_response(
+        request, etag=quote_etag(generacion[0]), last_modified=generacion[1]
+    )
+    return con_encabezados(respuesta, generacion) if respuesta is not None else None
+
+
+def con_encabezados(respuesta, generacion):
+    respuesta['ETag'] = quote_etag(generacion[0])
+    respuesta['Last-Modified'] = http_date(generacion[1])
+    patch_cache_control(respuesta, public=True, max_age=settings.API_RESULTADOS_MAX_AGE)
+    return respuesta
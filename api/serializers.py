@@ -1,8 +1,12 @@
 from collections import defaultdict
+from django.conf import settings
 from rest_framework import serializers
 
 from adjuntos.models import Attachment
-from elecciones.models import Categoria, Opcion
+from elecciones.models import (
+    Categoria, Opcion, TecnicaProyeccion, NIVELES_DE_AGREGACION, OPCIONES_A_CONSIDERAR, TIPOS_DE_AGREGACIONES
+)
+from elecciones.registro_metadata import registro
 
 
 class ActaSerializer(serializers.Serializer):
@@ -34,7 +38,7 @@ class VotosListSerializer(serializers.ListSerializer):
             opciones[votos['categoria']].append(votos['opcion'])
 
         for categoria, opciones in opciones.items():
-            prioritarias = categoria.opciones_actuales(solo_prioritarias=True, excluir_optativas=True)
+            prioritarias = registro.opciones_actuales(categoria, solo_prioritarias=True, excluir_optativas=True)
             faltantes = [opc for opc in prioritarias if opc not in opciones]
             if faltantes:
                 raise serializers.ValidationError(
@@ -73,3 +77,39 @@ class OpcionSerializer(serializers.Serializer):
     nombre = serializers.CharField()
     nombre_corto = serializers.CharField()
     codigo = serializers.CharField()
+
+
+class ResultadosQuerySerializer(serializers.Serializer):
+    nivel = serializers.ChoiceField(
+        choices=NIVELES_DE_AGREGACION, required=False,
+        help_text='Nivel de agregación (por defecto, todo el país)'
+    )
+    id = serializers.ListField(
+        child=serializers.IntegerField(), required=False, help_text='Ids de las unidades del nivel'
+    )
+    agregacion = serializers.ChoiceField(
+        choices=TIPOS_DE_AGREGACIONES, default=TIPOS_DE_AGREGACIONES.todas_las_cargas
+    )
+    opciones = serializers.ChoiceField(
+        choices=OPCIONES_A_CONSIDERAR, default=OPCIONES_A_CONSIDERAR.prioritarias
+    )
+    proyeccion = serializers.IntegerField(required=False, help_text='Id de la técnica de proyección')
+
+    def validate_id(self, value):
+        if len(set(value)) > settings.API_RESULTADOS_MAXIMO_IDS:
+            raise serializers.ValidationError(
+                f'Se pueden indicar como máximo {settings.API_RESULTADOS_MAXIMO_IDS} ids.'
+            )
+        return value
+
+    def validate_proyeccion(self, value):
+        if not TecnicaProyeccion.objects.filter(id=value).exists():
+            raise serializers.ValidationError('No existe la técnica de proyección.')
+        return value
+
+    def validate(self, data):
+        if bool(data.get('nivel')) != bool(data.get('id')):
+            raise serializers.ValidationError('Se deben indicar juntos el nivel y los ids.')
+        if 'id' in data:
+            data['id'] = sorted(set(data['id']))
+        return data
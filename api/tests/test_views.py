@@ -5,8 +5,15 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from api.resultados import clave_respuesta
 from elecciones.tests import factories
-from elecciones.models import Carga, Opcion
+from elecciones.generacion_resultados import (
+    cache_resultados, generacion_resultados, nueva_generacion_resultados
+)
+from elecciones.models import Carga, CategoriaOpcion, MesaCategoria, Opcion
+from elecciones.tests.conftest import carta_marina  # noqa
+from elecciones.tests.test_models import consumir_novedades_y_actualizar_objetos
+from elecciones.tests.utils import cargar_votos
 from adjuntos.models import Attachment, hash_file
 
 from elecciones.tests.factories import (
@@ -385,3 +392,158 @@ def test_listar_opciones_error(valor, admin_client):
 
     response = admin_client.get(url, data={'solo_prioritarias': valor}, format='json')
     assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.fixture
+def resultados(carta_marina, settings):
+    """
+    Una carga parcial consolidada para la primera mesa de la carta marina.
+    """
+    cache_resultados().clear()
+    m1, *otras_mesas = carta_marina
+    categoria = m1.categorias.get()
+    CategoriaOpcion.objects.filter(categoria=categoria).update(prioritaria=True)
+    o1, o2, *otras_opciones = categoria.opciones.filter(partido__isnull=False)
+
+    carga = factories.CargaFactory(
+        mesa_categoria=MesaCategoria.objects.get(mesa=m1, categoria=categoria), tipo=Carga.TIPOS.parcial
+    )
+    consumir_novedades_y_actualizar_objetos([m1])
+    cargar_votos(carga, {o1: 20, o2: 30, Opcion.blancos(): 5, Opcion.total_votos(): 60})
+    return categoria, o1, o2
+
+
+def test_resultados_categoria(resultados):
+    categoria, o1, o2 = resultados
+    response = APIClient().get(reverse('resultados', args=[categoria.id]))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'] == 'application/json'
+    assert response['ETag'] == f'"{generacion_resultados()[0]}"'
+    assert 'Last-Modified' in response
+    assert 'public' in response['Cache-Control']
+
+    datos = response.json()
+    assert datos['categoria']['id'] == categoria.id
+    assert datos['parametros']['agregacion'] == 'todas_las_cargas'
+    assert datos['mesas']['escrutadas'] == 1
+    assert datos['votantes'] == 60
+    # Se ordena de acuerdo al que va ganando.
+    assert [(positivo['partido'], positivo['votos']) for positivo in datos['positivos'][:2]] == [
+        (o2.partido.nombre, 30), (o1.partido.nombre, 20)
+    ]
+
+
+def test_resultados_categoria_no_modificados(resultados, monkeypatch):
+    categoria, *opciones = resultados
+    url = reverse('resultados', args=[categoria.id])
+    client = APIClient()
+    etag = client.get(url)['ETag']
+
+    def calcular(*args):
+        assert False, 'No debería recalcular los resultados'
+    monkeypatch.setattr('api.resultados.calcular', calcular)
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response['ETag'] == etag
+    assert not response.content
+
+
+def test_resultados_categoria_nueva_generacion(resultados, settings):
+    categoria, *opciones = resultados
+    url = reverse('resultados', args=[categoria.id])
+    client = APIClient()
+    etag = client.get(url)['ETag']
+
+    nueva_generacion_resultados()
+    # Dentro del período de vigencia se sigue sirviendo la respuesta anterior.
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    settings.API_RESULTADOS_VIGENCIA = 0
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] == f'"{generacion_resultados()[0]}"'
+    assert response['ETag'] != etag
+
+
+def test_resultados_categoria_calculo_en_curso(resultados, settings, monkeypatch):
+    categoria, *opciones = resultados
+    url = reverse('resultados', args=[categoria.id])
+    settings.API_RESULTADOS_ESPERA = 0
+    cache = cache_resultados()
+    bloqueo = clave_respuesta(categoria, {'agregacion': 'todas_las_cargas', 'opciones': 'prioritarias'})
+    bloqueo += '.calculando'
+
+    def calcular(*args):
+        assert False, 'Otro proceso está calculando los resultados'
+
+    # Si otro proceso la está calculando y no hay ninguna guardada, no se calcula de nuevo.
+    cache.add(bloqueo, 'otro proceso')
+    monkeypatch.setattr('api.resultados.calcular', calcular)
+    response = APIClient().get(url)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response['Retry-After'] == '0'
+    assert cache.get(bloqueo) == 'otro proceso'
+
+    monkeypatch.undo()
+    cache.delete(bloqueo)
+    etag = APIClient().get(url)['ETag']
+    assert cache.get(bloqueo) is None
+
+    # Con una generación nueva, mientras otro proceso la recalcula se sirve la anterior.
+    settings.API_RESULTADOS_VIGENCIA = 0
+    nueva_generacion_resultados()
+    cache.add(bloqueo, 'otro proceso')
+    monkeypatch.setattr('api.resultados.calcular', calcular)
+    response = APIClient().get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] == etag
+    assert cache.get(bloqueo) == 'otro proceso'
+
+
+def test_resultados_categoria_por_nivel(resultados):
+    categoria, *opciones = resultados
+    mesa = MesaCategoria.objects.filter(categoria=categoria).exclude(carga_testigo=None).get().mesa
+    url = reverse('resultados', args=[categoria.id])
+
+    response = APIClient().get(url, {'nivel': 'circuito', 'id': mesa.circuito.id})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['parametros']['id'] == [mesa.circuito.id]
+    assert response.json()['votantes'] == 60
+
+
+def test_resultados_categoria_parametros_invalidos(resultados, settings):
+    categoria, *opciones = resultados
+    url = reverse('resultados', args=[categoria.id])
+    client = APIClient()
+
+    assert client.get(url, {'nivel': 'seccion'}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get(url, {'proyeccion': 9999}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get(url, {'agregacion': 'otra'}).status_code == status.HTTP_400_BAD_REQUEST
+
+    settings.API_RESULTADOS_MAXIMO_IDS = 2
+    response = client.get(url, {'nivel': 'circuito', 'id': [1, 2, 3]})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'id' in response.json()
+
+
+def test_resultados_categoria_sensible(db):
+    categoria = factories.CategoriaFactory(sensible=True)
+    response = APIClient().get(reverse('resultados', args=[categoria.id]))
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert APIClient().get(reverse('resultados', args=[9999])).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_generacion_cambia_al_consolidar(resultados, monkeypatch):
+    categoria, *opciones = resultados
+    monkeypatch.setattr('elecciones.generacion_resultados.transaction.on_commit', lambda funcion: funcion())
+    generacion = generacion_resultados()
+
+    mesa_categoria = MesaCategoria.objects.filter(categoria=categoria).first()
+    mesa_categoria.save(update_fields=['coeficiente_para_orden_de_carga'])
+    assert generacion_resultados() == generacion
+
+    mesa_categoria.status = MesaCategoria.STATUS.parcial_en_conflicto
+    mesa_categoria.save(update_fields=['status'])
+    assert generacion_resultados() != generacion
@@ -29,6 +29,7 @@ urlpatterns = [
     path('actas/<int:id_mesa>/votos/', views.cargar_votos, name='cargar-votos'),
     path('categorias/', views.listar_categorias, name='categorias'),
     path('categorias/<int:id_categoria>/opciones/', views.listar_opciones, name='opciones'),
+    path('resultados/<int:id_categoria>/', views.resultados_categoria, name='resultados'),
     url(r'^token/$', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     url(r'^token/refresh/$', TokenRefreshView.as_view(), name='token_refresh'),
     url(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
@@ -1,27 +1,31 @@
 from collections import defaultdict
 
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 from django.db import transaction
 from django.db.utils import IntegrityError
 
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view, authentication_classes, parser_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
-from rest_framework import status
+from rest_framework import permissions, status
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .serializers import (
     VotoSerializer, ActaSerializer, MesaSerializer, CategoriaSerializer, OpcionSerializer,
-    ListarCategoriasQuerySerializer, ListarOpcionesQuerySerializer
+    ListarCategoriasQuerySerializer, ListarOpcionesQuerySerializer, ResultadosQuerySerializer
 )
+from .resultados import respuesta_resultados
 
 from adjuntos.models import Identificacion, Attachment, hash_file
 from elecciones.models import (
-    Distrito, Seccion, Circuito, Mesa, MesaCategoria, CategoriaOpcion, Categoria, Carga, VotoMesaReportado
+    Mesa, MesaCategoria, CategoriaOpcion, Categoria, Carga, VotoMesaReportado
 )
+from elecciones.registro_geografia import registro_geografia
+from elecciones.registro_metadata import registro
 
 
 @swagger_auto_schema(
@@ -123,10 +127,11 @@ def identificar_acta(request, foto_digest):
     if serializer.is_valid():
         data = serializer.validated_data
 
-        distrito = get_object_or_404(Distrito, numero=data['codigo_distrito'])
-        seccion = get_object_or_404(Seccion, distrito=distrito, numero=data['codigo_seccion'])
-        circuito = get_object_or_404(Circuito, seccion=seccion, numero=data['codigo_circuito'])
-        mesa = get_object_or_404(Mesa, circuito=circuito, numero=data['codigo_mesa'])
+        # La mesa se resuelve con el índice en memoria de la geografía.
+        mesa_id = registro_geografia.mesa(
+            data['codigo_distrito'], data['codigo_seccion'], data['codigo_circuito'], data['codigo_mesa']
+        )
+        mesa = get_object_or_404(Mesa, id=mesa_id)
 
         identificacion = Identificacion(
             source=Identificacion.SOURCES.telegram,
@@ -237,10 +242,54 @@ def listar_opciones(request, id_categoria):
     Por defecto se listan sólo las opciones prioritarias (`solo_prioritarias=true`).
     Las opciones se ordenan de forma ascendente según el campo orden (orden en el acta).
     """
-    c = get_object_or_404(Categoria, id=id_categoria)
+    try:
+        c = registro.categoria(id_categoria)
+    except Categoria.DoesNotExist:
+        raise Http404
     serializer = ListarOpcionesQuerySerializer(data=request.query_params)
     if serializer.is_valid():
-        opciones = c.opciones_actuales(**serializer.validated_data)
+        opciones = registro.opciones_actuales(c, **serializer.validated_data)
         return Response(OpcionSerializer(opciones, many=True).data)
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@swagger_auto_schema(
+    method='get',
+    query_serializer=ResultadosQuerySerializer,
+    responses={
+        status.HTTP_200_OK: 'Los resultados de la categoría',
+        status.HTTP_304_NOT_MODIFIED: 'Los resultados no cambiaron desde el ETag de If-None-Match',
+        status.HTTP_503_SERVICE_UNAVAILABLE: 'Los resultados se están calculando; reintentar (Retry-After)',
+    },
+    security=[],
+    tags=['Resultados']
+)
+@api_view(
+    ['GET'],
+)
+@authentication_classes(())
+@permission_classes((permissions.AllowAny, ))
+def resultados_categoria(request, id_categoria):
+    """
+    Permite consultar los resultados de una categoría. No requiere autenticación.
+
+    Por defecto se consideran todas las cargas de todo el país y sólo las opciones prioritarias.
+    Se puede restringir a un nivel de agregación (`nivel` e `id`, que puede repetirse), elegir
+    las cargas (`agregacion`), las opciones (`opciones`) y una técnica de proyección (`proyeccion`).
+
+    Las respuestas llevan `ETag` y `Last-Modified`: si los resultados no cambiaron desde el
+    `If-None-Match` (o `If-Modified-Since`) se responde 304 sin contenido. La cantidad de `id` por
+    consulta está limitada.
+    """
+    try:
+        categoria = registro.categoria(id_categoria)
+    except Categoria.DoesNotExist:
+        raise Http404
+    if categoria.sensible:
+        raise Http404
+    serializer = ResultadosQuerySerializer(data=request.query_params)
+    if serializer.is_valid():
+        return respuesta_resultados(request, categoria, serializer.validated_data)
+    else:
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
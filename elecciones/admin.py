@@ -28,6 +28,7 @@ from .models import (
 )
 from .forms import CategoriaForm, SeccionForm
 from django.http import HttpResponseRedirect
+from escrutinio_social.replica import ChangelistDesdeReplicaMixin
 from django_admin_row_actions import AdminRowActionsMixin
 from fiscales.admin import BaseBooleanFilter
 
@@ -155,7 +156,7 @@ class MesaForm(forms.ModelForm):
         fields = '__all__'
 
 
-class MesaAdmin(DjangoQLSearchMixin, AdminRowActionsMixin, admin.ModelAdmin):
+class MesaAdmin(ChangelistDesdeReplicaMixin, DjangoQLSearchMixin, AdminRowActionsMixin, admin.ModelAdmin):
     form = MesaForm
     actions = [resultados_reportados]
     list_display = ('numero', 'get_circuito', 'get_seccion', 'get_distrito')
@@ -212,7 +213,9 @@ class PartidoAdmin(admin.ModelAdmin):
     list_display_links = list_display
 
 
-class MesaCategoriaAdmin(DjangoQLSearchMixin, AdminRowActionsMixin, admin.ModelAdmin):
+class MesaCategoriaAdmin(
+    ChangelistDesdeReplicaMixin, DjangoQLSearchMixin, AdminRowActionsMixin, admin.ModelAdmin
+):
     list_display = ['mesa', 'categoria', 'status']
     raw_id_fields = ['mesa', 'categoria', 'carga_testigo', 'carga_oficial', 'parcial_oficial']
     list_filter = ['status', ]
@@ -279,7 +282,7 @@ class SeccionAdmin(admin.ModelAdmin):
     )
 
 
-class VotoMesaReportadoAdmin(DjangoQLSearchMixin, admin.ModelAdmin):
+class VotoMesaReportadoAdmin(ChangelistDesdeReplicaMixin, DjangoQLSearchMixin, admin.ModelAdmin):
     list_display = [
         'carga',
         'id',
@@ -354,7 +357,7 @@ class VotoMesaReportadoInline(admin.TabularInline):
     ordering = ['opcion__id']
 
 
-class CargaAdmin(DjangoQLSearchMixin, AdminRowActionsMixin, admin.ModelAdmin):
+class CargaAdmin(ChangelistDesdeReplicaMixin, DjangoQLSearchMixin, AdminRowActionsMixin, admin.ModelAdmin):
     list_display = ['mesa_categoria', 'fiscal', 'tipo', 'created', 'es_testigo']
     readonly_fields = ['fiscal', 'mesa_categoria']
     inlines = [VotoMesaReportadoInline]
@@ -6,4 +6,9 @@ class EleccionesAppConfig(AppConfig):
 
     def ready(self):
         import elecciones.system_checks
+        import elecciones.registro_metadata
+        import elecciones.registro_geografia
+        import elecciones.registro_config
+        import elecciones.contadores_avance
+        import elecciones.generacion_resultados
 
@@ -0,0 +1,126 @@
+"""
+Árbol compacto de la geografía electoral (distritos, secciones políticas, secciones y circuitos)
+para los menús laterales de resultados y de avance de carga.
+
+Se arma con una consulta por nivel (sólo ids, números y nombres, sin instanciar modelos) y se
+serializa una única vez a JSON. El JSON se comparte entre procesos a través del caché
+(ver ``RegistroEnMemoria.memo_compartido``) y se sirve como un archivo estático cuya URL lleva
+el hash del contenido, así que el navegador lo puede guardar indefinidamente: cuando la
+geografía cambia, cambia la URL. Como es un derivado del índice de la geografía
+(ver ``registro_geografia``), se descarta junto con él.
+
+Formato (listas, para que sea chico)::
+
+    [
+        [id, número, nombre, secciones_politicas, secciones],  # un distrito
+        ...
+    ]
+    secciones_politicas: [[id, número, nombre], ...]
+    secciones: [[id, número, nombre, id de la sección política o null, circuitos], ...]
+    circuitos: [[id, número, nombre], ...]
+
+Cada lista está en orden natural por número.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from .autocompletar import orden_natural
+from .models import Circuito, Distrito, Seccion, SeccionPolitica
+from .registro_geografia import normalizar, registro_geografia
+
+
+def orden(fila):
+    return orden_natural(normalizar(fila[1]) or '') + (fila[0], )
+
+
+def por_padre(filas):
+    """
+    Agrupa las filas (id, padre, número, nombre, ...) por padre, sin el padre y ordenadas.
+    """
+    hijos = defaultdict(list)
+    for id, padre_id, *resto in filas:
+        hijos[padre_id].append([id, *resto])
+    for lista in hijos.values():
+        lista.sort(key=orden)
+    return hijos
+
+
+def cargar_arbol():
+    circuitos = por_padre(Circuito.objects.values_list('id', 'seccion_id', 'numero', 'nombre').iterator())
+    secciones = por_padre(
+        (id, distrito_id, numero, nombre, seccion_politica_id, circuitos.get(id, []))
+        for id, distrito_id, numero, nombre, seccion_politica_id in Seccion.objects.values_list(
+            'id', 'distrito_id', 'numero', 'nombre', 'seccion_politica_id'
+        ).iterator()
+    )
+    secciones_politicas = por_padre(
+        SeccionPolitica.objects.values_list('id', 'distrito_id', 'numero', 'nombre')
+    )
+    distritos = [
+        [id, numero, nombre, secciones_politicas.get(id, []), secciones.get(id, [])]
+        for id, numero, nombre in Distrito.objects.values_list('id', 'numero', 'nombre')
+    ]
+    distritos.sort(key=orden)
+    return distritos
+
+
+class ArbolSerializado():
+
+    def __init__(self, arbol):
+        self.contenido = json.dumps(arbol, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.hash = hashlib.sha1(self.contenido).hexdigest()[:16]
+
+
+def arbol_serializado():
+    """
+    El árbol serializado a JSON, con el hash de su contenido.
+    """
+    return registro_geografia.memo_compartido(
+        'arbol_geografia', lambda: ArbolSerializado(cargar_arbol())
+    )
+
+
+class Nodo():
+    """
+    Un elemento del árbol, con la interfaz que usan los templates.
+    """
+
+    def __init__(self, id, numero, nombre):
+        self.id = id
+        self.numero = numero
+        self.nombre = nombre
+
+    def __str__(self):
+        return f"{self.numero} - {self.nombre}"
+
+
+def armar_nodos(arbol):
+    distritos = []
+    for id, numero, nombre, filas_politicas, filas_secciones in arbol:
+        distrito = Nodo(id, numero, nombre)
+        politicas = {}
+        for sp_id, sp_numero, sp_nombre in filas_politicas:
+            politicas[sp_id] = Nodo(sp_id, sp_numero, sp_nombre)
+            politicas[sp_id].secciones = []
+        distrito.secciones_politicas = list(politicas.values())
+        distrito.secciones = []
+        for s_id, s_numero, s_nombre, sp_id, filas_circuitos in filas_secciones:
+            seccion = Nodo(s_id, s_numero, s_nombre)
+            seccion.seccion_politica = politicas.get(sp_id)
+            seccion.circuitos = [Nodo(*fila) for fila in filas_circuitos]
+            distrito.secciones.append(seccion)
+            if seccion.seccion_politica:
+                seccion.seccion_politica.secciones.append(seccion)
+        distritos.append(distrito)
+    return distritos
+
+
+def distritos():
+    """
+    Los distritos, cada uno con sus ``secciones_politicas`` y sus ``secciones`` (y éstas con su
+    ``seccion_politica`` y sus ``circuitos``), para recorrerlos desde los templates.
+    """
+    return registro_geografia.memo(
+        'nodos_arbol_geografia', lambda: armar_nodos(json.loads(arbol_serializado().contenido))
+    )
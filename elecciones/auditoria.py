@@ -0,0 +1,285 @@
+"""
+Motor de auditoría de resultados por mesa (ver el comando ``nos_estan_cagando``).
+
+En lugar de calcular los resultados de cada mesa con un Sumarizador, se cargan de una vez,
+para una categoría, la matriz mesa × partido de votos de las cargas testigo y la de las cargas
+parciales oficiales. Los análisis (ceros, cambios de tendencia, mesas alejadas del promedio del
+circuito y diferencias con la carga oficial) se resuelven con operaciones vectorizadas agrupando
+por circuito.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from django.db.models import Count
+
+from .models import (
+    Mesa, MesaCategoria, Opcion, VotoMesaReportado, OPCIONES_A_CONSIDERAR, TIPOS_DE_AGREGACIONES,
+)
+from .sumarizador import Sumarizador
+
+ALERTA = 'alerta'
+CUIDADO = 'cuidado'
+
+Hallazgo = namedtuple('Hallazgo', 'nivel tipo circuito_id mesa_id mensaje datos')
+
+
+class Auditoria():
+    """
+    Analiza las mesas escrutadas de una categoría, opcionalmente restringidas a un
+    distrito, sección o circuito, comparando los votos de dos partidos
+    (``nosotros`` y ``ellos``).
+    """
+
+    def __init__(
+        self, categoria, nosotros, ellos,
+        tipo_de_agregacion=TIPOS_DE_AGREGACIONES.solo_consolidados,
+        distrito=None, seccion=None, circuito=None,
+    ):
+        self.categoria = categoria
+        self.nosotros = nosotros
+        self.ellos = ellos
+        self.tipo_de_agregacion = tipo_de_agregacion
+        self.geografia = {
+            campo: valor for campo, valor in
+            [('distrito', distrito), ('seccion', seccion), ('circuito', circuito)] if valor is not None
+        }
+
+    def mesa_categorias(self):
+        return MesaCategoria.objects.filter(categoria=self.categoria, **self.geografia)
+
+    def mesa_categorias_escrutadas(self):
+        sumarizador = Sumarizador(
+            tipo_de_agregacion=self.tipo_de_agregacion,
+            opciones_a_considerar=OPCIONES_A_CONSIDERAR.prioritarias
+        )
+        return self.mesa_categorias().filter(
+            carga_testigo__isnull=False,
+            **sumarizador.cargas_a_considerar_status_filter(self.categoria, '')
+        )
+
+    def mesas_por_circuito(self):
+        """
+        Cantidad total de mesas de la categoría en cada circuito.
+        """
+        return pd.Series(
+            dict(self.mesa_categorias().order_by().values('circuito_id').annotate(
+                n=Count('id')
+            ).values_list('circuito_id', 'n')),
+            dtype=np.int64,
+        )
+
+    def matriz_de_votos(self, consulta_cargas, cargas):
+        """
+        Matriz (DataFrame) de votos de las ``cargas`` (ids, resultado de ``consulta_cargas``),
+        con una columna por partido auditado. Las cargas sin votos para esos partidos quedan en cero.
+        """
+        votos = VotoMesaReportado.objects.filter(
+            categoria=self.categoria,
+            carga_id__in=consulta_cargas,
+            opcion__tipo=Opcion.TIPOS.positivo,
+            opcion__partido__in=[self.nosotros, self.ellos],
+        ).values_list('carga_id', 'opcion__partido_id', 'votos')
+        df = pd.DataFrame.from_records(list(votos), columns=['carga', 'partido', 'votos'])
+        matriz = df.pivot_table(
+            index='carga', columns='partido', values='votos', aggfunc='sum', fill_value=0
+        )
+        matriz = matriz.reindex(index=list(cargas), columns=[self.nosotros.id, self.ellos.id], fill_value=0)
+        matriz.columns = ['nosotros', 'ellos']
+        return matriz.astype(np.int64)
+
+    def cargar(self):
+        """
+        Devuelve un DataFrame con una fila por mesa escrutada, indexado por mesa:
+        circuito, votos de ``nosotros`` y ``ellos`` en la carga testigo y, si la hay,
+        en la parcial oficial (``oficial_nosotros``, ``oficial_ellos``; NaN si no hay).
+        """
+        mesa_categorias = pd.DataFrame.from_records(
+            list(self.mesa_categorias_escrutadas().values_list(
+                'mesa_id', 'circuito_id', 'carga_testigo_id', 'parcial_oficial_id'
+            )),
+            columns=['mesa', 'circuito', 'testigo', 'oficial'],
+        )
+        if mesa_categorias.empty:
+            return pd.DataFrame(
+                columns=['circuito', 'nosotros', 'ellos', 'oficial_nosotros', 'oficial_ellos'],
+                index=pd.Index([], name='mesa')
+            )
+
+        escrutadas = self.mesa_categorias_escrutadas()
+        testigo = self.matriz_de_votos(escrutadas.values('carga_testigo_id'), mesa_categorias['testigo'])
+        datos = mesa_categorias.set_index('mesa')[['circuito']].copy()
+        datos['nosotros'] = testigo['nosotros'].values
+        datos['ellos'] = testigo['ellos'].values
+
+        oficiales = mesa_categorias['oficial'].dropna().astype(np.int64)
+        oficial = self.matriz_de_votos(
+            escrutadas.filter(parcial_oficial__isnull=False).values('parcial_oficial_id'), oficiales
+        )
+        con_oficial = mesa_categorias.loc[oficiales.index, 'mesa']
+        datos['oficial_nosotros'] = pd.Series(oficial['nosotros'].values, index=con_oficial)
+        datos['oficial_ellos'] = pd.Series(oficial['ellos'].values, index=con_oficial)
+        return datos
+
+    def analizar(
+        self, analizar_ceros=False, analizar_tendencias=False, analizar_promedio=False,
+        comparar_con_correo=False, umbral_analisis_estadisticos=30, umbral_mesas_ganadas=0.4,
+        umbral_desvios=1,
+    ):
+        """
+        Corre los análisis pedidos y devuelve la lista de ``Hallazgo``.
+        """
+        datos = self.cargar()
+        hallazgos = []
+        if datos.empty:
+            return hallazgos
+
+        if analizar_ceros:
+            hallazgos.extend(self.ceros(datos))
+        if comparar_con_correo:
+            hallazgos.extend(self.diferencias_con_oficial(datos))
+
+        # Los análisis estadísticos sólo se hacen en los circuitos con suficientes mesas escrutadas.
+        listas = datos.groupby('circuito').size()
+        totales = self.mesas_por_circuito().reindex(listas.index, fill_value=0)
+        suficientes = listas > umbral_analisis_estadisticos / 100.0 * totales
+        for circuito_id in listas.index[~suficientes]:
+            hallazgos.append(Hallazgo(
+                CUIDADO, 'umbral', int(circuito_id), None,
+                f'No se superó el umbral de mesas listas '
+                f'(sólo {listas[circuito_id]} de {totales[circuito_id]}).',
+                {'listas': int(listas[circuito_id]), 'total': int(totales[circuito_id])}
+            ))
+        datos = datos[datos['circuito'].isin(listas.index[suficientes])]
+
+        if analizar_tendencias and not datos.empty:
+            hallazgos.extend(self.tendencias(datos, umbral_mesas_ganadas))
+        if analizar_promedio and not datos.empty:
+            hallazgos.extend(self.alejadas_del_promedio(datos, umbral_desvios))
+        return hallazgos
+
+    def ceros(self, datos):
+        hallazgos = []
+        for mesa_id, fila in datos[datos['nosotros'] == 0].iterrows():
+            hallazgos.append(Hallazgo(
+                ALERTA, 'cero', int(fila['circuito']), int(mesa_id),
+                f'{self.nosotros.nombre_corto} en cero votos.', {}
+            ))
+        for mesa_id, fila in datos[datos['ellos'] == 0].iterrows():
+            hallazgos.append(Hallazgo(
+                CUIDADO, 'cero', int(fila['circuito']), int(mesa_id),
+                f'{self.ellos.nombre_corto} en cero votos.', {}
+            ))
+        return hallazgos
+
+    def diferencias_con_oficial(self, datos):
+        """
+        Mesas en las que según nuestra carga no perdimos pero según la oficial sí.
+        """
+        hallazgos = []
+        con_oficial = datos.dropna(subset=['oficial_nosotros'])
+        invertidas = con_oficial[
+            (con_oficial['nosotros'] >= con_oficial['ellos']) &
+            (con_oficial['oficial_nosotros'] < con_oficial['oficial_ellos'])
+        ]
+        for mesa_id, fila in invertidas.iterrows():
+            votos = {
+                'nosotros': int(fila['nosotros']), 'ellos': int(fila['ellos']),
+                'oficial_nosotros': int(fila['oficial_nosotros']),
+                'oficial_ellos': int(fila['oficial_ellos']),
+            }
+            hallazgos.append(Hallazgo(
+                ALERTA, 'oficial', int(fila['circuito']), int(mesa_id),
+                f"Tiene diferencias respecto la carga oficial.\n"
+                f"\tNosotros decimos:\t{self.nosotros.nombre_corto} = {votos['nosotros']},"
+                f"\t{self.ellos.nombre_corto} = {votos['ellos']}.\n"
+                f"\tLa carga oficial dice:\t{self.nosotros.nombre_corto} = {votos['oficial_nosotros']},"
+                f"\t{self.ellos.nombre_corto} = {votos['oficial_ellos']}.",
+                votos
+            ))
+            if votos['oficial_nosotros'] == 0:
+                hallazgos.append(Hallazgo(
+                    ALERTA, 'oficial', int(fila['circuito']), int(mesa_id),
+                    'La carga oficial reporta 0 votos nuestros', votos
+                ))
+        return hallazgos
+
+    def tendencias(self, datos, umbral_mesas_ganadas):
+        """
+        Mesas ganadas por un partido en circuitos donde el otro ganó claramente
+        la mayoría de las mesas.
+        """
+        ganadas = pd.DataFrame({
+            'nosotros': (datos['nosotros'] > datos['ellos']).groupby(datos['circuito']).sum(),
+            'ellos': (datos['ellos'] > datos['nosotros']).groupby(datos['circuito']).sum(),
+        })
+        decididas = ganadas['nosotros'] + ganadas['ellos']
+        diferencia = (
+            (ganadas['nosotros'] - ganadas['ellos']).abs() / decididas.where(decididas > 0)
+        ).fillna(1)
+        claros = ganadas[diferencia >= umbral_mesas_ganadas]
+
+        por_mesa = datos.join(claros, on='circuito', rsuffix='_ganadas', how='inner')
+        hallazgos = []
+        contra_nosotros = por_mesa[
+            (por_mesa['nosotros_ganadas'] > por_mesa['ellos_ganadas']) &
+            (por_mesa['ellos'] > por_mesa['nosotros'])
+        ]
+        for mesa_id, fila in contra_nosotros.iterrows():
+            hallazgos.append(Hallazgo(
+                ALERTA, 'tendencia', int(fila['circuito']), int(mesa_id),
+                f'En el circuito {self.nosotros.nombre_corto} ganó en la mayoría de las mesas '
+                f'pero en ésta no '
+                f'({self.nosotros.nombre_corto}: {int(fila["nosotros"])} votos, '
+                f'{self.ellos.nombre_corto}: {int(fila["ellos"])} votos).',
+                {'nosotros': int(fila['nosotros']), 'ellos': int(fila['ellos'])}
+            ))
+        contra_ellos = por_mesa[
+            (por_mesa['ellos_ganadas'] > por_mesa['nosotros_ganadas']) &
+            (por_mesa['nosotros'] > por_mesa['ellos'])
+        ]
+        for mesa_id, fila in contra_ellos.iterrows():
+            hallazgos.append(Hallazgo(
+                CUIDADO, 'tendencia', int(fila['circuito']), int(mesa_id),
+                f'En el circuito {self.ellos.nombre_corto} ganó en la mayoría de las mesas '
+                f'pero en ésta no '
+                f'({self.nosotros.nombre_corto}: {int(fila["nosotros"])} votos, '
+                f'{self.ellos.nombre_corto}: {int(fila["ellos"])} votos).',
+                {'nosotros': int(fila['nosotros']), 'ellos': int(fila['ellos'])}
+            ))
+        return hallazgos
+
+    def alejadas_del_promedio(self, datos, umbral_desvios):
+        """
+        Mesas cuyos votos están a más de ``umbral_desvios`` desvíos estándar
+        del promedio de las mesas escrutadas de su circuito.
+        """
+        hallazgos = []
+        por_circuito = datos.groupby('circuito')
+        for columna, nivel, partido in [('nosotros', ALERTA, self.nosotros), ('ellos', CUIDADO, self.ellos)]:
+            promedio = por_circuito[columna].transform('mean')
+            desvio = por_circuito[columna].transform(lambda votos: votos.std(ddof=0))
+            diferencia = (datos[columna] - promedio).abs()
+            alejadas = diferencia > umbral_desvios * desvio
+            for mesa_id in datos.index[alejadas]:
+                hallazgos.append(Hallazgo(
+                    nivel, 'promedio', int(datos.at[mesa_id, 'circuito']), int(mesa_id),
+                    f'Mucha diferencia de votos con promedio '
+                    f'({partido.nombre_corto} = {datos.at[mesa_id, columna]}, '
+                    f'prom {partido.nombre_corto} = {promedio[mesa_id]:.2f}, '
+                    f'dif = {diferencia[mesa_id]:.2f}, '
+                    f'dif máxima esperada = {umbral_desvios * desvio[mesa_id]:.2f})',
+                    {
+                        'votos': int(datos.at[mesa_id, columna]), 'promedio': float(promedio[mesa_id]),
+                        'desvio': float(desvio[mesa_id])
+                    }
+                ))
+        return hallazgos
+
+
+def mesas_de_hallazgos(hallazgos):
+    """
+    Devuelve {id: Mesa} (con su circuito, sección y distrito) para las mesas de los hallazgos.
+    """
+    ids = {hallazgo.mesa_id for hallazgo in hallazgos if hallazgo.mesa_id is not None}
+    return Mesa.objects.select_related('circuito__seccion__distrito').in_bulk(ids)
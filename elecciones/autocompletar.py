@@ -0,0 +1,142 @@
+"""
+Búsqueda por prefijo para los autocompletes de la geografía (distrito, sección, circuito y mesa).
+
+Para cada nivel se arman, una única vez, arreglos ordenados de claves (número y nombre
+normalizados) por elemento padre. Cada búsqueda es una bisección en esos arreglos, sin
+consultar la base, y los resultados se recuerdan. Todo se guarda como derivado del índice
+de la geografía (ver ``registro_geografia``), así que se descarta cuando la geografía cambia.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+
+from .models import Circuito, Distrito, Mesa, Seccion
+from .registro_geografia import normalizar, registro_geografia
+
+# Máximo de búsquedas distintas que se recuerdan por nivel.
+MAXIMO_RESULTADOS_EN_MEMORIA = 4096
+
+
+def orden_natural(numero):
+    """
+    Los números puramente numéricos primero y en orden numérico; después el resto.
+    """
+    return (0, int(numero), '') if numero.isdigit() else (1, 0, numero)
+
+
+def normalizar_nombre(nombre):
+    return (nombre or '').strip().casefold()
+
+
+class Claves():
+    """
+    Arreglo ordenado de (clave, id) con búsqueda por prefijo.
+    """
+
+    def __init__(self, pares):
+        pares = sorted(pares)
+        self.claves = [clave for clave, _ in pares]
+        self.ids = [id for _, id in pares]
+
+    def con_prefijo(self, prefijo):
+        desde = bisect_left(self.claves, prefijo)
+        hasta = desde
+        while hasta < len(self.claves) and self.claves[hasta].startswith(prefijo):
+            hasta += 1
+        return self.ids[desde:hasta]
+
+
+class Opciones():
+    """
+    Opciones de autocompletado de un nivel de la geografía, agrupadas por padre
+    (las de todos los padres juntas, bajo ``None``).
+    """
+
+    def __init__(self, filas, por_nombre=True):
+        self.por_nombre_habilitado = por_nombre
+        self.etiquetas = {}
+        self.orden = {}
+        numeros = defaultdict(list)
+        nombres = defaultdict(list)
+        for id, padre_id, numero, nombre in filas:
+            numero = numero or ''
+            self.etiquetas[id] = (numero, nombre or '')
+            clave_numero = normalizar(numero) or ''
+            self.orden[id] = orden_natural(clave_numero) + (id, )
+            for padre in (None, ) if padre_id is None else (padre_id, None):
+                numeros[padre].append((clave_numero, id))
+                if nombre and por_nombre:
+                    nombres[padre].append((normalizar_nombre(nombre), id))
+        self.por_numero = {padre: Claves(pares) for padre, pares in numeros.items()}
+        self.por_nombre = {padre: Claves(pares) for padre, pares in nombres.items()}
+        self.resultados = {}
+
+    def buscar(self, q='', padres=None):
+        """
+        Devuelve los ids de los hijos de ``padres`` (``None`` es todos) cuyo número
+        o nombre empieza con ``q``: primero los de número igual a ``q``, después los de número
+        con ese prefijo y por último los de nombre con ese prefijo, cada grupo en orden natural.
+        """
+        clave = (q, None if padres is None else tuple(padres))
+        # Otro hilo puede vaciar la memoria en cualquier momento: se devuelve siempre el valor local.
+        resultado = self.resultados.get(clave)
+        if resultado is None:
+            if len(self.resultados) >= MAXIMO_RESULTADOS_EN_MEMORIA:
+                self.resultados.clear()
+            resultado = self.resultados[clave] = self._buscar(q, padres)
+        return resultado
+
+    def _buscar(self, q, padres):
+        padres = [None] if padres is None else padres
+        prefijo_numero = normalizar(q) if q else ''
+        grupos = [self._con_prefijo(self.por_numero, padres, prefijo_numero)]
+        if q and self.por_nombre_habilitado:
+            grupos.append(self._con_prefijo(self.por_nombre, padres, normalizar_nombre(q)))
+
+        exactos = [
+            id for id in grupos[0] if normalizar(self.etiquetas[id][0]) == prefijo_numero
+        ] if q else []
+        vistos = set(exactos)
+        resultado = sorted(exactos, key=self.orden.get)
+        for grupo in grupos:
+            nuevos = [id for id in grupo if id not in vistos]
+            vistos.update(nuevos)
+            resultado.extend(sorted(nuevos, key=self.orden.get))
+        return resultado
+
+    @staticmethod
+    def _con_prefijo(indice, padres, prefijo):
+        return [id for padre in padres if padre in indice for id in indice[padre].con_prefijo(prefijo)]
+
+    def etiqueta(self, id):
+        """
+        (número, nombre) del elemento, o ``None`` si no existe.
+        """
+        return self.etiquetas.get(id)
+
+
+def cargar_opciones(nivel):
+    if nivel == 'distrito':
+        filas = ((id, None, numero, nombre) for id, numero, nombre in Distrito.objects.values_list(
+            'id', 'numero', 'nombre'
+        ))
+    elif nivel == 'seccion':
+        filas = Seccion.objects.values_list('id', 'distrito_id', 'numero', 'nombre').iterator()
+    elif nivel == 'circuito':
+        filas = Circuito.objects.values_list('id', 'seccion_id', 'numero', 'nombre').iterator()
+    elif nivel == 'mesa':
+        # Las mesas se muestran con el nombre de su escuela, pero se buscan sólo por número.
+        return Opciones(
+            Mesa.objects.values_list('id', 'circuito_id', 'numero', 'lugar_votacion__nombre').iterator(),
+            por_nombre=False
+        )
+    else:
+        raise ValueError(f'Nivel desconocido: {nivel}')
+    return Opciones(filas)
+
+
+def opciones(nivel):
+    """
+    Las opciones de autocompletado del nivel ('distrito', 'seccion', 'circuito' o 'mesa').
+    Se descartan junto con el índice de la geografía.
+    """
+    return registro_geografia.memo(('autocompletar', nivel), lambda: cargar_opciones(nivel))
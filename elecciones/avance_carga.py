@@ -70,10 +70,7 @@ class AvanceDeCarga(Sumarizador):
             cantidad_preidentificaciones = PreIdentificacion.objects.filter(lookups_preident).count()
 
 
-        mesacats_de_la_categoria = MesaCategoria.objects.filter(
-            mesa__in=self.mesas_a_considerar,
-            categoria=self.categoria
-        )
+        mesacats_de_la_categoria = self.mesa_categorias(self.categoria)
 
         # mesas sin identificar y en identificación: dependen de las identificaciones **válidas**
         # y de los attachment.
@@ -134,7 +131,8 @@ class AvanceDeCarga(Sumarizador):
                 mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.total_en_conflicto) | \
                     mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.con_problemas)
 
-        dato_total = DatoTotalAvanceDeCarga().para_mesas(self.mesas_a_considerar)
+        # Hay una MesaCategoria por mesa, así que las cantidades son las mismas que sobre las mesas.
+        dato_total = DatoTotalAvanceDeCarga().para_mesacats(mesacats_de_la_categoria)
 
         return AttrDict({
             "total": dato_total,
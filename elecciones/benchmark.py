@@ -0,0 +1,469 @@
+"""
+Benchmark reproducible de la noche de la elección.
+
+:class:`GeneradorDataset` arma, con inserciones masivas, un dataset sintético de escala
+nacional (geografía, categorías, mesas-categorías, cargas ya consolidadas y actas sin identificar).
+
+:class:`Benchmark` simula a los voluntarios recorriendo siguiente acción → identificación → carga,
+intercala corridas del consolidador y del scheduler y al final consulta las páginas de resultados
+y de avance de carga. Cada paso se mide con :mod:`escrutinio_social.metricas` y el reporte
+(ver :meth:`Benchmark.reporte`) resume throughput, latencias p50/p99 y consultas por paso,
+pensado para guardarse como JSON y compararse entre commits.
+
+Todo se deriva de una semilla: la misma semilla genera el mismo dataset y los mismos votos.
+"""
+import math
+import random
+import subprocess
+import time
+import zlib
+from collections import defaultdict
+from io import BytesIO, StringIO
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+import structlog
+
+from adjuntos.consolidacion import consumir_novedades
+from adjuntos.models import Attachment
+from escrutinio_social.metricas import Medicion, midiendo
+from fiscales.forms import formset_de_carga
+from fiscales.models import Fiscal
+from scheduling.scheduler import scheduler
+from .contadores_avance import recalcular_contadores_avance
+from .generacion_resultados import nueva_generacion_resultados
+from .models import (
+    Carga, Categoria, CategoriaGeneral, CategoriaOpcion, Circuito, Distrito, LugarVotacion, Mesa,
+    MesaCategoria, Opcion, Partido, Seccion, VotoMesaReportado,
+)
+from .registro_geografia import registro_geografia
+from .registro_metadata import registro
+
+logger = structlog.get_logger(__name__)
+
+# Las actas sintéticas llevan en el digest el id de la mesa a la que corresponden.
+PREFIJO_DIGEST = 'benchmark-'
+RUTA_FOTO = 'benchmark/acta.png'
+TAMANIO_LOTE = 5000
+CIRCUITOS_POR_TANDA = 25
+
+
+def crear_en_lote(modelo, objetos):
+    """
+    ``bulk_create`` en lotes que además deja asignados los ids de los objetos creados.
+
+    Las bases que no devuelven los ids (todas menos Postgres) se asume que sólo las está
+    escribiendo el benchmark y se toman los últimos ids de la tabla.
+    """
+    for i in range(0, len(objetos), TAMANIO_LOTE):
+        lote = objetos[i:i + TAMANIO_LOTE]
+        modelo.objects.bulk_create(lote)
+        if lote and lote[0].pk is None:
+            ids = modelo.objects.order_by('-id').values_list('id', flat=True)[:len(lote)]
+            for objeto, id_creado in zip(lote, reversed(list(ids))):
+                objeto.pk = id_creado
+    return objetos
+
+
+def votos_sinteticos(semilla, mesa_id, mesa_categoria_id, opciones, electores):
+    """
+    Devuelve {opcion_id: votos} para las opciones dadas. Es determinístico, de modo que dos
+    voluntarios que cargan la misma mesa-categoría (o una carga parcial y una total) coinciden.
+    El total de votos es metadata compartida por todas las categorías de la mesa.
+    """
+    def numero(*claves):
+        return zlib.crc32('-'.join(str(clave) for clave in (semilla,) + claves).encode())
+
+    # Acotados para que la suma nunca supere la cantidad de electores.
+    maximo_por_opcion = max(electores // len(opciones), 1)
+    votos = {}
+    for opcion in opciones:
+        if opcion.tipo == Opcion.TIPOS.metadata:
+            votos[opcion.id] = electores // 2 + numero(mesa_id, opcion.id) % (electores // 2)
+        else:
+            votos[opcion.id] = numero(mesa_categoria_id, opcion.id) % maximo_por_opcion
+    return votos
+
+
+class GeneradorDataset():
+    """
+    Genera el dataset sintético. Los valores por defecto dan ~100k mesas y 10 categorías.
+    """
+
+    def __init__(
+        self, semilla=0, distritos=24, secciones_por_distrito=20, circuitos_por_seccion=10,
+        mesas_por_circuito=21, categorias=10, partidos=8, proporcion_cargadas=0.3,
+        proporcion_con_foto=0.1, voluntarios=50, electores_por_mesa=350, log=None
+    ):
+        self.semilla = semilla
+        self.random = random.Random(semilla)
+        self.cant_distritos = distritos
+        self.secciones_por_distrito = secciones_por_distrito
+        self.circuitos_por_seccion = circuitos_por_seccion
+        self.mesas_por_circuito = mesas_por_circuito
+        self.cant_categorias = categorias
+        self.cant_partidos = partidos
+        self.proporcion_cargadas = proporcion_cargadas
+        self.proporcion_con_foto = proporcion_con_foto
+        self.cant_voluntarios = voluntarios
+        self.electores_por_mesa = electores_por_mesa
+        self.log = log or (lambda mensaje: None)
+        self.cantidades = defaultdict(int)
+
+    def generar(self):
+        inicio = time.perf_counter()
+        self.crear_voluntarios()
+        self.crear_categorias_y_opciones()
+        self.crear_geografia()
+        self.crear_mesas()
+        # Las inserciones masivas no pasan por los contadores del avance de carga
+        # ni cambian la generación de los resultados.
+        recalcular_contadores_avance()
+        nueva_generacion_resultados()
+        registro.invalidar()
+        registro_geografia.invalidar()
+        self.cantidades['segundos'] = round(time.perf_counter() - inicio, 2)
+        return dict(self.cantidades)
+
+    def crear_voluntarios(self):
+        validadores, _ = Group.objects.get_or_create(name='validadores')
+        grupos_visualizador = [
+            Group.objects.get_or_create(name=nombre)[0]
+            for nombre in ('visualizadores', 'visualizadores_sensible')
+        ]
+        for i in range(self.cant_voluntarios):
+            user = User.objects.create(username=f'benchmark-voluntario-{i}')
+            user.groups.add(validadores)
+            Fiscal.objects.create(user=user, estado='CONFIRMADO', apellido='Benchmark', nombres=str(i))
+        user = User.objects.create(username='benchmark-visualizador')
+        user.groups.add(*grupos_visualizador)
+        Fiscal.objects.create(user=user, estado='CONFIRMADO', apellido='Benchmark', nombres='visualizador')
+        # Ordenados, para que la misma semilla elija siempre los mismos voluntarios.
+        self.fiscales = list(
+            Fiscal.objects.filter(user__username__startswith='benchmark-voluntario-').order_by('id')
+        )
+        self.cantidades['voluntarios'] = len(self.fiscales)
+
+    def crear_categorias_y_opciones(self):
+        categorias = []
+        for i in range(1, self.cant_categorias + 1):
+            general = CategoriaGeneral.objects.create(nombre=f'Benchmark {i}', slug=f'benchmark-{i}')
+            categorias.append(Categoria(
+                categoria_general=general, nombre=f'Benchmark {i}', slug=f'benchmark-{i}', prioridad=i,
+                # La primera categoría se carga primero en forma parcial.
+                requiere_cargas_parciales=i == 1,
+            ))
+        crear_en_lote(Categoria, categorias)
+        call_command('setup_opciones_basicas', stdout=StringIO())
+
+        codigos = [settings.CODIGO_PARTIDO_NOSOTROS, settings.CODIGO_PARTIDO_ELLOS]
+        codigos += [str(1000 + i) for i in range(self.cant_partidos - len(codigos))]
+        partidos = crear_en_lote(Partido, [
+            Partido(numero=i, codigo=codigo, nombre=f'Partido {codigo}', nombre_corto=f'P{codigo}')
+            for i, codigo in enumerate(codigos[:self.cant_partidos], 1)
+        ])
+        opciones = crear_en_lote(Opcion, [
+            Opcion(
+                partido=partido, nombre=partido.nombre, nombre_corto=partido.nombre_corto,
+                codigo=partido.codigo
+            )
+            for partido in partidos
+        ])
+        crear_en_lote(CategoriaOpcion, [
+            CategoriaOpcion(categoria=categoria, opcion=opcion, orden=orden, prioritaria=orden <= 2)
+            for categoria in categorias
+            for orden, opcion in enumerate(opciones, 1)
+        ])
+        registro.invalidar()
+        self.categorias = categorias
+        self.opciones_por_categoria = {
+            categoria.id: registro.opciones_actuales(categoria, excluir_optativas=True)
+            for categoria in categorias
+        }
+        self.cantidades['categorias'] = len(categorias)
+        self.cantidades['opciones_por_categoria'] = len(self.opciones_por_categoria[categorias[0].id])
+
+    def crear_geografia(self):
+        electores_circuito = self.mesas_por_circuito * self.electores_por_mesa
+        electores_seccion = electores_circuito * self.circuitos_por_seccion
+        distritos = crear_en_lote(Distrito, [
+            Distrito(
+                numero=str(i), nombre=f'Distrito {i}',
+                electores=electores_seccion * self.secciones_por_distrito
+            )
+            for i in range(1, self.cant_distritos + 1)
+        ])
+        secciones = crear_en_lote(Seccion, [
+            Seccion(distrito=distrito, numero=str(i), nombre=f'Sección {i}', electores=electores_seccion)
+            for distrito in distritos
+            for i in range(1, self.secciones_por_distrito + 1)
+        ])
+        self.circuitos = crear_en_lote(Circuito, [
+            Circuito(seccion=seccion, numero=str(i), nombre=f'Circuito {i}', electores=electores_circuito)
+            for seccion in secciones
+            for i in range(1, self.circuitos_por_seccion + 1)
+        ])
+        # Una escuela por circuito.
+        self.escuelas = {
+            escuela.circuito_id: escuela
+            for escuela in crear_en_lote(LugarVotacion, [
+                LugarVotacion(circuito=circuito, nombre=f'Escuela {circuito.numero}', direccion='-')
+                for circuito in self.circuitos
+            ])
+        }
+        self.cantidades['distritos'] = len(distritos)
+        self.cantidades['secciones'] = len(secciones)
+        self.cantidades['circuitos'] = len(self.circuitos)
+
+    def crear_mesas(self):
+        """
+        Las mesas se crean por tandas de circuitos, junto con sus mesas-categorías y,
+        según las proporciones pedidas, sus cargas consolidadas o su foto sin identificar.
+        """
+        if self.proporcion_con_foto and not default_storage.exists(RUTA_FOTO):
+            imagen = BytesIO()
+            Image.new('RGB', (300, 400), 'white').save(imagen, 'PNG')
+            default_storage.save(RUTA_FOTO, ContentFile(imagen.getvalue()))
+
+        numero_en_distrito = defaultdict(int)
+        for i in range(0, len(self.circuitos), CIRCUITOS_POR_TANDA):
+            mesas = []
+            for circuito in self.circuitos[i:i + CIRCUITOS_POR_TANDA]:
+                for _ in range(self.mesas_por_circuito):
+                    distrito_id = circuito.seccion.distrito_id
+                    numero_en_distrito[distrito_id] += 1
+                    mesas.append(Mesa(
+                        circuito=circuito, lugar_votacion=self.escuelas[circuito.id],
+                        numero=str(numero_en_distrito[distrito_id]), electores=self.electores_por_mesa
+                    ))
+            crear_en_lote(Mesa, mesas)
+            self.crear_tanda(mesas)
+            self.log(f'{self.cantidades["mesas"]} mesas creadas')
+
+    def crear_tanda(self, mesas):
+        mesa_categorias = crear_en_lote(MesaCategoria, [
+            MesaCategoria(mesa=mesa, categoria=categoria) for mesa in mesas for categoria in self.categorias
+        ])
+        cargadas = set()
+        attachments = []
+        for mesa in mesas:
+            sorteo = self.random.random()
+            if sorteo < self.proporcion_cargadas:
+                cargadas.add(mesa.id)
+            elif sorteo < self.proporcion_cargadas + self.proporcion_con_foto:
+                attachments.append(Attachment(
+                    foto=RUTA_FOTO, foto_digest=f'{PREFIJO_DIGEST}{mesa.id}', mimetype='image/png',
+                    width=300, height=400
+                ))
+        crear_en_lote(Attachment, attachments)
+        self.crear_cargas_consolidadas([mc for mc in mesa_categorias if mc.mesa_id in cargadas])
+        self.cantidades['mesas'] += len(mesas)
+        self.cantidades['mesa_categorias'] += len(mesa_categorias)
+        self.cantidades['attachments'] += len(attachments)
+
+    def crear_cargas_consolidadas(self, mesa_categorias):
+        """
+        Dos cargas totales coincidentes por mesa-categoría, ya procesadas, y la mesa-categoría
+        consolidada con la primera como testigo.
+        """
+        cargas = crear_en_lote(Carga, [
+            Carga(
+                mesa_categoria=mc, tipo=Carga.TIPOS.total, origen=Carga.SOURCES.web, procesada=True,
+                fiscal=fiscal
+            )
+            for mc in mesa_categorias
+            for fiscal in self.random.sample(self.fiscales, 2)
+        ])
+        reportados = []
+        for carga in cargas:
+            mc = carga.mesa_categoria
+            opciones = self.opciones_por_categoria[mc.categoria_id]
+            votos = votos_sinteticos(self.semilla, mc.mesa_id, mc.id, opciones, self.electores_por_mesa)
+            reportados.extend(
+                VotoMesaReportado(carga=carga, opcion_id=opcion_id, votos=cantidad)
+                for opcion_id, cantidad in votos.items()
+            )
+        crear_en_lote(VotoMesaReportado, reportados)
+
+        for mc, carga in zip(mesa_categorias, cargas[::2]):
+            mc.status = MesaCategoria.STATUS.total_consolidada_dc
+            mc.carga_testigo = carga
+        MesaCategoria.objects.bulk_update(
+            mesa_categorias, ['status', 'carga_testigo'], batch_size=TAMANIO_LOTE
+        )
+        self.cantidades['cargas'] += len(cargas)
+        self.cantidades['votos_reportados'] += len(reportados)
+
+
+class Benchmark():
+    """
+    Simula ``voluntarios`` fiscales trabajando en paralelo (intercalados) hasta realizar
+    ``acciones`` acciones o quedarse sin tareas.
+    """
+
+    def __init__(self, semilla=0, acciones=500, acciones_por_ronda=50, log=None):
+        self.semilla = semilla
+        self.acciones = acciones
+        self.acciones_por_ronda = acciones_por_ronda
+        self.log = log or (lambda mensaje: None)
+        self.mediciones = defaultdict(list)
+        self.flujo = {}
+
+    def medir(self, nombre, funcion, *args, **kwargs):
+        with midiendo(Medicion(nombre)) as medicion:
+            resultado = funcion(*args, **kwargs)
+        self.mediciones[nombre].append(medicion)
+        return resultado
+
+    def cliente_de(self, fiscal):
+        cliente = Client()
+        cliente.force_login(fiscal.user)
+        return cliente
+
+    def correr(self):
+        # El test client usa 'testserver' como host.
+        with override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+            voluntarios = Fiscal.objects.filter(
+                user__username__startswith='benchmark-voluntario-'
+            ).select_related('user')
+            clientes = [self.cliente_de(fiscal) for fiscal in voluntarios]
+            self.simular_voluntarios(clientes)
+            visualizador = Fiscal.objects.select_related('user').get(user__username='benchmark-visualizador')
+            self.consultar_resultados(self.cliente_de(visualizador))
+        return self.reporte()
+
+    def simular_voluntarios(self, clientes):
+        self.medir('scheduler', scheduler)
+        realizadas = 0
+        inicio = time.perf_counter()
+        while realizadas < self.acciones:
+            en_la_ronda = 0
+            for cliente in clientes:
+                if en_la_ronda >= self.acciones_por_ronda or realizadas >= self.acciones:
+                    break
+                if self.accion(cliente):
+                    en_la_ronda += 1
+                    realizadas += 1
+            self.medir('consolidador', consumir_novedades, 500)
+            self.medir('scheduler', scheduler)
+            self.log(f'{realizadas} acciones realizadas')
+            if en_la_ronda == 0:
+                break
+        duracion = time.perf_counter() - inicio
+        self.flujo = {
+            'acciones': realizadas,
+            'segundos': round(duracion, 3),
+            'acciones_por_segundo': round(realizadas / duracion, 2) if duracion else None,
+        }
+
+    def accion(self, cliente):
+        """
+        Pide la siguiente acción y la realiza. Devuelve False si no había nada para hacer.
+        """
+        response = self.medir('siguiente_accion', cliente.get, reverse('siguiente-accion'))
+        if response.status_code != 302:
+            return False
+        url = response.url
+        match = resolve(urlparse(url).path)
+        if match.url_name == 'asignar-mesa':
+            self.identificar(cliente, url, int(match.kwargs['attachment_id']))
+        elif match.url_name in ('carga-total', 'carga-parcial'):
+            self.cargar(
+                cliente, url, int(match.kwargs['mesacategoria_id']), match.kwargs.get('tipo', 'total')
+            )
+        else:
+            return False
+        return True
+
+    def identificar(self, cliente, url, attachment_id):
+        self.medir('identificacion_get', cliente.get, url)
+        digest = Attachment.objects.values_list('foto_digest', flat=True).get(id=attachment_id)
+        mesa = Mesa.objects.select_related('circuito__seccion').get(id=int(digest[len(PREFIJO_DIGEST):]))
+        data = {
+            'distrito': mesa.circuito.seccion.distrito_id,
+            'seccion': mesa.circuito.seccion.numero,
+            'circuito': mesa.circuito.numero,
+            'mesa': mesa.numero,
+        }
+        self.medir('identificacion_post', cliente.post, url, data)
+
+    def cargar(self, cliente, url, mesa_categoria_id, tipo):
+        self.medir('carga_get', cliente.get, url)
+        mc = MesaCategoria.objects.select_related('mesa', 'categoria').get(id=mesa_categoria_id)
+        _, opciones = formset_de_carga(mc.categoria, tipo)
+        votos = votos_sinteticos(self.semilla, mc.mesa_id, mc.id, opciones, mc.mesa.electores)
+        votos.update(mc.datos_previos(tipo))
+        data = {
+            'form-TOTAL_FORMS': len(opciones),
+            'form-INITIAL_FORMS': 0,
+            'form-MIN_NUM_FORMS': len(opciones),
+            'form-MAX_NUM_FORMS': 1000,
+        }
+        for i, opcion in enumerate(opciones):
+            data[f'form-{i}-opcion'] = opcion.id
+            data[f'form-{i}-votos'] = votos[opcion.id]
+            # Igual a los votos, para confirmar de entrada las advertencias.
+            data[f'form-{i}-valor-previo'] = votos[opcion.id]
+        self.medir('carga_post', cliente.post, url, data)
+
+    def consultar_resultados(self, cliente):
+        # El parámetro extra evita el caché por url de las vistas.
+        for categoria in Categoria.objects.filter(slug__startswith='benchmark-'):
+            sin_cache = {'benchmark': timezone.now().timestamp()}
+            self.medir(
+                'resultados', cliente.get,
+                reverse('resultados-categoria-cuerpo-central', args=[categoria.id]), sin_cache
+            )
+            self.medir(
+                'avance_carga', cliente.get,
+                reverse('avance-carga-cuerpo-central', args=[categoria.id]), sin_cache
+            )
+
+    @staticmethod
+    def percentil(valores_ordenados, percentil):
+        indice = max(math.ceil(percentil / 100 * len(valores_ordenados)) - 1, 0)
+        return valores_ordenados[indice]
+
+    def resumen(self, mediciones):
+        tiempos = sorted(medicion.tiempo_total for medicion in mediciones)
+        consultas = [medicion.consultas for medicion in mediciones]
+        total = sum(tiempos)
+        return {
+            'cantidad': len(mediciones),
+            'por_segundo': round(len(mediciones) / total, 2) if total else None,
+            'p50_ms': round(self.percentil(tiempos, 50) * 1000, 2),
+            'p99_ms': round(self.percentil(tiempos, 99) * 1000, 2),
+            'media_ms': round(total / len(tiempos) * 1000, 2),
+            'tiempo_db_ms': round(sum(m.tiempo_db for m in mediciones) / len(mediciones) * 1000, 2),
+            'consultas_media': round(sum(consultas) / len(consultas), 2),
+            'consultas_max': max(consultas),
+        }
+
+    def reporte(self):
+        return {
+            'commit': commit_actual(),
+            'fecha': timezone.now().isoformat(),
+            'semilla': self.semilla,
+            'flujo': self.flujo,
+            'pasos': {
+                nombre: self.resumen(mediciones) for nombre, mediciones in sorted(self.mediciones.items())
+            },
+        }
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,250 @@
+"""
+Contadores del resumen de avance de carga (``AvanceDeCargaResumen``).
+
+El resumen muestra cuántas mesas, mesa-categorías, fotos y preidentificaciones hay en cada estado,
+en todo el país, en PBA y en la restricción geográfica elegida. Calcularlo sobre las tablas de carga
+son decenas de COUNT con anti-joins sobre Mesa, Attachment y MesaCategoria en cada vista. En cambio,
+``ContadorAvance`` guarda esas cantidades agrupadas por distrito, sección, categoría y estado, y el
+resumen se resuelve con una única consulta con SUM (ver ``resultados_resumen.ContadoresResumen``).
+
+Los contadores se mantienen en forma incremental: cada operación que cambia el estado de una mesa,
+una foto o una preidentificación calcula la contribución a los contadores de lo que toca antes y
+después del cambio, y suma la diferencia en la misma transacción (ver :func:`actualizando_contadores`)
+con un único ``INSERT ... ON CONFLICT DO UPDATE``.
+
+Las filas actualizadas quedan bloqueadas hasta el fin de la transacción. Para que las
+identificaciones concurrentes no se esperen entre sí en la fila de cada estado, las fotos se
+reparten en ``GRUPOS_FOTOS`` filas por estado (según su id), que se suman al leerlas.
+
+Qué cuenta cada tipo de fila:
+    - ``mesa_categoria``: mesa-categorías por distrito, sección, categoría, status y si la mesa
+      tiene alguna foto (``con_foto``).
+    - ``mesa``: mesas por distrito, sección, ``con_foto`` y si alguna de sus mesa-categorías
+      salió de ``sin_cargar`` (``con_carga`` / ``sin_carga``).
+    - ``foto``: fotos por grupo y estado (``identificada``, ``problema``, y las sin identificar en
+      ``en_proceso`` si tienen identificaciones o ``sin_acciones`` si no).
+    - ``preidentificacion``: preidentificaciones por distrito, sección y si alguna de sus fotos
+      está identificada (``identificada`` / ``sin_identificar``).
+
+Los mantienen la consolidación de cargas (``MesaCategoria.actualizar_status``) y de identificaciones,
+y la creación de mesas, mesa-categorías (también con ``bulk_create``), fotos, identificaciones y
+preidentificaciones. Lo que no pasa por ahí (``bulk_create`` de mesas o fotos, ``update``, cambios de
+geografía, borrados) requiere correr ``manage.py recalcular_contadores_avance``, que los arma de cero.
+"""
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from adjuntos.models import Attachment, Identificacion, PreIdentificacion
+from .models import ContadorAvance, Mesa, MesaCategoria
+
+TIPOS = ContadorAvance.TIPOS
+SIN_VALOR = ContadorAvance.SIN_VALOR
+
+# Campos que identifican cada fila, en el orden de las claves de las contribuciones.
+CAMPOS = ('tipo', 'distrito_id', 'seccion_id', 'categoria_id', 'con_foto', 'grupo', 'clave')
+
+# Cantidad de filas por estado en que se reparten las fotos.
+GRUPOS_FOTOS = 32
+
+# Cantidad de ids por consulta al calcular las contribuciones.
+TAMANIO_LOTE = 500
+
+
+def contribuciones_mesas(mesas):
+    """
+    Contribución a los contadores de las mesas del queryset ``mesas`` y de sus mesa-categorías.
+    """
+    # Una única consulta: una fila por mesa-categoría, o una fila con nulos si la mesa no tiene.
+    filas = mesas.annotate(
+        con_foto=Exists(Attachment.objects.filter(mesa_id=OuterRef('id')))
+    ).values_list(
+        'id', 'circuito__seccion__distrito_id', 'circuito__seccion_id', 'con_foto',
+        'mesacategoria__distrito_id', 'mesacategoria__seccion_id', 'mesacategoria__categoria_id',
+        'mesacategoria__status',
+    ).order_by()
+    contribuciones = Counter()
+    mesas_por_id = {}
+    con_carga = set()
+    for mesa_id, distrito_id, seccion_id, con_foto, mc_distrito_id, mc_seccion_id, categoria_id, status in (
+        filas.iterator()
+    ):
+        mesas_por_id[mesa_id] = (distrito_id or SIN_VALOR, seccion_id or SIN_VALOR, bool(con_foto))
+        if status is None:
+            continue
+        contribuciones[(
+            TIPOS.mesa_categoria, mc_distrito_id or SIN_VALOR, mc_seccion_id or SIN_VALOR, categoria_id,
+            bool(con_foto), 0, status
+        )] += 1
+        if status != MesaCategoria.STATUS.sin_cargar:
+            con_carga.add(mesa_id)
+
+    for mesa_id, (distrito_id, seccion_id, con_foto) in mesas_por_id.items():
+        clave = 'con_carga' if mesa_id in con_carga else 'sin_carga'
+        contribuciones[(TIPOS.mesa, distrito_id, seccion_id, SIN_VALOR, con_foto, 0, clave)] += 1
+    return contribuciones
+
+
+def clave_foto(status, con_identificaciones):
+    if status == Attachment.STATUS.sin_identificar:
+        return 'en_proceso' if con_identificaciones else 'sin_acciones'
+    return status
+
+
+def contribuciones_fotos(fotos):
+    filas = fotos.annotate(
+        con_identificaciones=Exists(Identificacion.objects.filter(attachment_id=OuterRef('id')))
+    ).values_list('id', 'status', 'con_identificaciones')
+    return Counter(
+        (
+            TIPOS.foto, SIN_VALOR, SIN_VALOR, SIN_VALOR, False, id % GRUPOS_FOTOS,
+            clave_foto(status, con_identificaciones)
+        )
+        for id, status, con_identificaciones in filas.iterator()
+    )
+
+
+def contribuciones_preidentificaciones(preidentificaciones):
+    filas = preidentificaciones.annotate(
+        identificada=Exists(Attachment.objects.filter(
+            pre_identificacion_id=OuterRef('id'), status=Attachment.STATUS.identificada
+        ))
+    ).values_list('distrito_id', 'seccion_id', 'identificada')
+    return Counter(
+        (
+            TIPOS.preidentificacion, distrito_id or SIN_VALOR, seccion_id or SIN_VALOR, SIN_VALOR, False, 0,
+            'identificada' if identificada else 'sin_identificar'
+        )
+        for distrito_id, seccion_id, identificada in filas.iterator()
+    )
+
+
+def contribuciones(mesas=(), fotos=(), preidentificaciones=()):
+    """
+    Contribución a los contadores de las mesas, fotos y preidentificaciones con los ids dados.
+    """
+    total = Counter()
+    for calcular, modelo, ids in (
+        (contribuciones_mesas, Mesa, mesas),
+        (contribuciones_fotos, Attachment, fotos),
+        (contribuciones_preidentificaciones, PreIdentificacion, preidentificaciones),
+    ):
+        ids = sorted({id for id in ids if id is not None})
+        for i in range(0, len(ids), TAMANIO_LOTE):
+            total.update(calcular(modelo.objects.filter(id__in=ids[i:i + TAMANIO_LOTE])))
+    return total
+
+
+def diferencia(antes, despues):
+    return {
+        clave: despues[clave] - antes[clave]
+        for clave in antes.keys() | despues.keys()
+        if despues[clave] != antes[clave]
+    }
+
+
+def aplicar(diferencias):
+    """
+    Suma las diferencias a los contadores, creando las filas que falten, con una única consulta.
+    """
+    if not diferencias:
+        return
+    # Siempre en el mismo orden, para que dos transacciones que actualizan las mismas filas
+    # no se bloqueen mutuamente.
+    claves = sorted(diferencias)
+    tabla = ContadorAvance._meta.db_table
+    columnas = CAMPOS + ('cantidad', )
+    fila = '(' + ', '.join(['%s'] * len(columnas)) + ')'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {tabla} ({", ".join(columnas)}) VALUES {", ".join([fila] * len(claves))} '
+            f'ON CONFLICT ({", ".join(CAMPOS)}) '
+            f'DO UPDATE SET cantidad = {tabla}.cantidad + EXCLUDED.cantidad',
+            [valor for clave in claves for valor in clave + (diferencias[clave], )]
+        )
+
+
+@contextmanager
+def actualizando_contadores(mesas=(), fotos=(), preidentificaciones=()):
+    """
+    Actualiza los contadores con el efecto de lo que se haga dentro del bloque sobre las mesas
+    (y sus mesa-categorías), fotos y preidentificaciones con los ids dados::
+
+        with actualizando_contadores(mesas=[mesa.id]):
+            mesa_categoria.save(update_fields=['status'])
+
+    Todo ocurre en la transacción de quien lo usa (o en una nueva), así que los contadores cambian
+    junto con los datos.
+    """
+    afectados = dict(mesas=set(mesas), fotos=set(fotos), preidentificaciones=set(preidentificaciones))
+    with transaction.atomic(savepoint=False):
+        antes = contribuciones(**afectados)
+        yield
+        aplicar(diferencia(antes, contribuciones(**afectados)))
+
+
+@transaction.atomic
+def recalcular_contadores_avance():
+    """
+    Arma los contadores de cero a partir de los datos. Devuelve la cantidad de filas.
+    """
+    if connection.vendor == 'postgresql':
+        # Las actualizaciones incrementales concurrentes esperan a que termine, y entonces
+        # suman su diferencia sobre los contadores ya recalculados.
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {ContadorAvance._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+    total = contribuciones_mesas(Mesa.objects.all())
+    total.update(contribuciones_fotos(Attachment.objects.all()))
+    total.update(contribuciones_preidentificaciones(PreIdentificacion.objects.all()))
+    ContadorAvance.objects.all().delete()
+    filas = ContadorAvance.objects.bulk_create(
+        ContadorAvance(cantidad=cantidad, **dict(zip(CAMPOS, clave)))
+        for clave, cantidad in total.items() if cantidad
+    )
+    return len(filas)
+
+
+def afectados_por(instancia):
+    if isinstance(instancia, Mesa):
+        return dict(mesas=[instancia.id])
+    if isinstance(instancia, MesaCategoria):
+        return dict(mesas=[instancia.mesa_id])
+    if isinstance(instancia, Attachment):
+        return dict(
+            mesas=[instancia.mesa_id], fotos=[instancia.id],
+            preidentificaciones=[instancia.pre_identificacion_id]
+        )
+    if isinstance(instancia, Identificacion):
+        return dict(fotos=[instancia.attachment_id])
+    return dict(preidentificaciones=[instancia.id])
+
+
+@receiver(pre_save, sender=Mesa)
+@receiver(pre_save, sender=MesaCategoria)
+@receiver(pre_save, sender=Attachment)
+@receiver(pre_save, sender=Identificacion)
+@receiver(pre_save, sender=PreIdentificacion)
+def contribuciones_previas_a_crear(sender, instance, raw=False, **kwargs):
+    if raw or not instance._state.adding:
+        return
+    if sender is Identificacion and instance.attachment_id and connection.in_atomic_block:
+        # Si dos fiscales identifican la misma foto a la vez, la segunda espera a que termine
+        # la primera para no contarla dos veces como "en proceso".
+        list(Attachment.objects.select_for_update().filter(id=instance.attachment_id).values_list('id'))
+    instance._contribuciones_previas = contribuciones(**afectados_por(instance))
+
+
+@receiver(post_save, sender=Mesa)
+@receiver(post_save, sender=MesaCategoria)
+@receiver(post_save, sender=Attachment)
+@receiver(post_save, sender=Identificacion)
+@receiver(post_save, sender=PreIdentificacion)
+def actualizar_contadores_al_crear(sender, instance, created, raw=False, **kwargs):
+    if raw or not created or not hasattr(instance, '_contribuciones_previas'):
+        return
+    antes = instance.__dict__.pop('_contribuciones_previas')
+    aplicar(diferencia(antes, contribuciones(**afectados_por(instance))))
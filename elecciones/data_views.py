@@ -6,9 +6,11 @@ ej: http://localhost:8000/elecciones/resultados-parciales-gobernador-cordoba-201
 from elecciones.models import Categoria, VotoMesaReportado
 import django_excel as excel
 from django.views.decorators.cache import cache_page
+from escrutinio_social.replica import vista_desde_replica
 
 
 @cache_page(60 * 5)  # 5 minutos
+@vista_desde_replica
 def resultado_parcial_categoria(request, slug_categoria, filetype):
     '''
     lista de paradas de transporte urbano de pasajeros
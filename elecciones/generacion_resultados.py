@@ -0,0 +1,76 @@
+"""
+Generación de los resultados: un identificador que cambia cada vez que pueden haber cambiado
+los resultados, junto con el momento del cambio.
+
+Cambia al confirmarse cada transacción que cambia el status o la carga testigo de una
+mesa-categoría (la consolidación), o que modifica la metadata electoral o las técnicas de
+proyección. Se guarda en el caché compartido ``settings.CACHE_API_RESULTADOS``, así que todos
+los procesos ven la misma. La API pública de resultados (ver ``api/resultados.py``) la usa para
+los encabezados ``ETag`` y ``Last-Modified``.
+
+Como los contadores del avance de carga (ver ``contadores_avance``), no se entera de los
+``update`` ni de las inserciones masivas: después de esos cambios hay que llamar a
+:func:`nueva_generacion_resultados`.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    AgrupacionCircuito, AgrupacionCircuitos, Categoria, CategoriaOpcion, MesaCategoria, Opcion, Partido,
+    TecnicaProyeccion,
+)
+
+CLAVE_GENERACION = 'elecciones.generacion_resultados'
+
+# Los campos de MesaCategoria que cambian los resultados.
+CAMPOS_RESULTADOS = {'status', 'carga_testigo'}
+
+
+def cache_resultados():
+    return caches[settings.CACHE_API_RESULTADOS]
+
+
+def nueva_generacion_resultados():
+    """
+    Publica una generación nueva y la devuelve.
+    """
+    generacion = (uuid.uuid4().hex, int(time.time()))
+    cache_resultados().set(CLAVE_GENERACION, generacion, None)
+    return generacion
+
+
+def generacion_resultados():
+    """
+    La generación vigente: ``(identificador, timestamp)``.
+    """
+    return cache_resultados().get(CLAVE_GENERACION) or nueva_generacion_resultados()
+
+
+@receiver(post_save, sender=MesaCategoria)
+def cambiar_generacion_al_consolidar(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or CAMPOS_RESULTADOS & set(update_fields):
+        transaction.on_commit(nueva_generacion_resultados)
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Opcion)
+@receiver(post_save, sender=CategoriaOpcion)
+@receiver(post_save, sender=Partido)
+@receiver(post_save, sender=TecnicaProyeccion)
+@receiver(post_save, sender=AgrupacionCircuitos)
+@receiver(post_save, sender=AgrupacionCircuito)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Opcion)
+@receiver(post_delete, sender=CategoriaOpcion)
+@receiver(post_delete, sender=Partido)
+@receiver(post_delete, sender=TecnicaProyeccion)
+@receiver(post_delete, sender=AgrupacionCircuitos)
+@receiver(post_delete, sender=AgrupacionCircuito)
+def cambiar_generacion(sender, **kwargs):
+    transaction.on_commit(nueva_generacion_resultados)
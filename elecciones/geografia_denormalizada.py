@@ -0,0 +1,85 @@
+"""
+Completa la categoría y la ubicación geográfica denormalizadas en ``MesaCategoria``, ``Carga`` y
+``VotoMesaReportado`` a partir de la mesa de cada una.
+
+Lo usan el comando ``denormalizar_geografia`` y la migración que agregó esas columnas, por eso
+recibe el registro de modelos (``django.apps.apps`` o el de la migración). Los cambios de circuito
+de una mesa, de sección de un circuito y de distrito de una sección se propagan solos
+(ver los receivers en ``models``).
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+
+TAMANIO_LOTE = 50000
+
+
+def actualizar_en_lotes(queryset, tamanio_lote, al_avanzar=None, **valores):
+    """
+    Actualiza ``queryset`` con un UPDATE por rango de ids, para no bloquear la tabla entera
+    en una única transacción. Después de cada lote llama a ``al_avanzar(actualizadas, hasta_id)``.
+    Devuelve la cantidad de filas actualizadas.
+    """
+    maximo = queryset.aggregate(maximo=Max('id'))['maximo'] or 0
+    actualizadas = 0
+    for desde in range(0, maximo + 1, tamanio_lote):
+        with transaction.atomic():
+            actualizadas += queryset.filter(id__gte=desde, id__lt=desde + tamanio_lote).update(**valores)
+        if al_avanzar:
+            al_avanzar(actualizadas, desde + tamanio_lote)
+    return actualizadas
+
+
+def denormalizar_geografia(apps, tamanio_lote=TAMANIO_LOTE, solo_faltantes=False, al_avanzar=None):
+    """
+    Completa (o con ``solo_faltantes=False`` recalcula) los datos denormalizados. Devuelve
+    ``[(nombre del modelo, filas actualizadas), ...]``; ``al_avanzar(nombre, actualizadas, hasta_id)``
+    se llama después de cada lote.
+    """
+    Mesa = apps.get_model('elecciones', 'Mesa')
+    MesaCategoria = apps.get_model('elecciones', 'MesaCategoria')
+    Carga = apps.get_model('elecciones', 'Carga')
+    VotoMesaReportado = apps.get_model('elecciones', 'VotoMesaReportado')
+
+    def actualizar(queryset, **valores):
+        nombre = queryset.model.__name__
+        avance = partial(al_avanzar, nombre) if al_avanzar else None
+        return nombre, actualizar_en_lotes(queryset, tamanio_lote, avance, **valores)
+
+    # Cada nivel se completa a partir del anterior, ya actualizado.
+    resultados = []
+    mesas = Mesa.objects.filter(id=OuterRef('mesa_id'))
+    mesa_categorias = MesaCategoria.objects.all()
+    if solo_faltantes:
+        mesa_categorias = mesa_categorias.filter(circuito__isnull=True)
+    resultados.append(actualizar(
+        mesa_categorias,
+        distrito_id=Subquery(mesas.values('circuito__seccion__distrito_id')[:1]),
+        seccion_id=Subquery(mesas.values('circuito__seccion_id')[:1]),
+        circuito_id=Subquery(mesas.values('circuito_id')[:1]),
+    ))
+
+    mesa_categorias = MesaCategoria.objects.filter(id=OuterRef('mesa_categoria_id'))
+    cargas = Carga.objects.all()
+    if solo_faltantes:
+        cargas = cargas.filter(circuito__isnull=True)
+    resultados.append(actualizar(
+        cargas,
+        distrito_id=Subquery(mesa_categorias.values('distrito_id')[:1]),
+        seccion_id=Subquery(mesa_categorias.values('seccion_id')[:1]),
+        circuito_id=Subquery(mesa_categorias.values('circuito_id')[:1]),
+    ))
+
+    cargas = Carga.objects.filter(id=OuterRef('carga_id'))
+    votos = VotoMesaReportado.objects.all()
+    if solo_faltantes:
+        votos = votos.filter(categoria__isnull=True)
+    resultados.append(actualizar(
+        votos,
+        categoria_id=Subquery(cargas.values('mesa_categoria__categoria_id')[:1]),
+        distrito_id=Subquery(cargas.values('distrito_id')[:1]),
+        seccion_id=Subquery(cargas.values('seccion_id')[:1]),
+        circuito_id=Subquery(cargas.values('circuito_id')[:1]),
+    ))
+    return resultados
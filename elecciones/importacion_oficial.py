@@ -0,0 +1,175 @@
+"""
+Importación de los resultados oficiales (cargas ``parcial_oficial``) en forma masiva.
+
+El mapa (distrito, sección, circuito, mesa) → ``MesaCategoria`` de la categoría y los ids
+de las opciones se arman una única vez al principio, así que resolver una fila no hace
+consultas. Cada fila se compara con la carga parcial oficial vigente de la mesa (por
+firma): las que no cambiaron se descartan y el resto se escribe en lotes con
+``bulk_create`` (cargas y votos) y ``bulk_update`` (``MesaCategoria.parcial_oficial``).
+
+Esto permite correr la importación contra el feed incremental todas las veces que
+haga falta: volver a importar los mismos datos no escribe nada.
+"""
+from django.conf import settings
+from django.db import transaction
+import structlog
+
+from .models import (
+    Carga, CategoriaOpcion, MesaCategoria, Opcion, VotoMesaReportado, empaquetar_votos,
+)
+from .registro_geografia import normalizar
+
+logger = structlog.get_logger(__name__)
+
+TAMANIO_LOTE = 2000
+
+# Claves de los votos de cada fila.
+NOSOTROS = 'nosotros'
+ELLOS = 'ellos'
+BLANCOS = 'blancos'
+NULOS = 'nulos'
+TOTAL = 'total'
+
+
+def clave_de_mesa(distrito, seccion, circuito, mesa):
+    return tuple(normalizar(numero) for numero in (distrito, seccion, circuito, mesa))
+
+
+def firma(opcion_votos):
+    """
+    Firma de una carga con los votos dados, en el mismo formato que ``Carga.actualizar_firma``.
+    """
+    return '|'.join(f'{opcion}-{votos}' for (opcion, votos) in sorted(opcion_votos))
+
+
+class ImportadorCargaOficial():
+    """
+    Uso::
+
+        importador = ImportadorCargaOficial(categoria, fiscal)
+        for fila in filas:
+            importador.agregar(distrito, seccion, circuito, mesa, {NOSOTROS: 10, ELLOS: 5, ...})
+        importador.guardar()
+
+    ``agregar`` devuelve ``False`` si la mesa no existe (o no tiene la categoría). Si una
+    mesa aparece más de una vez se toma la última fila.
+    """
+
+    def __init__(self, categoria, fiscal, origen=Carga.SOURCES.csv, tamanio_lote=TAMANIO_LOTE):
+        self.categoria = categoria
+        self.fiscal = fiscal
+        self.origen = origen
+        self.tamanio_lote = tamanio_lote
+        self.opciones = self.ids_de_opciones()
+        self.mesa_categorias = self.mapa_de_mesa_categorias()
+        self.pendientes = {}
+        self.creadas = 0
+        self.sin_cambios = 0
+        self.no_encontradas = 0
+
+    def ids_de_opciones(self):
+        def opcion_de_partido(codigo):
+            return CategoriaOpcion.objects.get(
+                categoria=self.categoria, opcion__partido__codigo=codigo
+            ).opcion_id
+
+        return {
+            NOSOTROS: opcion_de_partido(settings.CODIGO_PARTIDO_NOSOTROS),
+            ELLOS: opcion_de_partido(settings.CODIGO_PARTIDO_ELLOS),
+            BLANCOS: Opcion.blancos().id,
+            NULOS: Opcion.nulos().id,
+            TOTAL: Opcion.total_votos().id,
+        }
+
+    def mapa_de_mesa_categorias(self):
+        """
+        Devuelve un diccionario
+            clave de mesa -> [id de MesaCategoria, (distrito, sección, circuito), firma de parcial_oficial]
+        con una única consulta.
+        """
+        mapa = {}
+        consulta = MesaCategoria.objects.filter(categoria=self.categoria).values_list(
+            'id', 'mesa__circuito__seccion__distrito__numero', 'mesa__circuito__seccion__numero',
+            'mesa__circuito__numero', 'mesa__numero', 'distrito_id', 'seccion_id', 'circuito_id',
+            'parcial_oficial__firma'
+        )
+        for mc_id, distrito, seccion, circuito, mesa, *geografia, firma_oficial in consulta.iterator(
+            chunk_size=self.tamanio_lote
+        ):
+            mapa[clave_de_mesa(distrito, seccion, circuito, mesa)] = [mc_id, tuple(geografia), firma_oficial]
+        return mapa
+
+    def agregar(self, distrito, seccion, circuito, mesa, votos):
+        """
+        Agrega los votos (un diccionario clave de opción -> votos) de una mesa.
+        Devuelve si la mesa existe. Si algún voto no es un entero no negativo lanza
+        ``ValueError`` y la fila se descarta.
+        """
+        datos = self.mesa_categorias.get(clave_de_mesa(distrito, seccion, circuito, mesa))
+        if datos is None:
+            self.no_encontradas += 1
+            return False
+
+        mc_id, geografia, firma_oficial = datos
+        opcion_votos = [(self.opciones[clave], int(cantidad)) for clave, cantidad in votos.items()]
+        negativos = [cantidad for _, cantidad in opcion_votos if cantidad < 0]
+        if negativos:
+            # Los votos compactos son enteros sin signo: un negativo se guardaría como otro número.
+            raise ValueError(f'votos negativos ({negativos[0]})')
+        firma_nueva = firma(opcion_votos)
+        if firma_nueva == firma_oficial:
+            self.sin_cambios += 1
+            return True
+
+        # La firma nueva queda como vigente para las próximas filas de la misma mesa.
+        datos[2] = firma_nueva
+        self.pendientes[mc_id] = (geografia, opcion_votos, firma_nueva)
+        if len(self.pendientes) >= self.tamanio_lote:
+            self.guardar()
+        return True
+
+    def guardar(self):
+        """
+        Escribe las cargas pendientes, sus votos y las nuevas ``parcial_oficial``
+        en una transacción.
+        """
+        if not self.pendientes:
+            return
+
+        cargas = []
+        votos_por_carga = []
+        for mc_id, (geografia, opcion_votos, firma_nueva) in self.pendientes.items():
+            carga = Carga(
+                mesa_categoria_id=mc_id,
+                tipo=Carga.TIPOS.parcial_oficial,
+                fiscal=self.fiscal,
+                origen=self.origen,
+                firma=firma_nueva,
+                votos_compactos=empaquetar_votos(opcion_votos),
+            )
+            carga.distrito_id, carga.seccion_id, carga.circuito_id = geografia
+            cargas.append(carga)
+            votos_por_carga.append(opcion_votos)
+
+        with transaction.atomic():
+            Carga.objects.bulk_create(cargas, batch_size=self.tamanio_lote)
+            VotoMesaReportado.objects.bulk_create(
+                (
+                    VotoMesaReportado(
+                        carga_id=carga.id, opcion_id=opcion_id, votos=cantidad,
+                        categoria_id=self.categoria.id, distrito_id=carga.distrito_id,
+                        seccion_id=carga.seccion_id, circuito_id=carga.circuito_id,
+                    )
+                    for carga, opcion_votos in zip(cargas, votos_por_carga)
+                    for opcion_id, cantidad in opcion_votos
+                ),
+                batch_size=self.tamanio_lote
+            )
+            MesaCategoria.objects.bulk_update(
+                [MesaCategoria(id=carga.mesa_categoria_id, parcial_oficial_id=carga.id) for carga in cargas],
+                ['parcial_oficial'], batch_size=self.tamanio_lote
+            )
+
+        self.creadas += len(cargas)
+        logger.info('cargas oficiales importadas', categoria=self.categoria.id, cantidad=len(cargas))
+        self.pendientes = {}
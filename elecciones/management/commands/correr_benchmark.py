@@ -0,0 +1,87 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elecciones.benchmark import Benchmark, GeneradorDataset
+from elecciones.models import Mesa
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un dataset sintético de escala nacional y simula la noche de la elección. "
+        "Reporta throughput, latencias p50/p99 y consultas por paso en formato JSON. "
+        "¡Sólo para usar en una base de datos descartable!"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument(
+            '--sin_dataset', action='store_true', default=False,
+            help='Reusar el dataset generado por una corrida anterior.'
+        )
+        parser.add_argument('--distritos', type=int, default=24)
+        parser.add_argument('--secciones_por_distrito', type=int, default=20)
+        parser.add_argument('--circuitos_por_seccion', type=int, default=10)
+        parser.add_argument('--mesas_por_circuito', type=int, default=21)
+        parser.add_argument('--categorias', type=int, default=10)
+        parser.add_argument('--partidos', type=int, default=8)
+        parser.add_argument(
+            '--proporcion_cargadas', type=float, default=0.3,
+            help='Proporción de mesas con todas sus categorías ya consolidadas (default %(default)s).'
+        )
+        parser.add_argument(
+            '--proporcion_con_foto', type=float, default=0.1,
+            help='Proporción de mesas con una foto del acta sin identificar (default %(default)s).'
+        )
+        parser.add_argument('--voluntarios', type=int, default=50)
+        parser.add_argument(
+            '--acciones', type=int, default=1000,
+            help='Cantidad de acciones (identificaciones o cargas) a simular (default %(default)s).'
+        )
+        parser.add_argument(
+            '--acciones_por_ronda', type=int, default=50,
+            help='Acciones entre corridas del consolidador y el scheduler (default %(default)s).'
+        )
+        parser.add_argument('--salida', type=str, default=None, help='Archivo JSON para el reporte.')
+
+    def log(self, mensaje):
+        if self.verbosity > 1:
+            self.stderr.write(mensaje)
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        dataset = None
+        if not options['sin_dataset']:
+            if Mesa.objects.exists():
+                raise CommandError(
+                    'La base ya tiene mesas. El benchmark debe correr sobre una base vacía '
+                    '(o con --sin_dataset sobre una ya generada por el benchmark).'
+                )
+            dataset = GeneradorDataset(
+                semilla=options['semilla'],
+                distritos=options['distritos'],
+                secciones_por_distrito=options['secciones_por_distrito'],
+                circuitos_por_seccion=options['circuitos_por_seccion'],
+                mesas_por_circuito=options['mesas_por_circuito'],
+                categorias=options['categorias'],
+                partidos=options['partidos'],
+                proporcion_cargadas=options['proporcion_cargadas'],
+                proporcion_con_foto=options['proporcion_con_foto'],
+                voluntarios=options['voluntarios'],
+                log=self.log,
+            ).generar()
+
+        reporte = Benchmark(
+            semilla=options['semilla'],
+            acciones=options['acciones'],
+            acciones_por_ronda=options['acciones_por_ronda'],
+            log=self.log,
+        ).correr()
+        reporte['dataset'] = dataset
+
+        salida = json.dumps(reporte, indent=2)
+        if options['salida']:
+            with open(options['salida'], 'w') as archivo:
+                archivo.write(salida)
+        else:
+            self.stdout.write(salida)
@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from elecciones.geografia_denormalizada import TAMANIO_LOTE, denormalizar_geografia
+
+
+class Command(BaseCommand):
+    help = (
+        "Completa (o recalcula) la categoría y la ubicación geográfica denormalizadas en "
+        "MesaCategoria, Carga y VotoMesaReportado. La migración que agrega esas columnas ya las "
+        "completa, y los cambios de geografía se propagan solos; sirve para recalcularlas luego de "
+        "cambios que no disparan señales (updates o altas masivas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanio_lote', type=int, default=TAMANIO_LOTE,
+            help='Cantidad de ids que se actualizan en cada transacción (default %(default)s).'
+        )
+        parser.add_argument(
+            '--solo_faltantes', action='store_true', default=False,
+            help='Actualizar sólo las filas que todavía no tienen los datos denormalizados.'
+        )
+
+    def informar_avance(self, modelo, actualizadas, hasta):
+        if self.verbosity > 1:
+            self.stdout.write(f'{modelo}: {actualizadas} actualizadas (hasta id {hasta}).')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        resultados = denormalizar_geografia(
+            apps, tamanio_lote=options['tamanio_lote'], solo_faltantes=options['solo_faltantes'],
+            al_avanzar=self.informar_avance
+        )
+        for modelo, actualizadas in resultados:
+            self.stdout.write(self.style.SUCCESS(f'{modelo}: {actualizadas} filas actualizadas.'))
@@ -6,6 +6,7 @@ from elecciones.models import (
 )
 from elecciones.sumarizador import Sumarizador
 from escrutinio_social import settings
+from escrutinio_social.replica import desde_replica
 
 
 class Command(BaseCommand):
@@ -43,6 +44,7 @@ class Command(BaseCommand):
                             default=TIPOS_DE_AGREGACIONES.solo_consolidados
                             )
 
+    @desde_replica()
     def handle(self, *args, **kwargs):
         """
         """
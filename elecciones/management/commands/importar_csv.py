@@ -1,6 +1,7 @@
 from adjuntos.csv_import import CSVImporter
 from adjuntos.models import CSVTareaDeImportacion
 from fiscales.models import Fiscal
+from escrutinio_social.conexiones import reciclar_conexiones
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.conf import settings
@@ -172,6 +173,7 @@ class Command(BaseCommand):
         # Tomo una tarea.
         tarea = None
         while not tarea and not self.finalizar:
+            reciclar_conexiones()
             tarea = self.tomar_tarea()
             if not tarea:
                 time.sleep(self.espera_tarea)
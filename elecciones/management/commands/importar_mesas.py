@@ -3,7 +3,9 @@ from django.conf import settings
 from pathlib import Path
 from django.db.utils import IntegrityError
 from csv import DictReader
-from elecciones.models import Distrito, Seccion, Circuito, LugarVotacion, Mesa, Categoria, canonizar
+from elecciones.models import (
+    Distrito, Seccion, Circuito, LugarVotacion, Mesa, Categoria, canonizar, electores_diferidos
+)
 import datetime
 
 from .basic_command import BaseCommand
@@ -18,6 +20,11 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         super().handle(*args, **options)
 
+        # Los electores de escuelas, circuitos, secciones y distritos se recalculan una vez al final.
+        with electores_diferidos():
+            self.importar()
+
+    def importar(self):
         reader = DictReader(self.file.open())
         fallos = []
         for c, row in enumerate(reader, 1):
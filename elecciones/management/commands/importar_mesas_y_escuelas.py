@@ -3,7 +3,13 @@ from django.conf import settings
 from pathlib import Path
 from django.db.utils import IntegrityError
 from csv import DictReader
-from elecciones.models import Distrito, Seccion, Circuito, LugarVotacion, Mesa, Categoria
+from elecciones.models import (
+    Distrito, Seccion, Circuito, LugarVotacion, Mesa, Categoria, canonizar, recalcular_electores
+)
+from django.db import transaction
+from elecciones.contadores_avance import recalcular_contadores_avance
+from elecciones.registro_geografia import registro_geografia
+from elecciones.system_checks import invalidar_chequeos
 import datetime
 
 from .basic_command import BaseCommand
@@ -24,8 +30,28 @@ class Command(BaseCommand):
     '''
     help = "Importar escuelas"
 
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--masivo', action='store_true', default=False,
+            help=(
+                'Importación masiva: resuelve la geografía en memoria, crea escuelas y mesas con '
+                'bulk_create y recalcula los electores una única vez al final. Las mesas que ya '
+                'existen no se modifican.'
+            )
+        )
+        parser.add_argument(
+            '--tamanio_lote', type=int, default=5000,
+            help='Tamaño de lote de los INSERT/UPDATE en modo masivo (default %(default)s).'
+        )
+
     def handle(self, *args, **options):
         super().handle(*args, **options)
+        if options['masivo']:
+            self.tamanio_lote = options['tamanio_lote']
+            with transaction.atomic():
+                self.importar_masivo()
+            return
 
         reader = DictReader(self.file.open())
 
@@ -119,3 +145,115 @@ class Command(BaseCommand):
                                  f'rango {mesa_desde}-{mesa_hasta}.'
                                  f'Se crean las mesas {mesa_desde} hasta {mesa_hasta}. Línea {c}.'
                     )
+
+    def geolocalizacion(self, row):
+        coordenadas = (self.to_float(row['longitud']), self.to_float(row['latitud']))
+        if isinstance(coordenadas[0], float) and isinstance(coordenadas[1], float):
+            return {'type': 'Point', 'coordinates': coordenadas}, ESTADO_GEOLOCALIZACION['Match']
+        return None, 0
+
+    def rango_de_mesas(self, row, c):
+        """
+        Devuelve el rango de números de mesa de la fila, o None si no se puede determinar.
+        """
+        try:
+            mesa_desde = int(row['desde'])
+            mesa_hasta = int(row['hasta']) + 1
+        except ValueError:
+            self.warning(f'No están definidos los campos _desde_ y _hasta_. No se crean mesas. Línea {c}.')
+            return None
+        try:
+            mesas_total = int(row['cant_mesas'])
+        except ValueError:
+            mesas_total = None
+        if mesas_total != mesa_hasta - mesa_desde:
+            self.warning(f'El total de mesas {mesas_total} no coincide con el '
+                         f'rango {mesa_desde}-{mesa_hasta}. Línea {c}.'
+            )
+        return range(mesa_desde, mesa_hasta)
+
+    def importar_masivo(self):
+        """
+        Lee el archivo una sola vez y resuelve distritos, secciones, circuitos y escuelas
+        con diccionarios en memoria. Las escuelas se identifican por (circuito, número):
+        las nuevas se crean y las existentes se actualizan, en lotes. Las mesas se insertan
+        ignorando las que ya existen (``unique_together`` circuito-número).
+
+        Los pre_save/post_save no se disparan con ``bulk_create``, así que los números se
+        canonizan acá y los electores se recalculan al final con ``recalcular_electores``.
+        """
+        with self.file.open() as archivo:
+            filas = list(DictReader(archivo))
+
+        circuitos = {
+            (distrito, seccion, circuito): circuito_id
+            for circuito_id, circuito, seccion, distrito in Circuito.objects.values_list(
+                'id', 'numero', 'seccion__numero', 'seccion__distrito__numero'
+            )
+        }
+        escuelas = {
+            (escuela.circuito_id, escuela.numero): escuela
+            for escuela in LugarVotacion.objects.all()
+        }
+
+        escuelas_nuevas = []
+        escuelas_existentes = {}
+        mesas_por_escuela = []
+        for c, row in enumerate(filas, 1):
+            clave = tuple(canonizar(row[campo]) for campo in ('distrito_nro', 'seccion_nro', 'circuito_nro'))
+            nro_escuela = canonizar(row['escuela_nro'])
+            circuito_id = circuitos.get(clave)
+            if circuito_id is None:
+                self.warning(
+                    f'No existe el circuito {clave[2]} en la sección {clave[1]} del distrito {clave[0]}. '
+                    f'No se procesa la escuela {nro_escuela}. Línea {c}.'
+                )
+                continue
+
+            geom, estado_geolocalizacion = self.geolocalizacion(row)
+            escuela = escuelas.get((circuito_id, nro_escuela))
+            if escuela is None:
+                escuela = LugarVotacion(circuito_id=circuito_id, numero=nro_escuela)
+                escuelas[(circuito_id, nro_escuela)] = escuela
+                escuelas_nuevas.append(escuela)
+            elif escuela.pk:
+                escuelas_existentes[escuela.pk] = escuela
+            escuela.nombre = row['escuela']
+            escuela.direccion = row['direccion']
+            escuela.ciudad = row['localidad'] or ''
+            escuela.geom = geom
+            escuela.estado_geolocalizacion = estado_geolocalizacion
+            # Lo que haría LugarVotacion.save().
+            escuela.longitud, escuela.latitud = geom['coordinates'] if geom else (None, None)
+
+            mesas = self.rango_de_mesas(row, c)
+            if mesas is not None:
+                mesas_por_escuela.append((escuela, mesas))
+
+        LugarVotacion.objects.bulk_create(escuelas_nuevas, batch_size=self.tamanio_lote)
+        LugarVotacion.objects.bulk_update(
+            escuelas_existentes.values(),
+            ['nombre', 'direccion', 'ciudad', 'geom', 'estado_geolocalizacion', 'longitud', 'latitud'],
+            batch_size=self.tamanio_lote
+        )
+        self.log(f'Se crearon {len(escuelas_nuevas)} escuelas y se actualizaron {len(escuelas_existentes)}.', level=1)
+
+        mesas = [
+            Mesa(
+                numero=str(mesa_nro), lugar_votacion_id=escuela.id, circuito_id=escuela.circuito_id,
+                electores=ELECTORES_MESA_DEFAULT
+            )
+            for escuela, numeros in mesas_por_escuela
+            for mesa_nro in numeros
+        ]
+        cantidad_previa = Mesa.objects.count()
+        Mesa.objects.bulk_create(mesas, batch_size=self.tamanio_lote, ignore_conflicts=True)
+        self.log(f'Se crearon {Mesa.objects.count() - cantidad_previa} mesas.', level=1)
+
+        recalcular_electores()
+        # bulk_create y update no disparan las señales que invalidan los chequeos de integridad
+        # ni el índice de la geografía, ni las que mantienen los contadores del avance de carga.
+        recalcular_contadores_avance()
+        transaction.on_commit(invalidar_chequeos)
+        transaction.on_commit(registro_geografia.invalidar)
+        self.log(f'Se procesaron {len(filas)} líneas.', level=1)
@@ -1,306 +1,103 @@
-import math
+import json
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
-from elecciones.models import Distrito, Seccion, Circuito, Eleccion, Categoria, Mesa, Partido, MesaCategoria, TIPOS_DE_AGREGACIONES, NIVELES_DE_AGREGACION, OPCIONES_A_CONSIDERAR
-from elecciones.sumarizador import Sumarizador
-from escrutinio_social import settings
+from elecciones.auditoria import ALERTA, Auditoria, mesas_de_hallazgos
+from elecciones.models import Distrito, Seccion, Circuito, Categoria, Partido, TIPOS_DE_AGREGACIONES
+from escrutinio_social.replica import desde_replica
 
 
 class Command(BaseCommand):
     help = "Generar reportes para evaluar qué urnas hay que pedir recuento definitivo o revisión."
 
-    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
-        super().__init__(stdout=None, stderr=None, no_color=False, force_color=False)
-
-        # Opciones por default para usar cuando no nos dan parámetros
-        self.partido_fdt = Partido.objects.get(codigo=settings.CODIGO_PARTIDO_NOSOTROS)
-        self.partido_cambiemos = Partido.objects.get(codigo=settings.CODIGO_PARTIDO_ELLOS)
-
     def imprimir_mesa(self, mesa):
         circuito = mesa.circuito
         seccion = circuito.seccion
         distrito = seccion.distrito
         return f"D {distrito} - S {seccion} - C {circuito} - M {mesa}: "
 
-    def alerta_mesa(self, mesa, problema):
-        mensaje = self.imprimir_mesa(mesa) + problema
-        self.stdout.write(self.style.ERROR(f"ALERTA: {mensaje}"))
+    def imprimir_circuito(self, circuito):
+        return f"D {circuito.seccion.distrito} - S {circuito.seccion} - C {circuito}: "
 
-    def warning(self, problema, encabezado=None):
-        mensaje = problema
-        if encabezado is not None:
-            mensaje = encabezado + mensaje
-        self.stdout.write(self.style.WARNING(f"CUIDADO: {mensaje}"))
+    def alerta(self, problema, encabezado=''):
+        self.stdout.write(self.style.ERROR(f"ALERTA: {encabezado}{problema}"))
 
-    def warning_mesa(self, mesa, problema):
-        descrp_mesa = ""
-        if mesa is not None:
-            descrp_mesa = self.imprimir_mesa(mesa)
-        self.warning(problema, descrp_mesa)
+    def warning(self, problema, encabezado=''):
+        self.stdout.write(self.style.WARNING(f"CUIDADO: {encabezado}{problema}"))
 
     def status(self, texto):
         self.stdout.write(f"{texto}")
-        # self.stdout.write(self.style.SUCCESS(texto))
 
     def status_green(self, texto):
         self.stdout.write(self.style.SUCCESS(texto))
 
-    def get_votos_partido(self, resultados, partido):
-        return resultados.tabla_positivos()[partido]['votos']
-
-    def get_votos_nuestros(self, resultados):
-        return self.get_votos_partido(resultados, self.partido_fdt)
-
-    def get_votos_ellos(self, resultados):
-        return self.get_votos_partido(resultados, self.partido_cambiemos)
-
-    def analizar_ceros_mesas(self, mesas):
-        """
-        Determina si en alguna mesa nosotros o ellos sacamos cero votos.
-        """
-        for mesa in mesas:
-            resultados = self.get_resultados_mesa(mesa)
-            votos_nuestros = self.get_votos_nuestros(resultados)
-            votos_ellos = self.get_votos_ellos(resultados)
-            if votos_nuestros == 0:
-                self.alerta_mesa(mesa, "Fernandez en cero votos.")
-            if votos_ellos == 0:
-                self.warning_mesa(mesa, "Macri en cero votos.")
-
-    def cant_mesas_ganadas(self, mesas):
-        """
-        Devuelve cuántas de las mesas parámetro fueron ganadas por cada fuerza.
-        """
-        cant_ganadas_fdt = 0
-        cant_ganadas_cambiemos = 0
-        for mesa in mesas:
-            resultados = self.get_resultados_mesa(mesa)
-            votos_nuestros = self.get_votos_nuestros(resultados)
-            votos_ellos = self.get_votos_ellos(resultados)
-
-            if votos_nuestros > votos_ellos:
-                cant_ganadas_fdt = cant_ganadas_fdt + 1
-            elif votos_ellos > votos_nuestros:
-                cant_ganadas_cambiemos = cant_ganadas_cambiemos + 1
-        return cant_ganadas_fdt, cant_ganadas_cambiemos
-
-    def comparar_mesas_con_correo(self, mesas):
+    def reportar(self, hallazgos):
         """
-        Determina si en alguna mesa nosotros o ellos tiene diferencia con lo informado en el Correo.
+        Muestra los hallazgos ordenados por circuito y mesa y devuelve su versión serializable.
         """
-        for mesa in mesas:
-            self.comparar_mesa_con_correo(mesa)
-
-    def comparar_mesa_con_correo(self, mesa):
-        carga_testigo = self.get_carga_testigo(mesa)
-        if not carga_testigo:
-            #self.alerta_mesa(mesa, "No existe carga testigo para la mesa")
-            return
-
-        carga_correo = self.get_carga_correo(mesa)
-        if not carga_correo:
-            #self.warning_mesa(mesa, f"No existe carga oficial (correo) para la mesa.")
-            return
-
-        if carga_testigo.firma == carga_correo.firma:
-            return
-
-        votos_nuestros_testigo = self.get_votos_nuestros_carga(carga_testigo)
-        votos_ellos_testigo = self.get_votos_ellos_carga(carga_testigo)
-        votos_nuestros_correo = self.get_votos_nuestros_carga(carga_correo)
-        votos_ellos_correo = self.get_votos_ellos_carga(carga_correo)
-
-        if not (votos_nuestros_testigo >= votos_ellos_testigo and 
-            votos_nuestros_correo < votos_ellos_correo):
-            return
-        self.alerta_mesa(mesa, f"Tiene diferencias respecto la carga oficial.\n\tNosotros decimos:\tFdT = {votos_nuestros_testigo},\tJpC = {votos_ellos_testigo}.\n\tEl Correo dice:\t\tFdT = {votos_nuestros_correo},\tJpC = {votos_ellos_correo}.")
-
-        if votos_nuestros_correo == 0:
-            self.alerta_mesa(mesa, "La carga oficial reporta 0 votos nuestros")
-
-    def get_votos_nuestros_carga(self, carga):
-        return self.get_votos_en_carga(carga, self.partido_fdt)
-
-    def get_votos_ellos_carga(self, carga):
-        return self.get_votos_en_carga(carga, self.partido_cambiemos)
-
-    def get_votos_en_carga(self, carga, partido):
-        opcion_votos = carga.opcion_votos().filter(opcion__partido=partido)
-        votos = [voto for (opcion, voto) in opcion_votos][0]
-        return votos
-
-    def get_carga_testigo(self, mesa):
-        return MesaCategoria.objects.get(
-            mesa=mesa,
-            categoria=self.categoria,
-        ).carga_testigo
-
-    def get_carga_correo(self, mesa):
-        return MesaCategoria.objects.get(
-            mesa=mesa,
-            categoria=self.categoria,
-        ).parcial_oficial
-
-    def reporte_tendencias(self, mesas, cant_mesas_ganadas_por_fdt, cant_mesas_ganadas_por_cambiemos):
+        mesas = mesas_de_hallazgos(hallazgos)
+        circuitos = Circuito.objects.select_related('seccion__distrito').in_bulk(
+            {hallazgo.circuito_id for hallazgo in hallazgos}
+        )
+        reporte = []
+        for hallazgo in sorted(hallazgos, key=lambda h: (h.circuito_id, h.mesa_id or 0)):
+            if hallazgo.mesa_id is not None:
+                mesa = mesas[hallazgo.mesa_id]
+                encabezado = self.imprimir_mesa(mesa)
+            else:
+                mesa = None
+                encabezado = self.imprimir_circuito(circuitos[hallazgo.circuito_id])
+            if hallazgo.nivel == ALERTA:
+                self.alerta(hallazgo.mensaje, encabezado)
+            else:
+                self.warning(hallazgo.mensaje, encabezado)
+            circuito = circuitos[hallazgo.circuito_id]
+            reporte.append({
+                'nivel': hallazgo.nivel,
+                'tipo': hallazgo.tipo,
+                'distrito': circuito.seccion.distrito.numero,
+                'seccion': circuito.seccion.numero,
+                'circuito': circuito.numero,
+                'mesa': mesa.numero if mesa else None,
+                'mensaje': hallazgo.mensaje,
+                'datos': hallazgo.datos,
+            })
+        return reporte
+
+    def reportar_sin_inconvenientes(self, hallazgos):
         """
-        Reporta mesas ganadas por un partido en un circuito donde ganó el otro.
+        Según el nivel de verbosidad, informa los circuitos, secciones y distritos sin hallazgos.
         """
-        dif = 1
-        if cant_mesas_ganadas_por_cambiemos + cant_mesas_ganadas_por_fdt != 0:
-            dif = math.fabs(cant_mesas_ganadas_por_cambiemos - cant_mesas_ganadas_por_fdt) / (
-                cant_mesas_ganadas_por_cambiemos + cant_mesas_ganadas_por_fdt)
-
-        if dif < self.umbral_mesas_ganadas:
-            # Está parejo, no tiene sentido.
+        if self.verbose_level < 1:
             return
-
-        for mesa in mesas:
-            resultados = self.get_resultados_mesa(mesa)
-            votos_nuestros = self.get_votos_nuestros(resultados)
-            votos_ellos = self.get_votos_ellos(resultados)
-
-            if cant_mesas_ganadas_por_fdt > cant_mesas_ganadas_por_cambiemos:
-                if votos_ellos > votos_nuestros:
-                    self.alerta_mesa(mesa, f"En el circuito FdT ganó en la mayoría de las mesas pero en "
-                                     f"ésta no (FdT: {votos_nuestros} votos, JpC: {votos_ellos} votos).")
-                elif votos_nuestros > votos_ellos:
-                    self.warning_mesa(mesa,
-                                      "En el circuito JpC ganó en la mayoría de las mesas pero en ésta no ("
-                                      f"FdT: {votos_nuestros} votos, JpC: {votos_ellos} votos).")
-
-    def reporte_promedio(self, mesas, cant_mesas, promedio_votos_fdt, promedio_votos_cambiemos):
-        """
-        Reporta mesas en las que estemos a más de 2 std del promedio del circuito.
-        """
-        suma_diferencias_cuadradas_fdt = 0
-        suma_diferencias_cuadradas_cambiemos = 0
-        for mesa in mesas:
-            resultados = self.get_resultados_mesa(mesa)
-            votos_nuestros = self.get_votos_nuestros(resultados)
-            votos_ellos = self.get_votos_ellos(resultados)
-            suma_diferencias_cuadradas_fdt += math.pow((votos_nuestros - promedio_votos_fdt), 2)
-            suma_diferencias_cuadradas_cambiemos += math.pow((votos_ellos - promedio_votos_cambiemos), 2)
-
-        cant_mesas = mesas.count()
-
-        varianza_fdt = suma_diferencias_cuadradas_fdt / cant_mesas
-        varianza_cambiemos = suma_diferencias_cuadradas_cambiemos / cant_mesas
-
-        desv_estandard_fdt = math.sqrt(varianza_fdt)
-        desv_estandard_cambiemos = math.sqrt(varianza_cambiemos)
-
-        for mesa in mesas:
-            resultados = self.get_resultados_mesa(mesa)
-            votos_nuestros = self.get_votos_nuestros(resultados)
-            votos_ellos = self.get_votos_ellos(resultados)
-
-            dif_a_prom_fdt = math.fabs(votos_nuestros - promedio_votos_fdt)
-            if dif_a_prom_fdt > desv_estandard_fdt:
-                self.alerta_mesa(
-                    mesa,
-                    f"Mucha diferencia de votos con promedio (FdT = {votos_nuestros}, prom FdT = {promedio_votos_fdt}, "
-                    f"dif = {dif_a_prom_fdt}, dif máxima esperada = {desv_estandard_fdt}"
-                )
-
-            dif_a_prom_cambiemos = math.fabs(votos_ellos - promedio_votos_cambiemos)
-            if dif_a_prom_cambiemos > desv_estandard_cambiemos:
-                self.warning_mesa(
-                    mesa,
-                    f"Mucha diferencia de votos con promedio (JpC = {votos_ellos}, "
-                    f"prom JpC = {promedio_votos_cambiemos}, "
-                    f"dif = {dif_a_prom_cambiemos}, dif máxima esperada = {desv_estandard_cambiemos}"
-                )
-
-    def analizar_circuito(self, circuito):
-        self.sumarizador = self.crear_sumarizador_circuito(circuito)
-        resultados_circuito = self.sumarizador.get_resultados(self.categoria)
-
-        total_mesas_del_circuito = resultados_circuito.total_mesas()
-
-        # Si no tiene mesas listas no continuamos.
-        if resultados_circuito.total_mesas_escrutadas() == 0:
-            return
-
-        # Me quedo con las escrutadas.
-        mesas = self.sumarizador.mesas(self.categoria).filter(
-            mesacategoria__categoria=self.categoria,
-            mesacategoria__carga_testigo__isnull=False
-        )
-
-        if self.analizar_ceros:
-            self.analizar_ceros_mesas(mesas)
-
-        cant_mesas_listas = mesas.count()
-        if self.comparar_con_correo:
-            self.comparar_mesas_con_correo(mesas)
-
-        umbral_mesas_superado = cant_mesas_listas > (
-            self.umbral_analisis_estadisticos / 100.0 * total_mesas_del_circuito)
-
-        if not umbral_mesas_superado:
-            self.warning(f"No se superó el umbral de mesas listas en circuito {circuito.numero} ({circuito.seccion.distrito}) "
-                         f"(sólo {cant_mesas_listas} de {total_mesas_del_circuito}).")
-            return
-
-        cant_mesas_ganadas_por_fdt, cant_mesas_ganadas_por_cambiemos = self.cant_mesas_ganadas(mesas)
-
-        if self.analizar_tendencias:
-            self.reporte_tendencias(mesas, cant_mesas_ganadas_por_fdt, cant_mesas_ganadas_por_cambiemos)
-
-        if self.analizar_promedio:
-            total_votos_fdt = self.get_votos_nuestros(resultados_circuito)
-            total_votos_cambiemos = self.get_votos_ellos(resultados_circuito)
-            promedio_votos_fdt = total_votos_fdt / cant_mesas_listas
-            promedio_votos_cambiemos = total_votos_cambiemos / cant_mesas_listas
-            self.reporte_promedio(mesas, cant_mesas_listas, promedio_votos_fdt,
-                                  promedio_votos_cambiemos)
-
-    def armar_opciones_sumarizador(self, nivel, id):
-        opciones = {
-            "nivel_de_agregacion": nivel,
-            "opciones_a_considerar": OPCIONES_A_CONSIDERAR.prioritarias,
-            "tipo_de_agregacion": self.tipo_de_agregacion,
-            "ids_a_considerar": [id]
-        }
-        return opciones
-
-    def crear_sumarizador_circuito(self, circuito):
-        opciones = self.armar_opciones_sumarizador(NIVELES_DE_AGREGACION.circuito, circuito.id)
-        return Sumarizador(**opciones)
-
-    def get_resultados_circuito(self, circuito):
-        return self.crear_sumarizador_circuito(circuito).get_resultados(self.categoria)
-
-    def crear_sumarizador_mesa(self, mesa):
-        opciones = self.armar_opciones_sumarizador(NIVELES_DE_AGREGACION.mesa, mesa.id)
-        return Sumarizador(**opciones)
-
-    def get_resultados_mesa(self, mesa):
-        return self.crear_sumarizador_mesa(mesa).get_resultados(self.categoria)
-
-    def analizar_seccion(self, seccion):
-        for circuito in seccion.circuitos.all():
-            self.analizar_circuito(circuito)
-            if self.verbose_level >= 3:
+        con_hallazgos = {hallazgo.circuito_id for hallazgo in hallazgos}
+        circuitos = Circuito.objects.select_related('seccion__distrito')
+        if self.circuito:
+            circuitos = circuitos.filter(id=self.circuito.id)
+        elif self.seccion:
+            circuitos = circuitos.filter(seccion=self.seccion)
+        elif self.distrito:
+            circuitos = circuitos.filter(seccion__distrito=self.distrito)
+
+        secciones_con_hallazgos = set()
+        distritos_con_hallazgos = set()
+        secciones = {}
+        distritos = {}
+        for circuito in circuitos:
+            secciones[circuito.seccion_id] = circuito.seccion
+            distritos[circuito.seccion.distrito_id] = circuito.seccion.distrito
+            if circuito.id in con_hallazgos:
+                secciones_con_hallazgos.add(circuito.seccion_id)
+                distritos_con_hallazgos.add(circuito.seccion.distrito_id)
+            elif self.verbose_level >= 3:
                 self.status_green(f'Sin inconvenientes en el circuito {circuito}')
-
-    def analizar_distrito(self, distrito):
-        for seccion in distrito.secciones.extra(
-                select={'orden': 'CAST(numero AS INTEGER)'}
-        ).order_by('orden'):
-            self.analizar_seccion(seccion)
-            if self.verbose_level >= 2:
-                self.status_green(f'Sin inconvenientes en la sección {seccion}')
-
-
-    def analizar_pais(self):
-        distritos = Distrito.objects.extra(
-            select={'orden': 'CAST(numero AS INTEGER)'}
-        ).order_by('orden')
-        for distrito in distritos:
-            self.analizar_distrito(distrito)
-            if self.verbose_level >= 1:
+        if self.verbose_level >= 2:
+            for seccion_id, seccion in secciones.items():
+                if seccion_id not in secciones_con_hallazgos:
+                    self.status_green(f'Sin inconvenientes en la sección {seccion}')
+        for distrito_id, distrito in distritos.items():
+            if distrito_id not in distritos_con_hallazgos:
                 self.status_green(f'Sin inconvenientes en el distrito {distrito}')
 
     def add_arguments(self, parser):
@@ -333,6 +130,12 @@ class Command(BaseCommand):
                             "(default %(default)s).",
                             default=30
                             )
+        parser.add_argument("--umbral_desvios",
+                            type=float, dest="umbral_desvios",
+                            help="Cantidad de desvíos estándar respecto del promedio del circuito "
+                            "a partir de la cual se reporta una mesa (default %(default)s).",
+                            default=1
+                            )
         parser.add_argument("--umbral_mesas_ganadas",
                             type=float, dest="umbral_mesas_ganadas",
                             help="Porcentaje, umbral, de mesas para considerar dentro del "
@@ -367,6 +170,9 @@ class Command(BaseCommand):
                             )
 
 
+        parser.add_argument("--salida_json", type=str, dest="salida_json", default=None,
+                            help="Escribir además los hallazgos en este archivo JSON.")
+
         # Dependiendo de la ansiedad podemos ir viendo qué se hace.
         parser.add_argument("--verbose",
                             type=int, dest="verbose_level",
@@ -378,44 +184,48 @@ class Command(BaseCommand):
                             ">3=se muestra el avance a nivel circuito"
                             )
 
+    @desde_replica()
     def handle(self, *args, **kwargs):
         """
         """
-        self.analizar_ceros = kwargs['analizar_ceros']
-        self.analizar_tendencias = kwargs['analizar_tendencias']
-        self.analizar_promedio = kwargs['analizar_promedio']
-        self.comparar_con_correo = kwargs['comparar_con_correo']
-
-        self.umbral_analisis_estadisticos = kwargs['umbral_analisis_estadisticos']
-        self.umbral_mesas_ganadas = kwargs['umbral_mesas_ganadas']
-
-        self.tipo_de_agregacion = kwargs['tipo_de_agregacion']
         self.verbose_level = kwargs['verbose_level']
 
         nombre_categoria = kwargs['categoria']
         self.categoria = Categoria.objects.get(slug=nombre_categoria)
-        print("Vamos a analizar la categoría:", self.categoria)
+        self.status(f"Vamos a analizar la categoría: {self.categoria}")
 
-        self.asignar_nivel_agregacion(kwargs)
-        try:
-            self.analizar_segun_nivel_agregacion()
-        except KeyboardInterrupt:
-            pass  # Vale Ctrl-C.
+        nosotros = Partido.objects.get(codigo=settings.CODIGO_PARTIDO_NOSOTROS)
+        ellos = Partido.objects.get(codigo=settings.CODIGO_PARTIDO_ELLOS)
 
-    def analizar_segun_nivel_agregacion(self):
+        self.asignar_nivel_agregacion(kwargs)
         if self.circuito:
             self.status("Analizando circuito %s" % self.circuito.numero)
-            self.analizar_circuito(self.circuito)
         elif self.seccion:
             self.status("Analizando sección %s" % self.seccion.numero)
-            self.analizar_seccion(self.seccion)
         elif self.distrito:
             self.status("Analizando distrito %s" % self.distrito.numero)
-            self.analizar_distrito(self.distrito)
         else:
-            # Analiza todos los distritos
             self.status("Analizando país -> todos los distritos")
-            self.analizar_pais()
+
+        auditoria = Auditoria(
+            self.categoria, nosotros, ellos, tipo_de_agregacion=kwargs['tipo_de_agregacion'],
+            distrito=self.distrito, seccion=self.seccion, circuito=self.circuito,
+        )
+        hallazgos = auditoria.analizar(
+            analizar_ceros=kwargs['analizar_ceros'],
+            analizar_tendencias=kwargs['analizar_tendencias'],
+            analizar_promedio=kwargs['analizar_promedio'],
+            comparar_con_correo=kwargs['comparar_con_correo'],
+            umbral_analisis_estadisticos=kwargs['umbral_analisis_estadisticos'],
+            umbral_mesas_ganadas=kwargs['umbral_mesas_ganadas'],
+            umbral_desvios=kwargs['umbral_desvios'],
+        )
+        reporte = self.reportar(hallazgos)
+        self.reportar_sin_inconvenientes(hallazgos)
+
+        if kwargs['salida_json']:
+            with open(kwargs['salida_json'], 'w') as archivo:
+                json.dump(reporte, archivo, indent=2, ensure_ascii=False)
 
     def asignar_nivel_agregacion(self, kwargs):
         # Analizar resultados de acuerdo a los niveles de agregación
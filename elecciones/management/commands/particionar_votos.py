@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elecciones import particiones
+from elecciones.models import Categoria
+
+
+class Command(BaseCommand):
+    help = (
+        "Particiona la tabla de VotoMesaReportado por categoría (PostgreSQL 11 o superior). "
+        "Sin opciones crea las particiones que falten para las categorías existentes "
+        "(útil luego de importar categorías con una carga masiva)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convertir', action='store_true', default=False,
+            help='Convertir la tabla actual en particionada. Bloquea la tabla mientras copia los votos.'
+        )
+
+    def handle(self, *args, **options):
+        if not particiones.soportado():
+            raise CommandError('El particionado requiere PostgreSQL 11 o superior.')
+
+        if options['convertir']:
+            try:
+                particiones.convertir()
+            except particiones.ParticionadoNoSoportado as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'Tabla {particiones.TABLA} particionada por categoría.'))
+            return
+
+        if not particiones.esta_particionada():
+            raise CommandError(
+                f'La tabla {particiones.TABLA} no está particionada. Usar --convertir.'
+            )
+        creadas = particiones.crear_particiones(Categoria.objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'{len(creadas)} particiones creadas.'))
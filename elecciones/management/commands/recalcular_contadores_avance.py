@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from elecciones.contadores_avance import recalcular_contadores_avance
+
+
+class Command(BaseCommand):
+    help = (
+        "Arma de cero los contadores del resumen de avance de carga. Hace falta después de cambios "
+        "que no los actualizan: altas masivas, updates, cambios de geografía o borrados."
+    )
+
+    def handle(self, *args, **options):
+        filas = recalcular_contadores_avance()
+        self.stdout.write(self.style.SUCCESS(f'Se recalcularon los contadores del avance ({filas} filas).'))
@@ -4,6 +4,8 @@ from django.core.management.base import BaseCommand
 from adjuntos.models import Attachment, PreIdentificacion, CSVTareaDeImportacion
 from problemas.models import Problema
 from elecciones.models import (VotoMesaReportado, Carga, MesaCategoria)
+from elecciones.contadores_avance import recalcular_contadores_avance
+from elecciones.generacion_resultados import nueva_generacion_resultados
 from fiscales.models import Fiscal
 from scheduling.models import ColaCargasPendientes
 
@@ -54,6 +56,10 @@ class Command(BaseCommand):
         )
         ColaCargasPendientes.objects.all().delete()
         tablas_a_resetear_secuencias.append('scheduling_colacargaspendientes')
+        # Los borrados y el update no pasan por los contadores del avance de carga
+        # ni cambian la generación de los resultados.
+        recalcular_contadores_avance()
+        transaction.on_commit(nueva_generacion_resultados)
 
         with connection.cursor() as cursor:
             for tabla in tablas_a_resetear_secuencias:
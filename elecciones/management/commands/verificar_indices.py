@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from adjuntos.consolidacion import cargas_a_consolidar, identificaciones_a_consolidar
+from adjuntos.models import Attachment
+from elecciones.benchmark import GeneradorDataset
+from elecciones.models import Mesa, MesaCategoria
+
+
+def consultas_a_verificar(limite):
+    """
+    Las consultas de los caminos calientes que buscan trabajo pendiente, cada una con
+    el índice parcial que debería usar.
+    """
+    desde = timezone.now() - timedelta(minutes=settings.TIMEOUT_CONSOLIDACION)
+    return [
+        (
+            'consolidador_cargas', 'carga_pendiente_consolidar',
+            cargas_a_consolidar(desde).values_list('id', flat=True)[:limite]
+        ),
+        (
+            'consolidador_identificaciones', 'ident_pendiente_consolidar',
+            identificaciones_a_consolidar(desde).values_list('id', flat=True)[:limite]
+        ),
+        (
+            'fotos_sin_identificar', 'attach_sin_identificar',
+            Attachment.objects.sin_identificar(for_update=False).priorizadas()[:limite]
+        ),
+        (
+            'mesa_categorias_con_carga_pendiente', 'mc_carga_pendiente',
+            MesaCategoria.objects.con_carga_pendiente(for_update=False).ordenadas_por_prioridad_batch()[:limite]
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre EXPLAIN sobre las consultas de trabajo pendiente (consolidador y scheduler) "
+        "y verifica que usen los índices parciales definidos para ellas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--generar_dataset', action='store_true', default=False,
+            help='Generar antes un dataset sintético (ver correr_benchmark). Requiere una base vacía.'
+        )
+        parser.add_argument('--distritos', type=int, default=2)
+        parser.add_argument('--limite', type=int, default=100, help='LIMIT de las consultas (default %(default)s).')
+        parser.add_argument(
+            '--sin_seqscan', action='store_true', default=False,
+            help=(
+                'Sólo PostgreSQL: desalentar los scans secuenciales, para verificar que el índice '
+                'es aplicable aunque la tabla sea chica.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['generar_dataset']:
+            if Mesa.objects.exists():
+                raise CommandError('La base ya tiene mesas. --generar_dataset requiere una base vacía.')
+            GeneradorDataset(distritos=options['distritos']).generar()
+
+        postgres = connection.vendor == 'postgresql'
+        with connection.cursor() as cursor:
+            # Estadísticas al día para que el planificador elija como lo haría en producción.
+            cursor.execute('ANALYZE')
+            if postgres and options['sin_seqscan']:
+                cursor.execute('SET enable_seqscan = off')
+
+        sin_indice = []
+        for nombre, indice, queryset in consultas_a_verificar(options['limite']):
+            plan = queryset.explain()
+            usado = indice in plan
+            if not usado:
+                sin_indice.append(nombre)
+            estado = self.style.SUCCESS('usa') if usado else self.style.ERROR('NO usa')
+            self.stdout.write(f'{nombre}: {estado} {indice}')
+            if self.verbosity > 1:
+                self.stdout.write(plan)
+
+        if postgres and options['sin_seqscan']:
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+
+        if sin_indice:
+            raise CommandError(f'Consultas que no usan su índice: {", ".join(sin_indice)}.')
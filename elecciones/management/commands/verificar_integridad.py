@@ -0,0 +1,28 @@
+from django.core.checks import ERROR
+from django.core.management.base import BaseCommand, CommandError
+
+from elecciones.system_checks import chequeos_cacheados
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre los chequeos de integridad de los datos electorales (ver elecciones/system_checks.py) "
+        "y actualiza su resultado en el caché. Pensado para cuando no se corren al iniciar cada "
+        "proceso (settings.CHEQUEOS_INTEGRIDAD_AL_INICIAR = False)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usar_cache', action='store_true', default=False,
+            help='Usar el resultado cacheado si los datos no cambiaron desde la última verificación.'
+        )
+
+    def handle(self, *args, **options):
+        mensajes = chequeos_cacheados(forzar=not options['usar_cache'])
+        errores = [mensaje for mensaje in mensajes if mensaje.level >= ERROR]
+        for mensaje in mensajes:
+            estilo = self.style.ERROR if mensaje.level >= ERROR else self.style.WARNING
+            self.stdout.write(estilo(str(mensaje)))
+        if errores:
+            raise CommandError(f'Se encontraron {len(errores)} errores de integridad.')
+        self.stdout.write(self.style.SUCCESS(f'Datos íntegros ({len(mensajes)} advertencias).'))
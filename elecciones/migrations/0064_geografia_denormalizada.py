@@ -0,0 +1,102 @@
+# Generated by Django 2.2.23 on 2026-10-19 07:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from elecciones.geografia_denormalizada import denormalizar_geografia
+
+
+def completar_geografia(apps, schema_editor):
+    """
+    Completa las columnas nuevas en las bases con datos, para que los resultados (que filtran
+    por ellas) no queden vacíos.
+    """
+    denormalizar_geografia(apps)
+
+
+class Migration(migrations.Migration):
+
+    # Los datos se completan en lotes, cada uno en su transacción (ver denormalizar_geografia).
+    atomic = False
+
+    dependencies = [
+        ('elecciones', '0063_cat_activa_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carga',
+            name='circuito',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Circuito'),
+        ),
+        migrations.AddField(
+            model_name='carga',
+            name='distrito',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Distrito'),
+        ),
+        migrations.AddField(
+            model_name='carga',
+            name='seccion',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Seccion'),
+        ),
+        migrations.AddField(
+            model_name='mesacategoria',
+            name='circuito',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Circuito'),
+        ),
+        migrations.AddField(
+            model_name='mesacategoria',
+            name='distrito',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Distrito'),
+        ),
+        migrations.AddField(
+            model_name='mesacategoria',
+            name='seccion',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Seccion'),
+        ),
+        migrations.AddField(
+            model_name='votomesareportado',
+            name='categoria',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='elecciones.Categoria'),
+        ),
+        migrations.AddField(
+            model_name='votomesareportado',
+            name='circuito',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Circuito'),
+        ),
+        migrations.AddField(
+            model_name='votomesareportado',
+            name='distrito',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Distrito'),
+        ),
+        migrations.AddField(
+            model_name='votomesareportado',
+            name='seccion',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Seccion'),
+        ),
+        migrations.AddIndex(
+            model_name='mesacategoria',
+            index=models.Index(fields=['categoria', 'distrito'], name='mc_categoria_distrito'),
+        ),
+        migrations.AddIndex(
+            model_name='mesacategoria',
+            index=models.Index(fields=['categoria', 'seccion'], name='mc_categoria_seccion'),
+        ),
+        migrations.AddIndex(
+            model_name='mesacategoria',
+            index=models.Index(fields=['categoria', 'circuito'], name='mc_categoria_circuito'),
+        ),
+        migrations.AddIndex(
+            model_name='votomesareportado',
+            index=models.Index(fields=['categoria', 'distrito'], name='vmr_categoria_distrito'),
+        ),
+        migrations.AddIndex(
+            model_name='votomesareportado',
+            index=models.Index(fields=['categoria', 'seccion'], name='vmr_categoria_seccion'),
+        ),
+        migrations.AddIndex(
+            model_name='votomesareportado',
+            index=models.Index(fields=['categoria', 'circuito'], name='vmr_categoria_circuito'),
+        ),
+        migrations.RunPython(completar_geografia, migrations.RunPython.noop),
+    ]
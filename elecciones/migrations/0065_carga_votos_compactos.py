@@ -0,0 +1,18 @@
+# Generated by Django 2.2.23 on 2026-10-19 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0064_geografia_denormalizada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carga',
+            name='votos_compactos',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.23 on 2026-10-19 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0065_carga_votos_compactos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carga',
+            index=models.Index(condition=models.Q(procesada=False), fields=['tomada_por_consolidador', 'id'], name='carga_pendiente_consolidar'),
+        ),
+        migrations.AddIndex(
+            model_name='mesacategoria',
+            index=models.Index(condition=models.Q(('coeficiente_para_orden_de_carga__isnull', False), models.Q(_negated=True, status='con_problemas'), models.Q(_negated=True, status='total_consolidada_dc')), fields=['coeficiente_para_orden_de_carga', 'cant_asignaciones_realizadas', 'id'], name='mc_carga_pendiente'),
+        ),
+    ]
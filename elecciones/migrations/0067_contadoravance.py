@@ -0,0 +1,45 @@
+# Generated by Django 2.2.23 on 2026-10-19 15:21
+
+from django.db import migrations, models
+
+from elecciones.contadores_avance import recalcular_contadores_avance
+
+
+def completar_contadores(apps, schema_editor):
+    """
+    Arma los contadores a partir de los datos existentes: el resumen de avance los lee
+    (``RESUMEN_AVANCE_DESDE_CONTADORES``) y sólo se mantienen por diferencias.
+    Usa los modelos actuales y no los de la migración, porque calcula lo mismo que
+    ``recalcular_contadores_avance``; vale mientras esta sea la última migración de ``elecciones``.
+    """
+    recalcular_contadores_avance()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0066_indices_parciales_pendientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorAvance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('mesa_categoria', 'mesa_categoria'), ('mesa', 'mesa'), ('foto', 'foto'), ('preidentificacion', 'preidentificacion')], max_length=20)),
+                ('distrito_id', models.PositiveIntegerField(default=0)),
+                ('seccion_id', models.PositiveIntegerField(default=0)),
+                ('categoria_id', models.PositiveIntegerField(default=0)),
+                ('con_foto', models.BooleanField(default=False)),
+                ('grupo', models.PositiveSmallIntegerField(default=0)),
+                ('clave', models.CharField(max_length=50)),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {
+                    ('tipo', 'distrito_id', 'seccion_id', 'categoria_id', 'con_foto', 'grupo', 'clave')
+                },
+            },
+        ),
+        migrations.RunPython(completar_contadores, migrations.RunPython.noop),
+    ]
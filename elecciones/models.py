@@ -1,4 +1,6 @@
 import math
+import threading
+from contextlib import contextmanager
 from datetime import timedelta
 from collections import defaultdict
 
@@ -6,7 +8,8 @@ from django.dispatch import receiver
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models, transaction
-from django.db.models import Sum, Count, Q, F
+from django.db.models import Sum, Count, Q, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 from django.urls import reverse
@@ -15,10 +18,12 @@ from djgeojson.fields import PointField
 from model_utils import Choices, FieldTracker
 from model_utils.fields import StatusField
 from model_utils.models import TimeStampedModel
-from constance import config
+import numpy as np
 import structlog
 from versatileimagefield.fields import VersatileImageField
 
+from .registro_config import config
+
 logger = structlog.get_logger(__name__)
 
 MAX_INT_DB = 2147483647
@@ -163,10 +168,11 @@ class Seccion(models.Model):
         default=None, null=True, blank=True, validators=[MaxValueValidator(1000), MinValueValidator(1)]
     )
 
-    # Tracker de cambios en los atributos relacionados con la prioridad,
-    # usado en la función que dispara en el post_save
+    # Tracker de cambios en los atributos relacionados con la prioridad y en el distrito,
+    # usado en las funciones que disparan en el post_save
     tracker = FieldTracker(
         fields=[
+            'distrito',
             'prioridad_hasta_2',
             'cantidad_minima_prioridad_hasta_2',
             'prioridad_2_a_10',
@@ -222,6 +228,8 @@ class Circuito(models.Model):
     nombre = models.CharField(max_length=100)
     electores = models.PositiveIntegerField(default=0)
 
+    tracker = FieldTracker(fields=['seccion'])
+
     class Meta:
         verbose_name = 'Circuito electoral'
         verbose_name_plural = 'Circuitos electorales'
@@ -350,7 +358,56 @@ class LugarVotacion(models.Model):
         return self.circuito.seccion.distrito
 
 
-class MesaCategoriaQuerySet(models.QuerySet):
+def geografia_de_mesas(ids_mesas):
+    """
+    Devuelve un diccionario {id_mesa: (id_distrito, id_seccion, id_circuito)}
+    para las mesas indicadas.
+    """
+    filas = Mesa.objects.filter(id__in=ids_mesas).values_list(
+        'id', 'circuito__seccion__distrito_id', 'circuito__seccion_id', 'circuito_id'
+    )
+    return {
+        mesa_id: (distrito_id, seccion_id, circuito_id)
+        for mesa_id, distrito_id, seccion_id, circuito_id in filas
+    }
+
+
+def empaquetar_votos(opcion_votos):
+    """
+    Empaqueta pares (id de opción, votos) en el formato de ``Carga.votos_compactos``:
+    enteros sin signo de 32 bits little-endian, alternando opción y votos,
+    ordenados por opción.
+    """
+    return np.array(sorted(opcion_votos), dtype='<u4').reshape(-1, 2).tobytes()
+
+
+def desempaquetar_votos(vector):
+    """
+    Inversa de :func:`empaquetar_votos`: devuelve una matriz de N x 2 (opción, votos).
+    Acepta también la concatenación de varios vectores.
+    """
+    return np.frombuffer(bytes(vector), dtype='<u4').reshape(-1, 2)
+
+
+def copiar_geografia(destino, origen):
+    destino.distrito_id = origen.distrito_id
+    destino.seccion_id = origen.seccion_id
+    destino.circuito_id = origen.circuito_id
+
+
+class DenormalizacionQuerySet(models.QuerySet):
+    """
+    Completa las columnas denormalizadas (ver ``completar_denormalizacion`` en cada modelo)
+    también cuando los objetos se crean con ``bulk_create``, que no pasa por ``save()``.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self.model.completar_denormalizacion(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class MesaCategoriaQuerySet(DenormalizacionQuerySet):
     campos_de_orden = [
         'cant_fiscales_asignados_redondeados',  # Primero las que tienen menos gente trabajando en ellas.
         'prioridad_status', 'coeficiente_para_orden_de_carga',
@@ -358,6 +415,15 @@ class MesaCategoriaQuerySet(models.QuerySet):
         'id',
     ]
 
+    def bulk_create(self, objs, *args, **kwargs):
+        # evitar import circular
+        from .contadores_avance import actualizando_contadores
+
+        # ``bulk_create`` no dispara las señales que actualizan los contadores del resumen de avance.
+        objs = list(objs)
+        with actualizando_contadores(mesas={mesa_categoria.mesa_id for mesa_categoria in objs}):
+            return super().bulk_create(objs, *args, **kwargs)
+
     # La asignación batch desde el scheduler prioriza así:
     # Primero, el status (sin cargar, consolidada, inconsistente, etc.)
     # Segundo, el orden que la prioridad geográfica.
@@ -522,6 +588,23 @@ class MesaCategoria(models.Model):
     mesa = models.ForeignKey('Mesa', on_delete=models.CASCADE)
     categoria = models.ForeignKey('Categoria', on_delete=models.CASCADE)
 
+    # Ubicación de la mesa, denormalizada para que los cómputos filtren por geografía
+    # sin recorrer Mesa -> Circuito -> Sección -> Distrito. Se completa al crear la instancia
+    # (ver ``completar_denormalizacion``) y se actualiza si la mesa cambia de circuito.
+    # El comando ``denormalizar_geografia`` la recalcula para los datos preexistentes.
+    distrito = models.ForeignKey(
+        'Distrito', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+    seccion = models.ForeignKey(
+        'Seccion', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+    circuito = models.ForeignKey(
+        'Circuito', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+
     # Carga que es representativa del estado actual.
     carga_testigo = models.ForeignKey(
         'Carga', related_name='es_testigo', null=True, blank=True, on_delete=models.SET_NULL
@@ -587,7 +670,7 @@ class MesaCategoria(models.Model):
         from scheduling.models import mapa_prioridades_para_mesa_categoria
 
         en_circuito = MesaCategoria.objects.filter(
-            categoria=self.categoria, mesa__circuito=self.mesa.circuito
+            categoria=self.categoria, circuito_id=self.circuito_id
         )
         total = en_circuito.count()
         identificadas = en_circuito.identificadas().count()
@@ -621,8 +704,7 @@ class MesaCategoria(models.Model):
         Por alguna razón, hay que marcar todas las cargas que se hicieron para esta MesaCategoria
         como inválidas.
         """
-        for carga in self.cargas.all():
-            carga.invalidar()
+        self.cargas.update(invalidada=True, procesada=False)
 
     def firma_count(self):
         """
@@ -655,25 +737,87 @@ class MesaCategoria(models.Model):
         Si una opcion está en este diccionario, su campo votos
         se inicilizará con la cantidad de votos y será de sólo lectura,
         validando además que coincidan cuando la carga se guarda.
+
+        Se resuelve con una única consulta que trae tanto la metadata de la mesa
+        (ver :meth:`Mesa.metadata`) como, si corresponde, los votos de la carga testigo.
         """
-        datos = dict(self.mesa.metadata())
-        if tipo_carga == 'total' and self.status == MesaCategoria.STATUS.parcial_consolidada_dc:
-            # una carga total con parcial consolidada reutiliza los datos ya cargados
-            datos.update(
-                dict(self.carga_testigo.opcion_votos())
-            )
+        filtro = Q(
+            opcion__tipo=Opcion.TIPOS.metadata,
+            carga__mesa_categoria__mesa_id=self.mesa_id,
+            carga__mesa_categoria__status=MesaCategoria.STATUS.total_consolidada_dc
+        )
+        # una carga total con parcial consolidada reutiliza los datos ya cargados
+        reusa_testigo = (
+            tipo_carga == 'total' and self.status == MesaCategoria.STATUS.parcial_consolidada_dc
+            and self.carga_testigo_id is not None
+        )
+        if reusa_testigo:
+            filtro |= Q(carga_id=self.carga_testigo_id)
+
+        datos = {}
+        de_testigo = {}
+        reportados = VotoMesaReportado.objects.filter(filtro).values_list(
+            'carga_id', 'opcion_id', 'votos'
+        ).distinct()
+        for carga_id, opcion_id, votos in reportados:
+            if reusa_testigo and carga_id == self.carga_testigo_id:
+                de_testigo[opcion_id] = votos
+            else:
+                datos[opcion_id] = votos
+        # Los datos de la carga testigo tienen precedencia.
+        datos.update(de_testigo)
         return datos
 
     class Meta:
         unique_together = ('mesa', 'categoria')
         verbose_name = 'Mesa categoría'
         verbose_name_plural = "Mesas Categorías"
+        indexes = [
+            models.Index(fields=['categoria', 'distrito'], name='mc_categoria_distrito'),
+            models.Index(fields=['categoria', 'seccion'], name='mc_categoria_seccion'),
+            models.Index(fields=['categoria', 'circuito'], name='mc_categoria_circuito'),
+            # Índice parcial para las MesaCategoria con carga pendiente (ver `con_carga_pendiente`).
+            # Acota las filas a ordenar, pero no da el orden del scheduler (ver
+            # `campos_de_orden_batch`), que depende de la configuración.
+            models.Index(
+                fields=['coeficiente_para_orden_de_carga', 'cant_asignaciones_realizadas', 'id'],
+                name='mc_carga_pendiente',
+                condition=(
+                    Q(coeficiente_para_orden_de_carga__isnull=False) &
+                    ~Q(status='con_problemas') & ~Q(status='total_consolidada_dc')
+                ),
+            ),
+        ]
+
+    @classmethod
+    def completar_denormalizacion(cls, mesa_categorias):
+        """
+        Completa distrito, sección y circuito de las instancias nuevas a partir de su mesa,
+        con una única consulta para todas ellas.
+        """
+        pendientes = [mc for mc in mesa_categorias if mc.circuito_id is None and mc.mesa_id is not None]
+        if not pendientes:
+            return
+        geografia = geografia_de_mesas({mc.mesa_id for mc in pendientes})
+        for mc in pendientes:
+            mc.distrito_id, mc.seccion_id, mc.circuito_id = geografia.get(mc.mesa_id, (None, None, None))
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.completar_denormalizacion([self])
+        super().save(*args, **kwargs)
 
     def actualizar_status(self, status, carga_testigo):
-        self.status = status
-        self.carga_testigo = carga_testigo
-        logger.info('mc status', id=self.id, status=status, testigo=getattr(carga_testigo, 'id', None))
-        self.save(update_fields=['status', 'carga_testigo'])
+        # evitar import circular
+        from .contadores_avance import actualizando_contadores
+
+        # El cambio de status se refleja en los contadores del resumen de avance
+        # en la misma transacción.
+        with actualizando_contadores(mesas=[self.mesa_id]):
+            self.status = status
+            self.carga_testigo = carga_testigo
+            logger.info('mc status', id=self.id, status=status, testigo=getattr(carga_testigo, 'id', None))
+            self.save(update_fields=['status', 'carga_testigo'])
 
     def actualizar_parcial_oficial(self, parcial_oficial):
         self.parcial_oficial = parcial_oficial
@@ -698,7 +842,7 @@ class MesaCategoria(models.Model):
         Se usa como acción derivada del cambio de prioridades en la categoría.
         """
         mesa_cats_a_actualizar = cls.objects.identificadas().sin_problemas() \
-            .sin_consolidar_por_doble_carga().filter(mesa__circuito__seccion=seccion)
+            .sin_consolidar_por_doble_carga().filter(seccion=seccion)
         cls.recalcular_coeficiente_para_orden_de_carga_mesas(mesa_cats_a_actualizar)
 
     @classmethod
@@ -741,6 +885,8 @@ class Mesa(models.Model):
     electores = models.PositiveIntegerField(null=True, blank=True)
     extranjeros = models.BooleanField(default=False)
 
+    tracker = FieldTracker(fields=['circuito'])
+
     class Meta:
         unique_together = ('circuito', 'numero')
 
@@ -787,15 +933,24 @@ class Mesa(models.Model):
         """
         Efecto de que esta mesa tenía un attachment asociado y ya no lo tiene.
         Hay que: invalidar todas las cargas, y borrar el orden de carga de las MesaCategoria
-        para que no se tengan en cuenta en el scheduling
+        para que no se tengan en cuenta en el scheduling (y sacarlas de la cola si ya
+        estaban encoladas).
+
+        Se resuelve con dos UPDATE (uno sobre MesaCategoria y otro sobre Carga) y un DELETE
+        en la cola, en lugar de un save por cada instancia, para no alargar la transacción
+        del consolidador.
         """
+        # evitar import circular
+        from scheduling.models import ColaCargasPendientes
+
         logger.info('invalidar asignacion attachment', mesa=self.id)
-        for mc in MesaCategoria.objects.filter(mesa=self):
-            mc.coeficiente_para_orden_de_carga = None
-            mc.percentil = None
-            mc.orden_de_llegada = None
-            mc.save(update_fields=['coeficiente_para_orden_de_carga', 'percentil', 'orden_de_llegada'])
-            mc.invalidar_cargas()
+        MesaCategoria.objects.filter(mesa=self).update(
+            coeficiente_para_orden_de_carga=None,
+            percentil=None,
+            orden_de_llegada=None
+        )
+        Carga.objects.filter(mesa_categoria__mesa=self).update(invalidada=True, procesada=False)
+        ColaCargasPendientes.objects.filter(mesa_categoria__mesa=self).delete()
 
     def metadata(self):
         """
@@ -915,33 +1070,43 @@ class Opcion(models.Model):
     def opciones_no_partidarias_obligatorias(cls):
         return ['OPCION_BLANCOS', 'OPCION_TOTAL_VOTOS', 'OPCION_NULOS']
 
+    @classmethod
+    def por_filtro(cls, filtro):
+        """
+        Devuelve la opción que corresponde a uno de los filtros ``settings.OPCION_*``,
+        resuelta desde el registro en memoria de metadata.
+        """
+        # evitar import circular
+        from .registro_metadata import registro
+        return registro.opcion_por_filtro(filtro)
+
     @classmethod
     def blancos(cls):
-        return cls.objects.get(**settings.OPCION_BLANCOS)
+        return cls.por_filtro(settings.OPCION_BLANCOS)
 
     @classmethod
     def total_votos(cls):
-        return cls.objects.get(**settings.OPCION_TOTAL_VOTOS)
+        return cls.por_filtro(settings.OPCION_TOTAL_VOTOS)
 
     @classmethod
     def nulos(cls):
-        return cls.objects.get(**settings.OPCION_NULOS)
+        return cls.por_filtro(settings.OPCION_NULOS)
 
     @classmethod
     def sobres(cls):
-        return cls.objects.get(**settings.OPCION_TOTAL_SOBRES)
+        return cls.por_filtro(settings.OPCION_TOTAL_SOBRES)
 
     @classmethod
     def recurridos(cls):
-        return cls.objects.get(**settings.OPCION_RECURRIDOS)
+        return cls.por_filtro(settings.OPCION_RECURRIDOS)
 
     @classmethod
     def id_impugnada(cls):
-        return cls.objects.get(**settings.OPCION_ID_IMPUGNADA)
+        return cls.por_filtro(settings.OPCION_ID_IMPUGNADA)
 
     @classmethod
     def comando_electoral(cls):
-        return cls.objects.get(**settings.OPCION_COMANDO_ELECTORAL)
+        return cls.por_filtro(settings.OPCION_COMANDO_ELECTORAL)
 
     def __str__(self):
         if self.partido:
@@ -1077,6 +1242,9 @@ class Categoria(models.Model):
         Devuelve las opciones asociadas a la categoría en el orden correspondiente.
         Determina el orden de la filas a cargar, tal como se definen
         en el acta.
+
+        En los caminos calientes conviene usar ``registro_metadata.registro.opciones_actuales``,
+        que devuelve lo mismo como lista y sin ir a la base.
         """
         qs = self.opciones.all()
         if solo_prioritarias:
@@ -1169,6 +1337,8 @@ class Carga(TimeStampedModel):
     :class:`VotoMesaReportado`
     para las opciones válidas en la mesa-categoría.
     """
+    objects = DenormalizacionQuerySet.as_manager()
+
     invalidada = models.BooleanField(null=False, default=False)
     TIPOS = Choices(
         'problema',
@@ -1185,10 +1355,38 @@ class Carga(TimeStampedModel):
     mesa_categoria = models.ForeignKey(MesaCategoria, related_name='cargas', on_delete=models.CASCADE)
     fiscal = models.ForeignKey('fiscales.Fiscal', on_delete=models.CASCADE)
     firma = models.CharField(max_length=300, null=True, blank=True, editable=False)
+
+    # Copia de la ubicación denormalizada en la MesaCategoria (ver allí).
+    distrito = models.ForeignKey(
+        'Distrito', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+    seccion = models.ForeignKey(
+        'Seccion', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+    circuito = models.ForeignKey(
+        'Circuito', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+    # Los votos de la carga empaquetados (ver `empaquetar_votos`). Se completa junto con la
+    # firma y permite comparar y sumar cargas sin releer sus VotoMesaReportado, que siguen
+    # siendo la fuente de verdad al cargar.
+    votos_compactos = models.BinaryField(null=True, blank=True, editable=False)
+
     # Se utiliza para permitir concurrencia entre consolidadores.
     tomada_por_consolidador = models.DateTimeField(default=None, null=True, blank=True)
     procesada = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Índice parcial para las novedades que busca el consolidador.
+            models.Index(
+                fields=['tomada_por_consolidador', 'id'], name='carga_pendiente_consolidar',
+                condition=Q(procesada=False),
+            ),
+        ]
+
     @property
     def mesa(self):
         return self.mesa_categoria.mesa
@@ -1210,13 +1408,16 @@ class Carga(TimeStampedModel):
 
         Si esta firma iguala o coincide con la de otras cargas
         se marca consolidada.
+
+        Junto con la firma se guarda el vector de ``votos_compactos``.
         """
         # Si ya hay firma y no están forzando, listo.
         if self.firma and not forzar:
             return
-        tuplas = (f'{o}-{v}' for (o, v) in self.opcion_votos().order_by('opcion__id'))
-        self.firma = '|'.join(tuplas)
-        self.save(update_fields=['firma'])
+        opcion_votos = list(self.opcion_votos().order_by('opcion__id'))
+        self.firma = '|'.join(f'{o}-{v}' for (o, v) in opcion_votos)
+        self.votos_compactos = empaquetar_votos(opcion_votos) if opcion_votos else None
+        self.save(update_fields=['firma', 'votos_compactos'])
 
     def opcion_votos(self):
         """
@@ -1224,12 +1425,45 @@ class Carga(TimeStampedModel):
         """
         return self.reportados.values_list('opcion', 'votos')
 
+    def votos_por_opcion(self):
+        """
+        Devuelve una lista de (id de opción, votos) ordenada por opción. Usa el vector
+        de ``votos_compactos`` si ya se calculó; si no, lee los votos reportados.
+        """
+        if self.votos_compactos is not None:
+            return [tuple(par) for par in desempaquetar_votos(self.votos_compactos).tolist()]
+        return list(self.opcion_votos().order_by('opcion__id'))
+
     def listado_de_opciones(self):
         """
         Devuelve una lista de los ids de las opciones de esta carga.
         """
         return self.reportados.values_list('opcion__id', flat=True)
 
+    @classmethod
+    def completar_denormalizacion(cls, cargas):
+        """
+        Completa distrito, sección y circuito de las cargas nuevas a partir de su MesaCategoria.
+        """
+        pendientes = [
+            carga for carga in cargas if carga.circuito_id is None and carga.mesa_categoria_id is not None
+        ]
+        if not pendientes:
+            return
+        mesa_categorias = {
+            carga.mesa_categoria_id: carga.mesa_categoria
+            for carga in pendientes if cls.mesa_categoria.is_cached(carga)
+        }
+        faltantes = {carga.mesa_categoria_id for carga in pendientes} - set(mesa_categorias)
+        if faltantes:
+            mesa_categorias.update(
+                MesaCategoria.objects.only('distrito', 'seccion', 'circuito').in_bulk(list(faltantes))
+            )
+        for carga in pendientes:
+            mesa_categoria = mesa_categorias.get(carga.mesa_categoria_id)
+            if mesa_categoria:
+                copiar_geografia(carga, mesa_categoria)
+
     def save(self, *args, **kwargs):
         """
         si el fiscal es troll, la carga nace invalidada y ya procesada
@@ -1237,6 +1471,8 @@ class Carga(TimeStampedModel):
         if self.id is None and self.fiscal is not None and self.fiscal.troll:
             self.invalidada = True
             self.procesada = True
+        if self._state.adding:
+            self.completar_denormalizacion([self])
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -1244,21 +1480,21 @@ class Carga(TimeStampedModel):
         return f'carga {self.tipo}{str_invalidada}de {self.mesa} / {self.categoria} por {self.fiscal}'
 
     def __sub__(self, carga_2):
-        # arranco obteniendo los votos ordenados por opcion, que me van a ser utiles varias veces
-        reportados_1 = self.reportados.order_by('opcion__orden')
-        reportados_2 = carga_2.reportados.order_by('opcion__orden')
-
         # antes que nada: si las cargas son incomparables, o los conjuntos de opciones no coinciden,
         # la comparación se considera incorrecta
-        if self.mesa_categoria != carga_2.mesa_categoria or self.tipo != carga_2.tipo:
+        if self.mesa_categoria_id != carga_2.mesa_categoria_id or self.tipo != carga_2.tipo:
             raise CargasIncompatiblesError("las cargas no coinciden en mesa, categoría o tipo")
 
-        opciones_1 = [ov.opcion.id for ov in reportados_1]
-        opciones_2 = [ov.opcion.id for ov in reportados_2]
+        # los votos vienen ordenados por opción
+        votos_1 = self.votos_por_opcion()
+        votos_2 = carga_2.votos_por_opcion()
+
+        opciones_1 = [opcion for (opcion, votos) in votos_1]
+        opciones_2 = [opcion for (opcion, votos) in votos_2]
         if opciones_1 != opciones_2:
             raise CargasIncompatiblesError("las cargas no coinciden en sus opciones")
 
-        diferencia = sum(abs(r1.votos - r2.votos) for r1, r2 in zip(reportados_1, reportados_2))
+        diferencia = sum(abs(v1 - v2) for (_, v1), (_, v2) in zip(votos_1, votos_2))
         return diferencia
 
 
@@ -1268,12 +1504,70 @@ class VotoMesaReportado(models.Model):
     que define mesa y categoria, existe una instancia de este modelo
     para cada opción y su correspondiente cantidad de votos.
     """
+    objects = DenormalizacionQuerySet.as_manager()
+
     carga = models.ForeignKey(Carga, related_name='reportados', on_delete=models.CASCADE)
     opcion = models.ForeignKey(Opcion, on_delete=models.CASCADE)
     votos = models.PositiveIntegerField()
 
+    # Categoría y ubicación de la carga, denormalizadas para que el sumarizador
+    # agregue votos sin pasar por Carga -> MesaCategoria -> Mesa -> Circuito -> ...
+    categoria = models.ForeignKey(
+        'Categoria', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.CASCADE
+    )
+    distrito = models.ForeignKey(
+        'Distrito', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+    seccion = models.ForeignKey(
+        'Seccion', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+    circuito = models.ForeignKey(
+        'Circuito', null=True, blank=True, editable=False, db_index=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+
     class Meta:
         unique_together = ('carga', 'opcion')
+        indexes = [
+            models.Index(fields=['categoria', 'distrito'], name='vmr_categoria_distrito'),
+            models.Index(fields=['categoria', 'seccion'], name='vmr_categoria_seccion'),
+            models.Index(fields=['categoria', 'circuito'], name='vmr_categoria_circuito'),
+        ]
+
+    @classmethod
+    def completar_denormalizacion(cls, votos):
+        """
+        Completa categoría, distrito, sección y circuito de los votos nuevos a partir de su carga.
+        Normalmente todos los votos comparten la carga (ya en memoria), por lo que no hace consultas.
+        """
+        pendientes = [voto for voto in votos if voto.categoria_id is None and voto.carga_id is not None]
+        if not pendientes:
+            return
+        datos = {}
+        for voto in pendientes:
+            if cls.carga.is_cached(voto) and Carga.mesa_categoria.is_cached(voto.carga):
+                carga = voto.carga
+                datos[carga.id] = (
+                    carga.mesa_categoria.categoria_id, carga.distrito_id, carga.seccion_id, carga.circuito_id
+                )
+        faltantes = {voto.carga_id for voto in pendientes} - set(datos)
+        if faltantes:
+            filas = Carga.objects.filter(id__in=faltantes).values_list(
+                'id', 'mesa_categoria__categoria_id', 'distrito_id', 'seccion_id', 'circuito_id'
+            )
+            datos.update((carga_id, valores) for carga_id, *valores in filas)
+        for voto in pendientes:
+            voto.categoria_id, voto.distrito_id, voto.seccion_id, voto.circuito_id = datos.get(
+                voto.carga_id, (None, None, None, None)
+            )
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.completar_denormalizacion([self])
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.carga} - {self.opcion}: {self.votos}"
@@ -1377,6 +1671,92 @@ class CargaOficialControl(models.Model):
     categoria = models.ForeignKey('Categoria', on_delete=models.CASCADE, default=None)
 
 
+class ContadorAvance(models.Model):
+    """
+    Cantidad de mesa-categorías, mesas, fotos o preidentificaciones en un estado dado,
+    por distrito, sección y categoría. Se mantiene en forma incremental
+    (ver ``contadores_avance``) y alimenta el resumen del avance de carga.
+    """
+    TIPOS = Choices('mesa_categoria', 'mesa', 'foto', 'preidentificacion')
+    # Distrito, sección o categoría de las filas que no se abren por ese campo. No se usa NULL
+    # para que la restricción de unicidad (y el ON CONFLICT que suma las diferencias) valga
+    # también para esas filas.
+    SIN_VALOR = 0
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    # Ids sin clave foránea, para poder usar SIN_VALOR.
+    distrito_id = models.PositiveIntegerField(default=SIN_VALOR)
+    seccion_id = models.PositiveIntegerField(default=SIN_VALOR)
+    categoria_id = models.PositiveIntegerField(default=SIN_VALOR)
+    # Si la mesa tiene alguna foto asociada (sólo para mesa-categorías y mesas).
+    con_foto = models.BooleanField(default=False)
+    # Las cantidades de fotos se reparten en varias filas por estado (ver
+    # ``contadores_avance.GRUPOS_FOTOS``), que se suman al leerlas.
+    grupo = models.PositiveSmallIntegerField(default=0)
+    # El status de la mesa-categoría, o el estado de la mesa, la foto o la preidentificación.
+    clave = models.CharField(max_length=50)
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            'tipo', 'distrito_id', 'seccion_id', 'categoria_id', 'con_foto', 'grupo', 'clave'
+        )
+
+    def __str__(self):
+        return f'{self.tipo} {self.clave}: {self.cantidad}'
+
+
+def _suma_de_electores(queryset, campo):
+    """
+    Subconsulta con la suma de electores de ``queryset`` agrupada por ``campo``,
+    correlacionada con la fila que se actualiza.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{campo: OuterRef('pk')}).order_by().values(campo).annotate(
+                v=Sum('electores')
+            ).values('v')
+        ),
+        0
+    )
+
+
+def recalcular_electores():
+    """
+    Recalcula todas las denormalizaciones de cantidad de electores (lugar de votación,
+    circuito, sección y distrito) con un UPDATE agrupado por nivel, cada uno a partir
+    del anterior.
+
+    Es el equivalente masivo de ``actualizar_electores``.
+    """
+    con_lugar = Mesa.objects.filter(lugar_votacion__isnull=False)
+    LugarVotacion.objects.update(electores=_suma_de_electores(con_lugar, 'lugar_votacion'))
+    Circuito.objects.update(electores=_suma_de_electores(con_lugar, 'lugar_votacion__circuito'))
+    Seccion.objects.update(electores=_suma_de_electores(Circuito.objects.all(), 'seccion'))
+    Distrito.objects.update(electores=_suma_de_electores(Seccion.objects.all(), 'distrito'))
+
+
+_diferir_electores = threading.local()
+
+
+@contextmanager
+def electores_diferidos():
+    """
+    Dentro del bloque, guardar una mesa no actualiza los electores de su escuela,
+    circuito, sección y distrito; se recalculan todos juntos al salir
+    (ver ``recalcular_electores``). Pensado para importaciones masivas del padrón.
+    Si el bloque termina con una excepción no se recalcula nada.
+    """
+    profundidad = getattr(_diferir_electores, 'profundidad', 0)
+    _diferir_electores.profundidad = profundidad + 1
+    try:
+        yield
+    finally:
+        _diferir_electores.profundidad = profundidad
+    if not profundidad:
+        recalcular_electores()
+
+
 @receiver(post_save, sender=Mesa)
 def actualizar_electores(sender, instance=None, created=False, **kwargs):
     """
@@ -1384,7 +1764,10 @@ def actualizar_electores(sender, instance=None, created=False, **kwargs):
     cada vez que se crea o actualiza una instancia de mesa.
 
     En general, esto sólo debería ocurrir en la configuración inicial del sistema.
+    Para cargas masivas ver ``electores_diferidos``.
     """
+    if getattr(_diferir_electores, 'profundidad', 0):
+        return
     if instance.lugar_votacion:
         lugar = instance.lugar_votacion
         circuito = lugar.circuito
@@ -1417,6 +1800,56 @@ def actualizar_electores(sender, instance=None, created=False, **kwargs):
         distrito.save(update_fields=['electores'])
 
 
+@receiver(post_save, sender=Mesa)
+def actualizar_geografia_denormalizada(sender, instance=None, created=False, **kwargs):
+    """
+    Si la mesa cambió de circuito, actualiza la ubicación denormalizada
+    en sus MesaCategoria, cargas y votos.
+    """
+    if created or not instance.tracker.has_changed('circuito'):
+        return
+    distrito_id, seccion_id, circuito_id = geografia_de_mesas([instance.id]).get(
+        instance.id, (None, None, None)
+    )
+    actualizar_geografia_de_mesas(
+        [instance.id], distrito_id=distrito_id, seccion_id=seccion_id, circuito_id=circuito_id
+    )
+
+
+@receiver(post_save, sender=Circuito)
+def actualizar_seccion_denormalizada(sender, instance=None, created=False, **kwargs):
+    """
+    Si el circuito cambió de sección, actualiza la ubicación denormalizada de sus mesas.
+    """
+    if created or not instance.tracker.has_changed('seccion'):
+        return
+    actualizar_geografia_de_mesas(
+        Mesa.objects.filter(circuito=instance).values('id'),
+        distrito_id=instance.seccion.distrito_id, seccion_id=instance.seccion_id
+    )
+
+
+@receiver(post_save, sender=Seccion)
+def actualizar_distrito_denormalizado(sender, instance=None, created=False, **kwargs):
+    """
+    Si la sección cambió de distrito, actualiza el distrito denormalizado de sus mesas.
+    """
+    if created or not instance.tracker.has_changed('distrito'):
+        return
+    actualizar_geografia_de_mesas(
+        Mesa.objects.filter(circuito__seccion=instance).values('id'), distrito_id=instance.distrito_id
+    )
+
+
+def actualizar_geografia_de_mesas(ids_mesas, **geografia):
+    """
+    Actualiza la ubicación denormalizada en las MesaCategoria, cargas y votos de las mesas dadas.
+    """
+    MesaCategoria.objects.filter(mesa__in=ids_mesas).update(**geografia)
+    Carga.objects.filter(mesa_categoria__mesa__in=ids_mesas).update(**geografia)
+    VotoMesaReportado.objects.filter(carga__mesa_categoria__mesa__in=ids_mesas).update(**geografia)
+
+
 @receiver(post_save, sender=Categoria)
 def actualizar_prioridades_categoria(sender, instance, created, **kwargs):
     from scheduling.models import registrar_prioridad_categoria
@@ -1426,6 +1859,18 @@ def actualizar_prioridades_categoria(sender, instance, created, **kwargs):
         MesaCategoria.recalcular_coeficiente_para_orden_de_carga_para_categoria(instance)
 
 
+@receiver(post_save, sender=Categoria)
+def crear_particion_de_votos(sender, instance, created, **kwargs):
+    """
+    Si la tabla de votos está particionada por categoría, crea la partición de la categoría nueva.
+    """
+    # evitar import circular
+    from .particiones import crear_particiones, esta_particionada
+
+    if created and esta_particionada():
+        crear_particiones([instance.id])
+
+
 @receiver(post_save, sender=Seccion)
 def actualizar_prioridades_seccion(sender, instance, created, **kwargs):
     from scheduling.models import registrar_prioridades_seccion
@@ -0,0 +1,174 @@
+"""
+Particionado declarativo (Postgres 11 o superior) de la tabla de ``VotoMesaReportado``
+por categoría.
+
+Es opcional: la tabla se convierte con ``manage.py particionar_votos --convertir``
+(ver el comando). A partir de ese momento cada categoría tiene su partición
+(``elecciones_votomesareportado_c<id>``), que se crea sola al dar de alta la categoría.
+La partición por defecto recibe los votos de las categorías que todavía no tienen la suya
+(por ejemplo, creadas con un ``bulk_create``) hasta que se corre el comando.
+
+Como el Sumarizador filtra los votos por ``categoria`` (ver ``votos_reportados``),
+Postgres lee sólo la partición de la categoría consultada, y el vacuum y el
+mantenimiento de índices quedan acotados a las particiones activas.
+
+La clave primaria de la tabla particionada pasa a ser ``(id, categoria_id)`` y la
+restricción de unicidad ``(carga_id, opcion_id, categoria_id)``, porque Postgres exige
+que incluyan la clave de particionado. Para Django nada cambia: ``id`` sigue siendo único.
+"""
+from django.db import connection, transaction
+import structlog
+
+from .models import Categoria, VotoMesaReportado
+
+logger = structlog.get_logger(__name__)
+
+TABLA = VotoMesaReportado._meta.db_table
+TABLA_ORIGINAL = f'{TABLA}_sin_particionar'
+PARTICION_POR_DEFECTO = f'{TABLA}_default'
+
+
+class ParticionadoNoSoportado(Exception):
+    pass
+
+
+def soportado():
+    return connection.vendor == 'postgresql' and connection.pg_version >= 110000
+
+
+def nombre_particion(categoria_id):
+    return f'{TABLA}_c{categoria_id}'
+
+
+def esta_particionada():
+    if not soportado():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLA]
+        )
+        return cursor.fetchone() is not None
+
+
+def particiones_existentes():
+    """
+    Devuelve el conjunto de ids de categoría que ya tienen partición.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)', [TABLA]
+        )
+        prefijo = nombre_particion('')
+        return {
+            int(nombre[len(prefijo):]) for (nombre,) in cursor.fetchall()
+            if nombre.startswith(prefijo) and nombre[len(prefijo):].isdigit()
+        }
+
+
+def crear_particiones(categoria_ids):
+    """
+    Crea las particiones que falten para las categorías dadas. Los votos de esas
+    categorías que hubieran caído en la partición por defecto se mueven a la nueva.
+    Devuelve los ids de las categorías para las que se creó la partición.
+    """
+    faltantes = sorted(set(categoria_ids) - particiones_existentes())
+    with transaction.atomic(), connection.cursor() as cursor:
+        for categoria_id in faltantes:
+            particion = nombre_particion(categoria_id)
+            # Postgres no permite crear la partición si la de por defecto tiene filas con ese valor.
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE "{particion}_tmp" ON COMMIT DROP AS '
+                f'SELECT * FROM "{PARTICION_POR_DEFECTO}" WHERE categoria_id = %s', [categoria_id]
+            )
+            cursor.execute(f'DELETE FROM "{PARTICION_POR_DEFECTO}" WHERE categoria_id = %s', [categoria_id])
+            cursor.execute(
+                f'CREATE TABLE "{particion}" PARTITION OF "{TABLA}" FOR VALUES IN ({int(categoria_id)})'
+            )
+            cursor.execute(f'INSERT INTO "{TABLA}" SELECT * FROM "{particion}_tmp"')
+            logger.info('particion creada', particion=particion)
+    return faltantes
+
+
+def convertir():
+    """
+    Convierte la tabla de votos en una tabla particionada por categoría, copiando los
+    datos, los índices y las claves foráneas. Requiere que todos los votos tengan la
+    categoría denormalizada (ver el comando ``denormalizar_geografia``).
+    """
+    if not soportado():
+        raise ParticionadoNoSoportado('El particionado requiere PostgreSQL 11 o superior.')
+    if esta_particionada():
+        raise ParticionadoNoSoportado(f'La tabla {TABLA} ya está particionada.')
+    if VotoMesaReportado.objects.filter(categoria__isnull=True).exists():
+        raise ParticionadoNoSoportado(
+            'Hay votos sin categoría. Correr antes el comando denormalizar_geografia.'
+        )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{TABLA}" IN ACCESS EXCLUSIVE MODE')
+
+        # Índices y claves foráneas de la tabla original, para recrearlos con el mismo nombre
+        # (así las migraciones que los referencian siguen funcionando).
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN ('
+            '  SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype IN (%s, %s)'
+            ')', [TABLA, TABLA, 'p', 'u']
+        )
+        indices = cursor.fetchall()
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            'WHERE conrelid = to_regclass(%s) AND contype = %s', [TABLA, 'f']
+        )
+        foraneas = cursor.fetchall()
+        cursor.execute(
+            'SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = %s',
+            [TABLA, 'u']
+        )
+        unicas = [nombre for (nombre,) in cursor.fetchall()]
+        cursor.execute(
+            'SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = %s',
+            [TABLA, 'p']
+        )
+        (clave_primaria,) = cursor.fetchone()
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [TABLA, 'id'])
+        (secuencia,) = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE "{TABLA}" RENAME TO "{TABLA_ORIGINAL}"')
+        for nombre, _ in indices:
+            cursor.execute(f'ALTER INDEX "{nombre}" RENAME TO "{nombre}_sin_particionar"')
+        for nombre in unicas:
+            cursor.execute(f'ALTER TABLE "{TABLA_ORIGINAL}" DROP CONSTRAINT "{nombre}"')
+        cursor.execute(f'ALTER INDEX "{clave_primaria}" RENAME TO "{clave_primaria}_sin_particionar"')
+
+        cursor.execute(
+            f'CREATE TABLE "{TABLA}" (LIKE "{TABLA_ORIGINAL}" INCLUDING DEFAULTS) '
+            f'PARTITION BY LIST (categoria_id)'
+        )
+        cursor.execute(
+            f'ALTER TABLE "{TABLA}" ADD CONSTRAINT "{clave_primaria}" PRIMARY KEY (id, categoria_id)'
+        )
+        for nombre in unicas:
+            cursor.execute(
+                f'ALTER TABLE "{TABLA}" ADD CONSTRAINT "{nombre}" UNIQUE (carga_id, opcion_id, categoria_id)'
+            )
+        # Las definiciones referencian la tabla por nombre, que ahora es la particionada.
+        for nombre, definicion in indices:
+            cursor.execute(definicion)
+        for nombre, definicion in foraneas:
+            cursor.execute(f'ALTER TABLE "{TABLA}" ADD CONSTRAINT "{nombre}" {definicion}')
+
+        cursor.execute(f'CREATE TABLE "{PARTICION_POR_DEFECTO}" PARTITION OF "{TABLA}" DEFAULT')
+        for categoria_id in Categoria.objects.values_list('id', flat=True):
+            cursor.execute(
+                f'CREATE TABLE "{nombre_particion(categoria_id)}" PARTITION OF "{TABLA}" '
+                f'FOR VALUES IN ({int(categoria_id)})'
+            )
+
+        cursor.execute(f'INSERT INTO "{TABLA}" SELECT * FROM "{TABLA_ORIGINAL}"')
+        if secuencia:
+            cursor.execute(f'ALTER SEQUENCE {secuencia} OWNED BY "{TABLA}".id')
+        cursor.execute(f'DROP TABLE "{TABLA_ORIGINAL}"')
+        cursor.execute(f'ANALYZE "{TABLA}"')
+    logger.info('tabla particionada', tabla=TABLA)
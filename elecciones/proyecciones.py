@@ -1,5 +1,14 @@
+from collections import OrderedDict
 from functools import lru_cache
-from django.db.models import Q, F, Sum, Subquery, OuterRef, Count
+
+from attrdict import AttrDict
+from django.conf import settings
+from django.db.models import Sum, Subquery, Count
+import numpy as np
+
+from escrutinio_social.conexiones import pool
+from escrutinio_social.replica import alias_de_lectura, desde_replica
+
 from .models import (
     Categoria,
     Mesa,
@@ -49,16 +58,34 @@ def create_sumarizador(
     ) if tecnica_de_proyeccion else Sumarizador(*parametros_sumarizacion)
 
 
+def _valores_por_clave(claves, valores, buscadas, default=0):
+    """
+    Dados dos arrays paralelos ``claves`` y ``valores``, devuelve el valor asociado a cada
+    elemento de ``buscadas`` (o ``default`` si no está entre las claves).
+    """
+    buscadas = np.asarray(buscadas, dtype=np.int64)
+    if len(claves) == 0:
+        return np.full(len(buscadas), default, dtype=np.asarray(valores).dtype)
+    orden = np.argsort(claves)
+    claves = np.asarray(claves)[orden]
+    valores = np.asarray(valores)[orden]
+    posiciones = np.minimum(np.searchsorted(claves, buscadas), len(claves) - 1)
+    return np.where(claves[posiciones] == buscadas, valores[posiciones], default)
+
+
 class Proyecciones(Sumarizador):
-    
     """
     Esta clase encapsula el cómputo de proyecciones.
+
+    La pertenencia de los circuitos a las agrupaciones de la técnica se lee una única vez y
+    se guarda en arrays; las cantidades de mesas y los votos se obtienen agregados por circuito
+    (una consulta cada uno) y los coeficientes, exclusiones y totales proyectados se calculan
+    con NumPy.
     """
     def __init__(self, tecnica, *args):
         self.tecnica = tecnica
         super().__init__(*args)
-        self.cache_cant_mesas_totales_por_agrupacion = None
-        self.cache_cant_mesas_escrutadas_por_agrupacion = None
+        self.cache_agrupaciones = {}
 
     def circuito_subquery(self, id_agrupacion):
         """
@@ -83,124 +110,126 @@ class Proyecciones(Sumarizador):
             circuito__in=self.circuito_subquery(id_agrupacion)
         ).aggregate(electores=Sum('electores'))['electores']
 
+    def cant_mesas_por_circuito(self, mesa_categorias):
+        """
+        Devuelve dos arrays paralelos (ids de circuito, cantidad de mesas) para las
+        MesaCategoria dadas.
+        """
+        filas = list(mesa_categorias.values_list('circuito').annotate(
+            cant_mesas=Count('circuito')
+        ).order_by())
+        circuitos = np.array([circuito for circuito, _ in filas], dtype=np.int64)
+        cant_mesas = np.array([cant_mesas for _, cant_mesas in filas], dtype=np.int64)
+        return circuitos, cant_mesas
+
+    def agrupaciones(self):
+        """
+        Devuelve, para la categoría actual, un AttrDict con los datos de las agrupaciones de la técnica
+        de proyección ordenadas por id (todos arrays paralelos salvo ``nombres``):
+
+            ids, nombres, minimo_mesas,
+            mesas_totales: cantidad de mesas de cada agrupación,
+            mesas_escrutadas: cantidad de mesas escrutadas de cada agrupación,
+            consideradas: si la agrupación llegó al mínimo de mesas requerido,
+            coeficientes: factor de ponderación (0 para las no consideradas),
+            circuitos, agrupacion_de_circuito: pertenencia de los circuitos a las agrupaciones
+            consideradas, como el índice de la agrupación en los arrays anteriores.
+        """
+        if self.categoria.id in self.cache_agrupaciones:
+            return self.cache_agrupaciones[self.categoria.id]
+
+        filas = list(AgrupacionCircuitos.objects.filter(
+            proyeccion=self.tecnica
+        ).order_by('id').values_list('id', 'nombre', 'minimo_mesas'))
+        ids = np.array([id_agrupacion for id_agrupacion, _, _ in filas], dtype=np.int64)
+        nombres = [nombre for _, nombre, _ in filas]
+        minimo_mesas = np.array([minimo for _, _, minimo in filas], dtype=np.int64)
+
+        pertenencia = list(AgrupacionCircuito.objects.filter(
+            agrupacion__proyeccion=self.tecnica
+        ).values_list('circuito_id', 'agrupacion_id'))
+        circuitos = np.array([circuito for circuito, _ in pertenencia], dtype=np.int64)
+        indices = np.searchsorted(ids, [agrupacion for _, agrupacion in pertenencia]).astype(np.int64)
+
+        def mesas_por_agrupacion(mesa_categorias):
+            circuitos_con_mesas, cant_mesas = self.cant_mesas_por_circuito(mesa_categorias)
+            cant_mesas_de_circuitos = _valores_por_clave(circuitos_con_mesas, cant_mesas, circuitos)
+            return np.bincount(indices, weights=cant_mesas_de_circuitos, minlength=len(ids)).astype(np.int64)
+
+        # Las mesas totales consideran todas las de la categoría, más allá de los filtros.
+        mcs_de_la_categoria = MesaCategoria.objects.filter(categoria=self.categoria)
+        mesas_totales = mesas_por_agrupacion(mcs_de_la_categoria)
+
+        mesas_escrutadas = mesas_por_agrupacion(self.mesa_categorias_escrutadas(self.categoria))
+
+        consideradas = mesas_escrutadas >= minimo_mesas
+        # Idealmente el coeficiente debería surgir de la división entre la totalidad de votantes
+        # en la agrupación y la cantidad de votantes en las mesas escrutadas, pero ante la
+        # imposibilidad de contar con esos datos estamos dividiendo directamente la cantidad de mesas.
+        coeficientes = np.divide(
+            mesas_totales, mesas_escrutadas,
+            out=np.zeros(len(ids)), where=consideradas & (mesas_escrutadas > 0)
+        )
+
+        en_consideradas = consideradas[indices]
+        agrupaciones = AttrDict({
+            'ids': ids,
+            'nombres': nombres,
+            'minimo_mesas': minimo_mesas,
+            'mesas_totales': mesas_totales,
+            'mesas_escrutadas': mesas_escrutadas,
+            'consideradas': consideradas,
+            'coeficientes': coeficientes,
+            'circuitos': circuitos[en_consideradas],
+            'agrupacion_de_circuito': indices[en_consideradas],
+        })
+        self.cache_agrupaciones[self.categoria.id] = agrupaciones
+        return agrupaciones
+
+    def _indice(self, id_agrupacion):
+        return int(np.searchsorted(self.agrupaciones().ids, id_agrupacion))
+
     def total_mesas(self, id_agrupacion):
         """
         Calcula el total de mesas en una agrupación de circuitos
         """
-        if self.cache_cant_mesas_totales_por_agrupacion is None:
-            self.cache_cant_mesas_totales_por_agrupacion = {
-                agrupacion.id: cant_mesas
-                for (agrupacion, cant_mesas) in self.cant_mesas_totales_por_agrupacion()
-            }
-
-        return self.cache_cant_mesas_totales_por_agrupacion[id_agrupacion]
+        return int(self.agrupaciones().mesas_totales[self._indice(id_agrupacion)])
 
     def cant_mesas_escrutadas(self, id_agrupacion):
         """
-        Calcula el total de electores en las mesas escrutadas de una agrupación de circuitos
+        Calcula el total de mesas escrutadas de una agrupación de circuitos
         """
-        if self.cache_cant_mesas_escrutadas_por_agrupacion is None:
-            self.cache_cant_mesas_escrutadas_por_agrupacion = {
-                agrupacion.id: cant_mesas
-                for (agrupacion, cant_mesas) in self.cant_mesas_escrutadas_por_agrupacion()
-            }
-
-        return self.cache_cant_mesas_escrutadas_por_agrupacion[id_agrupacion]
+        return int(self.agrupaciones().mesas_escrutadas[self._indice(id_agrupacion)])
 
     def coeficiente_para_proyeccion(self, id_agrupacion):
         """
         Devuelve el coeficiente o factor de ponderación para una agrupación de circuitos.
-        Idealmente debería surgir de la división entre la totalidad de votantes en la agrupación, 
-        dividido por la cantidad de votantes en las mesas escrutadas, pero ante la imposibilidad
-        de contar con esos datos estamos dividiendo directamente la cantidad de mesas.
         """
         # TODO Considerar ambas formas de proyectar y hacerlo configurable para los distritos
         # en los que se cuente con la información de electores por mesa.
-        # return self.total_electores(id_agrupacion) / self.electores_en    _mesas_escrutadas(id_agrupacion)
-        return self.total_mesas(id_agrupacion) / self.cant_mesas_escrutadas(id_agrupacion)
+        return float(self.agrupaciones().coeficientes[self._indice(id_agrupacion)])
 
-    @lru_cache(128)
     def agrupaciones_no_consideradas(self):
         """
-        Devuelve la lista de agrupaciones que fueron descartadas por no tener el mínimo de mesas exigido.
-
-        Atención: el query se realiza en realidad sobre AgrupacionCircuito, porque de otra manera la
-        many to many entre AgrupacionCircuitos y Circuito impide hacer agregaciones.
+        Devuelve la lista de agrupaciones que fueron descartadas por no tener el mínimo de mesas exigido,
+        como tuplas (nombre, minimo_mesas, mesas_escrutadas).
         """
-
-        return AgrupacionCircuito.objects.values("agrupacion").annotate(
-            mesas_escrutadas=Count(
-                "circuito__mesas",
-                filter=Q(circuito__mesas__id__in=self.mesas_escrutadas().values_list('id', flat=True))
+        agrupaciones = self.agrupaciones()
+        return [
+            (
+                agrupaciones.nombres[i], int(agrupaciones.minimo_mesas[i]),
+                int(agrupaciones.mesas_escrutadas[i])
             )
-        ).filter(agrupacion__minimo_mesas__gt=F('mesas_escrutadas')).values_list(
-            'agrupacion__nombre', 'agrupacion__minimo_mesas', 'mesas_escrutadas'
-        )
-
-    def cant_mesas_totales_por_agrupacion(self):
-        """
-        Devuelve la lista de agrupaciones que se incluyen en la proyección, descartando aquellas
-        que no tienen aún el mínimo de mesas definido según la técnica de proyección.
-        """
-
-        # Era self.mesas_a_considerar, copiado para optimizar query por MesaCategoria que es más eficiente
-        # que por mesa, la optimización podria venirle bien también al sumarizador, pero prefiero no meter
-        # ese refactor a 3 días del escrutinio.
-        mcs_a_considerar = MesaCategoria.objects.filter(categoria=self.categoria)
-
-        cant_mesas_por_circuito = dict(mcs_a_considerar.values_list('mesa__circuito').annotate(
-            cant_mesas=Count('mesa__circuito')
-        ))
-
-        agrupaciones = AgrupacionCircuitos.objects.filter(
-            proyeccion=self.tecnica
-        ).prefetch_related('circuitos')
-
-        return ((
-            agrupacion,
-            sum(cant_mesas_por_circuito.get(circuito.id, 0) for circuito in agrupacion.circuitos.all())
-        ) for agrupacion in agrupaciones)
-
-    def cant_mesas_escrutadas_por_agrupacion(self):
-        """
-        Devuelve una lista de tuplas donde el primer elemento es una agrupación de circuitosy el segundo 
-        la cantidad de mesas escrutadas en esa agrupación de circuitos.
-        """
-
-        # Era self.mesas_a_considerar, copiado para optimizar query por MesaCategoria que es más eficiente
-        # que por mesa, la optimización podria venirle bien también al sumarizador, pero prefiero no meter
-        # ese refactor a 3 días del escrutinio.
-        lookups = self.lookups_de_mesas("mesa__")
-        mcs_a_considerar = MesaCategoria.objects.filter(categoria=self.categoria).filter(**lookups)
-
-        # Era self.mesas_escrutadas, copiado por el mismo motivo.
-        mcs_escrutadas = mcs_a_considerar.filter(
-            carga_testigo__isnull=False,
-            **self.cargas_a_considerar_status_filter(self.categoria, '')
-        )
-
-        cant_mesas_por_circuito = dict(mcs_escrutadas.values_list('mesa__circuito').annotate(
-            cant_mesas=Count('mesa__circuito')
-        ))
-
-        agrupaciones = AgrupacionCircuitos.objects.filter(
-            proyeccion=self.tecnica
-        ).prefetch_related('circuitos')
-
-        return ((
-            agrupacion,
-            sum(cant_mesas_por_circuito.get(circuito.id, 0) for circuito in agrupacion.circuitos.all())
-        ) for agrupacion in agrupaciones)
+            for i in np.flatnonzero(~agrupaciones.consideradas)
+        ]
 
     def agrupaciones_a_considerar(self):
         """
-        Devuelve la lista de agrupaciones que se incluyen en la proyección, descartando aquellas
+        Devuelve la lista de ids de las agrupaciones que se incluyen en la proyección, descartando aquellas
         que no tienen aún el mínimo de mesas definido según la técnica de proyección.
         """
-        return (
-            agrupacion.id for (agrupacion, cant_mesas) in self.cant_mesas_escrutadas_por_agrupacion()
-            if cant_mesas >= agrupacion.minimo_mesas
-        )
+        agrupaciones = self.agrupaciones()
+        return agrupaciones.ids[agrupaciones.consideradas].tolist()
 
     def cant_mesas_escrutadas_y_consideradas(self):
         """
@@ -208,73 +237,67 @@ class Proyecciones(Sumarizador):
         escrutado cuando una agrupación de circuitos tiene menos mesas escrutadas de las necesarias
         para ser consideradas en la proyección.
         """
-        return sum(
-            cant_mesas for (agrupacion, cant_mesas) in self.cant_mesas_escrutadas_por_agrupacion()
-            if cant_mesas >= agrupacion.minimo_mesas
-        )
+        agrupaciones = self.agrupaciones()
+        return int(agrupaciones.mesas_escrutadas[agrupaciones.consideradas].sum())
 
     def coeficientes_para_proyeccion(self):
-        return {
-            id_agrupacion: self.coeficiente_para_proyeccion(id_agrupacion)
-            for id_agrupacion in self.agrupaciones_a_considerar()
-        }
+        agrupaciones = self.agrupaciones()
+        return dict(zip(
+            agrupaciones.ids[agrupaciones.consideradas].tolist(),
+            agrupaciones.coeficientes[agrupaciones.consideradas].tolist()
+        ))
 
-    def votos_por_opcion(self, categoria, mesas):
+    def votos_por_opcion(self, categoria, mesas=None):
         """
-        Dada una categoría y un conjunto de mesas, devuelve una tabla de resultados con la cantidad de
-        votos por cada una de las opciones posibles (partidarias o no). A diferencia de la superclase,
-        aquí se realiza el group_by también por AgrupacionCircuitos, filtrando sólo aquellas cargas
-        correspondientes a agrupaciones que llegaron al mínimo de mesas requerido.
+        Dada una categoría y un conjunto de mesas, devuelve una lista de tuplas
+        (id_circuito, id_opcion, sum_votos). A diferencia de la superclase, aquí el group_by
+        es también por circuito, para poder ponderar los votos según la agrupación del circuito.
         """
-
-        agrupaciones_subquery = AgrupacionCircuitos.objects.filter(
-            id__in=self.agrupaciones_a_considerar()
-        ).filter(id__in=(OuterRef('carga__mesa_categoria__mesa__circuito__agrupaciones'))
-                 ).values_list('id', flat=True)
-
-        return self.votos_reportados(categoria, mesas).values_list('opcion__id').annotate(
-            id_agrupacion=Subquery(agrupaciones_subquery)
-        ).exclude(id_agrupacion__isnull=True).annotate(
+        return list(self.votos_reportados(categoria, mesas).values_list(
+            'circuito', 'opcion__id'
+        ).annotate(
             sum_votos=Sum('votos')
-        ).values_list('opcion__id', 'id_agrupacion', 'sum_votos')
+        ).order_by())
 
-    def votos_por_agrupacion(self, votos_a_procesar):
+    def agrupar_votos(self, votos_a_procesar):
         """
-        Dada una lista de tuplas (id_opcion, id_agrupacion, sum_votos) los agrupa en un dictionary
-        con key id_agrupacion y value = lista de tuplas (id_opcion, sum_votos)
+        Pondera los votos de cada circuito por el coeficiente de su agrupación, descartando los
+        circuitos que no pertenecen a agrupaciones consideradas. Como en el cómputo manual,
+        se redondean los votos proyectados de cada agrupación y opción antes de sumarlos.
         """
-        votos_por_agrupacion = {}
-        for id_opcion, id_agrupacion, sum_votos in votos_a_procesar:
-            votos_por_agrupacion.setdefault(id_agrupacion, []).append((id_opcion, sum_votos))
-
-        return votos_por_agrupacion
+        agrupaciones = self.agrupaciones()
+        votos = np.array(votos_a_procesar, dtype=np.int64).reshape(-1, 3)
+        indices = _valores_por_clave(
+            agrupaciones.circuitos, agrupaciones.agrupacion_de_circuito, votos[:, 0], default=-1
+        )
+        votos = votos[indices >= 0]
+        indices = indices[indices >= 0]
+        if len(votos) == 0:
+            return {}, {}
+
+        opciones = list(self.opciones())
+        ids_opciones = np.array([opcion.id for opcion in opciones], dtype=np.int64)
+        columnas = _valores_por_clave(ids_opciones, np.arange(len(opciones)), votos[:, 1])
+
+        matriz = np.zeros((len(agrupaciones.ids), len(opciones)))
+        np.add.at(matriz, (indices, columnas), votos[:, 2])
+        proyectados = np.round(matriz * agrupaciones.coeficientes[:, np.newaxis]).sum(axis=0)
+        proyectados = proyectados.astype(np.int64)
+        reportadas = np.zeros(len(opciones), dtype=bool)
+        reportadas[columnas] = True
 
-    def agrupar_votos(self, votos_a_procesar):
-        coeficientes = self.coeficientes_para_proyeccion()
         votos_positivos_proyectados = {}
         votos_no_positivos_proyectados = {}
-
-        for id_agrupacion, votos_de_agrupacion in self.votos_por_agrupacion(votos_a_procesar).items():
-            votos_positivos, votos_no_positivos = super().agrupar_votos(votos_de_agrupacion)
-
-            # Votos positivos
-            for partido, votos_por_opcion in votos_positivos.items():
-                votos_partido = votos_positivos_proyectados.setdefault(partido, {})
-                for opcion, votos in votos_por_opcion.items():
-                    votos_partido[opcion] = (
-                        votos_partido.setdefault(opcion, 0) + round(votos * coeficientes[id_agrupacion])
-                    )
-
-            # Votos no positivos[opcion.nombre] = sum_votos if sum_votos else 0
-            for nombre_opcion, votos in votos_no_positivos.items():
-                votos_no_positivos_proyectados[nombre_opcion] = (
-                    votos_no_positivos_proyectados.setdefault(nombre_opcion, 0) +
-                    round(votos * coeficientes[id_agrupacion])
-                )
+        for opcion, votos_opcion, reportada in zip(opciones, proyectados.tolist(), reportadas):
+            if opcion.partido:
+                if reportada:
+                    votos_positivos_proyectados.setdefault(opcion.partido, {})[opcion] = votos_opcion
+            else:
+                votos_no_positivos_proyectados[opcion.nombre_corto] = votos_opcion
 
         return votos_positivos_proyectados, votos_no_positivos_proyectados
 
-    def calcular(self, categoria, mesas):
+    def calcular(self, categoria, mesas=None):
         """
         Extiende los cómputos del sumarizador para agregar las agrupaciones que no fueron consideradas en la
         proyección por no alcanzar el mínimo de mesas requerido.
@@ -290,11 +313,67 @@ class Proyecciones(Sumarizador):
         return TecnicaProyeccion.objects.all()
 
 
+def _resultados_en_hilo(sumarizador, categoria, alias):
+    """
+    Calcula los resultados en un hilo del pool, leyendo de la base ``alias`` (la del hilo que
+    lanzó el cálculo, ver ``desde_replica``).
+    """
+    with desde_replica(alias):
+        return sumarizador.get_resultados(categoria)
+
+
 class SumarizadorCombinado():
+    """
+    Computa los resultados del total país combinando la configuración de cada distrito.
+
+    Los distritos sin proyección que comparten tipo de agregación y opciones a considerar
+    se computan juntos, con un único Sumarizador filtrado por todos ellos (las mismas consultas
+    que para un solo distrito); los que usan una técnica de proyección se computan de a uno.
+    Las distintas sumarizaciones son independientes entre sí y se evalúan en paralelo en un pool
+    de ``settings.SUMARIZADOR_COMBINADO_HILOS`` hilos por proceso (ver ``conexiones.PoolDeConexiones``),
+    que mantienen sus conexiones a la base entre un request y otro.
+    """
 
     def __init__(self, configuracion):
         self.configuracion = configuracion
 
+    def sumarizadores(self):
+        """
+        Devuelve la lista de sumarizadores necesarios para cubrir todas las configuraciones
+        por distrito, en el orden de las configuraciones.
+        """
+        grupos = OrderedDict()
+        for configuracion_distrito in self.configuracion.configuraciones.order_by('id'):
+            if configuracion_distrito.proyeccion_id:
+                clave = ('proyeccion', configuracion_distrito.id)
+            else:
+                clave = (configuracion_distrito.agregacion, configuracion_distrito.opciones)
+            _, ids_distritos = grupos.setdefault(clave, (configuracion_distrito, []))
+            ids_distritos.append(configuracion_distrito.distrito_id)
+
+        return [
+            create_sumarizador(
+                parametros_sumarizacion=[NIVELES_DE_AGREGACION.distrito, ids_distritos],
+                configuracion_distrito=configuracion_distrito
+            )
+            for configuracion_distrito, ids_distritos in grupos.values()
+        ]
+
+    def resultados_parciales(self, categoria):
+        sumarizadores = self.sumarizadores()
+        hilos = min(settings.SUMARIZADOR_COMBINADO_HILOS, len(sumarizadores))
+        if hilos <= 1:
+            return [sumarizador.get_resultados(categoria) for sumarizador in sumarizadores]
+
+        # El ruteo a la réplica es por hilo: los del pool leen de la misma base que este.
+        alias = alias_de_lectura()
+        pool_hilos = pool('sumarizador_combinado', tamanio=settings.SUMARIZADOR_COMBINADO_HILOS)
+        futuros = [
+            pool_hilos.ejecutar(_resultados_en_hilo, sumarizador, categoria, alias)
+            for sumarizador in sumarizadores
+        ]
+        return [futuro.result() for futuro in futuros]
+
     @property
     def filtros(self):
         """
@@ -308,11 +387,9 @@ class SumarizadorCombinado():
         """
         return Mesa.objects.filter(categorias=categoria).distinct()
 
+    @lru_cache(128)
     def get_resultados(self, categoria):
-        return sum((
-            create_sumarizador(configuracion_distrito=configuracion_distrito).get_resultados(categoria)
-            for configuracion_distrito in self.configuracion.configuraciones.all()
-        ), ResultadoCombinado())
+        return sum(self.resultados_parciales(categoria), ResultadoCombinado())
 
     def categorias(self):
         return Categoria.objects.filter(distrito__isnull=True, activa=True)
@@ -0,0 +1,87 @@
+"""
+Foto en memoria de los valores de Constance.
+
+Con el backend de base de datos cada lectura de ``constance.config.X`` puede ser una consulta
+(el caché de Constance también está en la base). El scheduler, la asignación de tareas, la
+consolidación y el antitrolling leen estos valores en sus caminos calientes, así que usan
+``config`` de este módulo, que tiene la misma interfaz: todos los valores se cargan juntos,
+con una única consulta, y se sirven desde memoria.
+
+Se invalida con la señal ``config_updated`` de Constance, que se dispara cada vez que se guarda
+un valor (desde el admin o con ``override_config``), y entre procesos con el número de versión
+compartido de ``RegistroEnMemoria``, que se verifica como mucho cada
+``settings.INTERVALO_VERIFICACION_CONFIG`` segundos.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from constance import config as config_constance, settings as settings_constance
+from constance.signals import config_updated
+
+from .registro_en_memoria import RegistroEnMemoria
+
+CLAVE_VERSION = 'elecciones.registro_config.version'
+
+
+class DatosConfig():
+
+    def __init__(self, valores):
+        # {clave: valor}, para todas las claves de ``CONSTANCE_CONFIG``.
+        self.valores = valores
+        self.derivados = {}
+
+    @classmethod
+    def cargar(cls):
+        valores = {clave: definicion[0] for clave, definicion in settings_constance.CONFIG.items()}
+        # Los valores guardados, todos en una consulta. El backend no tiene una interfaz
+        # pública para leer varios valores juntos.
+        valores.update(
+            (clave, valor) for clave, valor in config_constance._backend.mget(list(valores))
+            if valor is not None
+        )
+        return cls(valores)
+
+
+class RegistroConfig(RegistroEnMemoria):
+    clave_version = CLAVE_VERSION
+
+    @property
+    def intervalo(self):
+        return settings.INTERVALO_VERIFICACION_CONFIG
+
+    def cargar(self):
+        return DatosConfig.cargar()
+
+
+registro_config = RegistroConfig()
+
+
+class Config():
+    """
+    Lectura de los valores de Constance desde ``registro_config``. La escritura se delega
+    en Constance, que avisa el cambio con ``config_updated``.
+    """
+
+    def __getattr__(self, clave):
+        if clave.startswith('_'):
+            # Los atributos especiales que buscan pytest, copy, etc. no son valores.
+            raise AttributeError(clave)
+        try:
+            return registro_config.datos().valores[clave]
+        except KeyError:
+            raise AttributeError(clave)
+
+    def __setattr__(self, clave, valor):
+        setattr(config_constance, clave, valor)
+
+    def __dir__(self):
+        return settings_constance.CONFIG.keys()
+
+
+config = Config()
+
+
+@receiver(config_updated)
+def invalidar_registro_config(sender, **kwargs):
+    registro_config.invalidar(publicar=False)
+    transaction.on_commit(registro_config.invalidar)
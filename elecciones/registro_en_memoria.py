@@ -0,0 +1,117 @@
+"""
+Base de los registros en memoria: datos de la base que se cargan una única vez por proceso
+y se sirven desde memoria (la metadata electoral, el índice de la geografía, los valores de
+Constance).
+
+Se invalidan:
+    - en el mismo proceso, explícitamente o con las señales de los modelos involucrados
+      (cada registro conecta las suyas).
+    - entre procesos, a través de un número de versión compartido que se guarda en el caché
+      ``settings.CACHE_METADATA_ELECTORAL`` y que cada proceso verifica como mucho
+      cada ``intervalo`` segundos.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class RegistroEnMemoria():
+    """
+    Datos de la base que se cargan una única vez por proceso y se sirven desde memoria,
+    con la invalidación descripta arriba. Las subclases definen ``clave_version`` y ``cargar()``,
+    que devuelve un objeto con un diccionario ``derivados`` (ver ``memo``).
+    """
+    clave_version = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._datos = None
+        self._version = None
+        self._ultima_verificacion = 0
+
+    @property
+    def cache(self):
+        return caches[settings.CACHE_METADATA_ELECTORAL]
+
+    @property
+    def intervalo(self):
+        return settings.INTERVALO_VERIFICACION_METADATA
+
+    def cargar(self):
+        raise NotImplementedError
+
+    def invalidar(self, publicar=True):
+        """
+        Descarta los datos en memoria. Si ``publicar`` es verdadero, además avisa
+        a los demás procesos que deben recargarlos.
+        """
+        with self._lock:
+            self._datos = None
+        if publicar and self.intervalo is not None:
+            self.cache.set(self.clave_version, uuid.uuid4().hex, None)
+        logger.debug('registro invalidado', registro=type(self).__name__, publicar=publicar)
+
+    def _version_compartida(self):
+        return self.cache.get(self.clave_version)
+
+    def _verificar_version(self):
+        """
+        Si pasó el intervalo de verificación y otro proceso publicó
+        una versión nueva, se descartan los datos actuales.
+        """
+        if self.intervalo is None or self._datos is None:
+            return
+        ahora = time.monotonic()
+        if ahora - self._ultima_verificacion < self.intervalo:
+            return
+        self._ultima_verificacion = ahora
+        if self._version_compartida() != self._version:
+            self._datos = None
+
+    def datos(self):
+        with self._lock:
+            self._verificar_version()
+            if self._datos is None:
+                if self.intervalo is not None:
+                    self._version = self._version_compartida()
+                    self._ultima_verificacion = time.monotonic()
+                self._datos = self.cargar()
+                logger.debug('registro cargado', registro=type(self).__name__)
+            return self._datos
+
+    def memo(self, clave, calcular):
+        """
+        Devuelve el valor derivado de los datos asociado a ``clave``, calculándolo
+        con ``calcular()`` la primera vez. Se descarta junto con los datos, cuando
+        el registro se invalida.
+        """
+        datos = self.datos()
+        if clave not in datos.derivados:
+            datos.derivados[clave] = calcular()
+        return datos.derivados[clave]
+
+    def memo_compartido(self, clave, calcular, duracion=24 * 60 * 60):
+        """
+        Como ``memo``, pero el valor (que tiene que poder guardarse en el caché) se comparte
+        entre procesos a través del caché, asociado a la versión publicada: sólo el primer
+        proceso que lo necesita lo calcula. Si todavía no se publicó ninguna versión,
+        cada proceso lo calcula por su cuenta.
+        """
+        def calcular_o_leer():
+            version = self._version
+            if version is None:
+                return calcular()
+            clave_cache = f'{self.clave_version}.{clave}.{version}'
+            valor = self.cache.get(clave_cache)
+            if valor is None:
+                valor = calcular()
+                self.cache.set(clave_cache, valor, duracion)
+            return valor
+
+        return self.memo(clave, calcular_o_leer)
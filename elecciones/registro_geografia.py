@@ -0,0 +1,197 @@
+"""
+Índice en memoria de la geografía electoral (distritos, secciones, circuitos y mesas)
+por número canonizado.
+
+Resuelve lo que se tipea al identificar un acta (formulario, API y autocompletes) sin joins
+ni búsquedas ``iexact`` en la base: devuelve ids, y quien necesita las instancias las trae
+por clave primaria.
+
+Se carga y se invalida igual que el registro de la metadata (ver ``registro_metadata``):
+con las señales de los modelos en el mismo proceso, y con un número de versión compartido
+entre procesos. Guardar sólo otros campos (por ejemplo, los electores de una mesa) no invalida.
+Las importaciones masivas, que no disparan señales, lo invalidan explícitamente.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Circuito, Distrito, LugarVotacion, Mesa, Seccion, SeccionPolitica, canonizar
+from .registro_en_memoria import RegistroEnMemoria
+
+CLAVE_VERSION = 'elecciones.registro_geografia.version'
+
+# Los campos que afectan al índice, a las opciones de autocompletado (ver ``autocompletar``)
+# o al árbol de los menús (ver ``arbol_geografia``).
+CAMPOS_INDEXADOS = {
+    'numero', 'nombre', 'distrito', 'seccion_politica', 'seccion', 'circuito', 'lugar_votacion'
+}
+
+
+def normalizar(numero):
+    """
+    Canoniza el número y le quita los ceros a la izquierda aunque no sea numérico
+    (los circuitos vienen como "001A").
+    """
+    if numero is None:
+        return None
+    valor = canonizar(str(numero))
+    return valor.lstrip('0') or valor
+
+
+def como_lista(id):
+    return None if id is None else [id]
+
+
+def unico(ids):
+    """
+    El único id de la lista, o ``None`` si no hay ninguno o hay más de uno.
+    """
+    return ids[0] if ids and len(ids) == 1 else None
+
+
+class Nivel():
+    """
+    Índice de un nivel de la geografía: ids por número, por padre y por (padre, número).
+    """
+
+    def __init__(self, filas):
+        por_padre_y_numero = defaultdict(list)
+        por_numero = defaultdict(list)
+        hijos = defaultdict(list)
+        self.padre = {}
+        for id, padre_id, numero in filas:
+            numero = normalizar(numero)
+            por_padre_y_numero[(padre_id, numero)].append(id)
+            por_numero[numero].append(id)
+            hijos[padre_id].append(id)
+            self.padre[id] = padre_id
+        self.por_padre_y_numero = dict(por_padre_y_numero)
+        self.por_numero = dict(por_numero)
+        self.hijos = dict(hijos)
+
+    def filtrar(self, padres=None, numero=None, ids=None):
+        """
+        Devuelve los ids cuyo padre está en ``padres``, con el número dado y que están en ``ids``.
+        Los criterios en ``None`` no restringen; si ninguno restringe se devuelve ``None`` (todos).
+        """
+        if padres is None and numero is None and ids is None:
+            return None
+        if numero is not None:
+            numero = normalizar(numero)
+            if padres is None:
+                candidatos = self.por_numero.get(numero, [])
+            else:
+                candidatos = [
+                    id for padre in padres for id in self.por_padre_y_numero.get((padre, numero), ())
+                ]
+        elif padres is not None:
+            candidatos = [id for padre in padres for id in self.hijos.get(padre, ())]
+        else:
+            candidatos = [id for id in ids if id in self.padre]
+        if ids is not None:
+            ids = set(ids)
+            candidatos = [id for id in candidatos if id in ids]
+        return candidatos
+
+
+class DatosGeografia():
+
+    def __init__(self, distritos, secciones, circuitos, mesas):
+        self.distritos = distritos
+        self.secciones = secciones
+        self.circuitos = circuitos
+        self.mesas = mesas
+        # Estructuras derivadas de estos datos (ver RegistroEnMemoria.memo).
+        self.derivados = {}
+
+    @classmethod
+    def cargar(cls):
+        return cls(
+            Nivel((id, None, numero) for id, numero in Distrito.objects.values_list('id', 'numero')),
+            Nivel(Seccion.objects.values_list('id', 'distrito_id', 'numero').iterator()),
+            Nivel(Circuito.objects.values_list('id', 'seccion_id', 'numero').iterator()),
+            Nivel(Mesa.objects.values_list('id', 'circuito_id', 'numero').iterator()),
+        )
+
+
+class RegistroGeografia(RegistroEnMemoria):
+    clave_version = CLAVE_VERSION
+
+    def cargar(self):
+        return DatosGeografia.cargar()
+
+    def distritos(self, numero=None):
+        return self.datos().distritos.filtrar(numero=numero)
+
+    def secciones(self, distrito_id=None, numero=None, ids=None):
+        return self.datos().secciones.filtrar(padres=como_lista(distrito_id), numero=numero, ids=ids)
+
+    def circuitos(self, distrito_id=None, seccion_id=None, numero=None, numero_seccion=None, ids=None):
+        datos = self.datos()
+        secciones = datos.secciones.filtrar(
+            padres=como_lista(distrito_id), numero=numero_seccion, ids=como_lista(seccion_id)
+        )
+        return datos.circuitos.filtrar(padres=secciones, numero=numero, ids=ids)
+
+    def mesas(
+        self, distrito_id=None, seccion_id=None, circuito_id=None, numero=None,
+        numero_seccion=None, numero_circuito=None
+    ):
+        """
+        Devuelve los ids de las mesas que cumplen los criterios dados (``None`` si no hay
+        ningún criterio). Los números de sección y circuito permiten buscar sin conocer sus ids.
+        """
+        datos = self.datos()
+        secciones = datos.secciones.filtrar(
+            padres=como_lista(distrito_id), numero=numero_seccion, ids=como_lista(seccion_id)
+        )
+        circuitos = datos.circuitos.filtrar(
+            padres=secciones, numero=numero_circuito, ids=como_lista(circuito_id)
+        )
+        return datos.mesas.filtrar(padres=circuitos, numero=numero)
+
+    def ubicacion_de_mesa(self, mesa_id):
+        """
+        Devuelve (distrito, sección, circuito) de la mesa, como ids, o ``None`` si no existe.
+        """
+        datos = self.datos()
+        if mesa_id not in datos.mesas.padre:
+            return None
+        circuito_id = datos.mesas.padre[mesa_id]
+        seccion_id = datos.circuitos.padre.get(circuito_id)
+        return datos.secciones.padre.get(seccion_id), seccion_id, circuito_id
+
+    def mesa(self, distrito, seccion, circuito, mesa):
+        """
+        Devuelve el id de la mesa identificada por sus cuatro números, o ``None``.
+        """
+        distrito_id = unico(self.distritos(distrito))
+        if distrito_id is None:
+            return None
+        return unico(self.mesas(
+            distrito_id=distrito_id, numero_seccion=seccion, numero_circuito=circuito, numero=mesa
+        ))
+
+
+registro_geografia = RegistroGeografia()
+
+
+@receiver(post_save, sender=Distrito)
+@receiver(post_save, sender=SeccionPolitica)
+@receiver(post_save, sender=Seccion)
+@receiver(post_save, sender=Circuito)
+@receiver(post_save, sender=Mesa)
+@receiver(post_save, sender=LugarVotacion)
+@receiver(post_delete, sender=Distrito)
+@receiver(post_delete, sender=SeccionPolitica)
+@receiver(post_delete, sender=Seccion)
+@receiver(post_delete, sender=Circuito)
+@receiver(post_delete, sender=Mesa)
+@receiver(post_delete, sender=LugarVotacion)
+def invalidar_registro_geografia(sender, update_fields=None, **kwargs):
+    if update_fields and not CAMPOS_INDEXADOS.intersection(update_fields):
+        return
+    registro_geografia.invalidar(publicar=False)
+    transaction.on_commit(registro_geografia.invalidar)
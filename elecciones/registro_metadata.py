@@ -0,0 +1,148 @@
+"""
+Registro en memoria de la "metadata" electoral: categorías, opciones (con su orden en el acta
+y si son prioritarias o no) y partidos.
+
+Estos datos prácticamente no cambian durante la elección, pero se consultan en todos los
+caminos calientes (pantalla de carga, API, sumarizador, etc.). El registro los carga una única
+vez por proceso y los sirve desde memoria.
+
+Se invalida:
+    - en el mismo proceso, con los ``post_save`` / ``post_delete`` de los modelos involucrados.
+    - entre procesos, a través de un número de versión compartido que se guarda en el caché
+      ``settings.CACHE_METADATA_ELECTORAL`` y que cada proceso verifica como mucho
+      cada ``settings.INTERVALO_VERIFICACION_METADATA`` segundos.
+
+La carga y la invalidación están en ``RegistroEnMemoria`` (ver ``registro_en_memoria``),
+que también usan el índice de la geografía (ver ``registro_geografia``) y los valores
+de Constance (ver ``registro_config``).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Categoria, CategoriaOpcion, Opcion, Partido
+from .registro_en_memoria import RegistroEnMemoria
+
+CLAVE_VERSION = 'elecciones.registro_metadata.version'
+
+
+class DatosMetadata():
+    """
+    Foto inmutable de la metadata electoral en un momento dado.
+    """
+
+    def __init__(self, categorias, opciones, opciones_por_categoria):
+        # {id: Categoria}
+        self.categorias = categorias
+        # {id: Opcion} (con el partido ya resuelto)
+        self.opciones = opciones
+        # {id_categoria: [(Opcion, prioritaria), ...]} en el orden del acta.
+        self.opciones_por_categoria = opciones_por_categoria
+        # Estructuras derivadas de estos datos (ver RegistroEnMemoria.memo).
+        self.derivados = {}
+
+    @classmethod
+    def cargar(cls):
+        categorias = {categoria.id: categoria for categoria in Categoria.objects.all()}
+        opciones = {opcion.id: opcion for opcion in Opcion.objects.select_related('partido')}
+
+        asociaciones = CategoriaOpcion.objects.values_list('categoria_id', 'opcion_id', 'orden', 'prioritaria')
+        opciones_por_categoria = defaultdict(list)
+        # Se respeta el orden de ``Categoria.opciones_actuales``: por orden en el acta,
+        # con las opciones sin orden al final.
+        for categoria_id, opcion_id, orden, prioritaria in sorted(
+            asociaciones, key=lambda a: (a[0], a[2] is None, a[2] or 0, a[1])
+        ):
+            opciones_por_categoria[categoria_id].append((opciones[opcion_id], prioritaria))
+
+        return cls(categorias, opciones, dict(opciones_por_categoria))
+
+
+class RegistroMetadata(RegistroEnMemoria):
+    clave_version = CLAVE_VERSION
+
+    def cargar(self):
+        return DatosMetadata.cargar()
+
+    def _datos_con(self, categoria_id):
+        """
+        Devuelve los datos asegurándose de que incluyan la categoría pedida.
+        Si no está (por ejemplo, se creó con un ``bulk_create`` que no dispara señales)
+        se recargan una vez. Antes se verifica que exista: un id inexistente (que puede llegar
+        desde la API pública) no debe forzar la recarga de todo el registro.
+        """
+        datos = self.datos()
+        if categoria_id not in datos.categorias and Categoria.objects.filter(id=categoria_id).exists():
+            self.invalidar(publicar=False)
+            datos = self.datos()
+        return datos
+
+    def categoria(self, categoria_id):
+        """
+        Devuelve la categoría con el id dado, o lanza ``Categoria.DoesNotExist``.
+        """
+        try:
+            return self._datos_con(categoria_id).categorias[categoria_id]
+        except KeyError:
+            raise Categoria.DoesNotExist(f'No existe la categoría {categoria_id}')
+
+    def opciones_actuales(self, categoria, solo_prioritarias=False, excluir_optativas=False):
+        """
+        Equivalente en memoria de :meth:`Categoria.opciones_actuales`: devuelve una lista
+        con las opciones de la categoría en el orden del acta.
+        """
+        categoria_id = getattr(categoria, 'id', categoria)
+        opciones = self._datos_con(categoria_id).opciones_por_categoria.get(categoria_id, [])
+        return [
+            opcion for opcion, prioritaria in opciones
+            if (prioritaria or not solo_prioritarias) and not (
+                excluir_optativas and opcion.tipo == Opcion.TIPOS.metadata_optativa
+            )
+        ]
+
+    def opcion(self, opcion_id):
+        try:
+            return self.datos().opciones[opcion_id]
+        except KeyError:
+            return Opcion.objects.select_related('partido').get(id=opcion_id)
+
+    def opcion_por_filtro(self, filtro):
+        """
+        Busca la única opción que cumple con el filtro dado, que debe tener la forma
+        de las constantes ``settings.OPCION_*``. Si no está en memoria se delega en la base,
+        de modo que se lanzan las mismas excepciones que con ``Opcion.objects.get(**filtro)``.
+        """
+        candidatas = [
+            opcion for opcion in self.datos().opciones.values()
+            if all(self._valor(opcion, campo) == valor for campo, valor in filtro.items())
+        ]
+        if len(candidatas) == 1:
+            return candidatas[0]
+        return Opcion.objects.select_related('partido').get(**filtro)
+
+    @staticmethod
+    def _valor(opcion, campo):
+        if campo == 'partido':
+            return opcion.partido_id
+        return getattr(opcion, campo)
+
+
+registro = RegistroMetadata()
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Opcion)
+@receiver(post_save, sender=CategoriaOpcion)
+@receiver(post_save, sender=Partido)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Opcion)
+@receiver(post_delete, sender=CategoriaOpcion)
+@receiver(post_delete, sender=Partido)
+@receiver(m2m_changed, sender=CategoriaOpcion)
+def invalidar_registro_metadata(sender, **kwargs):
+    # Se invalida en el momento para que este mismo proceso vea el cambio, y de nuevo
+    # al confirmarse la transacción para que los demás procesos no recarguen datos viejos.
+    registro.invalidar(publicar=False)
+    transaction.on_commit(registro.invalidar)
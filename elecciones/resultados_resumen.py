@@ -1,9 +1,10 @@
-from django.db.models import Count
+from django.db.models import BooleanField, Case, Count, OuterRef, Q, Subquery, Sum, Value, When
 
+from collections import defaultdict
 from functools import reduce
 
 from escrutinio_social import settings
-from elecciones.models import Mesa, MesaCategoria, Seccion, Distrito, Categoria
+from elecciones.models import Mesa, MesaCategoria, Seccion, Distrito, Categoria, ContadorAvance
 from adjuntos.models import Attachment, PreIdentificacion
 
 
@@ -35,11 +36,14 @@ class RestriccionPorDistrito():
         return query.filter(circuito__seccion__distrito__id=self.distrito_id)
 
     def aplicar_restriccion_mesacats(self, query):
-        return query.filter(mesa__circuito__seccion__distrito__id=self.distrito_id)
+        return query.filter(distrito_id=self.distrito_id)
 
     def aplicar_restriccion_preidentificaciones(self, query):
         return query.filter(distrito__id=self.distrito_id)
 
+    def filtro_contadores(self):
+        return Q(distrito_id=self.distrito_id)
+
     def query_categorias(self):
         return Categoria.objects.filter(distrito__id=self.distrito_id, seccion=None) | Categoria.objects.filter(
             distrito=None, seccion=None)
@@ -63,11 +67,14 @@ class RestriccionPorSeccion():
         return query.filter(circuito__seccion__id=self.seccion_id)
 
     def aplicar_restriccion_mesacats(self, query):
-        return query.filter(mesa__circuito__seccion__id=self.seccion_id)
+        return query.filter(seccion_id=self.seccion_id)
 
     def aplicar_restriccion_preidentificaciones(self, query):
         return query.filter(seccion__id=self.seccion_id)
 
+    def filtro_contadores(self):
+        return Q(seccion_id=self.seccion_id)
+
     def query_categorias(self):
         seccion = Seccion.objects.filter(id=self.seccion_id).first()
         return Categoria.objects.filter(seccion=seccion) | Categoria.objects.filter(
@@ -75,6 +82,64 @@ class RestriccionPorSeccion():
             distrito=None, seccion=None)
 
 
+class ContadoresResumen():
+    """
+    Totales de los contadores del avance de carga (ver ``contadores_avance``) en todo el país
+    (``nacion``), en PBA (``pba``) y en la restricción geográfica (``restringido``), para las
+    categorías dadas. Se leen con una única consulta agrupada.
+    """
+
+    def __init__(self, restriccion, slugs_categorias):
+        self.restriccion = restriccion
+        self.slugs_categorias = slugs_categorias
+        self.totales = None
+
+    @staticmethod
+    def pertenece(condicion):
+        return Case(When(condicion, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+    def calcular(self):
+        if self.totales is not None:
+            return
+        # Los contadores guardan ids sin clave foránea: distrito y categoría se resuelven con subconsultas.
+        regiones = {'pba': self.pertenece(
+            Q(distrito_id__in=Distrito.objects.filter(numero=settings.DISTRITO_PBA).values('id'))
+        )}
+        if self.restriccion and self.restriccion.restringe_algo():
+            regiones['restringido'] = self.pertenece(self.restriccion.filtro_contadores())
+        categorias = Categoria.objects.filter(slug__in=self.slugs_categorias)
+        filas = ContadorAvance.objects.filter(
+            ~Q(tipo=ContadorAvance.TIPOS.mesa_categoria) | Q(categoria_id__in=categorias.values('id'))
+        ).annotate(
+            slug_categoria=Subquery(categorias.filter(id=OuterRef('categoria_id')).values('slug')),
+            **regiones
+        ).values(
+            'tipo', 'slug_categoria', 'con_foto', 'clave', *regiones
+        ).annotate(total=Sum('cantidad')).order_by()
+
+        self.totales = defaultdict(int)
+        for fila in filas:
+            clave = (fila['tipo'], fila['slug_categoria'], fila['con_foto'], fila['clave'])
+            self.totales[('nacion', ) + clave] += fila['total']
+            for region in regiones:
+                if fila[region]:
+                    self.totales[(region, ) + clave] += fila['total']
+
+    def suma(self, region, tipo, categoria=None, claves=None, con_foto=None):
+        """
+        Suma de los contadores de la región y el tipo dados, opcionalmente sólo para una categoría,
+        para algunas claves (status) o según si la mesa tiene foto.
+        """
+        self.calcular()
+        return sum(
+            cantidad for (r, t, slug, foto, clave), cantidad in self.totales.items()
+            if r == region and t == tipo
+            and (categoria is None or slug == categoria)
+            and (claves is None or clave in claves)
+            and (con_foto is None or foto == con_foto)
+        )
+
+
 
 
 class GeneradorDatosFotos():
@@ -121,7 +186,7 @@ class GeneradorDatosFotosDistrital(GeneradorDatosFotos):
         return Mesa.objects.filter(circuito__seccion__distrito__numero=self.distrito)
 
     def query_inicial_mesacats(self):
-        return MesaCategoria.objects.filter(mesa__circuito__seccion__distrito__numero=self.distrito)
+        return MesaCategoria.objects.filter(distrito__numero=self.distrito)
 
 
 class GeneradorDatosFotosConRestriccion(GeneradorDatosFotos):
@@ -136,6 +201,34 @@ class GeneradorDatosFotosConRestriccion(GeneradorDatosFotos):
         return self.restriccion.aplicar_restriccion_mesacats(MesaCategoria.objects)
 
 
+class GeneradorDatosFotosContadores():
+    def __init__(self, contadores, region):
+        self.contadores = contadores
+        self.region = region
+        self.cantidad_mesas = None
+
+    def mesas(self, **kwargs):
+        return self.contadores.suma(self.region, ContadorAvance.TIPOS.mesa, **kwargs)
+
+    def fotos(self, clave):
+        return self.contadores.suma(self.region, ContadorAvance.TIPOS.foto, claves=[clave])
+
+    def calcular(self):
+        if self.cantidad_mesas is None:
+            self.cantidad_mesas = self.mesas()
+            self.mesas_con_foto_identificada = self.mesas(con_foto=True)
+            self.mesas_con_carga_sin_foto = self.mesas(con_foto=False, claves=['con_carga'])
+            self.mesas_activas = self.mesas_con_foto_identificada + self.mesas_con_carga_sin_foto
+            # Las fotos no tienen ubicación: sólo se cuentan para todo el país.
+            self.fotos_con_problema_confirmado = self.fotos('problema')
+            self.fotos_en_proceso = self.fotos('en_proceso')
+            self.fotos_sin_acciones = self.fotos('sin_acciones')
+            self.mesas_sin_foto = self.cantidad_mesas - (
+                self.mesas_con_foto_identificada + self.fotos_con_problema_confirmado + self.fotos_en_proceso
+                + self.fotos_sin_acciones + self.mesas_con_carga_sin_foto
+            )
+
+
 class NoGeneradorDatosFotos():
     def __init__(self):
         self.cantidad_mesas = None
@@ -148,12 +241,19 @@ class NoGeneradorDatosFotos():
 
 
 class GeneradorDatosFotosConsolidado():
-    def __init__(self, restriccion=None):
+    def __init__(self, restriccion=None, contadores=None):
         super().__init__()
-        self.nacion = GeneradorDatosFotosNacional()
-        self.pba = GeneradorDatosFotosDistrital(settings.DISTRITO_PBA)
+        if contadores:
+            self.nacion = GeneradorDatosFotosContadores(contadores, 'nacion')
+            self.pba = GeneradorDatosFotosContadores(contadores, 'pba')
+        else:
+            self.nacion = GeneradorDatosFotosNacional()
+            self.pba = GeneradorDatosFotosDistrital(settings.DISTRITO_PBA)
         if restriccion and restriccion.restringe_algo():
-            self.restringido = GeneradorDatosFotosConRestriccion(restriccion)
+            if contadores:
+                self.restringido = GeneradorDatosFotosContadores(contadores, 'restringido')
+            else:
+                self.restringido = GeneradorDatosFotosConRestriccion(restriccion)
         else:
             self.restringido = NoGeneradorDatosFotos()
 
@@ -259,6 +359,20 @@ class GeneradorDatosPreidentificaciones():
             self.sin_identificar = self.cantidad_total - self.identificadas
 
 
+class GeneradorDatosPreidentificacionesContadores():
+    def __init__(self, contadores, region):
+        self.contadores = contadores
+        self.region = region
+        self.cantidad_total = None
+
+    def calcular(self):
+        if self.cantidad_total is None:
+            tipo = ContadorAvance.TIPOS.preidentificacion
+            self.cantidad_total = self.contadores.suma(self.region, tipo)
+            self.identificadas = self.contadores.suma(self.region, tipo, claves=['identificada'])
+            self.sin_identificar = self.cantidad_total - self.identificadas
+
+
 class NoGeneradorDatosPreidentificaciones():
     def __init__(self):
         self.cantidad_total = None
@@ -270,15 +384,22 @@ class NoGeneradorDatosPreidentificaciones():
 
 
 class GeneradorDatosPreidentificacionesConsolidado():
-    def __init__(self, restriccion):
+    def __init__(self, restriccion, contadores=None):
         super().__init__()
-        self.nacion = GeneradorDatosPreidentificaciones()
-        self.pba = GeneradorDatosPreidentificaciones(
-            PreIdentificacion.objects.filter(distrito__numero=settings.DISTRITO_PBA))
-        if restriccion and restriccion.restringe_algo():
-            self.restringido = GeneradorDatosPreidentificaciones(
-                restriccion.aplicar_restriccion_preidentificaciones(PreIdentificacion.objects))
+        restringe_algo = restriccion and restriccion.restringe_algo()
+        if contadores:
+            self.nacion = GeneradorDatosPreidentificacionesContadores(contadores, 'nacion')
+            self.pba = GeneradorDatosPreidentificacionesContadores(contadores, 'pba')
+            if restringe_algo:
+                self.restringido = GeneradorDatosPreidentificacionesContadores(contadores, 'restringido')
         else:
+            self.nacion = GeneradorDatosPreidentificaciones()
+            self.pba = GeneradorDatosPreidentificaciones(
+                PreIdentificacion.objects.filter(distrito__numero=settings.DISTRITO_PBA))
+            if restringe_algo:
+                self.restringido = GeneradorDatosPreidentificaciones(
+                    restriccion.aplicar_restriccion_preidentificaciones(PreIdentificacion.objects))
+        if not restringe_algo:
             self.restringido = NoGeneradorDatosPreidentificaciones()
 
     def datos(self):
@@ -382,12 +503,45 @@ class GeneradorDatosCargaTotal(GeneradorDatosCarga):
         ]
 
 
+class GeneradorDatosCargaContadores():
+    """
+    Calcula los datos de un ``GeneradorDatosCarga`` desde los contadores: en lugar de un queryset
+    por cada dato se usa la lista de status que suma (``None`` son todos).
+    """
+
+    def __init__(self, contadores, region, slug_categoria, solo_con_fotos=False):
+        super().__init__(None)
+        self.contadores = contadores
+        self.region = region
+        self.slug_categoria = slug_categoria
+        self.solo_con_fotos = solo_con_fotos
+
+    def restringir_por_statuses(self, statuses):
+        return statuses or None
+
+    def crear_dato(self, statuses):
+        return self.contadores.suma(
+            self.region, ContadorAvance.TIPOS.mesa_categoria, categoria=self.slug_categoria,
+            claves=statuses, con_foto=True if self.solo_con_fotos else None
+        )
+
+
+class GeneradorDatosCargaParcialContadores(GeneradorDatosCargaContadores, GeneradorDatosCargaParcial):
+    pass
+
+
+class GeneradorDatosCargaTotalContadores(GeneradorDatosCargaContadores, GeneradorDatosCargaTotal):
+    pass
+
+
 class GeneradorDatosCargaConsolidado():
-    def __init__(self, restriccion, categoria):
+    def __init__(self, restriccion, categoria, contadores=None):
         super().__init__()
         self.query_base = MesaCategoria.objects
         self.restriccion = restriccion
         self.categoria = categoria
+        self.contadores = contadores
+        self.solo_con_fotos = False
         self.crear_categorias()
 
     def query_inicial(self, slug_categoria):
@@ -396,6 +550,29 @@ class GeneradorDatosCargaConsolidado():
     def set_query_base(self, query):
         self.query_base = query
         self.crear_categorias()
+
+    def solo_mesas_con_fotos(self):
+        if self.contadores:
+            self.solo_con_fotos = True
+            self.crear_categorias()
+        else:
+            self.set_query_base(MesaCategoria.objects.exclude(mesa__attachments=None))
+
+    def crear_categorias(self):
+        self.pv = self.crear_generador('nacion', settings.SLUG_CATEGORIA_PRESI_Y_VICE)
+        self.gv = self.crear_generador('nacion', settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA)
+        if self.restriccion and self.restriccion.restringe_algo():
+            self.restringido = self.crear_generador('restringido', self.categoria.slug)
+        else:
+            self.restringido = NoGeneradorDatosCarga()
+
+    def crear_generador(self, region, slug_categoria):
+        if self.contadores:
+            return self.generador_contadores(self.contadores, region, slug_categoria, self.solo_con_fotos)
+        query = self.query_inicial(slug_categoria)
+        if region == 'restringido':
+            query = self.restriccion.aplicar_restriccion_mesacats(query)
+        return self.generador(query)
         
     def calcular(self):
         self.pv.calcular()
@@ -429,25 +606,13 @@ class GeneradorDatosCargaConsolidado():
 
 
 class GeneradorDatosCargaParcialConsolidado(GeneradorDatosCargaConsolidado):
-    def crear_categorias(self):
-        self.pv = GeneradorDatosCargaParcial(self.query_inicial(settings.SLUG_CATEGORIA_PRESI_Y_VICE))
-        self.gv = GeneradorDatosCargaParcial(self.query_inicial(settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA))
-        if self.restriccion and self.restriccion.restringe_algo():
-            self.restringido = GeneradorDatosCargaParcial(
-                self.restriccion.aplicar_restriccion_mesacats(self.query_inicial(self.categoria.slug)))
-        else:
-            self.restringido = NoGeneradorDatosCarga()
+    generador = GeneradorDatosCargaParcial
+    generador_contadores = GeneradorDatosCargaParcialContadores
 
 
 class GeneradorDatosCargaTotalConsolidado(GeneradorDatosCargaConsolidado):
-    def crear_categorias(self):
-        self.pv = GeneradorDatosCargaTotal(self.query_inicial(settings.SLUG_CATEGORIA_PRESI_Y_VICE))
-        self.gv = GeneradorDatosCargaTotal(self.query_inicial(settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA))
-        if self.restriccion and self.restriccion.restringe_algo():
-            self.restringido = GeneradorDatosCargaTotal(
-                self.restriccion.aplicar_restriccion_mesacats(self.query_inicial(self.categoria.slug)))
-        else:
-            self.restringido = NoGeneradorDatosCarga()
+    generador = GeneradorDatosCargaTotal
+    generador_contadores = GeneradorDatosCargaTotalContadores
 
 
 class GeneradorDatosCargaParcialDiscriminada():
@@ -1,6 +1,8 @@
 from functools import lru_cache
 from attrdict import AttrDict
+from django.conf import settings
 from django.db.models import Q, Sum, Subquery
+import numpy as np
 from .models import (
     Distrito,
     SeccionPolitica,
@@ -15,8 +17,10 @@ from .models import (
     TIPOS_DE_AGREGACIONES,
     OPCIONES_A_CONSIDERAR,
     NIVELES_DE_AGREGACION,
+    desempaquetar_votos,
 )
 from .resultados import Resultados
+from .registro_metadata import registro
 
 
 NIVEL_DE_AGREGACION = {
@@ -137,6 +141,38 @@ class Sumarizador():
                 lookups[f'{prefix}id__in'] = self.filtros
         return lookups
 
+    def lookups_denormalizados(self, prefix='', prefix_mesa=None):
+        """
+        Equivalente a :meth:`lookups_de_mesas` para modelos con la ubicación denormalizada
+        (MesaCategoria y VotoMesaReportado), que evita los joins con Mesa, Circuito y Sección.
+        ``prefix`` lleva al modelo denormalizado y ``prefix_mesa`` a la mesa, que sigue siendo
+        necesaria para filtrar por lugar de votación o por mesa.
+        """
+        if prefix_mesa is None:
+            prefix_mesa = f'{prefix}mesa__'
+        lookups = dict()
+        if not self.ids_a_considerar:
+            return lookups
+
+        if self.nivel_de_agregacion == NIVELES_DE_AGREGACION.distrito:
+            lookups[f'{prefix}distrito_id__in'] = self.ids_a_considerar
+
+        elif self.nivel_de_agregacion == NIVELES_DE_AGREGACION.seccion_politica:
+            lookups[f'{prefix}seccion__seccion_politica_id__in'] = self.ids_a_considerar
+
+        elif self.nivel_de_agregacion == NIVELES_DE_AGREGACION.seccion:
+            lookups[f'{prefix}seccion_id__in'] = self.ids_a_considerar
+
+        elif self.nivel_de_agregacion == NIVELES_DE_AGREGACION.circuito:
+            lookups[f'{prefix}circuito_id__in'] = self.ids_a_considerar
+
+        elif self.nivel_de_agregacion == NIVELES_DE_AGREGACION.lugar_de_votacion:
+            lookups[f'{prefix_mesa}lugar_votacion_id__in'] = self.ids_a_considerar
+
+        elif self.nivel_de_agregacion == NIVELES_DE_AGREGACION.mesa:
+            lookups[f'{prefix_mesa}id__in'] = self.ids_a_considerar
+        return lookups
+
     def categorias(self):
         """
         Devuelve la lista de categorías posibles de acuerdo al model recibido.
@@ -190,19 +226,35 @@ class Sumarizador():
         Considerando los filtros posibles, devuelve el conjunto de mesas
         asociadas a la categoría dada.
         """
-        lookups = self.lookups_de_mesas()
-        return Mesa.objects.filter(categorias=categoria).filter(**lookups).distinct()
+        lookups = self.lookups_denormalizados('mesacategoria__', '')
+        return Mesa.objects.filter(mesacategoria__categoria=categoria, **lookups).distinct()
+
+    @lru_cache(128)
+    def mesa_categorias(self, categoria):
+        """
+        Las MesaCategoria de la categoría dada que corresponden a los filtros.
+        Hay una por cada mesa de :meth:`mesas`.
+        """
+        return MesaCategoria.objects.filter(categoria=categoria, **self.lookups_denormalizados())
+
+    def mesa_categorias_escrutadas(self, categoria):
+        """
+        De las MesaCategoria de :meth:`mesa_categorias`, las que tienen carga testigo
+        en alguno de los status a considerar.
+        """
+        return self.mesa_categorias(categoria).filter(
+            carga_testigo__isnull=False,
+            **self.cargas_a_considerar_status_filter(categoria, '')
+        )
 
     def mesas_escrutadas(self):
         """
         De las mesas incluidas en los filtros seleccionados,
         aquellas que tienen votos para la categoría seleccionada.
         """
-        return self.mesas_a_considerar.filter(
-            mesacategoria__categoria=self.categoria,
-            mesacategoria__carga_testigo__isnull=False,
-            **self.cargas_a_considerar_status_filter(self.categoria, 'mesacategoria__')
-        ).distinct()
+        return Mesa.objects.filter(
+            mesacategoria__in=self.mesa_categorias_escrutadas(self.categoria)
+        )
 
     @lru_cache(128)
     def electores(self, categoria):
@@ -215,17 +267,27 @@ class Sumarizador():
         electores = mesas.aggregate(v=Sum('electores'))['v']
         return electores or 0
 
-    def votos_reportados(self, categoria, mesas):
+    def votos_reportados(self, categoria, mesas=None):
         """
         Me quedo con los votos reportados pertenecientes a las "cargas testigo"
         de las mesas que corresponden de acuerdo a los parámetros y la categoría.
+
+        Si no se indican ``mesas`` se usan los filtros del sumarizador sobre las columnas
+        denormalizadas de los votos.
         """
+        if mesas is None:
+            lookups = self.lookups_denormalizados(prefix_mesa='carga__mesa_categoria__mesa__')
+        else:
+            lookups = {'carga__mesa_categoria__mesa__in': Subquery(mesas.values('id'))}
+
+        # La MesaCategoria de la que la carga es testigo es la propia, así que el status
+        # se filtra sobre el mismo join.
         votos_reportados = VotoMesaReportado.objects.filter(
-            carga__mesa_categoria__mesa__in=Subquery(mesas.values('id')),
-            carga__mesa_categoria__categoria=categoria,
+            categoria=categoria,
             carga__es_testigo__isnull=False,
             opcion__in=self.opciones(),
-            **self.cargas_a_considerar_status_filter(categoria)
+            **self.cargas_a_considerar_status_filter(categoria, 'carga__es_testigo__'),
+            **lookups
         )
 
         return votos_reportados
@@ -234,7 +296,8 @@ class Sumarizador():
         if self.cache_opciones is None:
             self.cache_opciones = {
                 opcion.id: opcion
-                for opcion in self.categoria.opciones_actuales(
+                for opcion in registro.opciones_actuales(
+                    self.categoria,
                     solo_prioritarias=self.opciones_a_considerar == OPCIONES_A_CONSIDERAR.prioritarias,
                     excluir_optativas=True
                 )
@@ -256,34 +319,37 @@ class Sumarizador():
         Obtiene el listado de votos para incluirse en una exportación CSV.
         """
         return VotoMesaReportado.objects.filter(
-            carga__mesa_categoria__categoria=categoria,
+            categoria=categoria,
             carga__es_testigo__isnull=False,
-            **self.cargas_a_considerar_status_filter(categoria),
-            **self.lookups_de_mesas("carga__mesa_categoria__mesa__")
+            **self.cargas_a_considerar_status_filter(categoria, 'carga__es_testigo__'),
+            **self.lookups_denormalizados(prefix_mesa='carga__mesa_categoria__mesa__')
         ).values_list(
-            'carga__mesa_categoria__mesa__circuito__seccion__distrito__numero',
-            'carga__mesa_categoria__mesa__circuito__seccion__numero',
-            'carga__mesa_categoria__mesa__circuito__numero',
+            'distrito__numero',
+            'seccion__numero',
+            'circuito__numero',
             'carga__mesa_categoria__mesa__numero',
             'opcion__codigo',
             'votos',
         ).order_by(
-            "carga__mesa_categoria__mesa__circuito__seccion__distrito__numero",
-            "carga__mesa_categoria__mesa__circuito__seccion__numero",
-            "carga__mesa_categoria__mesa__circuito__numero",
-            "carga__mesa_categoria__mesa__numero"
+            'distrito__numero',
+            'seccion__numero',
+            'circuito__numero',
+            'carga__mesa_categoria__mesa__numero',
         )
 
-    def votos_por_opcion(self, categoria, mesas):
+    def votos_por_opcion(self, categoria, mesas=None):
         """
         Dada una categoría y un conjunto de mesas, devuelve una tabla de resultados con la cantidad de
         votos por cada una de las opciones posibles (partidarias o no)
         """
 
         # Obtener los votos reportados
-        votos_reportados = self.votos_reportados(categoria, mesas).values_list('opcion__id').annotate(
-            sum_votos=Sum('votos')
-        )
+        if settings.SUMARIZADOR_VOTOS_COMPACTOS and mesas is None:
+            votos_reportados = self.votos_compactos_por_opcion(categoria)
+        else:
+            votos_reportados = self.votos_reportados(categoria, mesas).values_list('opcion__id').annotate(
+                sum_votos=Sum('votos')
+            )
 
         # Diccionario inicial, opciones completas, todas en 0 (por si alguna opción no viene reportada).
         votos_por_opcion = {opcion.id: 0 for opcion in self.opciones()}
@@ -293,6 +359,43 @@ class Sumarizador():
 
         return votos_por_opcion.items()
 
+    def votos_compactos_por_opcion(self, categoria):
+        """
+        Como :meth:`votos_por_opcion`, pero sumando los ``votos_compactos`` de las cargas testigo:
+        se lee una fila por mesa en lugar de una por cada opción de cada mesa.
+        Las cargas testigo que todavía no tienen el vector se suman desde sus votos reportados.
+        """
+        opciones = np.array(sorted(self.opciones_dict()), dtype=np.int64)
+        if not len(opciones):
+            return {}
+
+        vectores = []
+        cargas_sin_vector = []
+        testigos = self.mesa_categorias_escrutadas(categoria).values_list(
+            'carga_testigo_id', 'carga_testigo__votos_compactos'
+        )
+        for carga_id, vector in testigos:
+            if vector is None:
+                cargas_sin_vector.append(carga_id)
+            else:
+                vectores.append(bytes(vector))
+
+        totales = np.zeros(len(opciones), dtype=np.int64)
+        votos = desempaquetar_votos(b''.join(vectores)).astype(np.int64)
+        posiciones = np.minimum(np.searchsorted(opciones, votos[:, 0]), len(opciones) - 1)
+        a_considerar = opciones[posiciones] == votos[:, 0]
+        np.add.at(totales, posiciones[a_considerar], votos[a_considerar, 1])
+        votos_por_opcion = dict(zip(opciones.tolist(), totales.tolist()))
+
+        if cargas_sin_vector:
+            reportados = VotoMesaReportado.objects.filter(
+                carga_id__in=cargas_sin_vector, opcion__in=self.opciones()
+            ).values_list('opcion__id').annotate(sum_votos=Sum('votos'))
+            for id_opcion, sum_votos in reportados:
+                votos_por_opcion[id_opcion] += sum_votos
+
+        return votos_por_opcion
+
     def agrupar_votos(self, votos_por_opcion):
         votos_positivos = {}
         votos_no_positivos = {opcion.nombre_corto: 0 for opcion in self.opciones_no_partidarias()}
@@ -308,11 +411,14 @@ class Sumarizador():
 
         return votos_positivos, votos_no_positivos
 
-    def calcular(self, categoria, mesas):
+    def calcular(self, categoria, mesas=None):
         """
         Implementa los cómputos esenciales de la categoría para las mesas dadas.
         Se invoca una vez para el cálculo de resultados y N veces para los proyectados.
 
+        Las cantidades de mesas y electores se calculan sobre :meth:`mesa_categorias`;
+        ``mesas`` sólo restringe los votos (ver :meth:`votos_reportados`).
+
         Devuelve
             electores: cantidad de electores en las mesas válidas de la categoría
             electores_en_mesas_escrutadas: cantidad de electores en las mesas efectivamente escrutadas
@@ -324,13 +430,16 @@ class Sumarizador():
         # 1) Mesas.
         # Me quedo con las mesas que corresponden de acuerdo a los parámetros
         # y la categoría, que tengan la carga testigo para esa categoría.
-        mesas_escrutadas = self.mesas_escrutadas()
-        total_mesas_escrutadas = mesas_escrutadas.count()
-        total_mesas = mesas.count()
+        mesa_categorias = self.mesa_categorias(categoria)
+        mesa_categorias_escrutadas = self.mesa_categorias_escrutadas(categoria)
+        total_mesas_escrutadas = mesa_categorias_escrutadas.count()
+        total_mesas = mesa_categorias.count()
 
         # 2) Electores.
-        electores = mesas.filter(categorias=categoria).aggregate(v=Sum('electores'))['v'] or 0
-        electores_en_mesas_escrutadas = mesas_escrutadas.aggregate(v=Sum('electores'))['v'] or 0
+        electores = mesa_categorias.aggregate(v=Sum('mesa__electores'))['v'] or 0
+        electores_en_mesas_escrutadas = (
+            mesa_categorias_escrutadas.aggregate(v=Sum('mesa__electores'))['v'] or 0
+        )
 
         # 3) Votos
         votos_por_opcion = self.votos_por_opcion(categoria, mesas)
@@ -352,4 +461,4 @@ class Sumarizador():
         """
         self.categoria = categoria
         self.mesas_a_considerar = self.mesas(categoria)
-        return Resultados(self.opciones_a_considerar, self.calcular(categoria, self.mesas_a_considerar))
+        return Resultados(self.opciones_a_considerar, self.calcular(categoria))
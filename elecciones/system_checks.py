@@ -1,8 +1,31 @@
+"""
+Chequeos de integridad de los datos electorales (opciones, partidos, geografía y electores).
+
+Se resuelven con unas pocas consultas agrupadas, independientemente del tamaño del padrón,
+y se registran como un único chequeo de Django (``integridad_de_datos``) cuyo resultado
+se cachea en ``settings.CACHE_CHEQUEOS_INTEGRIDAD`` asociado a una versión de los datos.
+La versión cambia al guardar o borrar cualquiera de los modelos involucrados; las cargas
+masivas que no disparan señales deben llamar a ``invalidar_chequeos``.
+
+Con ``settings.CHEQUEOS_INTEGRIDAD_AL_INICIAR = False`` no se corren al iniciar cada proceso,
+sino sólo con ``manage.py verificar_integridad``.
+"""
+import uuid
+from collections import defaultdict
+
 from django.conf import settings
+from django.core.cache import caches
 from django.core.checks import Error, register, Warning, Tags
+from django.db import DatabaseError, transaction
 from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+import structlog
+
 from elecciones.models import (
     Categoria,
+    CategoriaOpcion,
     Circuito,
     Distrito,
     LugarVotacion,
@@ -12,27 +35,33 @@ from elecciones.models import (
     Seccion,
 )
 
+logger = structlog.get_logger(__name__)
 
-@register(Tags.models, deploy=True)
-def opciones_metadata(app_configs, **kwargs):
+CLAVE_VERSION = 'elecciones.system_checks.version'
+CLAVE_RESULTADO = 'elecciones.system_checks.resultado'
+
+OPCIONES_EN_SETTINGS = [
+    'OPCION_NULOS',
+    'OPCION_BLANCOS',
+    'OPCION_TOTAL_VOTOS',
+    'OPCION_TOTAL_SOBRES',
+    'OPCION_RECURRIDOS',
+    'OPCION_ID_IMPUGNADA',
+    'OPCION_COMANDO_ELECTORAL',
+]
+
+
+def opciones_metadata():
     """
     Chequea que existan las opciones de metadata necesarias para los cómputos parciales
     en todas las categorías.
     """
     errors = []
-    opciones_en_settings = [
-        'OPCION_NULOS',
-        'OPCION_BLANCOS',
-        'OPCION_TOTAL_VOTOS',
-        'OPCION_TOTAL_SOBRES',
-        'OPCION_RECURRIDOS',
-        'OPCION_ID_IMPUGNADA',
-        'OPCION_COMANDO_ELECTORAL',
-    ]
     # Deben existir las opciones en la base
-    for opcion_setting in opciones_en_settings:
+    opciones = []
+    for opcion_setting in OPCIONES_EN_SETTINGS:
         try:
-            opcion = Opcion.objects.get(**getattr(settings, opcion_setting))
+            opciones.append(Opcion.objects.get(**getattr(settings, opcion_setting)))
         except Opcion.DoesNotExist:
             errors.append(
                 Error(
@@ -43,8 +72,14 @@ def opciones_metadata(app_configs, **kwargs):
                     id='elecciones.E001',
                 )
             )
-        else:
-            for categoria in Categoria.objects.exclude(opciones=opcion):
+
+    asociadas = set(
+        CategoriaOpcion.objects.filter(opcion__in=opciones).values_list('categoria_id', 'opcion_id')
+    )
+    categorias = list(Categoria.objects.all()) if opciones else []
+    for opcion in opciones:
+        for categoria in categorias:
+            if (categoria.id, opcion.id) not in asociadas:
                 errors.append(
                     Error(
                         f'La opción {opcion.nombre} no está asociada a la categoría '
@@ -57,13 +92,12 @@ def opciones_metadata(app_configs, **kwargs):
     return errors
 
 
-@register(Tags.models, deploy=True)
-def partidos_ok(app_configs, **kwargs):
+def partidos_ok():
     """
     Chequea que los partidos estén bien definidos.
     """
     errors = []
-    partidos = Partido.objects.all()
+    partidos = Partido.objects.prefetch_related('opciones')
 
     for partido in partidos:
         if not partido.nombre_corto or not partido.nombre:
@@ -84,7 +118,8 @@ def partidos_ok(app_configs, **kwargs):
                     id='elecciones.E012',
                 )
             )
-        if not partido.opciones.exists():
+        opciones = partido.opciones.all()
+        if not opciones:
             errors.append(
                 Error(
                     f'El partido {partido} no tiene opciones definidas.',
@@ -94,7 +129,7 @@ def partidos_ok(app_configs, **kwargs):
                 )
             )
         else:
-            for opcion in partido.opciones.exclude(tipo=Opcion.TIPOS.positivo):
+            for opcion in [opcion for opcion in opciones if opcion.tipo != Opcion.TIPOS.positivo]:
                 errors.append(
                     Error(
                         f'El partido {partido} está asociado a la opción {opcion} '
@@ -107,13 +142,12 @@ def partidos_ok(app_configs, **kwargs):
     return errors
 
 
-@register(Tags.models, deploy=True)
-def opciones_positivas_ok(app_configs, **kwargs):
+def opciones_positivas_ok():
     """
     Chequea que las opciones positivas tengan partido y estén bien definidas.
     """
     errors = []
-    for opcion in Opcion.objects.filter(tipo=Opcion.TIPOS.positivo):
+    for opcion in Opcion.objects.filter(tipo=Opcion.TIPOS.positivo).select_related('partido'):
         if not opcion.nombre_corto or not opcion.nombre:
             errors.append(
                 Warning(
@@ -133,7 +167,7 @@ def opciones_positivas_ok(app_configs, **kwargs):
                 )
             )
 
-        if not opcion.partido:
+        if not opcion.partido_id:
             errors.append(
                 Error(
                     f'La opción {opcion} no está asociada a un partido.',
@@ -145,13 +179,14 @@ def opciones_positivas_ok(app_configs, **kwargs):
     return errors
 
 
-@register(Tags.models, deploy=True)
-def mesas_circuitos_lugares_vot_ok(app_configs, **kwargs):
+def mesas_circuitos_lugares_vot_ok():
     """
     Chequea que los lugares de votación a los que corresponden las mesas estén en su mismo circuito.
     """
     errors = []
-    mesas_no_ok = Mesa.objects.exclude(lugar_votacion__circuito=F('circuito'))
+    mesas_no_ok = Mesa.objects.exclude(
+        lugar_votacion__circuito=F('circuito')
+    ).select_related('circuito', 'lugar_votacion')
 
     for mesa in mesas_no_ok:
         errors.append(
@@ -167,94 +202,155 @@ def mesas_circuitos_lugares_vot_ok(app_configs, **kwargs):
     return errors
 
 
-@register(Tags.models, deploy=True)
-def mesas_electores(app_configs, **kwargs):
+def con_electores_inconsistentes(queryset, campo_hijos):
     """
-    Chequea que los lugares de votación a los que corresponden las mesas estén en su mismo circuito.
+    Filtra de ``queryset`` las filas con electores definidos que no coinciden con la suma
+    de los electores de sus hijos. Se resuelve con GROUP BY/HAVING.
     """
+    return queryset.filter(electores__isnull=False).annotate(
+        suma=Coalesce(Sum(f'{campo_hijos}__electores'), 0)
+    ).exclude(electores=F('suma'))
 
-    errors = []
-    for d in Distrito.objects.all():
-        if d.electores is not None and d.electores != d.secciones.aggregate(v=Sum('electores'))['v']:
-            errors.append(
-                Error(
-                    f'Los electores del distrito {d} no coinciden con la suma '
-                    'de los electores de sus secciones',
-                )
-            )
-
-    for s in Seccion.objects.all():
-        if s.electores is not None and s.electores != s.circuitos.aggregate(v=Sum('electores'))['v']:
-            errors.append(
-                Error(
-                    f'Los electores de la sección {s} no coinciden con la suma '
-                    'de los electores de sus circuitos',
-                )
-            )
-
-    for c in Circuito.objects.all():
-        if c.electores is not None and c.electores != c.lugares_votacion.aggregate(v=Sum('electores'))['v']:
-            errors.append(
-                Error(
-                    f'Los electores del circuito {c} no coinciden con la suma '
-                    'de los electores de sus lugares de votacion',
-                )
-            )
 
-    for l in LugarVotacion.objects.all():
-        if l.electores is not None and l.electores != l.mesas.aggregate(v=Sum('electores'))['v']:
-            errors.append(
-                Error(
-                    f'Los electores de {l} no coinciden con la suma '
-                    'de los electores de sus mesas',
-                )
-            )
+def mesas_electores():
+    """
+    Chequea que los electores de cada nivel geográfico coincidan con la suma de los del nivel inferior.
+    """
+    niveles = [
+        (Distrito, 'secciones', 'Los electores del distrito {} no coinciden con la suma '
+                                'de los electores de sus secciones'),
+        (Seccion, 'circuitos', 'Los electores de la sección {} no coinciden con la suma '
+                               'de los electores de sus circuitos'),
+        (Circuito, 'lugares_votacion', 'Los electores del circuito {} no coinciden con la suma '
+                                       'de los electores de sus lugares de votacion'),
+        (LugarVotacion, 'mesas', 'Los electores de {} no coinciden con la suma '
+                                 'de los electores de sus mesas'),
+    ]
+    errors = []
+    for modelo, campo_hijos, mensaje in niveles:
+        for inconsistente in con_electores_inconsistentes(modelo.objects.all(), campo_hijos):
+            errors.append(Error(mensaje.format(inconsistente)))
     return errors
 
 
-@register(Tags.models, deploy=True)
-def categorias_ok(app_configs, **kwargs):
+def categorias_ok():
     """
     Chequea que la información geográfica de las categorías concida con las mesas que tienen asociadas.
     """
     errors = []
 
-    # Categorías asociadas a distrito.
-    for categoria in Categoria.objects.filter(activa=True, distrito__isnull=False):
-        mesas = Mesa.objects.filter(
-            lugar_votacion__circuito__seccion__distrito=categoria.distrito
-        ).exclude(
-            circuito__seccion__distrito=categoria.distrito
-        )
+    # Mesas cuyo lugar de votación está en otro distrito (o sección) que la mesa,
+    # agrupadas por el distrito (o sección) del lugar de votación.
+    niveles = [
+        ('distrito', 'circuito__seccion__distrito', 'al distrito', 'otros distritos', 'el distrito'),
+        ('seccion', 'circuito__seccion', 'a la sección', 'otras secciones', 'la sección'),
+    ]
+    for campo, camino, asociada, otros, a_chequear in niveles:
+        mesas_por_ubicacion = defaultdict(list)
+        mesas = Mesa.objects.filter(lugar_votacion__isnull=False).exclude(
+            **{camino: F(f'lugar_votacion__{camino}')}
+        ).annotate(ubicacion_lugar=F(f'lugar_votacion__{camino}'))
+        for mesa in mesas:
+            mesas_por_ubicacion[mesa.ubicacion_lugar].append(mesa)
+        if not mesas_por_ubicacion:
+            continue
 
-        if mesas.exists():
+        categorias = Categoria.objects.filter(
+            activa=True, **{f'{campo}__in': mesas_por_ubicacion.keys()}
+        ).select_related(campo)
+        for categoria in categorias:
+            ubicacion = getattr(categoria, campo)
             errors.append(
                 Error(
-                    f'La categoria {categoria} está asociada al distrito {categoria.distrito} '
-                    f'pero tiene mesas en otros distritos ({mesas}).',
-                    hint='Chequear o bien las mesas o bien el distrito de la categoria.',
+                    f'La categoria {categoria} está asociada {asociada} {ubicacion} '
+                    f'pero tiene mesas en {otros} ({mesas_por_ubicacion[ubicacion.id]}).',
+                    hint=f'Chequear o bien las mesas o bien {a_chequear} de la categoria.',
                     obj=categoria,
                     id='elecciones.E051',
                 )
             )
 
-    # Categorías asociadas a sección.
-    for categoria in Categoria.objects.filter(activa=True, seccion__isnull=False):
-        mesas = Mesa.objects.filter(
-            lugar_votacion__circuito__seccion=categoria.seccion
-        ).exclude(
-            circuito__seccion=categoria.seccion
-        )
+    return errors
+
+
+CHEQUEOS = [
+    opciones_metadata,
+    partidos_ok,
+    opciones_positivas_ok,
+    mesas_circuitos_lugares_vot_ok,
+    mesas_electores,
+    categorias_ok,
+]
+
+
+def cache_chequeos():
+    return caches[settings.CACHE_CHEQUEOS_INTEGRIDAD]
 
-        if mesas.exists():
-            errors.append(
-                Error(
-                    f'La categoria {categoria} está asociada a la sección {categoria.seccion} '
-                    f'pero tiene mesas en otras secciones ({mesas}).',
-                    hint='Chequear o bien las mesas o bien la sección de la categoria.',
-                    obj=categoria,
-                    id='elecciones.E051',
-                )
-            )
 
+def invalidar_chequeos():
+    """
+    Publica una nueva versión de los datos, de modo que el próximo chequeo no use resultados cacheados.
+    """
+    cache_chequeos().set(CLAVE_VERSION, uuid.uuid4().hex, None)
+
+
+def correr_chequeos():
+    errors = []
+    for chequeo in CHEQUEOS:
+        errors.extend(chequeo())
     return errors
+
+
+def chequeos_cacheados(forzar=False):
+    """
+    Devuelve el resultado de los chequeos para la versión actual de los datos,
+    corriéndolos sólo si no está en el caché (o si ``forzar`` es verdadero).
+    """
+    try:
+        cache = cache_chequeos()
+        version = cache.get_or_set(CLAVE_VERSION, uuid.uuid4().hex, None)
+        resultado = None if forzar else cache.get(CLAVE_RESULTADO)
+    except DatabaseError:
+        # Por ejemplo, si todavía no se creó la tabla del caché.
+        logger.warning('caché de chequeos no disponible')
+        return correr_chequeos()
+
+    if resultado is not None and resultado[0] == version:
+        return resultado[1]
+    # Los objetos se reemplazan por su representación (que es lo que se muestra),
+    # porque las instancias de los modelos con FieldTracker no se pueden serializar.
+    errors = [
+        type(error)(error.msg, hint=error.hint, obj=None if error.obj is None else str(error.obj), id=error.id)
+        for error in correr_chequeos()
+    ]
+    cache.set(CLAVE_RESULTADO, (version, errors), settings.CHEQUEOS_INTEGRIDAD_TIMEOUT)
+    return errors
+
+
+@register(Tags.models, deploy=True)
+def integridad_de_datos(app_configs, **kwargs):
+    if not settings.CHEQUEOS_INTEGRIDAD_AL_INICIAR:
+        return []
+    return chequeos_cacheados()
+
+
+@receiver(post_save, sender=Distrito)
+@receiver(post_save, sender=Seccion)
+@receiver(post_save, sender=Circuito)
+@receiver(post_save, sender=LugarVotacion)
+@receiver(post_save, sender=Mesa)
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=CategoriaOpcion)
+@receiver(post_save, sender=Opcion)
+@receiver(post_save, sender=Partido)
+@receiver(post_delete, sender=Distrito)
+@receiver(post_delete, sender=Seccion)
+@receiver(post_delete, sender=Circuito)
+@receiver(post_delete, sender=LugarVotacion)
+@receiver(post_delete, sender=Mesa)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=CategoriaOpcion)
+@receiver(post_delete, sender=Opcion)
+@receiver(post_delete, sender=Partido)
+def invalidar_chequeos_al_cambiar(sender, **kwargs):
+    transaction.on_commit(invalidar_chequeos)
@@ -0,0 +1,68 @@
+import json
+
+from django.urls import reverse
+
+from elecciones import arbol_geografia
+from elecciones.models import SeccionPolitica
+from .factories import CircuitoFactory, DistritoFactory, SeccionFactory
+
+
+def test_arbol_en_orden_natural_con_secciones_politicas(db):
+    distrito = DistritoFactory(numero='10', nombre='Diez')
+    dos = DistritoFactory(numero='2', nombre='Dos')
+    politica = SeccionPolitica.objects.create(distrito=distrito, numero=1, nombre='Primera')
+    seccion = SeccionFactory(distrito=distrito, numero='1', nombre='Una', seccion_politica=politica)
+    circuito_10 = CircuitoFactory(seccion=seccion, numero='10', nombre='C10')
+    circuito_2 = CircuitoFactory(seccion=seccion, numero='2', nombre='C2')
+    circuito_1a = CircuitoFactory(seccion=seccion, numero='001A', nombre='C1A')
+
+    arbol = [
+        fila for fila in json.loads(arbol_geografia.arbol_serializado().contenido)
+        if fila[0] in (distrito.id, dos.id)
+    ]
+    assert [fila[1] for fila in arbol] == ['2', '10']
+    _, _, _, secciones_politicas, secciones = arbol[1]
+    assert secciones_politicas == [[politica.id, 1, 'Primera']]
+    assert secciones == [[seccion.id, '1', 'Una', politica.id, [
+        [circuito_2.id, '2', 'C2'], [circuito_10.id, '10', 'C10'], [circuito_1a.id, '001A', 'C1A']
+    ]]]
+
+    nodo = next(nodo for nodo in arbol_geografia.distritos() if nodo.id == distrito.id)
+    assert str(nodo) == '10 - Diez'
+    assert nodo.secciones_politicas[0].secciones == nodo.secciones
+    assert nodo.secciones[0].seccion_politica.nombre == 'Primera'
+    assert [c.nombre for c in nodo.secciones[0].circuitos] == ['C2', 'C10', 'C1A']
+
+
+def test_arbol_se_invalida_y_cambia_de_hash(db, django_assert_num_queries):
+    seccion = SeccionFactory()
+    hash_inicial = arbol_geografia.arbol_serializado().hash
+    with django_assert_num_queries(0):
+        assert arbol_geografia.arbol_serializado().hash == hash_inicial
+        arbol_geografia.distritos()
+
+    SeccionPolitica.objects.create(distrito=seccion.distrito, numero=1, nombre='Primera')
+    assert arbol_geografia.arbol_serializado().hash != hash_inicial
+
+
+def test_arbol_json_redirige_al_hash_vigente(fiscal_client):
+    CircuitoFactory()
+    arbol = arbol_geografia.arbol_serializado()
+
+    response = fiscal_client.get(reverse('arbol-geografia', kwargs={'hash': arbol.hash}))
+    assert response.status_code == 200
+    assert response.content == arbol.contenido
+    assert 'immutable' in response['Cache-Control']
+
+    response = fiscal_client.get(reverse('arbol-geografia', kwargs={'hash': '0123abcd'}))
+    assert response.status_code == 302
+    assert response.url == reverse('arbol-geografia', kwargs={'hash': arbol.hash})
+
+
+def test_menu_lateral_no_recorre_la_geografia(fiscal_client):
+    CircuitoFactory()
+    response = fiscal_client.get(reverse('resultados-nuevo-menu', kwargs={'categoria_id': 1}))
+    assert response.status_code == 200
+    assert response.context['url_arbol'] == reverse(
+        'arbol-geografia', kwargs={'hash': arbol_geografia.arbol_serializado().hash}
+    )
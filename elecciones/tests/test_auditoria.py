@@ -0,0 +1,107 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+
+from elecciones.auditoria import ALERTA, CUIDADO, Auditoria
+from elecciones.models import MesaCategoria, Carga
+from .factories import (
+    CargaFactory, CategoriaFactory, CircuitoFactory, MesaFactory, OpcionFactory, PartidoFactory,
+)
+from .utils import cargar_votos
+
+
+def crear_mesa(circuito, categoria, votos=None, oficial=None):
+    """
+    Crea una mesa del circuito con su MesaCategoria. Si se indican ``votos`` la mesa queda
+    consolidada con una carga testigo con esos votos y, si se indica ``oficial``, con una
+    carga parcial oficial.
+    """
+    mesa = MesaFactory(lugar_votacion__circuito=circuito, categorias=[categoria])
+    mc = MesaCategoria.objects.get(mesa=mesa, categoria=categoria)
+    if votos is None:
+        return mesa
+    testigo = CargaFactory(mesa_categoria=mc, tipo=Carga.TIPOS.parcial, procesada=True)
+    cargar_votos(testigo, votos)
+    cambios = dict(status=MesaCategoria.STATUS.parcial_consolidada_dc, carga_testigo=testigo)
+    if oficial is not None:
+        carga_oficial = CargaFactory(
+            mesa_categoria=mc, tipo=Carga.TIPOS.parcial, origen=Carga.SOURCES.csv
+        )
+        cargar_votos(carga_oficial, oficial)
+        cambios['parcial_oficial'] = carga_oficial
+    MesaCategoria.objects.filter(id=mc.id).update(**cambios)
+    return mesa
+
+
+def escenario():
+    nosotros = PartidoFactory(codigo='136', nombre_corto='nos')
+    ellos = PartidoFactory(codigo='135', nombre_corto='ellos')
+    o_nos = OpcionFactory(partido=nosotros)
+    o_ellos = OpcionFactory(partido=ellos)
+    categoria = CategoriaFactory(opciones=[o_nos, o_ellos])
+
+    circuito = CircuitoFactory()
+    mesas = [
+        crear_mesa(circuito, categoria, {o_nos: nos, o_ellos: ell})
+        for nos, ell in [(100, 50), (90, 60), (95, 55), (0, 120), (100, 0)]
+    ]
+    mesas.append(crear_mesa(circuito, categoria, {o_nos: 80, o_ellos: 70}, oficial={o_nos: 40, o_ellos: 90}))
+    crear_mesa(circuito, categoria)
+
+    # Un circuito con pocas mesas escrutadas.
+    otro_circuito = CircuitoFactory()
+    crear_mesa(otro_circuito, categoria, {o_nos: 0, o_ellos: 10})
+    for i in range(4):
+        crear_mesa(otro_circuito, categoria)
+    return categoria, nosotros, ellos, circuito, otro_circuito, mesas
+
+
+def test_auditoria(db, django_assert_max_num_queries):
+    categoria, nosotros, ellos, circuito, otro_circuito, mesas = escenario()
+    auditoria = Auditoria(categoria, nosotros, ellos)
+
+    datos = auditoria.cargar()
+    assert datos.loc[mesas[3].id, ['nosotros', 'ellos']].tolist() == [0, 120]
+    assert datos.loc[mesas[5].id, ['oficial_nosotros', 'oficial_ellos']].tolist() == [40, 90]
+    assert datos['oficial_nosotros'].isna().sum() == len(datos) - 1
+
+    # La cantidad de consultas no depende de la cantidad de mesas.
+    with django_assert_max_num_queries(5):
+        hallazgos = auditoria.analizar(
+            analizar_ceros=True, analizar_tendencias=True, analizar_promedio=True, comparar_con_correo=True,
+        )
+    encontrados = {(h.nivel, h.tipo, h.mesa_id) for h in hallazgos}
+
+    assert (ALERTA, 'cero', mesas[3].id) in encontrados
+    assert (CUIDADO, 'cero', mesas[4].id) in encontrados
+    # Los ceros se reportan aunque el circuito no supere el umbral.
+    assert len([h for h in hallazgos if h.tipo == 'cero' and h.circuito_id == otro_circuito.id]) == 1
+    assert (ALERTA, 'oficial', mesas[5].id) in encontrados
+    assert (ALERTA, 'tendencia', mesas[3].id) in encontrados
+    assert (ALERTA, 'promedio', mesas[3].id) in encontrados
+    assert [h.circuito_id for h in hallazgos if h.tipo == 'umbral'] == [otro_circuito.id]
+    # Los análisis estadísticos no se hacen en el circuito que no superó el umbral.
+    assert not [
+        h for h in hallazgos if h.tipo in ('tendencia', 'promedio') and h.circuito_id == otro_circuito.id
+    ]
+
+    # Restringida a un circuito.
+    hallazgos = Auditoria(categoria, nosotros, ellos, circuito=otro_circuito).analizar(analizar_ceros=True)
+    assert {h.circuito_id for h in hallazgos} == {otro_circuito.id}
+
+
+def test_nos_estan_cagando(db, tmp_path):
+    categoria, nosotros, ellos, circuito, otro_circuito, mesas = escenario()
+    salida = tmp_path / 'hallazgos.json'
+    out = StringIO()
+    call_command(
+        'nos_estan_cagando', categoria=categoria.slug, analizar_ceros=True, analizar_tendencias=True,
+        analizar_promedio=True, comparar_con_correo=True, salida_json=str(salida), verbose_level=3,
+        stdout=out,
+    )
+    reporte = json.loads(salida.read_text())
+    assert {'nivel': ALERTA, 'tipo': 'oficial', 'mesa': mesas[5].numero} in [
+        {clave: hallazgo[clave] for clave in ('nivel', 'tipo', 'mesa')} for hallazgo in reporte
+    ]
+    assert f'M {mesas[3].numero}: nos en cero votos.' in out.getvalue()
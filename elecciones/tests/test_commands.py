@@ -1,7 +1,19 @@
-from elecciones.tests.factories import CategoriaFactory
-from elecciones.models import Opcion
+import json
+from io import StringIO
+
+import pytest
+
+from elecciones.tests.factories import (
+    AttachmentFactory, CargaFactory, CategoriaFactory, CircuitoFactory, DistritoFactory, FiscalFactory,
+    IdentificacionFactory, LugarVotacionFactory, MesaCategoriaFactory, MesaFactory, OpcionFactory,
+    VotoMesaReportadoFactory,
+)
+from elecciones import particiones
+from elecciones.models import Carga, Categoria, LugarVotacion, Mesa, MesaCategoria, Opcion, VotoMesaReportado
+from adjuntos.models import Attachment
 from django.conf import settings
-from django.core.management import call_command
+from django.core.management import call_command, CommandError
+from django.db import connection
 
 
 def test_setup_opciones(db):
@@ -16,3 +28,221 @@ def test_setup_opciones(db):
     assert Opcion.objects.get(**settings.OPCION_ID_IMPUGNADA)
     assert Opcion.objects.get(**settings.OPCION_COMANDO_ELECTORAL)
     assert c.opciones.count() == 7
+
+
+def test_denormalizar_geografia(db):
+    voto = VotoMesaReportadoFactory(votos=10)
+    circuito = voto.carga.mesa_categoria.mesa.circuito
+    MesaCategoria.objects.update(distrito=None, seccion=None, circuito=None)
+    Carga.objects.update(distrito=None, seccion=None, circuito=None)
+    VotoMesaReportado.objects.update(categoria=None, distrito=None, seccion=None, circuito=None)
+
+    call_command('denormalizar_geografia', solo_faltantes=True, tamanio_lote=1)
+
+    for objeto in (voto.carga.mesa_categoria, voto.carga, voto):
+        objeto.refresh_from_db()
+        assert objeto.distrito_id == circuito.seccion.distrito_id
+        assert objeto.seccion_id == circuito.seccion_id
+        assert objeto.circuito_id == circuito.id
+    assert voto.categoria_id == voto.carga.mesa_categoria.categoria_id
+
+
+def contar_votos(tabla):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT categoria_id, count(*) FROM "{tabla}" GROUP BY categoria_id')
+        return dict(cursor.fetchall())
+
+
+def test_particionar_votos(db):
+    for categoria in CategoriaFactory.create_batch(2):
+        VotoMesaReportadoFactory.create_batch(2, votos=10, carga__mesa_categoria__categoria=categoria)
+    antes = contar_votos(particiones.TABLA)
+    # Postgres no permite alterar la tabla con chequeos de claves foráneas pendientes.
+    connection.check_constraints()
+
+    salida = StringIO()
+    call_command('particionar_votos', convertir=True, stdout=salida)
+    assert 'particionada por categoría' in salida.getvalue()
+    assert particiones.esta_particionada()
+    assert contar_votos(particiones.TABLA) == antes
+    assert particiones.particiones_existentes() == set(Categoria.objects.values_list('id', flat=True))
+    for categoria_id, cantidad in antes.items():
+        assert contar_votos(particiones.nombre_particion(categoria_id)) == {categoria_id: cantidad}
+    assert contar_votos(particiones.PARTICION_POR_DEFECTO) == {}
+
+    # Las categorías nuevas tienen su partición.
+    voto = VotoMesaReportadoFactory(votos=10, carga__mesa_categoria__categoria=CategoriaFactory())
+    assert contar_votos(particiones.nombre_particion(voto.categoria_id)) == {voto.categoria_id: 1}
+
+    # Las que se dan de alta sin señales (con una carga masiva) caen en la partición por defecto
+    # hasta que se corre el comando sin opciones.
+    categoria_general = Categoria.objects.first().categoria_general
+    (masiva, ) = Categoria.objects.bulk_create(
+        [Categoria(nombre='Masiva', slug='masiva', categoria_general=categoria_general)]
+    )
+    VotoMesaReportadoFactory(votos=10, carga__mesa_categoria__categoria=masiva)
+    assert contar_votos(particiones.PARTICION_POR_DEFECTO) == {masiva.id: 1}
+    connection.check_constraints()
+
+    salida = StringIO()
+    call_command('particionar_votos', stdout=salida)
+    assert '1 particiones creadas' in salida.getvalue()
+    assert contar_votos(particiones.PARTICION_POR_DEFECTO) == {}
+    assert contar_votos(particiones.nombre_particion(masiva.id)) == {masiva.id: 1}
+    assert VotoMesaReportado.objects.count() == sum(antes.values()) + 2
+
+
+def test_particionar_votos_no_soportado(db, monkeypatch):
+    monkeypatch.setattr(particiones, 'soportado', lambda: False)
+    with pytest.raises(CommandError):
+        call_command('particionar_votos', convertir=True)
+    # El alta de categorías sigue funcionando sin particiones.
+    assert CategoriaFactory().id
+    assert not particiones.particiones_existentes()
+
+
+def test_verificar_indices(db):
+    # Como en la noche de la elección: casi todo ya está procesado.
+    CargaFactory.create_batch(30, procesada=True)
+    CargaFactory.create_batch(2)
+    IdentificacionFactory.create_batch(30, procesada=True)
+    IdentificacionFactory.create_batch(2)
+    AttachmentFactory.create_batch(2)
+    MesaCategoria.objects.update(coeficiente_para_orden_de_carga=None)
+    MesaCategoriaFactory.create_batch(2, coeficiente_para_orden_de_carga=1)
+
+    salida = StringIO()
+    # Con tan pocas filas el planificador preferiría un scan secuencial.
+    call_command('verificar_indices', sin_seqscan=True, stdout=salida)
+    salida = salida.getvalue()
+    assert 'consolidador_cargas: usa carga_pendiente_consolidar' in salida
+    assert 'consolidador_identificaciones: usa ident_pendiente_consolidar' in salida
+    assert 'fotos_sin_identificar: usa attach_sin_identificar' in salida
+    assert 'mesa_categorias_con_carga_pendiente: usa mc_carga_pendiente' in salida
+
+
+def test_correr_benchmark(db, tmp_path, settings):
+    # Las consultas de cada paso forman parte del reporte.
+    settings.PRESUPUESTO_CONSULTAS_ESTRICTO = False
+    salida = tmp_path / 'benchmark.json'
+    call_command(
+        'correr_benchmark', distritos=1, secciones_por_distrito=1, circuitos_por_seccion=2,
+        mesas_por_circuito=4, categorias=2, partidos=3, proporcion_cargadas=0.25,
+        proporcion_con_foto=0.5, voluntarios=3, acciones=60, acciones_por_ronda=6, salida=str(salida)
+    )
+    reporte = json.loads(salida.read_text())
+
+    assert reporte['dataset']['mesas'] == 8
+    assert reporte['dataset']['mesa_categorias'] == 16
+    assert reporte['flujo']['acciones'] > 0
+    for paso in [
+        'siguiente_accion', 'identificacion_post', 'carga_post', 'consolidador', 'scheduler',
+        'resultados', 'avance_carga'
+    ]:
+        assert reporte['pasos'][paso]['cantidad'] > 0
+        assert reporte['pasos'][paso]['p99_ms'] >= reporte['pasos'][paso]['p50_ms']
+
+    # Los voluntarios identificaron actas y cargaron votos coincidentes, que se consolidaron.
+    assert Attachment.objects.filter(status=Attachment.STATUS.identificada).exists()
+    assert Carga.objects.filter(procesada=True, tipo=Carga.TIPOS.parcial).exists()
+    assert MesaCategoria.objects.filter(
+        status=MesaCategoria.STATUS.total_consolidada_dc, cargas__origen=Carga.SOURCES.web,
+        cargas__procesada=True, cargas__fiscal__user__username__startswith='benchmark-voluntario-'
+    ).exists()
+
+
+def test_importar_mesas_y_escuelas_masivo(db, tmp_path, django_assert_max_num_queries):
+    circuito = CircuitoFactory(numero='1', seccion__numero='2', seccion__distrito=DistritoFactory(numero='3'))
+    existente = LugarVotacionFactory(circuito=circuito, numero='10', nombre='Vieja')
+    MesaFactory(numero='1', lugar_votacion=existente, circuito=circuito, electores=200)
+    archivo = tmp_path / 'escuelas.csv'
+    archivo.write_text(
+        'distrito_nro,escuela_nro,escuela,direccion,circuito_nro,seccion_nro,localidad,desde,hasta,cant_mesas,latitud,longitud\n'
+        '03,010,Nueva Vieja,Calle 1,1,2,Ciudad,1,2,2,"-34,5",-58.5\n'
+        '3,11,Otra,Calle 2,001,2,,3,5,3,,\n'
+        '3,12,Sin circuito,Calle 3,9,2,,6,6,1,,\n'
+    )
+
+    # La cantidad de consultas no depende de la cantidad de filas (más las de recalcular los
+    # contadores del avance).
+    with django_assert_max_num_queries(26):
+        call_command('importar_mesas_y_escuelas', str(archivo), masivo=True, verbosity=0)
+
+    existente.refresh_from_db()
+    assert existente.nombre == 'Nueva Vieja'
+    assert (existente.latitud, existente.longitud) == (-34.5, -58.5)
+    otra = LugarVotacion.objects.get(numero='11')
+    assert otra.circuito == circuito and otra.latitud is None
+    assert not LugarVotacion.objects.filter(numero='12').exists()
+
+    # La mesa existente no se modifica; el resto se crea con los electores por defecto.
+    assert dict(Mesa.objects.values_list('numero', 'electores')) == {
+        '1': 200, '2': 350, '3': 350, '4': 350, '5': 350
+    }
+    assert set(Mesa.objects.filter(lugar_votacion=otra).values_list('numero', flat=True)) == {'3', '4', '5'}
+    existente.refresh_from_db()
+    circuito.refresh_from_db()
+    assert existente.electores == 200 + 350
+    assert circuito.electores == 200 + 350 * 4
+    circuito.seccion.distrito.refresh_from_db()
+    assert circuito.seccion.distrito.electores == 200 + 350 * 4
+
+
+def test_importar_carga_oficial(db, tmp_path, settings, django_assert_max_num_queries):
+    fiscal = FiscalFactory(id=1)
+    nosotros = OpcionFactory(partido__codigo=settings.CODIGO_PARTIDO_NOSOTROS)
+    ellos = OpcionFactory(partido__codigo=settings.CODIGO_PARTIDO_ELLOS)
+    categoria = CategoriaFactory(opciones=[nosotros, ellos])
+    circuito = CircuitoFactory(
+        numero='1A', seccion__numero='2', seccion__distrito=DistritoFactory(numero='3')
+    )
+    mesas = [MesaFactory(numero=str(n), circuito=circuito, categorias=[categoria]) for n in (1, 2)]
+    archivo = tmp_path / 'oficial.csv'
+    encabezado = 'distrito,seccion,circuito,mesa,blanco,nulo,total_electores,vot_alferdez,vot_macri\n'
+    archivo.write_text(
+        encabezado +
+        '03,2,001A,1,1,2,100,60,37\n'
+        '3,2,1a,2,0,0,50,30,20\n'
+        '3,2,1A,99,0,0,50,30,20\n'
+    )
+
+    def importar():
+        # La cantidad de consultas no depende de la cantidad de filas.
+        with django_assert_max_num_queries(15):
+            call_command('importar_carga_oficial', str(archivo), categoria=categoria.slug, verbosity=0)
+
+    importar()
+    oficiales = Carga.objects.filter(tipo=Carga.TIPOS.parcial_oficial, fiscal=fiscal)
+    assert oficiales.count() == 2
+    mc = MesaCategoria.objects.get(mesa=mesas[0], categoria=categoria)
+    carga = mc.parcial_oficial
+    assert carga.origen == Carga.SOURCES.web
+    assert carga.circuito == circuito
+    assert dict(carga.opcion_votos()) == {
+        nosotros.id: 60, ellos.id: 37,
+        Opcion.blancos().id: 1, Opcion.nulos().id: 2, Opcion.total_votos().id: 100,
+    }
+    # Firma y votos compactos quedan iguales a los que calcularía la carga.
+    firma, compactos = carga.firma, bytes(carga.votos_compactos)
+    carga.actualizar_firma(forzar=True)
+    assert (carga.firma, bytes(carga.votos_compactos)) == (firma, compactos)
+    assert VotoMesaReportado.objects.filter(carga=carga, categoria=categoria, circuito=circuito).count() == 5
+
+    # Reimportar los mismos datos no escribe nada.
+    importar()
+    assert oficiales.count() == 2
+
+    # Sólo se crea una carga nueva para la mesa que cambió.
+    archivo.write_text(encabezado + '3,2,1A,1,1,2,100,61,36\n3,2,1A,2,0,0,50,30,20\n')
+    importar()
+    assert oficiales.count() == 3
+    mc.refresh_from_db()
+    assert mc.parcial_oficial != carga
+    assert dict(mc.parcial_oficial.opcion_votos())[nosotros.id] == 61
+
+    # Las filas con votos negativos se descartan.
+    archivo.write_text(encabezado + '3,2,1A,1,1,2,100,-1,36\n3,2,1A,2,0,0,50,31,20\n')
+    importar()
+    assert oficiales.count() == 4
+    mc.refresh_from_db()
+    assert dict(mc.parcial_oficial.opcion_votos())[nosotros.id] == 61
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.test import override_settings
 
 from elecciones.models import (
     Distrito,
@@ -9,6 +10,7 @@ from elecciones.models import (
     TIPOS_DE_AGREGACIONES,
     OPCIONES_A_CONSIDERAR,
 )
+from elecciones.proyecciones import SumarizadorCombinado, Proyecciones
 from .factories import (
     MesaCategoriaFactory,
     CargaFactory,
@@ -21,7 +23,8 @@ import pytest
 
 
 @pytest.mark.django_db(transaction=True)
-def test_configuracion_combinada(db, fiscal_client, url_resultados_computo):
+@pytest.mark.parametrize('hilos', [1, 3])
+def test_configuracion_combinada(db, fiscal_client, url_resultados_computo, hilos):
     # Seteamos el modo de elección como PASO; por lo tanto
     # los porcentajes que deberíamos visualizar son los porcentaje_validos
     settings.MODO_ELECCION = settings.ME_OPCION_GEN
@@ -104,7 +107,9 @@ def test_configuracion_combinada(db, fiscal_client, url_resultados_computo):
         proyeccion=tecnica_proyeccion(minimo_mesas=2),
     )
 
-    response = fiscal_client.get(url_resultados_computo)
+    # Con más de un hilo las configuraciones se computan en paralelo.
+    with override_settings(SUMARIZADOR_COMBINADO_HILOS=hilos):
+        response = fiscal_client.get(url_resultados_computo)
     resultados = response.context['resultados']
 
     assert resultados.total_mesas() == 24  # 8 en c/u de los 3 distritos
@@ -142,3 +147,42 @@ def test_configuracion_combinada(db, fiscal_client, url_resultados_computo):
 
     # Todos los positivos suman 100
     assert sum(float(v['porcentaje_positivos']) for v in positivos.values()) == 100.0
+
+
+def test_configuracion_combinada_agrupa_distritos(db):
+    Distrito.objects.all().delete()
+    create_carta_marina(create_distritos=4)
+    d1, d2, d3, d4 = Distrito.objects.order_by('id')
+    configuracion_combinada = ConfiguracionComputoFactory()
+    for distrito in (d1, d3):
+        ConfiguracionComputoDistritoFactory(
+            configuracion=configuracion_combinada,
+            distrito=distrito,
+            agregacion=TIPOS_DE_AGREGACIONES.todas_las_cargas,
+            opciones=OPCIONES_A_CONSIDERAR.todas,
+        )
+    ConfiguracionComputoDistritoFactory(
+        configuracion=configuracion_combinada,
+        distrito=d2,
+        agregacion=TIPOS_DE_AGREGACIONES.solo_consolidados_doble_carga,
+        opciones=OPCIONES_A_CONSIDERAR.todas,
+    )
+    ConfiguracionComputoDistritoFactory(
+        configuracion=configuracion_combinada,
+        distrito=d4,
+        agregacion=TIPOS_DE_AGREGACIONES.todas_las_cargas,
+        opciones=OPCIONES_A_CONSIDERAR.todas,
+        proyeccion=tecnica_proyeccion(),
+    )
+
+    sumarizadores = SumarizadorCombinado(configuracion_combinada).sumarizadores()
+
+    # Los distritos con la misma configuración se computan juntos; los proyectados, de a uno.
+    assert len(sumarizadores) == 3
+    juntos, consolidados, proyeccion = sumarizadores
+    assert juntos.tipo_de_agregacion == TIPOS_DE_AGREGACIONES.todas_las_cargas
+    assert juntos.ids_a_considerar == [d1.id, d3.id]
+    assert consolidados.tipo_de_agregacion == TIPOS_DE_AGREGACIONES.solo_consolidados_doble_carga
+    assert consolidados.ids_a_considerar == [d2.id]
+    assert isinstance(proyeccion, Proyecciones)
+    assert proyeccion.ids_a_considerar == [d4.id]
@@ -0,0 +1,187 @@
+import pytest
+from django.urls import reverse
+
+from adjuntos.consolidacion import consumir_novedades
+from elecciones.contadores_avance import CAMPOS, GRUPOS_FOTOS, aplicar, recalcular_contadores_avance
+from elecciones.models import Carga, Categoria, ContadorAvance
+from elecciones.resultados_resumen import (
+    ContadoresResumen, GeneradorDatosFotosConsolidado, GeneradorDatosPreidentificacionesConsolidado,
+    GeneradorDatosCargaParcialConsolidado, GeneradorDatosCargaTotalConsolidado,
+    SinRestriccion, RestriccionPorDistrito, RestriccionPorSeccion
+)
+from elecciones.tests.factories import AttachmentFactory, PreidentificacionFactory
+from elecciones.tests.utils_para_test import identificar, reportar_problema_attachment
+
+from .test_resultados_resumen import (
+    Cargas, DataTresDistritos, agregar_cargas_mesa, asociar_foto_a_mesa, nueva_carga
+)
+
+DATOS_FOTOS = ['cantidad_mesas', 'mesas_con_foto_identificada', 'mesas_con_carga_sin_foto', 'mesas_activas']
+DATOS_FOTOS_NACION = DATOS_FOTOS + [
+    'fotos_con_problema_confirmado', 'fotos_en_proceso', 'fotos_sin_acciones', 'mesas_sin_foto'
+]
+DATOS_PREIDENTIFICACIONES = ['cantidad_total', 'identificadas', 'sin_identificar']
+DATOS_CARGA = [
+    'dato_total', 'dato_carga_confirmada', 'dato_carga_csv', 'dato_carga_en_proceso',
+    'dato_carga_sin_carga', 'dato_carga_con_problemas'
+]
+
+
+@pytest.fixture
+def data(db, settings):
+    settings.MIN_COINCIDENCIAS_IDENTIFICACION = 2
+    settings.MIN_COINCIDENCIAS_CARGAS = 2
+    settings.MIN_COINCIDENCIAS_CARGAS_PROBLEMA = 1
+    settings.DISTRITO_PBA = '2'
+    Cargas.crear_cargas()
+
+    # 50 mesas: 20 pba, 15 caba, 15 catamarca
+    data = DataTresDistritos(settings.DISTRITO_PBA)
+    data.agregar_mesacats(settings)
+
+    # fotos identificadas para 6 mesas pba y 3 caba
+    for mesa in data.mesas_pba[0:6] + data.mesas_caba[0:3]:
+        asociar_foto_a_mesa(mesa, data)
+    # 3 fotos en proceso, 1 con problemas y 2 sin acciones
+    for mesa in data.mesas_cat[0:3]:
+        identificar(AttachmentFactory(), mesa, data.fiscales[4])
+    foto = AttachmentFactory()
+    reportar_problema_attachment(foto, data.fiscales[6])
+    reportar_problema_attachment(foto, data.fiscales[7])
+    AttachmentFactory()
+    AttachmentFactory()
+
+    # preidentificaciones: 2 de pba y 1 de caba con foto identificada
+    preidentificaciones = [
+        PreidentificacionFactory(distrito=data.distrito_pba, seccion=data.seccion_pba) for ix in range(4)
+    ] + [PreidentificacionFactory(distrito=data.distrito_caba, seccion=data.seccion_caba) for ix in range(3)]
+    for preidentificacion, mesa in zip(
+        preidentificaciones[0:2] + preidentificaciones[4:5], data.mesas_pba[6:8] + data.mesas_caba[3:4]
+    ):
+        foto = AttachmentFactory(pre_identificacion=preidentificacion)
+        identificar(foto, mesa, data.fiscales[0])
+        identificar(foto, mesa, data.fiscales[1])
+    consumir_novedades()
+
+    agregar_cargas_mesa(data.mesacats_pv_pba[0], [Cargas.total_csv, Cargas.total_web])
+    agregar_cargas_mesa(data.mesacats_pv_pba[1], [Cargas.parcial_web, Cargas.parcial_web])
+    agregar_cargas_mesa(data.mesacats_pv_pba[2], [Cargas.parcial_web])
+    agregar_cargas_mesa(data.mesacats_gv_pba[0], [Cargas.total_web, Cargas.total_web])
+    # una mesa sin foto con carga
+    agregar_cargas_mesa(data.mesacats_pv_caba[10], [Cargas.parcial_csv])
+    nueva_carga(data.mesacats_pv_cat[0], data.fiscales[2], [], Carga.TIPOS.problema)
+    consumir_novedades()
+    return data
+
+
+def estado_contadores():
+    estado = {}
+    for contador in ContadorAvance.objects.all():
+        clave = (
+            contador.tipo, contador.distrito_id, contador.seccion_id, contador.categoria_id,
+            contador.con_foto, contador.grupo, contador.clave
+        )
+        estado[clave] = estado.get(clave, 0) + contador.cantidad
+    return {clave: cantidad for clave, cantidad in estado.items() if cantidad}
+
+
+def datos(generador, atributos):
+    generador.calcular()
+    return {atributo: getattr(generador, atributo) for atributo in atributos}
+
+
+def test_contadores_incrementales_iguales_a_recalculados(data):
+    incrementales = estado_contadores()
+    assert incrementales
+    assert recalcular_contadores_avance() > 0
+    assert estado_contadores() == incrementales
+
+
+def test_contadores_sin_filas_repetidas(data, django_assert_num_queries):
+    # Sin columnas nulas, la restricción de unicidad vale también para las filas sin categoría.
+    claves = list(ContadorAvance.objects.values_list(*CAMPOS))
+    assert len(claves) == len(set(claves))
+
+    # Las fotos de un mismo estado se reparten en varias filas.
+    fotos = ContadorAvance.objects.filter(tipo=ContadorAvance.TIPOS.foto)
+    assert fotos.values('grupo').distinct().count() > 1
+    assert all(0 <= grupo < GRUPOS_FOTOS for grupo in fotos.values_list('grupo', flat=True))
+
+    # Las diferencias se suman, creando las filas que falten, con una única consulta.
+    existente, nueva = claves[0], ('foto', 0, 0, 0, False, 0, 'otra')
+    cantidad = ContadorAvance.objects.get(**dict(zip(CAMPOS, existente))).cantidad
+    with django_assert_num_queries(1):
+        aplicar({existente: 2, nueva: 3})
+    assert ContadorAvance.objects.get(**dict(zip(CAMPOS, existente))).cantidad == cantidad + 2
+    assert ContadorAvance.objects.get(**dict(zip(CAMPOS, nueva))).cantidad == 3
+
+
+def restriccion(data, tipo):
+    if tipo == 'distrito':
+        return RestriccionPorDistrito(data.distrito_pba.id)
+    if tipo == 'seccion':
+        return RestriccionPorSeccion(data.seccion_caba.id)
+    return SinRestriccion()
+
+
+@pytest.mark.parametrize('tipo_restriccion', ['ninguna', 'distrito', 'seccion'])
+@pytest.mark.parametrize('solo_con_fotos', [False, True])
+def test_resumen_desde_contadores_igual_a_consultas(data, settings, tipo_restriccion, solo_con_fotos):
+    restringe = restriccion(data, tipo_restriccion)
+    categoria = Categoria.objects.get(slug=settings.SLUG_CATEGORIA_PRESI_Y_VICE)
+    contadores = ContadoresResumen(restringe, [
+        settings.SLUG_CATEGORIA_PRESI_Y_VICE, settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA
+    ])
+    regiones = ['nacion', 'pba'] + (['restringido'] if restringe.restringe_algo() else [])
+
+    fotos = GeneradorDatosFotosConsolidado(restringe)
+    fotos_contadores = GeneradorDatosFotosConsolidado(restringe, contadores)
+    assert datos(fotos.nacion, DATOS_FOTOS_NACION) == datos(fotos_contadores.nacion, DATOS_FOTOS_NACION)
+    for region in regiones:
+        assert datos(getattr(fotos, region), DATOS_FOTOS) == datos(
+            getattr(fotos_contadores, region), DATOS_FOTOS)
+
+    preidentificaciones = GeneradorDatosPreidentificacionesConsolidado(restringe)
+    preidentificaciones_contadores = GeneradorDatosPreidentificacionesConsolidado(restringe, contadores)
+    for region in regiones:
+        assert datos(getattr(preidentificaciones, region), DATOS_PREIDENTIFICACIONES) == datos(
+            getattr(preidentificaciones_contadores, region), DATOS_PREIDENTIFICACIONES)
+
+    for clase in [GeneradorDatosCargaParcialConsolidado, GeneradorDatosCargaTotalConsolidado]:
+        carga = clase(restringe, categoria)
+        carga_contadores = clase(restringe, categoria, contadores)
+        if solo_con_fotos:
+            carga.solo_mesas_con_fotos()
+            carga_contadores.solo_mesas_con_fotos()
+        for generador in ['pv', 'gv'] + (['restringido'] if restringe.restringe_algo() else []):
+            assert datos(getattr(carga, generador), DATOS_CARGA) == datos(
+                getattr(carga_contadores, generador), DATOS_CARGA)
+
+
+def test_resumen_desde_contadores_en_una_consulta(data, settings, django_assert_num_queries):
+    restringe = RestriccionPorDistrito(data.distrito_caba.id)
+    categoria = Categoria.objects.get(slug='JG_CABA')
+    contadores = ContadoresResumen(restringe, [
+        settings.SLUG_CATEGORIA_PRESI_Y_VICE, settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, categoria.slug
+    ])
+    with django_assert_num_queries(1):
+        fotos = GeneradorDatosFotosConsolidado(restringe, contadores)
+        fotos.datos_nacion_pba_restriccion()
+        fotos.datos_solo_nacion()
+        GeneradorDatosCargaParcialConsolidado(restringe, categoria, contadores).datos()
+        carga_total = GeneradorDatosCargaTotalConsolidado(restringe, categoria, contadores)
+        carga_total.solo_mesas_con_fotos()
+        carga_total.datos()
+        GeneradorDatosPreidentificacionesConsolidado(restringe, contadores).datos()
+    assert carga_total.restringido.dato_total == 4
+
+
+def test_avance_carga_resumen_desde_contadores(data, fiscal_client):
+    url = reverse('avance-carga-resumen', kwargs={
+        'carga_parcial': 'solo_con_fotos', 'carga_total': 'todas',
+        'restriccion_geografica': f'Distrito-{data.distrito_pba.id}', 'categoria': 'None',
+        'data_extra': 'None_None_None',
+    })
+    response = fiscal_client.get(url)
+    assert response.status_code == 200
+    assert response.context['data_carga_parcial']
@@ -1,5 +1,7 @@
 import pytest
-from django.core.management import call_command
+from django.core.checks import ERROR
+from django.core.management import call_command, CommandError
+from django.db.models import F
 from django.conf import settings
 from datetime import timedelta
 from django.utils import timezone
@@ -21,10 +23,11 @@ from .factories import (
     DistritoFactory,
     FiscalFactory,
 )
-from elecciones.models import Mesa, MesaCategoria, Categoria, Carga, Opcion
+from elecciones.models import Mesa, MesaCategoria, Categoria, Carga, Opcion, recalcular_electores
 from adjuntos.models import Identificacion
 from adjuntos.consolidacion import consumir_novedades_carga, consumir_novedades_identificacion
 from problemas.models import Problema, ReporteDeProblema
+from elecciones import system_checks
 
 
 def consumir_novedades_y_actualizar_objetos(lista=None):
@@ -396,6 +399,41 @@ def test_con_carga_pendiente_ignora_cats_inactivas(db):
     assert mc in MesaCategoria.objects.con_carga_pendiente()
 
 
+def test_invalidar_asignacion_attachment(db, django_assert_num_queries):
+    from scheduling.models import ColaCargasPendientes
+
+    mesa = MesaFactory()
+    mc1 = MesaCategoriaFactory(mesa=mesa, coeficiente_para_orden_de_carga=10, percentil=1, orden_de_llegada=1)
+    mc2 = MesaCategoriaFactory(mesa=mesa, coeficiente_para_orden_de_carga=20, percentil=2, orden_de_llegada=2)
+    otra_mc = MesaCategoriaFactory(coeficiente_para_orden_de_carga=30)
+    c1 = CargaFactory(mesa_categoria=mc1, tipo='total', procesada=True)
+    c2 = CargaFactory(mesa_categoria=mc2, tipo='total', procesada=True)
+    otra_carga = CargaFactory(mesa_categoria=otra_mc, tipo='total', procesada=True)
+    ColaCargasPendientes.objects.create(mesa_categoria=mc1, orden=1)
+    ColaCargasPendientes.objects.create(mesa_categoria=otra_mc, orden=2)
+
+    # Dos UPDATE y el DELETE de la cola, sin importar la cantidad de categorías y cargas.
+    with django_assert_num_queries(3):
+        mesa.invalidar_asignacion_attachment()
+
+    for mc in (mc1, mc2):
+        mc.refresh_from_db()
+        assert mc.coeficiente_para_orden_de_carga is None
+        assert mc.percentil is None
+        assert mc.orden_de_llegada is None
+    for carga in (c1, c2):
+        carga.refresh_from_db()
+        assert carga.invalidada
+        assert not carga.procesada
+
+    # Lo de otras mesas queda igual.
+    otra_mc.refresh_from_db()
+    otra_carga.refresh_from_db()
+    assert otra_mc.coeficiente_para_orden_de_carga == 30
+    assert not otra_carga.invalidada
+    assert list(ColaCargasPendientes.objects.values_list('mesa_categoria', flat=True)) == [otra_mc.id]
+
+
 def test_problema_falta_foto(db):
     mc = MesaCategoriaFactory()
     assert mc.status == MesaCategoria.STATUS.sin_cargar
@@ -500,11 +538,87 @@ def test_metadata_de_mesa(db, settings):
     assert set(mesa.metadata()) == {(o1.id, 10), (o2.id, 0)}
 
 
+def test_datos_previos_en_una_consulta(db, settings, django_assert_num_queries):
+    settings.MIN_COINCIDENCIAS_CARGAS = 1
+    meta = OpcionFactory(tipo=Opcion.TIPOS.metadata)
+    o1, o2 = OpcionFactory(), OpcionFactory()
+    c1 = CategoriaFactory(opciones=[meta, o1])
+    c2 = CategoriaFactory(opciones=[meta, o1, o2])
+    mc1 = MesaCategoriaFactory(categoria=c1)
+    mc2 = MesaCategoriaFactory(categoria=c2, mesa=mc1.mesa)
+
+    # c1 consolidada con carga total: aporta la metadata de la mesa.
+    carga1 = CargaFactory(mesa_categoria=mc1, tipo='total')
+    VotoMesaReportadoFactory(carga=carga1, opcion=meta, votos=100)
+    VotoMesaReportadoFactory(carga=carga1, opcion=o1, votos=30)
+    # c2 consolidada con carga parcial.
+    carga2 = CargaFactory(mesa_categoria=mc2, tipo='parcial')
+    VotoMesaReportadoFactory(carga=carga2, opcion=o1, votos=20)
+    consumir_novedades_carga()
+    mc2.refresh_from_db()
+    assert mc2.status == MesaCategoria.STATUS.parcial_consolidada_dc
+
+    with django_assert_num_queries(1):
+        assert mc2.datos_previos('parcial') == {meta.id: 100}
+    with django_assert_num_queries(1):
+        assert mc2.datos_previos('total') == {meta.id: 100, o1.id: 20}
+
+
 def test_system_check_for_dev_data(db):
     call_command('loaddata', 'fixtures/dev_data.json')
     call_command('check', deploy=True)
 
 
+def test_chequeos_integridad(db, django_assert_max_num_queries):
+    call_command('loaddata', 'fixtures/dev_data.json')
+    # Los datos de desarrollo sólo tienen advertencias.
+    assert all(mensaje.level < ERROR for mensaje in system_checks.correr_chequeos())
+
+    mesa = Mesa.objects.filter(lugar_votacion__isnull=False).first()
+    distrito = mesa.circuito.seccion.distrito
+    # Electores desactualizados.
+    Mesa.objects.filter(id=mesa.id).update(electores=F('electores') + 1)
+    # Mesa en un distrito distinto al de su lugar de votación.
+    otro_circuito = CircuitoFactory(seccion__distrito=DistritoFactory())
+    Mesa.objects.filter(id=mesa.id).update(circuito=otro_circuito)
+    categoria = CategoriaFactory(distrito=distrito)
+
+    # La cantidad de consultas no depende de la cantidad de distritos, mesas o categorías.
+    with django_assert_max_num_queries(25):
+        errores = system_checks.correr_chequeos()
+    ids = [error.id for error in errores]
+    assert ids.count('elecciones.E031') == 1
+    assert ids.count('elecciones.E051') == 1
+    assert [error.obj for error in errores if error.id == 'elecciones.E051'] == [categoria]
+    assert 'Los electores de' in str([error.msg for error in errores])
+
+    # El resultado se cachea hasta que se publica una nueva versión de los datos.
+    cacheados = system_checks.chequeos_cacheados()
+    assert [str(error) for error in cacheados] == [str(error) for error in errores]
+    with django_assert_max_num_queries(2):
+        assert system_checks.chequeos_cacheados() == cacheados
+    recalcular_electores()
+    Mesa.objects.filter(id=mesa.id).update(circuito=mesa.circuito)
+    assert system_checks.chequeos_cacheados() == cacheados
+    system_checks.invalidar_chequeos()
+    assert not [
+        mensaje for mensaje in system_checks.chequeos_cacheados()
+        if mensaje.id in ('elecciones.E031', 'elecciones.E051') or 'Los electores' in mensaje.msg
+    ]
+
+
+def test_verificar_integridad(db, settings):
+    settings.CHEQUEOS_INTEGRIDAD_AL_INICIAR = False
+    mesa = MesaFactory(electores=10)
+    Mesa.objects.filter(id=mesa.id).update(electores=20)
+    # Al iniciar no se corren.
+    call_command('check', deploy=True)
+    with pytest.raises(CommandError):
+        call_command('verificar_integridad')
+    recalcular_electores()
+    call_command('verificar_integridad')
+
+
 def test_orden_por_prioridad_status(db):
     statuses = [s[0] for s in settings.MC_STATUS_CHOICE]
 
@@ -542,3 +656,65 @@ def test_normalizacion_numero(db):
     s.save()
     # ... pero si ponemos en mayúsculas
     assert s.numero == "00678VP"
+
+
+def _geografia(objeto):
+    return (objeto.distrito_id, objeto.seccion_id, objeto.circuito_id)
+
+
+def test_geografia_denormalizada(db):
+    mesa = MesaFactory()
+    circuito = mesa.circuito
+    esperada = (circuito.seccion.distrito_id, circuito.seccion_id, circuito.id)
+    mc = MesaCategoriaFactory(mesa=mesa)
+    voto = VotoMesaReportadoFactory(carga__mesa_categoria=mc, votos=10)
+    assert _geografia(mc) == esperada
+    assert _geografia(voto.carga) == esperada
+    assert _geografia(voto) == esperada
+    assert voto.categoria_id == mc.categoria_id
+
+    # También con bulk_create.
+    categoria = CategoriaFactory()
+    MesaCategoria.objects.bulk_create([MesaCategoria(mesa=mesa, categoria=categoria)])
+    assert _geografia(MesaCategoria.objects.get(mesa=mesa, categoria=categoria)) == esperada
+
+    # Si la mesa cambia de circuito se actualiza todo.
+    otro = CircuitoFactory()
+    mesa.circuito = otro
+    mesa.save()
+    esperada = (otro.seccion.distrito_id, otro.seccion_id, otro.id)
+    for objeto in (mc, voto.carga, voto):
+        objeto.refresh_from_db()
+        assert _geografia(objeto) == esperada
+
+    # Y si el circuito cambia de sección, o la sección de distrito.
+    seccion = SeccionFactory()
+    otro.seccion = seccion
+    otro.save(update_fields=['seccion'])
+    distrito = DistritoFactory()
+    seccion.distrito = distrito
+    seccion.save(update_fields=['distrito'])
+    for objeto in (mc, voto.carga, voto):
+        objeto.refresh_from_db()
+        assert _geografia(objeto) == (distrito.id, seccion.id, otro.id)
+
+
+def test_votos_compactos(db, django_assert_num_queries):
+    o1, o2 = OpcionFactory.create_batch(2)
+    mc = MesaCategoriaFactory()
+    c1, c2 = CargaFactory.create_batch(2, mesa_categoria=mc, tipo=Carga.TIPOS.parcial)
+    for carga, votos in ((c1, (10, 20)), (c2, (13, 20))):
+        VotoMesaReportadoFactory(carga=carga, opcion=o2, votos=votos[1])
+        VotoMesaReportadoFactory(carga=carga, opcion=o1, votos=votos[0])
+    assert c1.votos_compactos is None
+    assert c1.votos_por_opcion() == [(o1.id, 10), (o2.id, 20)]
+
+    c1.actualizar_firma()
+    c2.actualizar_firma()
+    c1.refresh_from_db()
+    assert c1.firma == f'{o1.id}-10|{o2.id}-20'
+    assert c1.votos_por_opcion() == [(o1.id, 10), (o2.id, 20)]
+
+    # La diferencia se calcula con los vectores, sin consultas.
+    with django_assert_num_queries(0):
+        assert c1 - c2 == 3
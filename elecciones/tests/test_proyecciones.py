@@ -1,5 +1,10 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from elecciones.models import Categoria, Carga, Seccion, Opcion, CategoriaOpcion
+from elecciones.models import (
+    Categoria, Carga, Seccion, Opcion, CategoriaOpcion, TIPOS_DE_AGREGACIONES, OPCIONES_A_CONSIDERAR,
+)
+from elecciones.proyecciones import Proyecciones
 
 from .factories import (
     CategoriaFactory,
@@ -10,7 +15,7 @@ from .factories import (
     CargaFactory,
 )
 from .test_models import consumir_novedades_y_actualizar_objetos
-from .utils import tecnica_proyeccion, cargar_votos
+from .utils import create_carta_marina, tecnica_proyeccion, cargar_votos
 
 
 def test_resultados_proyectados(fiscal_client):
@@ -217,11 +222,37 @@ def test_proyeccion_con_agrupaciones_no_consideradas(carta_marina, fiscal_client
     assert positivos[o2.partido]['porcentaje_positivos'] == '66.67'  # = 360 / 640
 
     agrupaciones_no_consideradas = resultados.resultados['agrupaciones_no_consideradas']
-    assert agrupaciones_no_consideradas.count() == 1
+    assert len(agrupaciones_no_consideradas) == 1
 
-    nombre_agrupacion, minimo_mesas, mesas_escrutadas = agrupaciones_no_consideradas.first()
+    nombre_agrupacion, minimo_mesas, mesas_escrutadas = agrupaciones_no_consideradas[0]
     assert s1.nombre in nombre_agrupacion
     assert minimo_mesas == 2
     assert mesas_escrutadas == 1
 
 
+def test_proyeccion_no_depende_de_la_cantidad_de_agrupaciones(db):
+    o1, o2 = OpcionFactory.create_batch(2)
+    categoria = CategoriaFactory(opciones=[o1, o2])
+
+    def consultas_para_proyectar(carta_marina):
+        for mesa in carta_marina:
+            MesaCategoriaFactory(mesa=mesa, categoria=categoria)
+        carga = CargaFactory(
+            mesa_categoria__mesa=carta_marina[0], tipo=Carga.TIPOS.total, mesa_categoria__categoria=categoria
+        )
+        cargar_votos(carga, {o1: 40, o2: 30})
+        consumir_novedades_y_actualizar_objetos([carta_marina[0]])
+        proyecciones = Proyecciones(
+            tecnica_proyeccion(), TIPOS_DE_AGREGACIONES.todas_las_cargas, OPCIONES_A_CONSIDERAR.todas
+        )
+        with CaptureQueriesContext(connection) as consultas:
+            resultados = proyecciones.get_resultados(categoria)
+        return len(consultas), resultados
+
+    consultas_un_distrito, resultados = consultas_para_proyectar(create_carta_marina())
+    positivos = resultados.tabla_positivos()
+    assert positivos[o1.partido]['votos'] == 160  # = 40 * (4/1)
+    assert positivos[o2.partido]['votos'] == 120  # = 30 * (4/1)
+
+    consultas_tres_distritos, _ = consultas_para_proyectar(create_carta_marina(create_distritos=3))
+    assert consultas_tres_distritos == consultas_un_distrito
@@ -0,0 +1,39 @@
+from constance import config as config_constance
+from constance.test import override_config
+
+from elecciones.registro_config import config, registro_config
+
+
+def test_config_se_lee_de_memoria(db, django_assert_num_queries):
+    registro_config.invalidar(publicar=False)
+    with django_assert_num_queries(1):
+        config.COEFICIENTE_IDENTIFICACION_VS_CARGA
+        config.PRIORIDAD_STATUS
+        config.UMBRAL_EXCLUIR_TAREAS_FISCAL
+    assert config.COEFICIENTE_IDENTIFICACION_VS_CARGA == config_constance.COEFICIENTE_IDENTIFICACION_VS_CARGA
+
+
+def test_config_se_invalida_al_cambiar_un_valor(db):
+    valor = config.BONUS_AFINIDAD_GEOGRAFICA
+    with override_config(BONUS_AFINIDAD_GEOGRAFICA=valor + 7):
+        assert config.BONUS_AFINIDAD_GEOGRAFICA == valor + 7
+    assert config.BONUS_AFINIDAD_GEOGRAFICA == valor
+
+    config.BONUS_AFINIDAD_GEOGRAFICA = valor + 1
+    assert config_constance.BONUS_AFINIDAD_GEOGRAFICA == valor + 1
+    assert config.BONUS_AFINIDAD_GEOGRAFICA == valor + 1
+
+
+def test_config_recarga_si_otro_proceso_publica_una_version(db, settings):
+    settings.CACHE_METADATA_ELECTORAL = 'default'
+    settings.INTERVALO_VERIFICACION_CONFIG = 0
+    registro_config.invalidar()
+    valor = config.PAUSA_SCHEDULER
+
+    # Otro proceso guarda un valor: acá no llega la señal, sólo la versión nueva.
+    config_constance._backend._model.objects.update_or_create(
+        key='PAUSA_SCHEDULER', defaults={'value': valor + 3}
+    )
+    assert config.PAUSA_SCHEDULER == valor
+    registro_config.cache.set(registro_config.clave_version, 'otra')
+    assert config.PAUSA_SCHEDULER == valor + 3
@@ -0,0 +1,60 @@
+from elecciones.registro_geografia import registro_geografia
+from .factories import CircuitoFactory, DistritoFactory, MesaFactory, SeccionFactory
+
+
+def test_busqueda_por_numeros_canonizados(db):
+    circuito = CircuitoFactory(
+        numero='1A', seccion__numero='3', seccion__distrito=DistritoFactory(numero='2')
+    )
+    mesa = MesaFactory(numero='7', circuito=circuito)
+    otro_circuito = CircuitoFactory(numero='2', seccion=circuito.seccion)
+    homonima = MesaFactory(numero='7', circuito=otro_circuito)
+
+    assert registro_geografia.mesa('02', '3', '001a', '007') == mesa.id
+    assert registro_geografia.mesa('2', '3', '2', '7') == homonima.id
+    assert registro_geografia.mesa('9', '3', '1A', '7') is None
+    assert registro_geografia.mesa('2', '3', '1A', '8') is None
+
+    distrito = circuito.seccion.distrito
+    # Sin circuito hay dos mesas 7 en la sección.
+    assert sorted(registro_geografia.mesas(distrito_id=distrito.id, numero='7')) == [mesa.id, homonima.id]
+    assert registro_geografia.mesas(distrito_id=distrito.id, numero_circuito='1a', numero='7') == [mesa.id]
+    assert registro_geografia.secciones(distrito.id, '03') == [circuito.seccion.id]
+    assert registro_geografia.circuitos(seccion_id=circuito.seccion.id) == [circuito.id, otro_circuito.id]
+    assert registro_geografia.ubicacion_de_mesa(mesa.id) == (distrito.id, circuito.seccion.id, circuito.id)
+    # Sin criterios no hay restricción.
+    assert registro_geografia.mesas() is None
+
+
+def test_registro_no_consulta_la_base_una_vez_cargado(db, django_assert_num_queries):
+    mesa = MesaFactory()
+    registro_geografia.ubicacion_de_mesa(mesa.id)
+
+    with django_assert_num_queries(0):
+        assert registro_geografia.mesas(circuito_id=mesa.circuito.id, numero=mesa.numero) == [mesa.id]
+        assert registro_geografia.distritos(mesa.circuito.seccion.distrito.numero) == [
+            mesa.circuito.seccion.distrito.id
+        ]
+
+
+def test_registro_se_invalida_con_las_senales(db):
+    mesa = MesaFactory(numero='1')
+    assert registro_geografia.mesas(circuito_id=mesa.circuito.id, numero='1') == [mesa.id]
+
+    mesa.numero = '2'
+    mesa.save()
+    assert registro_geografia.mesas(circuito_id=mesa.circuito.id, numero='1') == []
+    assert registro_geografia.mesas(circuito_id=mesa.circuito.id, numero='2') == [mesa.id]
+
+    # Los cambios que no tocan la geografía no descartan el índice.
+    mesa.electores = 10
+    mesa.save(update_fields=['electores'])
+    assert registro_geografia._datos is not None
+
+    seccion = SeccionFactory()
+    mesa.circuito.seccion = seccion
+    mesa.circuito.save()
+    assert registro_geografia.ubicacion_de_mesa(mesa.id)[:2] == (seccion.distrito.id, seccion.id)
+
+    mesa.delete()
+    assert registro_geografia.ubicacion_de_mesa(mesa.id) is None
@@ -0,0 +1,88 @@
+from django.conf import settings
+import pytest
+
+from elecciones.models import Categoria, Opcion
+from elecciones.registro_metadata import registro, CLAVE_VERSION
+from .factories import CategoriaFactory, CategoriaOpcionFactory, OpcionFactory
+
+
+def test_opciones_actuales_igual_que_la_base(db):
+    o2 = OpcionFactory()
+    o3 = OpcionFactory()
+    c = CategoriaFactory(opciones=[])
+    CategoriaOpcionFactory(categoria=c, orden=2, opcion=o3)
+    CategoriaOpcionFactory(categoria=c, orden=3, opcion=o2)
+    o1 = CategoriaOpcionFactory(categoria=c, orden=1, prioritaria=True).opcion
+
+    for kwargs in [{}, {'solo_prioritarias': True}, {'excluir_optativas': True}]:
+        assert registro.opciones_actuales(c, **kwargs) == list(c.opciones_actuales(**kwargs))
+    assert registro.opciones_actuales(c.id, solo_prioritarias=True) == [o1]
+
+
+def test_registro_no_consulta_la_base_una_vez_cargado(db, django_assert_num_queries):
+    c = CategoriaFactory()
+    registro.opciones_actuales(c)
+
+    nulos = Opcion.objects.get(**settings.OPCION_NULOS)
+
+    with django_assert_num_queries(0):
+        opciones = registro.opciones_actuales(c, excluir_optativas=True)
+        assert Opcion.blancos() in opciones
+        assert Opcion.nulos() == nulos
+        assert Opcion.total_votos().partido is None
+        assert registro.categoria(c.id) == c
+
+
+def test_registro_se_invalida_con_las_senales(db):
+    c = CategoriaFactory(opciones=[])
+    no_partidarias = registro.opciones_actuales(c)
+
+    co = CategoriaOpcionFactory(categoria=c, orden=1)
+    assert registro.opciones_actuales(c) == [co.opcion] + no_partidarias
+    assert registro.opciones_actuales(c, solo_prioritarias=True) == []
+
+    co.prioritaria = True
+    co.save()
+    assert registro.opciones_actuales(c, solo_prioritarias=True) == [co.opcion]
+
+    co.opcion.nombre = 'Nuevo nombre'
+    co.opcion.save()
+    assert registro.opciones_actuales(c)[0].nombre == 'Nuevo nombre'
+
+    co.delete()
+    assert registro.opciones_actuales(c) == no_partidarias
+
+
+def test_registro_recarga_si_otro_proceso_publica_una_version(db, settings, django_assert_num_queries):
+    settings.CACHE_METADATA_ELECTORAL = 'default'
+    settings.INTERVALO_VERIFICACION_METADATA = 0
+    c = CategoriaFactory()
+    registro.invalidar()
+    registro.opciones_actuales(c)
+
+    # Sin cambios publicados no se recarga.
+    with django_assert_num_queries(0):
+        registro.opciones_actuales(c)
+
+    # Otro proceso modificó la metadata.
+    registro.cache.set(CLAVE_VERSION, 'otra version')
+    with django_assert_num_queries(3):
+        registro.opciones_actuales(c)
+
+
+def test_registro_recarga_solo_por_categorias_existentes(db, django_assert_num_queries):
+    c = CategoriaFactory()
+    registro.opciones_actuales(c)
+
+    # Un id inexistente sólo cuesta verificar que no está en la base.
+    with django_assert_num_queries(1):
+        with pytest.raises(Categoria.DoesNotExist):
+            registro.categoria(c.id + 1000)
+    with django_assert_num_queries(1):
+        assert registro.opciones_actuales(c.id + 1000) == []
+
+    # Una categoría creada sin señales se encuentra recargando el registro.
+    (nueva, ) = Categoria.objects.bulk_create(
+        [Categoria(nombre='Nueva', slug='nueva', categoria_general=c.categoria_general)]
+    )
+    assert registro.categoria(nueva.id) == nueva
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.db import DatabaseError
+
+from elecciones.models import Mesa
+from elecciones.proyecciones import SumarizadorCombinado
+from escrutinio_social.conexiones import pool
+from escrutinio_social import replica
+from escrutinio_social.replica import RouterReplica, desde_replica, vista_desde_replica
+
+from .factories import MesaFactory
+
+
+@pytest.fixture(autouse=True)
+def sin_verificaciones_previas():
+    replica._verificaciones.clear()
+    yield
+    replica._verificaciones.clear()
+
+
+@pytest.fixture
+def con_replica(settings):
+    # La "réplica" de los tests es la misma base local.
+    settings.REPLICA_ALIAS = 'default'
+    return settings
+
+
+def test_router_lee_de_la_replica_dentro_del_bloque(db, con_replica):
+    router = RouterReplica()
+    assert router.db_for_read(Mesa) is None
+    with desde_replica():
+        assert router.db_for_read(Mesa) == 'default'
+        # Las sesiones siempre se leen de la principal.
+        assert router.db_for_read(Session) is None
+        with desde_replica():
+            assert router.db_for_read(Mesa) == 'default'
+        assert router.db_for_read(Mesa) == 'default'
+        assert MesaFactory().id in Mesa.objects.values_list('id', flat=True)
+    assert router.db_for_read(Mesa) is None
+    assert router.db_for_write(Mesa) == 'default'
+
+
+def test_sin_replica_se_lee_de_la_principal(db, settings):
+    settings.REPLICA_ALIAS = 'no-configurada'
+    with desde_replica():
+        assert RouterReplica().db_for_read(Mesa) is None
+    assert RouterReplica().allow_migrate('default', 'elecciones') is None
+
+
+def replica_atrasada(alias):
+    return 120
+
+
+def replica_caida(alias):
+    raise DatabaseError('no responde')
+
+
+@pytest.mark.parametrize('retraso', [replica_atrasada, replica_caida])
+def test_replica_atrasada_o_caida_se_lee_de_la_principal(db, con_replica, monkeypatch, retraso):
+    con_replica.REPLICA_RETRASO_MAXIMO = 30
+    monkeypatch.setattr(replica, 'retraso', retraso)
+    with desde_replica():
+        assert RouterReplica().db_for_read(Mesa) is None
+
+    # La verificación se recuerda durante REPLICA_INTERVALO_VERIFICACION segundos.
+    monkeypatch.setattr(replica, 'retraso', lambda alias: 0)
+    assert replica.replica_disponible() is None
+    con_replica.REPLICA_INTERVALO_VERIFICACION = 0
+    assert replica.replica_disponible() == 'default'
+
+
+def test_vista_desde_replica_renderiza_dentro_del_bloque(db, con_replica):
+    class Respuesta():
+        def render(self):
+            self.alias = RouterReplica().db_for_read(Mesa)
+
+    respuesta = vista_desde_replica(lambda request: Respuesta())(None)
+    assert respuesta.alias == 'default'
+
+
+def test_resultados_desde_replica(fiscal_client, url_resultados, con_replica, monkeypatch):
+    leidas = []
+    db_for_read = RouterReplica.db_for_read
+
+    def espiar(self, model, **hints):
+        alias = db_for_read(self, model, **hints)
+        leidas.append(alias)
+        return alias
+
+    monkeypatch.setattr(RouterReplica, 'db_for_read', espiar)
+    response = fiscal_client.get(url_resultados)
+    assert response.status_code == 200
+    assert 'default' in leidas
+
+
+def test_hilos_del_sumarizador_combinado_leen_de_la_misma_base(db, con_replica, monkeypatch):
+    con_replica.SUMARIZADOR_COMBINADO_HILOS = 2
+
+    class SumarizadorEspia():
+        def get_resultados(self, categoria):
+            self.hilo = threading.get_ident()
+            self.alias = RouterReplica().db_for_read(Mesa)
+
+    sumarizadores = [SumarizadorEspia(), SumarizadorEspia()]
+    combinado = SumarizadorCombinado(configuracion=None)
+    monkeypatch.setattr(combinado, 'sumarizadores', lambda: sumarizadores)
+
+    with desde_replica():
+        combinado.resultados_parciales(categoria=None)
+    assert all(sumarizador.hilo != threading.get_ident() for sumarizador in sumarizadores)
+    assert [sumarizador.alias for sumarizador in sumarizadores] == ['default', 'default']
+
+    # Fuera del bloque los hilos leen de la principal.
+    combinado.resultados_parciales(categoria=None)
+    assert [sumarizador.alias for sumarizador in sumarizadores] == [None, None]
+
+    # Los hilos son los del pool del proceso, que se reutiliza entre llamadas.
+    hilos_del_pool = {hilo.ident for hilo in pool('sumarizador_combinado', tamanio=2)._hilos}
+    assert {sumarizador.hilo for sumarizador in sumarizadores} <= hilos_del_pool
@@ -1,10 +1,14 @@
+import pytest
 from django.conf import settings
+from django.test import override_settings
 from django.urls import reverse
 from django.contrib.auth.models import Group
 from http import HTTPStatus
 from elecciones.models import (
-    Categoria, MesaCategoria, Carga, Seccion, Opcion, CategoriaOpcion, OPCIONES_A_CONSIDERAR
+    Categoria, MesaCategoria, Carga, Seccion, Opcion, CategoriaOpcion, OPCIONES_A_CONSIDERAR,
+    TIPOS_DE_AGREGACIONES, Mesa, electores_diferidos, recalcular_electores,
 )
+from elecciones.sumarizador import Sumarizador
 
 from .factories import (
     UserFactory,
@@ -579,7 +583,8 @@ def test_siguiente_accion_cargar_acta(client, setup_groups, settings):
     assert response.url == reverse('carga-total', args=(mc1.id, ))
 
 
-def test_resultados_no_positivos(fiscal_client):
+@pytest.mark.parametrize('votos_compactos', [False, True])
+def test_resultados_no_positivos(fiscal_client, votos_compactos):
     o1, o2 = OpcionFactory.create_batch(2)
     e1 = CategoriaFactory(opciones=[o1, o2])
 
@@ -600,9 +605,10 @@ def test_resultados_no_positivos(fiscal_client):
     c1.actualizar_firma()
     consumir_novedades_y_actualizar_objetos()
 
-    response = fiscal_client.get(
-        reverse('resultados-categoria', args=[e1.id]) + '?opcionaConsiderar=prioritarias'
-    )
+    with override_settings(SUMARIZADOR_VOTOS_COMPACTOS=votos_compactos):
+        response = fiscal_client.get(
+            reverse('resultados-categoria', args=[e1.id]) + '?opcionaConsiderar=prioritarias'
+        )
 
     resultados = response.context['resultados']
 
@@ -686,6 +692,38 @@ def test_actualizar_electores(carta_marina):
     assert d.electores == 100 * 2 + 120 * 2 + 90 * 4
 
 
+def test_electores_diferidos(carta_marina, django_assert_num_queries):
+    """
+    prueba :func:`elecciones.models.electores_diferidos` y :func:`elecciones.models.recalcular_electores`
+    """
+    m1 = carta_marina[0]
+    lugar = m1.lugar_votacion
+    c1 = lugar.circuito
+    with electores_diferidos():
+        with electores_diferidos():
+            # Sin agregaciones por mesa: sólo el UPDATE de la mesa.
+            with django_assert_num_queries(1):
+                m1.electores = 150
+                m1.save(update_fields=['electores'])
+        c1.refresh_from_db()
+        assert c1.electores == 100 * 2
+        MesaFactory(lugar_votacion=lugar, circuito=c1, electores=10)
+
+    c1.refresh_from_db()
+    assert c1.electores == 150 + 100 + 10
+    lugar.refresh_from_db()
+    assert lugar.electores == 150 + 10
+    d = c1.seccion.distrito
+    d.refresh_from_db()
+    assert d.electores == 150 + 100 + 10 + 120 * 2 + 90 * 4
+
+    # Sin mesas los electores quedan en cero.
+    Mesa.objects.filter(circuito=c1).delete()
+    recalcular_electores()
+    c1.refresh_from_db()
+    assert c1.electores == 0
+
+
 def test_permisos_vistas(setup_groups, url_resultados, client):
     u_visualizador = UserFactory()
     FiscalFactory(user=u_visualizador)
@@ -749,3 +787,34 @@ def test_categorias_sensible(setup_groups, client):
     # El usuario visualizador sensible puede ver resultado no sensible.
     response = client.get(c_url, {'opcionaConsiderar': 'todas'})
     assert response.status_code == 200
+
+
+def test_votos_compactos_con_y_sin_vector(db):
+    o1, o2 = OpcionFactory.create_batch(2)
+    categoria = CategoriaFactory(opciones=[o1, o2])
+    CategoriaOpcion.objects.filter(categoria=categoria).update(prioritaria=True)
+    cargas = []
+    for votos in ((10, 20), (1, 2), (100, 200)):
+        for _ in range(2):
+            # Doble carga coincidente para que se consolide.
+            carga = CargaFactory(
+                mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.parcial,
+                **({'mesa_categoria': cargas[-1].mesa_categoria} if len(cargas) % 2 else {})
+            )
+            cargar_votos(carga, dict(zip([o1, o2], votos)))
+            cargas.append(carga)
+    consumir_novedades_y_actualizar_objetos()
+
+    # Una de las cargas testigo todavía no tiene el vector.
+    testigo = MesaCategoria.objects.get(id=cargas[0].mesa_categoria_id).carga_testigo
+    Carga.objects.filter(id=testigo.id).update(votos_compactos=None)
+
+    def votos_por_opcion(votos_compactos):
+        sumarizador = Sumarizador(tipo_de_agregacion=TIPOS_DE_AGREGACIONES.solo_consolidados_doble_carga)
+        sumarizador.categoria = categoria
+        with override_settings(SUMARIZADOR_VOTOS_COMPACTOS=votos_compactos):
+            return dict(sumarizador.votos_por_opcion(categoria))
+
+    compactos = votos_por_opcion(True)
+    assert compactos == votos_por_opcion(False)
+    assert (compactos[o1.id], compactos[o2.id]) == (111, 222)
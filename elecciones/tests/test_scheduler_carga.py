@@ -21,13 +21,12 @@ from problemas.models import Problema, ReporteDeProblema
 @pytest.fixture
 def setup_constance(db):
     """
-    Cuando se pide alguna config, Constance realiza por unica vez el setup
-    de los definiciones por default de todas aquellas que no hayan sido explicitamente
-    modificadas.
-    Este fixture tiene el fin de forzar esa inilizacion para
+    La primera vez que se pide alguna config se cargan todos los valores de Constance
+    (ver ``elecciones.registro_config``).
+    Este fixture tiene el fin de forzar esa inicialización para
     no afectar artificialmente el computo cuando se mide el numero de queries
     """
-    from constance import config
+    from elecciones.registro_config import config
     config.PRIORIDAD_STATUS
 
 
@@ -75,7 +74,7 @@ def test_siguiente_prioriza_estado_y_luego_coeficiente(db, settings, setup_const
         coeficiente_para_orden_de_carga=2.0,
         mesa=m3
     )
-    with django_assert_num_queries(17):
+    with django_assert_num_queries(1):
         assert MesaCategoria.objects.siguiente() == mc1
 
     for i in range(settings.MIN_COINCIDENCIAS_CARGAS):
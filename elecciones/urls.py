@@ -44,6 +44,11 @@ urlpatterns = [
         views.limpiar_busqueda, name='limpiar-busqueda'),
     url(r'^eleccion_efectiva_distrito_o_seccion/(?P<donde_volver>(\w|-)+)$',
         views.eleccion_efectiva_distrito_o_seccion, name='eleccion-efectiva-distrito-o-seccion'),
+    url(
+        r'^arbol-geografia-(?P<hash>[0-9a-f]+).json$',
+        views.arbol_geografia_json,
+        name='arbol-geografia'
+    ),
     url(
         r'^resultados-nuevo-menu/(?P<categoria_id>\d+)?$',
         cache_page(60 * 60)(views.menu_lateral_resultados),
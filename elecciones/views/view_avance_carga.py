@@ -2,12 +2,15 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.decorators import method_decorator
 from django.utils.text import get_text_list
 from django.views.generic.base import TemplateView
 
 from .definiciones import VisualizadoresOnlyMixin
+from .view_resultados import url_arbol_geografia
 
 from escrutinio_social import settings
+from escrutinio_social.replica import vista_desde_replica
 
 from fiscales.models import Fiscal
 
@@ -18,7 +21,6 @@ from elecciones.models import (
     Categoria,
     LugarVotacion,
     Mesa,
-    MesaCategoria,
     OPCIONES_A_CONSIDERAR,
     TIPOS_DE_AGREGACIONES,
     NIVELES_AGREGACION,
@@ -31,7 +33,7 @@ from elecciones.resultados_resumen import (
     GeneradorDatosFotosConsolidado, GeneradorDatosPreidentificacionesConsolidado,
     GeneradorDatosCargaParcialConsolidado, GeneradorDatosCargaTotalConsolidado,
     GeneradorDatosFotosPorDistrito, GeneradorDatosFotosDistritoPorSeccion,
-    GeneradorDatosCargaParcialDiscriminada,
+    GeneradorDatosCargaParcialDiscriminada, ContadoresResumen,
     SinRestriccion, RestriccionPorDistrito, RestriccionPorSeccion
 )
 
@@ -41,6 +43,7 @@ from django.utils.six.moves.urllib.parse import urlsplit
 ESTRUCTURA = {None: Seccion, Seccion: Circuito, Circuito: LugarVotacion, LugarVotacion: Mesa, Mesa: None}
 
 
+@method_decorator(vista_desde_replica, name='dispatch')
 class AvanceDeCargaCategoria(VisualizadoresOnlyMixin, TemplateView):
     """
     Vista principal avance de carga de actas.
@@ -123,13 +126,7 @@ def menu_lateral_avance_carga(request, categoria_id):
         return redirect('avance-carga-nuevo-menu', categoria_id=categoria)
 
     context = {}
-    context['distritos'] = Distrito.objects.all().extra(
-        select={'numero_int': 'CAST(numero AS INTEGER)'}
-    ).prefetch_related(
-        'secciones_politicas',
-        'secciones',
-        'secciones__circuitos'
-    ).order_by('numero_int')
+    context['url_arbol'] = url_arbol_geografia()
     context['cat_id'] = categoria
 
     # Agrego al contexto el host del servidor para armar los links del menú
@@ -138,6 +135,7 @@ def menu_lateral_avance_carga(request, categoria_id):
 
     return render(request, 'elecciones/menu-lateral-avance-carga.html', context=context)
 
+@method_decorator(vista_desde_replica, name='dispatch')
 class AvanceDeCargaResumen(TemplateView):
     """
     Vista principal avance de carga resumen
@@ -180,25 +178,31 @@ class AvanceDeCargaResumen(TemplateView):
         ahora = timezone.now()
         desde = ahora - timedelta(minutes=5)
         context['fiscales_activos'] = Fiscal.objects.filter(last_seen__gt=desde).count()
+        # los datos consolidados salen de los contadores del avance, con una única consulta
+        contadores = None
+        if settings.RESUMEN_AVANCE_DESDE_CONTADORES:
+            contadores = ContadoresResumen(self.restriccion_geografica, [
+                settings.SLUG_CATEGORIA_PRESI_Y_VICE, settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA,
+                self.categoria.slug
+            ])
         # data fotos
-        generador_datos_fotos = GeneradorDatosFotosConsolidado(self.restriccion_geografica)
+        generador_datos_fotos = GeneradorDatosFotosConsolidado(self.restriccion_geografica, contadores)
         context['data_fotos_nacion_pba_restriccion'] = generador_datos_fotos.datos_nacion_pba_restriccion()
         context['data_fotos_solo_nacion'] = generador_datos_fotos.datos_solo_nacion()
         # data carga
         generador_datos_carga_parcial = GeneradorDatosCargaParcialConsolidado(
-            self.restriccion_geografica, self.categoria)
+            self.restriccion_geografica, self.categoria, contadores)
         if self.base_carga_parcial == "solo_con_fotos":
-            generador_datos_carga_parcial.set_query_base(
-                MesaCategoria.objects.exclude(mesa__attachments=None))
+            generador_datos_carga_parcial.solo_mesas_con_fotos()
         generador_datos_carga_total = GeneradorDatosCargaTotalConsolidado(
-            self.restriccion_geografica, self.categoria)
+            self.restriccion_geografica, self.categoria, contadores)
         if self.base_carga_total == "solo_con_fotos":
-            generador_datos_carga_total.set_query_base(MesaCategoria.objects.exclude(mesa__attachments=None))
+            generador_datos_carga_total.solo_mesas_con_fotos()
         context['data_carga_parcial'] = generador_datos_carga_parcial.datos()
         context['data_carga_total'] = generador_datos_carga_total.datos()
         # data preidentificaciones
         context['data_preidentificaciones'] = GeneradorDatosPreidentificacionesConsolidado(
-            self.restriccion_geografica).datos()
+            self.restriccion_geografica, contadores).datos()
         # data extra
         context['detalle_foto'] = self.detalle_foto
         context['detalle_carga_parcial_confirmada'] = self.detalle_carga_parcial_confirmada
@@ -212,17 +216,17 @@ class AvanceDeCargaResumen(TemplateView):
         # detalle carga parcial confirmada
         if self.detalle_carga_parcial_confirmada == 'distrito':
             context['datos_detalle_carga_parcial_confirmada'] = GeneradorDatosCargaParcialDiscriminada(
-                settings.SLUG_CATEGORIA_PRESI_Y_VICE, 'mesa__circuito__seccion__distrito__nombre').para_carga_confirmada().datos()
+                settings.SLUG_CATEGORIA_PRESI_Y_VICE, 'distrito__nombre').para_carga_confirmada().datos()
         elif self.detalle_carga_parcial_confirmada == 'seccion':
             context['datos_detalle_carga_parcial_confirmada'] = GeneradorDatosCargaParcialDiscriminada(
-                settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, 'mesa__circuito__seccion__nombre').para_carga_confirmada().datos()
+                settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, 'seccion__nombre').para_carga_confirmada().datos()
         # detalle carga parcial csv
         if self.detalle_carga_parcial_csv == 'distrito':
             context['datos_detalle_carga_parcial_csv'] = GeneradorDatosCargaParcialDiscriminada(
-                settings.SLUG_CATEGORIA_PRESI_Y_VICE, 'mesa__circuito__seccion__distrito__nombre').para_carga_csv().datos()
+                settings.SLUG_CATEGORIA_PRESI_Y_VICE, 'distrito__nombre').para_carga_csv().datos()
         elif self.detalle_carga_parcial_csv == 'seccion':
             context['datos_detalle_carga_parcial_csv'] = GeneradorDatosCargaParcialDiscriminada(
-                settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, 'mesa__circuito__seccion__nombre').para_carga_csv().datos()
+                settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, 'seccion__nombre').para_carga_csv().datos()
         # data relacionada con navegación
         context['base_carga_parcial'] = self.base_carga_parcial
         context['base_carga_total'] = self.base_carga_total
@@ -1,8 +1,11 @@
 from urllib import parse
 from django.utils.six.moves.urllib.parse import urlsplit
 from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 from django.utils.text import get_text_list
 from django.views.generic.base import TemplateView
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -14,7 +17,6 @@ import django_excel as excel
 
 from elecciones.models import (
     MesaCategoria,
-    Distrito,
     Seccion,
     Circuito,
     Categoria,
@@ -28,8 +30,30 @@ from elecciones.models import (
     NIVELES_DE_AGREGACION,
 )
 
+from elecciones import arbol_geografia
 from elecciones.proyecciones import Proyecciones, create_sumarizador
 from elecciones.sumarizador import NIVEL_DE_AGREGACION
+from escrutinio_social.replica import vista_desde_replica
+
+
+def url_arbol_geografia():
+    return reverse('arbol-geografia', kwargs={'hash': arbol_geografia.arbol_serializado().hash})
+
+
+@login_required
+@user_passes_test(lambda u: u.fiscal.esta_en_grupo('visualizadores'), login_url='permission-denied')
+def arbol_geografia_json(request, hash):
+    """
+    El árbol de la geografía de los menús laterales (ver ``elecciones.arbol_geografia``).
+    La URL lleva el hash del contenido, así que la respuesta no cambia nunca y el navegador
+    la puede guardar; si el hash ya no es el vigente se redirige al actual.
+    """
+    arbol = arbol_geografia.arbol_serializado()
+    if hash != arbol.hash:
+        return redirect('arbol-geografia', hash=arbol.hash)
+    response = HttpResponse(arbol.contenido, content_type='application/json')
+    patch_cache_control(response, private=True, max_age=settings.ARBOL_GEOGRAFIA_MAX_AGE, immutable=True)
+    return response
 
 
 @login_required
@@ -43,13 +67,7 @@ def menu_lateral_resultados(request, categoria_id):
             categoria = Categoria.objects.get(slug=settings.SLUG_CATEGORIA_PRESI_Y_VICE).id
             return redirect('resultados-nuevo-menu', categoria_id=categoria)
     context = {}
-    context['distritos'] = Distrito.objects.all().extra(
-        select={'numero_int': 'CAST(numero AS INTEGER)'}
-    ).prefetch_related(
-        'secciones_politicas',
-        'secciones',
-        'secciones__circuitos'
-    ).order_by('numero_int')
+    context['url_arbol'] = url_arbol_geografia()
     context['cat_id'] = categoria
 
     # Agrego al contexto el host del servidor para armar los links del menú
@@ -59,6 +77,7 @@ def menu_lateral_resultados(request, categoria_id):
     return render(request, 'elecciones/menu-lateral-resultados.html', context=context)
 
 
+@method_decorator(vista_desde_replica, name='dispatch')
 class ResultadosCategoriaBase(VisualizadoresOnlyMixin, TemplateView):
     """
     Clase base para subclasear vistas de resultados
@@ -124,11 +143,7 @@ class ResultadosCategoriaBase(VisualizadoresOnlyMixin, TemplateView):
             categorias = categorias.exclude(sensible=True)
 
         context['categorias'] = categorias.order_by('id')
-        context['distritos'] = Distrito.objects.all().prefetch_related(
-            'secciones_politicas',
-            'secciones',
-            'secciones__circuitos'
-        ).order_by('numero')
+        context['distritos'] = arbol_geografia.distritos()
         return context
 
     def create_sumarizador(self):
@@ -0,0 +1,216 @@
+"""
+Conexiones persistentes a la base para los procesos web y los comandos de larga duración.
+
+Con ``CONN_MAX_AGE`` (variable de entorno ``DB_CONN_MAX_AGE``) cada proceso (y cada hilo) reutiliza su
+conexión en lugar de abrir una por request. Django descarta las conexiones vencidas o con errores
+al empezar y terminar cada request, pero no detecta las que cortó el servidor (un reinicio,
+pgbouncer, un timeout por inactividad). Con ``settings.DB_VERIFICAR_CONEXIONES``, al empezar
+cada request se verifica (``is_usable()``) cada conexión que se va a reutilizar, y si no responde
+se cierra para que Django abra una nueva. Cuesta una consulta por conexión abierta (incluida la de
+la réplica, aunque el request no la use) en cada request, así que está desactivado por defecto:
+conviene activarlo sólo si hay algo en el medio que corta las conexiones inactivas.
+
+Los comandos que corren en loop (scheduler, consolidador, importadores) no pasan por
+``request_started``: llaman a :func:`reciclar_conexiones` en cada vuelta.
+
+Cada hilo tiene su propia conexión. :class:`PoolDeConexiones` es un pool de hilos de tamaño fijo
+para el trabajo en segundo plano: cada hilo mantiene su conexión entre tareas, así que la cantidad
+de conexiones que usa el proceso queda acotada por el tamaño del pool.
+
+Las conexiones abiertas por el proceso y el estado de los pools se exponen en la instrumentación
+(ver ``metricas``). En total, la base necesita::
+
+    max_connections >= procesos * (1 + hilos de sus pools) + hilos de cada comando
+"""
+from concurrent.futures import Future
+import queue
+import threading
+import weakref
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class RegistroConexiones():
+    """
+    Contadores de las conexiones del proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Los DatabaseWrapper (uno por hilo y alias) que abrieron alguna conexión.
+        self._wrappers = weakref.WeakSet()
+        self.pools = weakref.WeakSet()
+        self.creadas = 0
+        self.verificadas = 0
+        self.descartadas = 0
+
+    def conexion_creada(self, wrapper):
+        with self._lock:
+            self._wrappers.add(wrapper)
+            self.creadas += 1
+
+    def conexion_verificada(self, descartada):
+        with self._lock:
+            self.verificadas += 1
+            if descartada:
+                self.descartadas += 1
+
+    def abiertas(self):
+        with self._lock:
+            return sum(1 for wrapper in self._wrappers if wrapper.connection is not None)
+
+    def estado(self):
+        """
+        Diccionario con los contadores, para loguear o exportar.
+        """
+        pools = list(self.pools)
+        return {
+            'conexiones_abiertas': self.abiertas(),
+            'conexiones_creadas': self.creadas,
+            'conexiones_verificadas': self.verificadas,
+            'conexiones_descartadas': self.descartadas,
+            'pool_tamanio': sum(pool.tamanio for pool in pools),
+            'pool_ocupados': sum(pool.ocupados for pool in pools),
+            'pool_pendientes': sum(pool.pendientes() for pool in pools),
+        }
+
+
+registro_conexiones = RegistroConexiones()
+
+
+@receiver(connection_created)
+def contar_conexion(sender, connection, **kwargs):
+    registro_conexiones.conexion_creada(connection)
+
+
+def verificar_conexiones():
+    """
+    Cierra las conexiones del hilo actual que ya no responden. Las que están dentro
+    de una transacción no se tocan.
+    """
+    for conexion in connections.all():
+        if conexion.connection is None or conexion.in_atomic_block:
+            continue
+        usable = conexion.is_usable()
+        registro_conexiones.conexion_verificada(descartada=not usable)
+        if not usable:
+            logger.warning('conexión descartada', alias=conexion.alias)
+            conexion.close()
+
+
+def reciclar_conexiones():
+    """
+    Lo mismo que se hace al empezar un request, para los loops de los comandos:
+    descarta las conexiones vencidas (``CONN_MAX_AGE``) o con errores y verifica las demás.
+    Como en ``verificar_conexiones``, las que están dentro de una transacción no se tocan.
+    """
+    for conexion in connections.all():
+        if not conexion.in_atomic_block:
+            conexion.close_if_unusable_or_obsolete()
+    if settings.DB_VERIFICAR_CONEXIONES:
+        verificar_conexiones()
+
+
+@receiver(request_started)
+def verificar_conexiones_al_empezar_el_request(sender, **kwargs):
+    if settings.DB_VERIFICAR_CONEXIONES:
+        verificar_conexiones()
+
+
+class PoolDeConexiones():
+    """
+    Hilos de trabajo, cada uno con su conexión persistente a la base::
+
+        pool = PoolDeConexiones('importacion_csv', tamanio=2)
+        futuro = pool.ejecutar(funcion, *args)
+        ...
+        pool.cerrar()
+
+    Las tareas se encolan y se ejecutan en orden a medida que se libera un hilo. ``ejecutar``
+    devuelve un ``concurrent.futures.Future`` con el resultado de la tarea. Antes de cada
+    tarea se reciclan las conexiones del hilo (ver :func:`reciclar_conexiones`); al cerrar el pool
+    se cierran.
+    """
+
+    def __init__(self, nombre, tamanio):
+        self.nombre = nombre
+        self.tamanio = tamanio
+        self.ocupados = 0
+        self._lock = threading.Lock()
+        self._tareas = queue.Queue()
+        self._hilos = [
+            threading.Thread(target=self._trabajar, name=f'{nombre}-{i}', daemon=True)
+            for i in range(tamanio)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+        registro_conexiones.pools.add(self)
+        logger.info('pool de conexiones iniciado', pool=nombre, tamanio=tamanio)
+
+    def pendientes(self):
+        return self._tareas.qsize()
+
+    def ejecutar(self, funcion, *args, **kwargs):
+        futuro = Future()
+        self._tareas.put((futuro, funcion, args, kwargs))
+        return futuro
+
+    def _trabajar(self):
+        while True:
+            tarea = self._tareas.get()
+            if tarea is None:
+                break
+            futuro, funcion, args, kwargs = tarea
+            with self._lock:
+                self.ocupados += 1
+            try:
+                reciclar_conexiones()
+                futuro.set_result(funcion(*args, **kwargs))
+            except Exception as e:
+                logger.exception('error en tarea del pool', pool=self.nombre)
+                futuro.set_exception(e)
+            finally:
+                with self._lock:
+                    self.ocupados -= 1
+                self._tareas.task_done()
+        connections.close_all()
+
+    def esperar(self):
+        """
+        Espera a que terminen todas las tareas encoladas.
+        """
+        self._tareas.join()
+
+    def cerrar(self):
+        for _ in self._hilos:
+            self._tareas.put(None)
+        for hilo in self._hilos:
+            hilo.join()
+        registro_conexiones.pools.discard(self)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool(nombre, tamanio=None):
+    """
+    El pool del proceso con ese nombre, de ``tamanio`` hilos (por defecto
+    ``settings.POOL_CONEXIONES[nombre]``). El tamaño sólo se tiene en cuenta al crearlo.
+    Devuelve ``None`` si el pool no está configurado (o tiene tamaño 0).
+    """
+    if tamanio is None:
+        tamanio = settings.POOL_CONEXIONES.get(nombre)
+    if not tamanio:
+        return None
+    with _pools_lock:
+        if nombre not in _pools:
+            _pools[nombre] = PoolDeConexiones(nombre, tamanio)
+        return _pools[nombre]
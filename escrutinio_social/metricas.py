@@ -0,0 +1,341 @@
+"""
+Instrumentación de los caminos calientes de la aplicación.
+
+Por cada endpoint (vía :class:`MetricasMiddleware`) o fase de los comandos
+(vía el context manager :func:`medir`) se registra:
+
+    - la cantidad de consultas SQL,
+    - el tiempo pasado en la base,
+    - el tiempo total y, por diferencia, el tiempo en Python.
+
+Cada medición se emite como evento de structlog (junto con las conexiones a la base abiertas
+por el proceso) y se acumula en ``registro_metricas``. Los acumulados son por proceso: cada uno
+(los workers web y también los comandos, como el scheduler y el consolidador) los publica junto
+con el estado de sus conexiones y pools (ver ``conexiones``) en el caché compartido
+``settings.CACHE_METRICAS``, como mucho cada ``settings.METRICAS_INTERVALO_PUBLICACION`` segundos.
+``/metrics`` los expone todos en formato de texto de Prometheus, con el label ``proceso``, de modo
+que da lo mismo qué worker atienda cada consulta.
+
+Si ``settings.PRESUPUESTO_CONSULTAS`` define un máximo de consultas para un nombre
+y una medición lo supera, se loguea un warning; con ``settings.PRESUPUESTO_CONSULTAS_ESTRICTO``
+además se lanza :class:`PresupuestoExcedido` (útil en los tests).
+"""
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+import structlog
+
+from .conexiones import registro_conexiones
+
+logger = structlog.get_logger(__name__)
+
+# Clave del caché con los procesos que publicaron métricas (y cuándo lo hicieron por última vez).
+CLAVE_PROCESOS = 'escrutinio_social.metricas.procesos'
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+class Medicion():
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.tiempo_total = 0.0
+
+    @property
+    def tiempo_python(self):
+        return max(self.tiempo_total - self.tiempo_db, 0.0)
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Se instala como ``execute_wrapper`` de las conexiones mientras dura la medición.
+        """
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.tiempo_db += time.perf_counter() - inicio
+
+
+# (clave en registro_conexiones.estado(), métrica, tipo, ayuda)
+METRICAS_CONEXIONES = [
+    ('conexiones_abiertas', 'escrutinio_conexiones_abiertas', 'gauge', 'Conexiones a la base abiertas.'),
+    (
+        'conexiones_creadas', 'escrutinio_conexiones_creadas_total', 'counter',
+        'Conexiones a la base creadas.'
+    ),
+    (
+        'conexiones_verificadas', 'escrutinio_conexiones_verificadas_total', 'counter',
+        'Verificaciones de conexiones reutilizadas.'
+    ),
+    (
+        'conexiones_descartadas', 'escrutinio_conexiones_descartadas_total', 'counter',
+        'Conexiones reutilizadas que no respondían.'
+    ),
+    ('pool_tamanio', 'escrutinio_pool_hilos', 'gauge', 'Hilos de los pools de conexiones.'),
+    ('pool_ocupados', 'escrutinio_pool_hilos_ocupados', 'gauge', 'Hilos de los pools ejecutando una tarea.'),
+    ('pool_pendientes', 'escrutinio_pool_tareas_pendientes', 'gauge', 'Tareas encoladas en los pools.'),
+]
+
+
+def proceso_actual():
+    """
+    Identifica al proceso en el label ``proceso`` (se calcula cada vez: los workers se forkean).
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def cache_metricas():
+    return caches[settings.CACHE_METRICAS]
+
+
+def _etiquetas(nombre=None, proceso=None):
+    etiquetas = []
+    if nombre is not None:
+        etiquetas.append(f'nombre="{nombre}"')
+    if proceso is not None:
+        etiquetas.append(f'proceso="{proceso}"')
+    return '{' + ','.join(etiquetas) + '}' if etiquetas else ''
+
+
+def exportar(instantaneas):
+    """
+    Devuelve en el formato de texto de Prometheus las instantáneas (ver
+    :meth:`RegistroMetricas.instantanea`) de ``{proceso: instantanea}``. Con proceso ``None``
+    no se agrega el label.
+    """
+    lineas = []
+    contadores = [
+        ('llamadas', 'escrutinio_llamadas_total', 'Cantidad de mediciones.'),
+        ('consultas', 'escrutinio_consultas_total', 'Consultas SQL ejecutadas.'),
+        ('tiempo_db', 'escrutinio_tiempo_db_segundos_total', 'Tiempo en la base de datos.'),
+        ('tiempo_python', 'escrutinio_tiempo_python_segundos_total', 'Tiempo fuera de la base de datos.'),
+    ]
+    procesos = sorted(instantaneas, key=str)
+    for clave, metrica, ayuda in contadores:
+        lineas.append(f'# HELP {metrica} {ayuda}')
+        lineas.append(f'# TYPE {metrica} counter')
+        for proceso in procesos:
+            acumulados = instantaneas[proceso]['acumulados']
+            for nombre in sorted(acumulados):
+                lineas.append(f'{metrica}{_etiquetas(nombre, proceso)} {acumulados[nombre][clave]:g}')
+
+    metrica = 'escrutinio_duracion_segundos'
+    lineas.append(f'# HELP {metrica} Duración total de cada medición.')
+    lineas.append(f'# TYPE {metrica} histogram')
+    for proceso in procesos:
+        acumulados = instantaneas[proceso]['acumulados']
+        for nombre in sorted(acumulados):
+            acumulado = acumulados[nombre]
+            buckets = instantaneas[proceso]['buckets'].get(nombre, {})
+            etiquetas = _etiquetas(nombre, proceso)[:-1]
+            for limite in settings.METRICAS_BUCKETS_DURACION:
+                lineas.append(f'{metrica}_bucket{etiquetas},le="{limite:g}"}} {buckets.get(limite, 0)}')
+            lineas.append(f'{metrica}_bucket{etiquetas},le="+Inf"}} {acumulado["llamadas"]:g}')
+            lineas.append(f'{metrica}_sum{etiquetas}}} {acumulado["tiempo_total"]:g}')
+            lineas.append(f'{metrica}_count{etiquetas}}} {acumulado["llamadas"]:g}')
+
+    for clave, metrica, tipo, ayuda in METRICAS_CONEXIONES:
+        lineas.append(f'# HELP {metrica} {ayuda}')
+        lineas.append(f'# TYPE {metrica} {tipo}')
+        for proceso in procesos:
+            valor = instantaneas[proceso]['conexiones'][clave]
+            lineas.append(f'{metrica}{_etiquetas(proceso=proceso)} {valor}')
+    return '\n'.join(lineas) + '\n'
+
+
+class RegistroMetricas():
+    """
+    Acumula las mediciones agrupadas por nombre.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self._acumulados = defaultdict(lambda: defaultdict(float))
+            self._buckets = defaultdict(lambda: defaultdict(int))
+            self._publicado = None
+
+    def registrar(self, medicion):
+        with self._lock:
+            acumulado = self._acumulados[medicion.nombre]
+            acumulado['llamadas'] += 1
+            acumulado['consultas'] += medicion.consultas
+            acumulado['tiempo_db'] += medicion.tiempo_db
+            acumulado['tiempo_python'] += medicion.tiempo_python
+            acumulado['tiempo_total'] += medicion.tiempo_total
+            buckets = self._buckets[medicion.nombre]
+            for limite in settings.METRICAS_BUCKETS_DURACION:
+                if medicion.tiempo_total <= limite:
+                    buckets[limite] += 1
+
+    def acumulado(self, nombre):
+        with self._lock:
+            return dict(self._acumulados.get(nombre, {}))
+
+    def instantanea(self):
+        """
+        Copia de los acumulados y del estado de las conexiones, para publicar o exportar.
+        """
+        with self._lock:
+            acumulados = {nombre: dict(acumulado) for nombre, acumulado in self._acumulados.items()}
+            buckets = {nombre: dict(porlimite) for nombre, porlimite in self._buckets.items()}
+        return {'acumulados': acumulados, 'buckets': buckets, 'conexiones': registro_conexiones.estado()}
+
+    def exportar(self):
+        """
+        Devuelve los acumulados de este proceso en el formato de texto de Prometheus.
+        """
+        return exportar({None: self.instantanea()})
+
+    def publicar(self, forzar=False):
+        """
+        Publica la instantánea de este proceso en el caché compartido, si pasó el intervalo
+        desde la última vez (o si se fuerza).
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            if not forzar and self._publicado is not None and (
+                ahora - self._publicado < settings.METRICAS_INTERVALO_PUBLICACION
+            ):
+                return
+            self._publicado = ahora
+        proceso = proceso_actual()
+        cache = cache_metricas()
+        cache.set(f'{CLAVE_PROCESOS}.{proceso}', self.instantanea(), settings.METRICAS_EXPIRACION)
+        # Sin lock entre procesos: si dos se pisan, el perdido se vuelve a anotar al publicar de nuevo.
+        vigentes = time.time() - settings.METRICAS_EXPIRACION
+        procesos = {
+            otro: momento for otro, momento in (cache.get(CLAVE_PROCESOS) or {}).items()
+            if momento > vigentes
+        }
+        procesos[proceso] = time.time()
+        cache.set(CLAVE_PROCESOS, procesos, None)
+
+    def exportar_procesos(self):
+        """
+        Devuelve en el formato de texto de Prometheus lo publicado por todos los procesos.
+        """
+        self.publicar(forzar=True)
+        cache = cache_metricas()
+        claves = {f'{CLAVE_PROCESOS}.{proceso}': proceso for proceso in cache.get(CLAVE_PROCESOS) or {}}
+        return exportar({claves[clave]: valor for clave, valor in cache.get_many(claves).items()})
+
+
+registro_metricas = RegistroMetricas()
+
+
+def verificar_presupuesto(medicion):
+    presupuesto = settings.PRESUPUESTO_CONSULTAS.get(medicion.nombre)
+    if presupuesto is None or medicion.consultas <= presupuesto:
+        return
+    logger.warning(
+        'presupuesto de consultas excedido',
+        nombre=medicion.nombre, consultas=medicion.consultas, presupuesto=presupuesto
+    )
+    if settings.PRESUPUESTO_CONSULTAS_ESTRICTO:
+        raise PresupuestoExcedido(
+            f'{medicion.nombre} ejecutó {medicion.consultas} consultas '
+            f'(el presupuesto es {presupuesto})'
+        )
+
+
+@contextmanager
+def midiendo(medicion):
+    """
+    Mide el bloque en ``medicion`` sin registrarla ni loguearla.
+    """
+    inicio = time.perf_counter()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(medicion))
+        try:
+            yield medicion
+        finally:
+            medicion.tiempo_total = time.perf_counter() - inicio
+
+
+def _registrar(medicion, **contexto):
+    registro_metricas.registrar(medicion)
+    try:
+        registro_metricas.publicar()
+    except Exception:
+        # Las métricas no deben interrumpir el request o la fase medida.
+        logger.exception('no se pudieron publicar las metricas')
+    logger.info(
+        'metricas',
+        nombre=medicion.nombre,
+        consultas=medicion.consultas,
+        tiempo_db=round(medicion.tiempo_db, 4),
+        tiempo_python=round(medicion.tiempo_python, 4),
+        tiempo_total=round(medicion.tiempo_total, 4),
+        conexiones_abiertas=registro_conexiones.abiertas(),
+        **contexto
+    )
+    verificar_presupuesto(medicion)
+
+
+@contextmanager
+def medir(nombre, **contexto):
+    """
+    Mide las consultas y el tiempo del bloque::
+
+        with medir('consumir_novedades') as medicion:
+            ...
+        medicion.consultas
+
+    ``contexto`` se agrega al evento de structlog.
+    """
+    with midiendo(Medicion(nombre)) as medicion:
+        yield medicion
+    _registrar(medicion, **contexto)
+
+
+class MetricasMiddleware:
+    """
+    Mide cada request y lo registra con el nombre de la vista que lo atendió.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with midiendo(Medicion(None)) as medicion:
+            response = self.get_response(request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match:
+            medicion.nombre = resolver_match.view_name or resolver_match._func_path
+        else:
+            medicion.nombre = 'sin_resolver'
+        _registrar(medicion, status=response.status_code)
+        return response
+
+
+def metricas(request):
+    """
+    Expone los acumulados de todos los procesos para Prometheus. Si ``settings.METRICAS_TOKEN`` está
+    definido se requiere ``Authorization: Bearer <token>``; si no, un usuario staff.
+    """
+    token = settings.METRICAS_TOKEN
+    if token:
+        autorizado = request.META.get('HTTP_AUTHORIZATION') == f'Bearer {token}'
+    else:
+        autorizado = request.user.is_authenticated and request.user.is_staff
+    if not autorizado:
+        return HttpResponseForbidden()
+    return HttpResponse(registro_metricas.exportar_procesos(), content_type='text/plain; version=0.0.4')
@@ -5,6 +5,26 @@ MIN_COINCIDENCIAS_CARGAS = 2
 MIN_COINCIDENCIAS_IDENTIFICACION_PROBLEMA = 2
 MIN_COINCIDENCIAS_CARGAS_PROBLEMA = 2
 
+# En los tests todo corre en un único proceso.
+INTERVALO_VERIFICACION_METADATA = None
+INTERVALO_VERIFICACION_CONFIG = None
+CACHE_API_RESULTADOS = 'default'
+CACHE_METRICAS = 'default'
+
+# Cualquier test que recorra estos caminos falla si se excede el presupuesto de consultas.
+PRESUPUESTO_CONSULTAS_ESTRICTO = True
+PRESUPUESTO_CONSULTAS = {
+    'siguiente-accion': 110,
+    'asignar-mesa': 40,
+    'carga-total': 30,
+    'carga-parcial': 30,
+    'cargar-desde-ub': 80,
+}
+
+# Los hilos abren sus propias conexiones, que no ven los datos de los tests que
+# corren dentro de una transacción.
+SUMARIZADOR_COMBINADO_HILOS = 1
+
 
 CONSTANCE_CONFIG.update({
     'SCORING_MINIMO_PARA_CONSIDERAR_QUE_FISCAL_ES_TROLL': (1500, 'Valor de scoring que debe superar un fiscal para que la aplicación lo considere troll.', int),
@@ -0,0 +1,196 @@
+"""
+Lecturas de reportes y resultados desde una réplica de la base.
+
+Las vistas de resultados y de avance de carga, las exportaciones, los changelists pesados del
+admin y los comandos de reportes sólo leen, pero compiten con la carga de datos (los
+``select_for_update`` del scheduler, las cargas, la consolidación) por la misma base. Si en
+``DATABASES`` hay una réplica (con el alias ``settings.REPLICA_ALIAS``), esos caminos leen de ella::
+
+    @vista_desde_replica
+    def mi_vista(request):
+        ...
+
+    with desde_replica():
+        ...
+
+Fuera de esos bloques (y para toda escritura) se usa la base principal. Tampoco se leen nunca de la
+réplica las sesiones, el caché en base ni los valores de Constance, que tienen que verse en el
+momento en que se escriben.
+
+Antes de usarla se verifica, como mucho cada ``settings.REPLICA_INTERVALO_VERIFICACION`` segundos,
+que la réplica responda y que su retraso respecto de la principal no supere
+``settings.REPLICA_RETRASO_MAXIMO`` segundos. Si no, se lee de la principal.
+"""
+import threading
+import time
+from contextlib import ContextDecorator
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Aplicaciones que siempre se leen de la principal.
+APPS_SIEMPRE_PRINCIPAL = {
+    'django_cache',  # DatabaseCache
+    'sessions',
+    'database',  # El backend de base de datos de Constance.
+}
+
+# Retraso de la réplica (en segundos) en PostgreSQL. Si ya aplicó todo lo que recibió, el
+# retraso es 0 aunque la última transacción sea vieja (la principal no escribió nada).
+CONSULTA_RETRASO_POSTGRES = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_local = threading.local()
+_verificaciones = {}
+_verificaciones_lock = threading.Lock()
+
+
+def alias_replica():
+    """
+    El alias de la réplica, o ``None`` si no está configurada.
+    """
+    alias = settings.REPLICA_ALIAS
+    return alias if alias in settings.DATABASES else None
+
+
+def retraso(alias):
+    """
+    Segundos de retraso de la réplica respecto de la principal.
+    """
+    conexion = connections[alias]
+    if conexion.vendor != 'postgresql':
+        return 0
+    with conexion.cursor() as cursor:
+        cursor.execute(CONSULTA_RETRASO_POSTGRES)
+        (segundos, ) = cursor.fetchone()
+    # En una base que no es réplica las funciones devuelven null.
+    return float(segundos or 0)
+
+
+def verificar_replica(alias):
+    try:
+        segundos = retraso(alias)
+    except DatabaseError:
+        logger.warning('réplica no disponible', alias=alias, exc_info=True)
+        return False
+    if segundos > settings.REPLICA_RETRASO_MAXIMO:
+        logger.warning('réplica atrasada', alias=alias, retraso=segundos)
+        return False
+    return True
+
+
+def replica_disponible():
+    """
+    El alias de la réplica si está configurada, responde y está al día; si no, ``None``.
+    """
+    alias = alias_replica()
+    if alias is None:
+        return None
+    ahora = time.monotonic()
+    with _verificaciones_lock:
+        disponible, verificada = _verificaciones.get(alias, (False, None))
+    if verificada is None or ahora - verificada >= settings.REPLICA_INTERVALO_VERIFICACION:
+        disponible = verificar_replica(alias)
+        with _verificaciones_lock:
+            _verificaciones[alias] = (disponible, ahora)
+    return alias if disponible else None
+
+
+def _pila():
+    if not hasattr(_local, 'pila'):
+        _local.pila = []
+    return _local.pila
+
+
+def alias_de_lectura():
+    """
+    El alias del que se lee en este hilo: la réplica dentro de ``desde_replica``
+    (si estaba disponible al entrar), ``None`` (lo que decida Django) si no.
+    """
+    pila = _pila()
+    return pila[-1] if pila else None
+
+
+# Para ``desde_replica``: verificar la réplica al entrar.
+_VERIFICAR = object()
+
+
+class desde_replica(ContextDecorator):
+    """
+    Dentro del bloque (o de la función decorada) las lecturas van a la réplica, si está disponible.
+
+    Con ``alias`` se lee de esa base sin verificarla. Como el estado es por hilo, sirve para que
+    los hilos que lanza un bloque lean de la misma base que él: se toma ``alias_de_lectura()``
+    antes de lanzarlos y cada hilo entra en ``desde_replica(alias)``.
+    """
+
+    def __init__(self, alias=_VERIFICAR):
+        self.alias = alias
+
+    def __enter__(self):
+        _pila().append(replica_disponible() if self.alias is _VERIFICAR else self.alias)
+        return self
+
+    def __exit__(self, *exc):
+        _pila().pop()
+        return False
+
+
+def vista_desde_replica(vista):
+    """
+    Decorador de vistas de sólo lectura. La respuesta se renderiza dentro del bloque,
+    porque los ``TemplateResponse`` recorren los querysets recién al renderizarse.
+    Para vistas basadas en clases, con ``method_decorator(vista_desde_replica, name='dispatch')``.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        with desde_replica():
+            respuesta = vista(request, *args, **kwargs)
+            if hasattr(respuesta, 'render') and callable(respuesta.render):
+                respuesta.render()
+        return respuesta
+    return envoltura
+
+
+class ChangelistDesdeReplicaMixin():
+    """
+    Mixin para los ``ModelAdmin`` con changelists pesados: el listado (GET) se lee de la réplica.
+    Las acciones (POST) y la edición usan la principal.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        return vista_desde_replica(super().changelist_view)(request, extra_context)
+
+
+class RouterReplica():
+    """
+    Router de bases (``settings.DATABASE_ROUTERS``): lee de la réplica dentro de ``desde_replica``
+    y escribe siempre en la principal, aunque la instancia se haya leído de la réplica.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in APPS_SIEMPRE_PRINCIPAL:
+            return None
+        return alias_de_lectura()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica tiene los mismos datos que la principal.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == alias_replica():
+            return False
+        return None
@@ -89,6 +89,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'escrutinio_social.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -141,8 +142,34 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASS'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT', ''),
+        # Segundos que se reutiliza cada conexión (0 es una por request; None, para siempre).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
+# Réplica de sólo lectura para los reportes y resultados (ver escrutinio_social/replica.py).
+# Se configura sólo si está DB_REPLICA_HOST; el resto de los datos de conexión son los de la principal.
+REPLICA_ALIAS = 'replica'
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES[REPLICA_ALIAS] = dict(
+        DATABASES['default'],
+        HOST=os.getenv('DB_REPLICA_HOST'),
+        PORT=os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        # En los tests la réplica es la misma base.
+        TEST={'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS = ['escrutinio_social.replica.RouterReplica']
+# Segundos de retraso respecto de la principal a partir de los cuales se deja de leer de la réplica.
+REPLICA_RETRASO_MAXIMO = 30
+# Cada cuántos segundos se vuelve a verificar el estado de la réplica.
+REPLICA_INTERVALO_VERIFICACION = 5
+# Conexiones persistentes y pools de los comandos (ver escrutinio_social/conexiones.py).
+# Si es verdadero, al empezar cada request (o cada vuelta de los comandos) se verifica que cada
+# conexión abierta responda. Cuesta una consulta por conexión, por eso está desactivado por defecto.
+DB_VERIFICAR_CONEXIONES = os.getenv('DB_VERIFICAR_CONEXIONES') == 'True'
+# Hilos de cada pool de conexiones (0 no usa pool y cada tarea lanza su propio hilo).
+POOL_CONEXIONES = {
+    'importacion_csv': int(os.getenv('POOL_IMPORTACION_CSV', 0)),
+}
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -358,6 +385,70 @@ CACHES = {
     }
 }
 
+# Registro en memoria de categorías, opciones y partidos (ver elecciones/registro_metadata.py).
+# Caché compartido entre procesos donde se publica la versión de la metadata, y cada cuántos
+# segundos cada proceso verifica si cambió. Con None no se verifica (sólo se invalida por señales
+# dentro del mismo proceso).
+CACHE_METADATA_ELECTORAL = 'dbcache'
+INTERVALO_VERIFICACION_METADATA = 30
+# Idem para los valores de Constance (ver elecciones/registro_config.py), que conviene
+# propagar rápido.
+INTERVALO_VERIFICACION_CONFIG = 5
+
+# API pública de resultados (ver api/resultados.py). Caché compartido entre procesos donde se
+# publican la generación de los resultados y las respuestas calculadas. Como la generación cambia
+# con cada consolidación, una respuesta se sigue sirviendo durante API_RESULTADOS_VIGENCIA segundos
+# aunque haya una generación más nueva. API_RESULTADOS_MAX_AGE es el max-age para navegadores y proxies.
+CACHE_API_RESULTADOS = 'dbcache'
+API_RESULTADOS_VIGENCIA = 10
+API_RESULTADOS_MAX_AGE = 5
+# Segundos que se guarda cada respuesta calculada (las combinaciones de parámetros que nadie vuelve
+# a pedir no quedan para siempre en el caché) y cantidad máxima de ids por consulta.
+API_RESULTADOS_EXPIRACION = 60 * 60
+API_RESULTADOS_MAXIMO_IDS = 50
+# Segundos que una consulta sin respuesta guardada espera a que otro proceso termine de calcularla
+# antes de responder 503.
+API_RESULTADOS_ESPERA = 5
+
+# Segundos que el navegador (o un proxy) puede reutilizar una respuesta de los autocompletes
+# de la geografía (ver elecciones/autocompletar.py).
+AUTOCOMPLETAR_MAX_AGE = 60
+
+# Segundos que el navegador puede reutilizar el árbol de la geografía de los menús laterales
+# (ver elecciones/arbol_geografia.py). Su URL cambia cuando cambia el contenido.
+ARBOL_GEOGRAFIA_MAX_AGE = 365 * 24 * 60 * 60
+
+# Chequeos de integridad de los datos (ver elecciones/system_checks.py). Si no se corren al
+# iniciar cada proceso, se corren con ``manage.py verificar_integridad``. El resultado se cachea
+# por versión de los datos, como mucho CHEQUEOS_INTEGRIDAD_TIMEOUT segundos.
+CHEQUEOS_INTEGRIDAD_AL_INICIAR = True
+CACHE_CHEQUEOS_INTEGRIDAD = 'dbcache'
+CHEQUEOS_INTEGRIDAD_TIMEOUT = 60 * 60
+
+# Instrumentación de consultas y tiempos (ver escrutinio_social/metricas.py).
+# Si METRICAS_TOKEN está definido, /metrics se accede con "Authorization: Bearer <token>";
+# si no, sólo con un usuario staff.
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN')
+METRICAS_BUCKETS_DURACION = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Caché compartido donde cada proceso (web o comando) publica sus métricas, como mucho cada
+# METRICAS_INTERVALO_PUBLICACION segundos. Las de un proceso que deja de publicar se descartan
+# a los METRICAS_EXPIRACION segundos.
+CACHE_METRICAS = 'dbcache'
+METRICAS_INTERVALO_PUBLICACION = 15
+METRICAS_EXPIRACION = 60 * 60
+# Máxima cantidad de consultas por vista (por su nombre de url) o fase. Si se supera se loguea
+# un warning; con PRESUPUESTO_CONSULTAS_ESTRICTO se lanza una excepción.
+PRESUPUESTO_CONSULTAS = {}
+PRESUPUESTO_CONSULTAS_ESTRICTO = False
+
+# Hilos del pool de cada proceso con el que SumarizadorCombinado computa en paralelo
+# las configuraciones de los distritos (ver elecciones/proyecciones.py).
+SUMARIZADOR_COMBINADO_HILOS = 4
+
+# Si es True, el Sumarizador suma los votos a partir del vector compacto de las cargas
+# testigo (Carga.votos_compactos) en lugar de agregar los VotoMesaReportado.
+SUMARIZADOR_VOTOS_COMPACTOS = False
+
 # config para el comando importar_actas
 IMAPS = json.loads(os.getenv("IMAPS", "[]"))
 
@@ -449,6 +540,10 @@ CODIGO_PARTIDO_ELLOS_BA = '135'
 # Número del Distrito Provincia de Buenos Aires
 DISTRITO_PBA = '2'
 
+# Si el resumen del avance de carga se calcula desde los contadores que se mantienen al consolidar
+# (ver elecciones/contadores_avance.py) en lugar de contar sobre las tablas de carga.
+RESUMEN_AVANCE_DESDE_CONTADORES = True
+
 # Cada cuánto tiempo actualizar el campo last_seen de un Fiscal.
 LAST_SEEN_UPDATE_INTERVAL = 2 * 60  # en segundos.
 
@@ -23,6 +23,8 @@ from fiscales.views import (
 )
 from fiscales.forms import AuthenticationFormCustomError
 
+from escrutinio_social.metricas import metricas
+
 from api import urls as api_urls
 from antitrolling import urls as antitrolling_urls
 
@@ -51,6 +53,7 @@ urlpatterns = [
     url(r'^problemas/', include(problemas_urls)),
     url(r'^antitrolling/', include(antitrolling_urls)),
     url(r'^summernote/', include('django_summernote.urls')),
+    url(r'^metrics$', metricas, name='metricas'),
 ]
 
 if settings.DEBUG:
@@ -1,7 +1,7 @@
 from django.shortcuts import redirect, render, reverse
 from urllib.parse import urlencode
 from django.db import transaction
-from constance import config
+from elecciones.registro_config import config
 
 from adjuntos.models import Attachment
 from elecciones.models import MesaCategoria
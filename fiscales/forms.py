@@ -23,6 +23,7 @@ import phonenumbers
 from .models import Fiscal
 from django.contrib.auth.models import User
 from elecciones.models import VotoMesaReportado, Categoria, Opcion, Distrito, Seccion
+from elecciones.registro_metadata import registro
 from .widgets import Select as OpcionLista
 
 class AuthenticationFormCustomError(AuthenticationForm):
@@ -298,14 +299,38 @@ class QuieroSerFiscalForm(forms.Form):
         return referido_por_codigo
 
 
+class OpcionEnMemoriaField(forms.ModelChoiceField):
+    """
+    Campo de opción que valida contra opciones ya cargadas en memoria
+    (ver ``elecciones.registro_metadata``) en lugar de consultar la base.
+    """
+
+    def __init__(self, opciones, **kwargs):
+        super().__init__(queryset=Opcion.objects.none(), **kwargs)
+        self.opciones = {str(opcion.id): opcion for opcion in opciones}
+        self.choices = [(opcion.id, opcion) for opcion in opciones]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.opciones[str(value)]
+        except KeyError:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
 class VotoMesaModelForm(forms.ModelForm):
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, opciones=None, **kwargs):
+        """
+        Si se recibe ``opciones`` (una lista de instancias de ``Opcion``) el campo
+        ``opcion`` se valida contra ella en memoria, sin consultas a la base.
+        """
+        self.opciones = opciones
         super().__init__(*args, **kwargs)
         self.fields['carga'].widget = forms.HiddenInput()
         self.fields['carga'].required = False
-        self.fields['opcion'].label = ''
-        self.fields['opcion'].widget = OpcionLista(
+        widget_opcion = OpcionLista(
             attrs={
                 # Materialize muestra el select default
                 'class': 'browser-default',
@@ -313,10 +338,23 @@ class VotoMesaModelForm(forms.ModelForm):
                 'onmousedown': '(function(e){ e.preventDefault(); })(event, this)'
             }
         )
+        if opciones is not None:
+            self.fields['opcion'] = OpcionEnMemoriaField(opciones, widget=widget_opcion)
+        else:
+            self.fields['opcion'].widget = widget_opcion
+        self.fields['opcion'].label = ''
         self.fields['votos'].label = ''
         self.fields['votos'].required = True
         self.fields['votos'].widget.attrs = {'required': ''}
 
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        if self.opciones is not None:
+            # Ya se validó contra las opciones en memoria; evitamos que el modelo
+            # verifique la existencia de la FK con otra consulta.
+            exclude.append('opcion')
+        return exclude
+
     class Meta:
         model = VotoMesaReportado
         fields = ('carga', 'opcion', 'votos')
@@ -335,11 +373,21 @@ class BaseVotoMesaReportadoFormSet(BaseModelFormSet):
         donde viene los valores de una carga parcial u opciones meta, tal cual se presentan
         pre-inicializados en el formset. Acá se reciben para verificar que estos datos
         no fueron adulterados para el requests "POST"
+
+        Opcionalmente se recibe ``opciones``, la lista de opciones de la categoría.
+        En ese caso cada formulario valida su opción contra ella, en memoria.
         """
         self.mesa = kwargs.pop('mesa')
         self.datos_previos = kwargs.pop('datos_previos')
+        self.opciones = kwargs.pop('opciones', None)
         super().__init__(*args, **kwargs)
 
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        if self.opciones is not None:
+            kwargs['opciones'] = self.opciones
+        return kwargs
+
     def add_fields(self, form, index):
         super().add_fields(form, index)
 
@@ -443,6 +491,25 @@ votomesareportadoformset_factory = partial(
 )
 
 
+def formset_de_carga(categoria, tipo):
+    """
+    Devuelve la clase de formset para cargar la categoría dada junto con la lista
+    de opciones (en el orden del acta) que corresponde a cada fila.
+
+    Ambas se arman una única vez por (categoría, tipo de carga) y se descartan
+    junto con el registro de metadata.
+    """
+    # En carga parcial sólo se cargan opciones prioritarias.
+    solo_prioritarias = tipo == 'parcial'
+
+    def armar():
+        opciones = registro.opciones_actuales(categoria, solo_prioritarias, excluir_optativas=True)
+        # Tantas filas como opciones. Como extra=0, el formset tiene un tamaño fijo.
+        return votomesareportadoformset_factory(min_num=len(opciones)), opciones
+
+    return registro.memo(('formset_de_carga', categoria.id, solo_prioritarias), armar)
+
+
 class EnviarEmailForm(forms.Form):
     asunto = forms.CharField(max_length=200)
     template = forms.CharField(widget=SummernoteWidget())
@@ -0,0 +1,30 @@
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand
+
+from fiscales.reportes import REPORTES, escribir_csv
+from escrutinio_social.replica import desde_replica
+
+
+class Command(BaseCommand):
+    help = "Genera un reporte CSV sobre la actividad de los voluntarios (ver fiscales/reportes.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('reporte', choices=sorted(REPORTES))
+        parser.add_argument(
+            '--salida', default=None,
+            help='Archivo de salida (default reporte_<reporte>_<fecha>.csv). Con "-" se escribe en stdout.'
+        )
+
+    @desde_replica()
+    def handle(self, *args, **options):
+        reporte = options['reporte']
+        salida = options['salida'] or f'reporte_{reporte}_{datetime.date.today()}.csv'
+        if salida == '-':
+            escribir_csv(reporte, sys.stdout)
+            return
+
+        with open(salida, 'w', newline='') as archivo:
+            cantidad = escribir_csv(reporte, archivo)
+        self.stdout.write(self.style.SUCCESS(f'Se escribieron {cantidad} filas en {salida}.'))
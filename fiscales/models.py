@@ -206,8 +206,7 @@ class Fiscal(models.Model):
         No se hace aquí para evitar deadlocks (ver #317), se hace desde
         acciones.py en una transacción independiente.
         """
-        distrito = mesa_categoria.mesa.distrito
-        self.asignar_attachment_o_mesacategoria(None, mesa_categoria, distrito)
+        self.asignar_attachment_o_mesacategoria(None, mesa_categoria, mesa_categoria.distrito)
 
     def asignar_attachment_o_mesacategoria(self, attachment, mesa_categoria, distrito_afin=None):
         self.attachment_asignado = attachment
@@ -0,0 +1,171 @@
+"""
+Reportes sobre la actividad de los voluntarios (fiscales): ranking de validadores,
+participación, puntaje de troll y precisión respecto de los resultados consolidados.
+
+Cada reporte es una única consulta sobre ``Fiscal``: las cantidades de cargas e identificaciones
+y los datos de contacto se resuelven con subconsultas correlacionadas (sin joins que multipliquen
+filas), y el resultado se escribe a CSV a medida que se lee de la base (``iterator()``), de modo
+que se puede correr durante la elección sobre decenas de miles de voluntarios.
+"""
+import csv
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from adjuntos.models import Identificacion
+from contacto.models import DatoDeContacto
+from elecciones.models import Carga, MesaCategoria
+from .models import Fiscal
+
+TAMANIO_LOTE = 2000
+
+STATUS_CONSOLIDADOS = [
+    MesaCategoria.STATUS.parcial_consolidada_dc, MesaCategoria.STATUS.total_consolidada_dc
+]
+
+
+def cantidad(queryset, **filtros):
+    """
+    Subconsulta con la cantidad de filas de ``queryset`` (de un modelo con FK ``fiscal``)
+    que cumplen ``filtros``, para el fiscal de la consulta externa.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(fiscal=OuterRef('pk'), **filtros).order_by().values('fiscal').annotate(
+                n=Count('*')
+            ).values('n'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def contacto(tipo):
+    """
+    Subconsulta con el primer dato de contacto del tipo dado, para el fiscal de la consulta externa.
+    """
+    return Coalesce(
+        Subquery(
+            DatoDeContacto.objects.filter(
+                content_type=ContentType.objects.get_for_model(Fiscal), object_id=OuterRef('pk'), tipo=tipo
+            ).order_by('id').values('valor')[:1]
+        ),
+        Value('-')
+    )
+
+
+def con_contacto(queryset):
+    return queryset.annotate(
+        telefono=contacto(DatoDeContacto.TIPOS.teléfono),
+        email=contacto(DatoDeContacto.TIPOS.email),
+    )
+
+
+def ranking_validadores():
+    """
+    Fiscales ordenados por la cantidad de cargas parciales que contribuyeron a una consolidación.
+    """
+    return con_contacto(
+        Fiscal.objects.annotate(
+            participaciones=cantidad(
+                Carga.objects, invalidada=False, procesada=True,
+                mesa_categoria__status=MesaCategoria.STATUS.parcial_consolidada_dc
+            )
+        ).filter(participaciones__gt=0).order_by('-participaciones', 'id')
+    )
+
+
+def participacion():
+    """
+    Actividad de cada fiscal: identificaciones y cargas (parciales y totales) realizadas.
+    """
+    return con_contacto(
+        Fiscal.objects.annotate(
+            identificaciones=cantidad(Identificacion.objects),
+            cargas_parciales=cantidad(Carga.objects, tipo=Carga.TIPOS.parcial),
+            cargas_totales=cantidad(Carga.objects, tipo=Carga.TIPOS.total),
+        ).annotate(
+            tareas=F('identificaciones') + F('cargas_parciales') + F('cargas_totales')
+        ).filter(tareas__gt=0).order_by('-tareas', 'id')
+    )
+
+
+def trolls():
+    """
+    Fiscales con puntaje de troll, marcados o no como trolls, con sus tareas invalidadas.
+    """
+    return con_contacto(
+        Fiscal.objects.filter(Q(troll=True) | Q(puntaje_scoring_troll__gt=0)).annotate(
+            identificaciones_invalidadas=cantidad(Identificacion.objects, invalidada=True),
+            cargas_invalidadas=cantidad(Carga.objects, invalidada=True),
+        ).order_by('-puntaje_scoring_troll', 'id')
+    )
+
+
+def precision():
+    """
+    Para cada fiscal, cuántas de sus cargas de mesas consolidadas coinciden con la carga testigo
+    (del mismo tipo) que se tomó como resultado.
+    """
+    consolidadas = dict(
+        procesada=True,
+        mesa_categoria__status__in=STATUS_CONSOLIDADOS,
+        mesa_categoria__carga_testigo__tipo=F('tipo'),
+    )
+    return con_contacto(
+        Fiscal.objects.annotate(
+            cargas_consolidadas=cantidad(Carga.objects, **consolidadas),
+            cargas_coincidentes=cantidad(
+                Carga.objects, firma=F('mesa_categoria__carga_testigo__firma'), **consolidadas
+            ),
+        ).filter(cargas_consolidadas__gt=0).order_by('-cargas_consolidadas', 'id')
+    )
+
+
+# nombre: (función que arma la consulta, columnas del CSV)
+REPORTES = {
+    'ranking_validadores': (
+        ranking_validadores, ['participaciones', 'nombres', 'apellido', 'email', 'telefono']
+    ),
+    'participacion': (
+        participacion, [
+            'id', 'nombres', 'apellido', 'email', 'telefono', 'identificaciones', 'cargas_parciales',
+            'cargas_totales', 'ingreso_alguna_vez', 'asignacion_ultima_tarea'
+        ]
+    ),
+    'trolls': (
+        trolls, [
+            'id', 'nombres', 'apellido', 'email', 'telefono', 'puntaje_scoring_troll', 'troll',
+            'identificaciones_invalidadas', 'cargas_invalidadas'
+        ]
+    ),
+    'precision': (
+        precision, [
+            'id', 'nombres', 'apellido', 'email', 'telefono', 'cargas_consolidadas', 'cargas_coincidentes'
+        ]
+    ),
+}
+
+
+def filas(nombre):
+    """
+    Devuelve las columnas del reporte y un iterador sobre sus filas, que se leen
+    de la base en lotes.
+    """
+    consulta, columnas = REPORTES[nombre]
+    return columnas, consulta().values_list(*columnas).iterator(chunk_size=TAMANIO_LOTE)
+
+
+def escribir_csv(nombre, archivo):
+    """
+    Escribe el reporte en ``archivo`` (abierto en modo texto) y devuelve la cantidad de filas.
+    """
+    columnas, iterador = filas(nombre)
+    writer = csv.writer(archivo)
+    writer.writerow(columnas)
+    cantidad_filas = 0
+    for fila in iterador:
+        writer.writerow(fila)
+        cantidad_filas += 1
+    return cantidad_filas
@@ -112,6 +112,29 @@ def test_formset_carga_valida_votos_para_opcion(db):
     assert formset.errors[0]['votos'][0] == 'El valor confirmado que tenemos para esta opción es 10'
 
 
+def test_formset_carga_valida_opciones_en_memoria(db, django_assert_num_queries):
+    m = MesaFactory()
+    o1, o2, otra = OpcionFactory(), OpcionFactory(), OpcionFactory()
+    Opcion.sobres()
+
+    VMRFormSet = votomesareportadoformset_factory(min_num=2)
+    data = _construir_request_data_para_carga_de_resultados(
+        [(o1.id, 10, 10), (o2.id, 5, 5)]
+    )
+    formset = VMRFormSet(data=data, mesa=m, datos_previos={}, opciones=[o1, o2])
+    with django_assert_num_queries(0):
+        assert formset.is_valid()
+    assert [form.cleaned_data['opcion'] for form in formset] == [o1, o2]
+
+    # Una opción que no está entre las recibidas no es válida.
+    data = _construir_request_data_para_carga_de_resultados(
+        [(o1.id, 10, 10), (otra.id, 5, 5)]
+    )
+    formset = VMRFormSet(data=data, mesa=m, datos_previos={}, opciones=[o1, o2])
+    assert not formset.forms[0].errors
+    assert 'opcion' in formset.forms[1].errors
+
+
 def test_formset_carga_warning_sobres_mayor_mesa_electores(db):
     m = MesaFactory()
     o1 = Opcion.sobres()
@@ -0,0 +1,149 @@
+import time
+
+import pytest
+
+from django.db import connections
+from django.urls import reverse
+
+from elecciones.models import Mesa
+from elecciones.tests.conftest import fiscal_client, setup_groups    # noqa
+from elecciones.tests.factories import MesaFactory
+from escrutinio_social.conexiones import PoolDeConexiones, registro_conexiones, reciclar_conexiones
+from escrutinio_social.metricas import (
+    CLAVE_PROCESOS, cache_metricas, exportar, medir, proceso_actual, registro_metricas, PresupuestoExcedido
+)
+
+
+@pytest.fixture(autouse=True)
+def reiniciar_metricas():
+    registro_metricas.reiniciar()
+    cache_metricas().delete(CLAVE_PROCESOS)
+
+
+def test_medir_cuenta_consultas(db):
+    MesaFactory.create_batch(2)
+    with medir('fase') as medicion:
+        list(Mesa.objects.all())
+        Mesa.objects.count()
+    assert medicion.consultas == 2
+    assert medicion.tiempo_total >= medicion.tiempo_db > 0
+
+    with medir('fase'):
+        pass
+    acumulado = registro_metricas.acumulado('fase')
+    assert acumulado['llamadas'] == 2
+    assert acumulado['consultas'] == 2
+
+
+def test_medir_presupuesto_excedido(db, settings):
+    settings.PRESUPUESTO_CONSULTAS = {'fase': 1}
+    with medir('fase'):
+        Mesa.objects.count()
+
+    with pytest.raises(PresupuestoExcedido):
+        with medir('fase'):
+            Mesa.objects.count()
+            Mesa.objects.count()
+
+    settings.PRESUPUESTO_CONSULTAS_ESTRICTO = False
+    with medir('fase'):
+        Mesa.objects.count()
+        Mesa.objects.count()
+
+
+def test_middleware_registra_por_vista(fiscal_client, settings):
+    fiscal_client.get(reverse('siguiente-accion'))
+    acumulado = registro_metricas.acumulado('siguiente-accion')
+    assert acumulado['llamadas'] == 1
+    assert 0 < acumulado['consultas'] <= settings.PRESUPUESTO_CONSULTAS['siguiente-accion']
+
+
+def test_endpoint_metricas(fiscal_client, client, settings):
+    fiscal_client.get(reverse('siguiente-accion'))
+    response = fiscal_client.get(reverse('metricas'))
+    assert response.status_code == 200
+    contenido = response.content.decode()
+    etiquetas = f'nombre="siguiente-accion",proceso="{proceso_actual()}"'
+    assert f'escrutinio_llamadas_total{{{etiquetas}}} 1' in contenido
+    assert f'escrutinio_duracion_segundos_count{{{etiquetas}}} 1' in contenido
+
+    client.logout()
+    assert client.get(reverse('metricas')).status_code == 403
+
+    settings.METRICAS_TOKEN = 'secreto'
+    response = client.get(reverse('metricas'), HTTP_AUTHORIZATION='Bearer secreto')
+    assert response.status_code == 200
+
+
+def test_metricas_de_todos_los_procesos(db, settings):
+    with medir('fase'):
+        Mesa.objects.count()
+    # Otro proceso (por ejemplo el scheduler) publicó sus métricas.
+    cache = cache_metricas()
+    otra = {
+        'acumulados': {'scheduler': {'llamadas': 3, 'consultas': 9, 'tiempo_db': 1, 'tiempo_python': 1,
+                                     'tiempo_total': 2}},
+        'buckets': {'scheduler': {10: 3}},
+        'conexiones': dict.fromkeys(registro_metricas.instantanea()['conexiones'], 1),
+    }
+    cache.set(f'{CLAVE_PROCESOS}.otro:1', otra)
+    cache.set(CLAVE_PROCESOS, dict(cache.get(CLAVE_PROCESOS), **{'otro:1': time.time()}))
+
+    contenido = registro_metricas.exportar_procesos()
+    assert f'escrutinio_llamadas_total{{nombre="fase",proceso="{proceso_actual()}"}} 1' in contenido
+    assert 'escrutinio_consultas_total{nombre="scheduler",proceso="otro:1"} 9' in contenido
+    assert 'escrutinio_duracion_segundos_bucket{nombre="scheduler",proceso="otro:1",le="10"} 3' in contenido
+    assert 'escrutinio_conexiones_abiertas{proceso="otro:1"} 1' in contenido
+    assert contenido == exportar({proceso_actual(): registro_metricas.instantanea(), 'otro:1': otra})
+
+    # Cada proceso publica como mucho una vez por intervalo.
+    with medir('fase'):
+        pass
+    assert cache.get(f'{CLAVE_PROCESOS}.{proceso_actual()}')['acumulados']['fase']['llamadas'] == 1
+    settings.METRICAS_INTERVALO_PUBLICACION = 0
+    with medir('fase'):
+        pass
+    assert cache.get(f'{CLAVE_PROCESOS}.{proceso_actual()}')['acumulados']['fase']['llamadas'] == 3
+
+
+def test_pool_de_conexiones_en_metricas():
+    # Puede haber otros pools del proceso (por ejemplo, el del sumarizador combinado).
+    otros = registro_conexiones.estado()['pool_tamanio']
+    resultados = []
+    pool = PoolDeConexiones('prueba', tamanio=2)
+    for i in range(5):
+        pool.ejecutar(resultados.append, i)
+    pool.esperar()
+    assert sorted(resultados) == list(range(5))
+    assert pool.ejecutar(sum, [1, 2]).result() == 3
+    with pytest.raises(TypeError):
+        pool.ejecutar(sum, None).result()
+    assert f'escrutinio_pool_hilos {otros + 2}' in registro_metricas.exportar()
+
+    pool.cerrar()
+    assert f'escrutinio_pool_hilos {otros}' in registro_metricas.exportar()
+
+
+def test_reciclar_conexiones_descarta_las_que_no_responden(transactional_db, settings, monkeypatch):
+    settings.DB_VERIFICAR_CONEXIONES = True
+    Mesa.objects.count()
+    assert registro_conexiones.abiertas() >= 1
+
+    descartadas = registro_conexiones.descartadas
+    monkeypatch.setattr(type(connections['default']), 'is_usable', lambda self: False)
+    reciclar_conexiones()
+    assert registro_conexiones.descartadas == descartadas + 1
+    monkeypatch.undo()
+
+    # Se vuelve a conectar sola.
+    assert Mesa.objects.count() == 0
+
+
+def test_reciclar_conexiones_no_toca_las_transacciones_en_curso(db, monkeypatch):
+    Mesa.objects.count()
+    monkeypatch.setattr(type(connections['default']), 'is_usable', lambda self: False)
+    descartadas = registro_conexiones.descartadas
+    reciclar_conexiones()
+    assert registro_conexiones.descartadas == descartadas
+    monkeypatch.undo()
+    assert Mesa.objects.count() == 0
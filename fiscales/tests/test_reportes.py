@@ -0,0 +1,72 @@
+import csv
+from io import StringIO
+
+from django.core.management import call_command
+
+from contacto.models import DatoDeContacto
+from elecciones.models import Carga, MesaCategoria
+from elecciones.tests.factories import (
+    CargaFactory, FiscalFactory, IdentificacionFactory, MesaCategoriaFactory,
+)
+from fiscales import reportes
+from fiscales.models import Fiscal
+
+
+def leer(nombre):
+    salida = StringIO()
+    reportes.escribir_csv(nombre, salida)
+    return list(csv.DictReader(StringIO(salida.getvalue())))
+
+
+def test_reportes_voluntarios(db, django_assert_num_queries):
+    f1, f2, f3 = FiscalFactory.create_batch(3)
+    f1.datos_de_contacto.create(tipo=DatoDeContacto.TIPOS.email, valor='f1@example.com')
+    f1.datos_de_contacto.create(tipo=DatoDeContacto.TIPOS.teléfono, valor='1234')
+
+    consolidada = MesaCategoriaFactory(status=MesaCategoria.STATUS.parcial_consolidada_dc)
+    parcial = dict(tipo=Carga.TIPOS.parcial, procesada=True, mesa_categoria=consolidada)
+    testigo = CargaFactory(fiscal=f1, firma='1-10', **parcial)
+    CargaFactory(fiscal=f2, firma='1-10', **parcial)
+    CargaFactory(fiscal=f3, firma='1-11', **parcial)
+    MesaCategoria.objects.filter(id=consolidada.id).update(carga_testigo=testigo)
+    otra = MesaCategoriaFactory(status=MesaCategoria.STATUS.parcial_consolidada_dc)
+    CargaFactory(fiscal=f1, firma='1-20', tipo=Carga.TIPOS.parcial, procesada=True, mesa_categoria=otra)
+    CargaFactory(fiscal=f3, tipo=Carga.TIPOS.total, invalidada=True)
+    IdentificacionFactory(fiscal=f2)
+    # Se marca al final porque las cargas de un troll nacen invalidadas.
+    Fiscal.objects.filter(id=f3.id).update(troll=True, puntaje_scoring_troll=500)
+
+    # Una única consulta por reporte, independientemente de la cantidad de fiscales.
+    reportes.ranking_validadores().count()
+    with django_assert_num_queries(1):
+        ranking = leer('ranking_validadores')
+    assert [fila['participaciones'] for fila in ranking] == ['2', '1', '1']
+    assert (ranking[0]['email'], ranking[0]['telefono']) == ('f1@example.com', '1234')
+    assert (ranking[1]['email'], ranking[1]['telefono']) == ('-', '-')
+
+    participacion = {fila['id']: fila for fila in leer('participacion')}
+    assert participacion[str(f2.id)]['identificaciones'] == '1'
+    assert participacion[str(f3.id)]['cargas_totales'] == '1'
+
+    trolls = leer('trolls')
+    assert [fila['id'] for fila in trolls] == [str(f3.id)]
+    assert trolls[0]['cargas_invalidadas'] == '1'
+
+    precision = {fila['id']: fila for fila in leer('precision')}
+    for fiscal, esperados in ((f2, ('1', '1')), (f3, ('1', '0'))):
+        fila = precision[str(fiscal.id)]
+        assert (fila['cargas_consolidadas'], fila['cargas_coincidentes']) == esperados
+    # La carga de ``otra`` no tiene testigo.
+    assert precision[str(f1.id)]['cargas_consolidadas'] == '1'
+
+
+def test_reporte_voluntarios_comando(db, tmp_path):
+    CargaFactory(
+        tipo=Carga.TIPOS.parcial, procesada=True,
+        mesa_categoria__status=MesaCategoria.STATUS.parcial_consolidada_dc
+    )
+    salida = tmp_path / 'ranking.csv'
+    call_command('reporte_voluntarios', 'ranking_validadores', salida=str(salida), stdout=StringIO())
+    filas = list(csv.reader(salida.open()))
+    assert filas[0] == reportes.REPORTES['ranking_validadores'][1]
+    assert len(filas) == 2
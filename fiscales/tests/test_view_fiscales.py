@@ -8,8 +8,10 @@ from constance.test import override_config
 
 from elecciones.tests.conftest import fiscal_client, setup_groups
 from elecciones.tests.factories import (
+    CircuitoFactory,
     DistritoFactory,
     FiscalFactory,
+    MesaFactory,
     SeccionFactory,
 )
 from django.contrib.auth.models import Group
@@ -324,3 +326,49 @@ def _hacer_call_seccion_autocomplete(client, q=None, distrito=None):
     url = reverse("autocomplete-seccion-simple") + "?" + query_string
     return client.get(url)
 
+
+def test_autocomplete_mesa_y_circuito_de_la_identificacion(db, client):
+    circuito = CircuitoFactory(numero='1A')
+    mesa = MesaFactory(numero='7', circuito=circuito)
+    MesaFactory(numero='7')
+    MesaFactory(numero='8', circuito=circuito)
+
+    def resultados(nombre, **params):
+        params['forward'] = json.dumps(params.get('forward', {}))
+        response = client.get(reverse(nombre) + '?' + parse.urlencode(params))
+        return [int(r['id']) for r in json.loads(response.content)['results']]
+
+    assert resultados('autocomplete-mesa', q='007', forward={'circuito': str(circuito.id)}) == [mesa.id]
+    assert len(resultados('autocomplete-mesa', q='7')) == 2
+    assert len(resultados('autocomplete-mesa', forward={'circuito': str(circuito.id), 'seccion': '-1'})) == 2
+    assert resultados(
+        'autocomplete-circuito', q='001a', forward={'distrito': str(circuito.seccion.distrito.id)}
+    ) == [circuito.id]
+    assert resultados('autocomplete-circuito', forward={'mesa': str(mesa.id), 'desdeMesa': '1'}) == [circuito.id]
+    assert resultados('autocomplete-seccion', forward={'mesa': str(mesa.id), 'desdeMesa': '1'}) == [
+        circuito.seccion.id
+    ]
+
+
+def test_autocomplete_por_prefijo_sin_consultar_la_base(db, client, django_assert_num_queries):
+    distrito = DistritoFactory(nombre='Buenos Aires')
+    secciones = [
+        SeccionFactory(distrito=distrito, numero=str(n), nombre=f'Sección {n}') for n in (1, 10, 2)
+    ]
+    SeccionFactory(distrito=distrito, numero='3', nombre='La Matanza')
+    url = reverse('autocomplete-seccion-simple') + '?' + parse.urlencode(
+        {'q': '1', 'forward': json.dumps({'distrito': str(distrito.id)})}
+    )
+
+    response = client.get(url)
+    # Primero la de número igual, después las de número con ese prefijo.
+    assert [r['id'] for r in json.loads(response.content)['results']] == [
+        str(secciones[0].id), str(secciones[1].id)
+    ]
+    assert 'max-age' in response['Cache-Control']
+
+    # Cargadas las opciones, las búsquedas se resuelven en memoria.
+    with django_assert_num_queries(0):
+        response = client.get(url)
+        response = client.get(reverse('autocomplete-seccion-simple') + '?q=la%20mat')
+    assert json.loads(response.content)['results'][0]['text'] == '3 - La Matanza'
@@ -12,18 +12,19 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic.detail import DetailView
 from django.utils.safestring import mark_safe
 from django.views.generic.edit import UpdateView, CreateView, FormView
+from django.views.generic.base import View
 from django.views.generic.list import ListView
+from django.utils.cache import patch_cache_control
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.views import PasswordChangeView
 from django.db import transaction
-from django.db.models import Q
 from django.utils.functional import cached_property
 
 
 from annoying.functions import get_object_or_None
 from constance import config
-from dal import autocomplete
+from dal.views import ViewMixin
 import structlog
 
 
@@ -32,12 +33,12 @@ from elecciones.models import (
     Distrito,
     Mesa,
     Carga,
-    Seccion,
-    Circuito,
     Categoria,
     MesaCategoria,
     VotoMesaReportado
 )
+from elecciones import autocompletar
+from elecciones.registro_geografia import como_lista, registro_geografia
 from .acciones import siguiente_accion, redirect_siguiente_accion
 from adjuntos.consolidacion import consolidar_cargas
 
@@ -47,7 +48,7 @@ from django.core.mail import send_mail
 from sentry_sdk import capture_exception, capture_message
 from .forms import (
     MisDatosForm,
-    votomesareportadoformset_factory,
+    formset_de_carga,
     QuieroSerFiscalForm,
     ReferidoForm,
     EnviarEmailForm,
@@ -273,36 +274,32 @@ def carga(request, mesacategoria_id, tipo='total', desde_ub=False):
     Es la vista que muestra y procesa el formset de carga de datos para una categoría-mesa.
     """
     fiscal = request.user.fiscal
-    mesa_categoria = get_object_or_404(MesaCategoria, id=mesacategoria_id)
+    mesa_categoria = get_object_or_404(
+        MesaCategoria.objects.select_related('mesa', 'categoria__categoria_general'),
+        id=mesacategoria_id
+    )
     modo_ub = desde_ub or request.GET.get('modo_ub', False)
 
     # Sólo el fiscal a quien se le asignó la mesa tiene permiso de cargar esta mc
-    if fiscal.mesa_categoria_asignada != mesa_categoria:
+    if fiscal.mesa_categoria_asignada_id != mesa_categoria.id:
         logger.warning(
             'Carga no autorizada', mc=mesa_categoria.id, tipo=tipo, ub=modo_ub,
-            tenia_mc=fiscal.mesa_categoria_asignada.id if fiscal.mesa_categoria_asignada else None
+            tenia_mc=fiscal.mesa_categoria_asignada_id
         )
         # Lo mandamos nuevamente a que se le dé algo para hacer.
         return redirect(reverse('siguiente-accion'))
 
-    # En carga parcial sólo se cargan opciones prioritarias.
-    solo_prioritarias = tipo == 'parcial'
     mesa = mesa_categoria.mesa
     categoria = mesa_categoria.categoria
     if request.method == 'GET':
         logger.info('Carga inicio', mc=mesa_categoria.id, tipo=tipo)
 
-    # Tenemos la lista de opciones ordenadas como el acta.
-    opciones = categoria.opciones_actuales(solo_prioritarias, excluir_optativas=True)
+    # Tenemos la clase del formset (precompilada por categoría y tipo de carga)
+    # y la lista de opciones ordenadas como el acta.
+    VotoMesaReportadoFormset, opciones = formset_de_carga(categoria, tipo)
 
     datos_previos = mesa_categoria.datos_previos(tipo)
 
-    # Obtenemos la clase para el formset seteando tantas filas como opciones
-    # existen. Como extra=0, el formset tiene un tamaño fijo
-    VotoMesaReportadoFormset = votomesareportadoformset_factory(
-        min_num=opciones.count()
-    )
-
     def fix_opciones(formset):
         """
         Función auxiliar que deja sólo la opción correspondiente a cada fila en los
@@ -336,7 +333,8 @@ def carga(request, mesacategoria_id, tipo='total', desde_ub=False):
     qs = VotoMesaReportado.objects.none()
     initial = [{'opcion': o, 'votos': datos_previos.get(o.id)} for o in opciones]
     formset = VotoMesaReportadoFormset(
-        data, queryset=qs, initial=initial, mesa=mesa, datos_previos=datos_previos
+        data, queryset=qs, initial=initial, mesa=mesa, datos_previos=datos_previos,
+        opciones=opciones
     )
     fix_opciones(formset)
 
@@ -591,123 +589,144 @@ class DistritoBaseListView(AutocompleteBaseListView):
         return qs
 
 
-class AjaxListView(autocomplete.Select2QuerySetView):
-    def get_result_label(self, item):
-        return item.nombre
+class AjaxListView(ViewMixin, View):
+    """
+    Base de los autocompletes de la geografía. Busca por prefijo de número o nombre
+    en memoria (ver ``elecciones.autocompletar``), filtrando por la geografía reenviada,
+    y responde en el formato de select2 sin consultar la base. Las respuestas se
+    pueden cachear ``settings.AUTOCOMPLETAR_MAX_AGE`` segundos.
+    """
+    nivel = None
+    paginate_by = 10
 
-    def get_selected_result_label(self, item):
-        return item.numero
+    def get_result_label(self, numero, nombre):
+        return nombre
 
+    def get_selected_result_label(self, numero, nombre):
+        return numero
 
-class DistritoSimpleListView(autocomplete.Select2QuerySetView):
-    model = Distrito
+    def reenviado(self, campo):
+        """
+        El id reenviado por select2 en ``campo``, o None si no hay uno ("-1" es "ninguno").
+        """
+        try:
+            id = int(self.forwarded.get(campo, None))
+        except (TypeError, ValueError):
+            return None
+        return id if id > 0 else None
 
-    def get_queryset(self):
-        qs = Distrito.objects.all()
-        lookups = Q()
-        if self.q:
-            lookups &= Q(numero=self.q) | Q(nombre__istartswith=self.q)
-        return qs.filter(lookups)
+    def ubicacion_de_mesa(self):
+        """
+        (distrito, sección, circuito) de la mesa reenviada cuando se llega desde la mesa.
+        """
+        mesa = self.reenviado('mesa')
+        if mesa is None or not self.forwarded.get('desdeMesa', None):
+            return None
+        return registro_geografia.ubicacion_de_mesa(mesa) or (None, None, None)
 
+    def padres(self):
+        """
+        Ids de los elementos padre entre cuyos hijos se busca (None es sin restricción).
+        """
+        return None
 
-class SeccionSimpleListView(autocomplete.Select2QuerySetView):
-    model = Seccion
+    def restringir(self, ids):
+        return ids
 
-    def get_queryset(self):
-        qs = Seccion.objects.all()
-        lookups = Q()
-        distrito = self.forwarded.get('distrito', None)
-        if distrito:
-            lookups &= Q(distrito_id=distrito)
-        if self.q:
-            lookups &= Q(numero=self.q) | Q(nombre__istartswith=self.q)
+    def get_ids(self, opciones_del_nivel):
+        ident = self.request.GET.get('ident', None)
+        if ident is not None:
+            try:
+                ident = int(ident)
+            except ValueError:
+                return []
+            return [ident] if opciones_del_nivel.etiqueta(ident) else []
+        return self.restringir(opciones_del_nivel.buscar(self.q.strip(), self.padres()))
 
-        return qs.filter(lookups)
+    def get(self, request, *args, **kwargs):
+        opciones_del_nivel = autocompletar.opciones(self.nivel)
+        ids = self.get_ids(opciones_del_nivel)
+        try:
+            pagina = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            pagina = 1
+        desde = (pagina - 1) * self.paginate_by
+        hasta = desde + self.paginate_by
+        resultados = []
+        for id in ids[desde:hasta]:
+            numero, nombre = opciones_del_nivel.etiqueta(id)
+            resultados.append({
+                'id': str(id),
+                'text': self.get_result_label(numero, nombre),
+                'selected_text': self.get_selected_result_label(numero, nombre),
+            })
+        response = JsonResponse({'results': resultados, 'pagination': {'more': len(ids) > hasta}})
+        patch_cache_control(response, public=True, max_age=settings.AUTOCOMPLETAR_MAX_AGE)
+        return response
+
+
+class SimpleListView(AjaxListView):
+    """
+    Autocompletes que muestran número y nombre.
+    """
 
+    def get_result_label(self, numero, nombre):
+        return f'{numero} - {nombre}'
 
-class DistritoListView(AjaxListView):
-    model = Distrito
+    def get_selected_result_label(self, numero, nombre):
+        return self.get_result_label(numero, nombre)
 
-    def get_queryset(self):
-        qs = Distrito.objects.all()
-        lookups = Q()
-        ident = self.request.GET.get('ident', None)
-        if ident is not None:
-            return qs.filter(id=ident)
-        if self.q:
-            lookups = Q(numero=self.q) | Q(nombre__istartswith=self.q)
-        return qs.filter(lookups)
+
+class DistritoSimpleListView(SimpleListView):
+    nivel = 'distrito'
+
+
+class SeccionSimpleListView(SimpleListView):
+    nivel = 'seccion'
+
+    def padres(self):
+        return como_lista(self.reenviado('distrito'))
+
+
+class DistritoListView(AjaxListView):
+    nivel = 'distrito'
 
 
 class SeccionListView(AjaxListView):
-    model = Seccion
+    nivel = 'seccion'
 
-    def get_queryset(self):
-        qs = Seccion.objects.all()
-        lookups = Q()
-        distrito = self.forwarded.get('distrito', None)
-        ident = self.request.GET.get('ident', None)
-        if ident is not None:
-            return qs.filter(id=ident)
-        if self.q:
-            lookups = Q(numero__iexact=self.q)
-        if distrito:
-            lookups &= Q(distrito_id=distrito)
-        mesa = self.forwarded.get('mesa', None)
-        desdeMesa = self.forwarded.get('desdeMesa', None)
-        if mesa and desdeMesa:
-            mesas = Mesa.objects.filter(id=mesa).values('circuito__seccion_id')
-            lookups &= Q(id__in=mesas)
-        return qs.filter(lookups)
+    def padres(self):
+        return como_lista(self.reenviado('distrito'))
+
+    def restringir(self, ids):
+        ubicacion = self.ubicacion_de_mesa()
+        return ids if ubicacion is None else [id for id in ids if id == ubicacion[1]]
 
 
 class CircuitoListView(AjaxListView):
-    model = Circuito
+    nivel = 'circuito'
 
-    def get_queryset(self):
-        qs = Circuito.objects.all()
-        lookups = Q()
-        ident = self.request.GET.get('ident', None)
-        if ident is not None:
-            return qs.filter(id=ident)
-        if self.q:
-            lookups = Q(numero__iexact=self.q)
-        seccion = self.forwarded.get('seccion', None)
-        if seccion and seccion != "-1":
-            lookups &= Q(seccion_id=seccion)
-        distrito = self.forwarded.get('distrito', None)
-        if distrito:
-            lookups &= Q(seccion__distrito_id=distrito)
-        mesa = self.forwarded.get('mesa', None)
-        desdeMesa = self.forwarded.get('desdeMesa', None)
-        if mesa and desdeMesa:
-            mesas = Mesa.objects.filter(id=mesa).values('circuito_id')
-            lookups &= Q(id__in=mesas)
-        return qs.filter(lookups)
+    def padres(self):
+        distrito, seccion = self.reenviado('distrito'), self.reenviado('seccion')
+        if distrito is None and seccion is None:
+            return None
+        return registro_geografia.secciones(distrito_id=distrito, ids=como_lista(seccion))
+
+    def restringir(self, ids):
+        ubicacion = self.ubicacion_de_mesa()
+        return ids if ubicacion is None else [id for id in ids if id == ubicacion[2]]
 
 
 class MesaListView(AjaxListView):
-    model = Mesa
-
-    def get_result_label(self, item):
-        return item.lugar_votacion.nombre
-
-    def get_selected_result_label(self, item):
-        return item.numero
-
-    def get_queryset(self):
-        qs = Mesa.objects.all()
-        lookups = Q()
-        if self.q:
-            lookups &= Q(numero__iexact=self.q)
-        circuito = self.forwarded.get('circuito',None)
-        if circuito and circuito != "-1":
-            lookups &= Q(circuito_id=circuito)
-        seccion = self.forwarded.get('seccion',None)
-        if seccion and seccion != "-1":
-            lookups &= Q(circuito__seccion_id=seccion)
-        distrito = self.forwarded.get('distrito',None)
-        if distrito:
-            lookups &= Q(circuito__seccion__distrito_id=distrito)
-        return qs.filter(lookups)
+    nivel = 'mesa'
+
+    def padres(self):
+        distrito, seccion, circuito = (
+            self.reenviado('distrito'), self.reenviado('seccion'), self.reenviado('circuito')
+        )
+        if distrito is None and seccion is None and circuito is None:
+            return None
+        return registro_geografia.circuitos(
+            distrito_id=distrito, seccion_id=seccion, ids=como_lista(circuito)
+        )
 
@@ -37,7 +37,7 @@ class Command(BaseCommand):
     def priorizar_circuito_y_cat(self, nuevas, lugar_en_cola, categoria, circuito, cant_mesas_necesarias):
         cant_mesas_existentes = MesaCategoria.objects.filter(
             categoria=categoria,
-            mesa__circuito=circuito,
+            circuito=circuito,
             carga_testigo__isnull=False,
             status__in=[
                 MesaCategoria.STATUS.parcial_consolidada_dc, MesaCategoria.STATUS.parcial_consolidada_csv
@@ -89,7 +89,7 @@ class Command(BaseCommand):
     def priorizar_mesacats(self, nuevas, lugar_en_cola, categoria, circuito, cant_necesarias):
         mcs = MesaCategoria.objects.con_carga_sensible_y_parcial_pendiente().filter(
             categoria=categoria,
-            mesa__circuito=circuito,
+            circuito=circuito,
         )[0:cant_necesarias]
 
         for mc in mcs:
@@ -98,8 +98,8 @@ class Command(BaseCommand):
                     mesa_categoria=mc,
                     orden=lugar_en_cola,
                     numero_carga=10,  # Esto es un truco para que si el scheduler normal la puso, no se pise.
-                    distrito=mc.mesa.distrito,
-                    seccion=mc.mesa.seccion
+                    distrito_id=mc.distrito_id,
+                    seccion_id=mc.seccion_id
                 )
             )
             self.success(f"Insertando mesa {mc.mesa} para circuito {circuito} en pos {lugar_en_cola}.")
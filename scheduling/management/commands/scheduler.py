@@ -2,9 +2,11 @@ import time
 import structlog
 
 from django.core.management.base import BaseCommand
-from constance import config
+from elecciones.registro_config import config
 from sentry_sdk import capture_message
 from scheduling.scheduler import scheduler
+from escrutinio_social.conexiones import reciclar_conexiones
+from escrutinio_social.metricas import medir
 from adjuntos.management.commands.consolidar_identificaciones_y_cargas import consolidador
 
 logger = structlog.get_logger('scheduler')
@@ -40,6 +42,7 @@ class Command(BaseCommand):
                 finalizar = True
 
     def una_ronda(self, options):
+        reciclar_conexiones()
         if not options['no_llamar_al_consolidador']:
             consolidador(cant_por_iteracion=options['cant_elem_consolidador'], ejecutado_desde='Scheduler')
         self.ronda_consolidador += 1
@@ -51,7 +54,8 @@ class Command(BaseCommand):
             reconstruir_la_cola = False
 
         try:
-            (cant_tareas, cant_cargas, cant_ident) = scheduler(reconstruir_la_cola)
+            with medir('scheduler', reconstruir_la_cola=reconstruir_la_cola):
+                (cant_tareas, cant_cargas, cant_ident) = scheduler(reconstruir_la_cola)
             logger.debug(
                 'Encolado',
                 tareas=cant_tareas,
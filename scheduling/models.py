@@ -3,7 +3,7 @@ from django.db.models import Q, F, ExpressionWrapper, Case, When
 from django.contrib.sessions.models import Session
 from django.utils import timezone
 from django.conf import settings
-from constance import config
+from elecciones.registro_config import config
 from datetime import timedelta
 
 from elecciones.models import (Distrito, Seccion, Categoria, MesaCategoria)
@@ -1,7 +1,8 @@
 from django.db import transaction
-from constance import config
+from django.db.models import Exists, OuterRef
+from elecciones.registro_config import config
 from django.conf import settings
-from adjuntos.models import Attachment
+from adjuntos.models import Attachment, Identificacion
 from elecciones.models import MesaCategoria
 from .models import ColaCargasPendientes, count_active_sessions
 
@@ -36,8 +37,21 @@ def scheduler(reconstruir_la_cola=False):
     mc_con_carga_importante = MesaCategoria.objects.con_carga_sensible_y_parcial_pendiente()
     cant_cargas_parcial = mc_con_carga_importante.count()
 
-    identificaciones = iter(attachments_sin_identificar.priorizadas())
-    cargas = iter(mc_con_carga_pendiente.ordenadas_por_prioridad_batch())
+    # Cada ronda encola a lo sumo `long_cola` elementos, así que sólo se traen los
+    # `long_cola` más prioritarios de cada tipo, con todo lo necesario para encolarlos,
+    # y la cantidad de consultas no depende del tamaño del backlog.
+    tope = max(long_cola, 0)
+    identificaciones = iter(
+        attachments_sin_identificar.priorizadas().select_related('pre_identificacion').annotate(
+            tiene_identificaciones=Exists(Identificacion.objects.filter(attachment=OuterRef('pk')))
+        )[:tope]
+    )
+    cargas = iter(mc_con_carga_pendiente.ordenadas_por_prioridad_batch().only(
+        'id', 'status', 'distrito', 'seccion'
+    )[:tope])
+
+    # Se lee una sola vez para toda la ronda.
+    coeficiente_identificacion_vs_carga = config.COEFICIENTE_IDENTIFICACION_VS_CARGA
 
     nuevas, k, num_cargas, num_idents = [], orden_inicial, 0, 0
 
@@ -52,7 +66,7 @@ def scheduler(reconstruir_la_cola=False):
         # "suficientemente menos" involucra el multiplicador `COEFICIENTE_IDENTIFICACION_VS_CARGA`.
         turno_mc = (
             (cant_cargas_parcial > 0 and cant_fotos == 0) or
-            cant_fotos < cant_cargas_parcial * config.COEFICIENTE_IDENTIFICACION_VS_CARGA
+            cant_fotos < cant_cargas_parcial * coeficiente_identificacion_vs_carga
         )
 
         # La bandera `turno_mc` indica turno respecto a cantidad de
@@ -83,8 +97,8 @@ def scheduler(reconstruir_la_cola=False):
                         mesa_categoria=mc,
                         orden=k,
                         numero_carga=i,
-                        distrito=mc.mesa.distrito,
-                        seccion=mc.mesa.seccion
+                        distrito_id=mc.distrito_id,
+                        seccion_id=mc.seccion_id
                     )
                 )
                 k += 1
@@ -100,17 +114,18 @@ def scheduler(reconstruir_la_cola=False):
 
             cant_unidades = settings.MIN_COINCIDENCIAS_IDENTIFICACION
             # Si hay alguna identificación asumimos que sólo falta una para consolidar.
-            if foto.identificaciones.exists():
+            if foto.tiene_identificaciones:
                 cant_unidades = 1
 
+            pre_identificacion = foto.pre_identificacion
             for i in range(cant_unidades):
                 nuevas.append(
                     ColaCargasPendientes(
                         attachment=foto,
                         orden=k,
                         numero_carga=i,
-                        distrito=foto.distrito_preidentificacion,
-                        seccion=foto.seccion_preidentificacion
+                        distrito_id=pre_identificacion.distrito_id if pre_identificacion else None,
+                        seccion_id=pre_identificacion.seccion_id if pre_identificacion else None
                     )
                 )
                 k += 1
@@ -11,11 +11,15 @@ from elecciones.tests.factories import (
     MesaFactory,
     OpcionFactory,
     VotoMesaReportadoFactory,
-    FiscalFactory
+    FiscalFactory,
+    PreidentificacionFactory,
+    DistritoFactory,
 )
 
 from elecciones.tests.conftest import fiscal_client, setup_groups, fiscal_client_from_fiscal    # noqa
 from constance.test import override_config
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from scheduling.models import ColaCargasPendientes
 from adjuntos.models import Identificacion, Attachment
 from adjuntos.consolidacion import consumir_novedades_identificacion, consumir_novedades_carga
@@ -81,6 +85,46 @@ def test_scheduler(db, settings):
         assert i in cola_primera
 
 
+def test_scheduler_consultas_no_dependen_del_backlog(db):
+    categoria = CategoriaFactory(sensible=True)
+
+    def agregar_backlog(cantidad):
+        for _ in range(cantidad):
+            # Una foto con una identificación y preidentificación, y otra sin nada.
+            IdentificacionFactory(
+                attachment__pre_identificacion=PreidentificacionFactory(distrito=DistritoFactory()),
+                status=Identificacion.STATUS.identificada, source=Identificacion.SOURCES.web,
+            )
+            AttachmentFactory()
+            # Una mesa identificada con carga pendiente.
+            IdentificacionFactory(
+                mesa=MesaFactory(categorias=[categoria]),
+                status=Identificacion.STATUS.identificada, source=Identificacion.SOURCES.csv,
+            )
+        consumir_novedades_identificacion()
+
+    def consultas_del_scheduler():
+        ColaCargasPendientes.objects.all().delete()
+        with CaptureQueriesContext(connection) as contexto:
+            scheduler()
+        return len(contexto)
+
+    with override_config(
+        COTA_INFERIOR_COLA_TAREAS=12, FACTOR_LARGO_COLA_POR_USUARIOS_ACTIVOS=1,
+        COEFICIENTE_IDENTIFICACION_VS_CARGA=10
+    ):
+        agregar_backlog(4)
+        # La primera corrida además completa la caché de constance.
+        consultas_del_scheduler()
+        consultas = consultas_del_scheduler()
+        assert ColaCargasPendientes.objects.filter(attachment__isnull=False).exists()
+        assert ColaCargasPendientes.objects.filter(mesa_categoria__isnull=False).exists()
+        assert ColaCargasPendientes.objects.filter(distrito__isnull=False, attachment__isnull=False).exists()
+
+        agregar_backlog(8)
+        assert consultas_del_scheduler() == consultas
+
+
 def consumir(es_attachment=True):
     """
     Consumo una tarea y espero que sea attachment (o no).